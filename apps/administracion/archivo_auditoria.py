@@ -0,0 +1,188 @@
+"""
+Archivo de los meses de auditoría ya cerrados.
+
+Cada mes archivado queda en AUDITORIA_ARCHIVO_DIR como
+auditoria_AAAA_MM.jsonl.gz: una línea JSON por registro, en orden
+(timestamp, id), con permisos de solo lectura. manifiesto.json guarda por
+archivo su sha256, la cantidad de registros y el mes que cubre. El mes
+solo se elimina de la BD (la partición en PostgreSQL, las filas en SQLite,
+que no se particiona) después de releer el archivo y comprobar la
+cantidad de registros.
+
+Los archivos se conservan AUDITORIA_RETENCION_ANIOS años (Decreto 7/2023);
+purgar_vencidos() elimina los que superan ese plazo y lo anota en el
+manifiesto.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import stat
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Auditoria
+from .particiones import (
+    TABLA_BASE, inicio_mes, mes_de, mes_siguiente, modelo_particion, nombre_particion,
+    particiones_existentes,
+)
+
+
+NOMBRE_MANIFIESTO = 'manifiesto.json'
+
+
+@dataclass
+class ArchivoMes:
+    """Resultado de archivar un mes."""
+    archivo: str
+    registros: int
+    sha256: str
+
+
+def restar_meses(anio, mes, cantidad):
+    indice = anio * 12 + (mes - 1) - cantidad
+    return indice // 12, indice % 12 + 1
+
+
+def _directorio():
+    directorio = Path(settings.AUDITORIA_ARCHIVO_DIR)
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
+
+
+def _sha256(ruta):
+    resumen = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(1024 * 1024), b''):
+            resumen.update(bloque)
+    return resumen.hexdigest()
+
+
+def _escribir_solo_lectura(ruta, escribir):
+    """Escribe en un temporal, lo reemplaza de forma atómica y lo deja en 0444."""
+    temporal = ruta.with_name(ruta.name + '.tmp')
+    escribir(temporal)
+    if ruta.exists():
+        os.chmod(ruta, stat.S_IWUSR | stat.S_IRUSR)
+    os.replace(temporal, ruta)
+    os.chmod(ruta, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+
+def leer_manifiesto():
+    ruta = _directorio() / NOMBRE_MANIFIESTO
+    if not ruta.exists():
+        return {}
+    with open(ruta, encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+def _guardar_manifiesto(manifiesto):
+    def escribir(temporal):
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(manifiesto, archivo, indent=2, sort_keys=True)
+    _escribir_solo_lectura(_directorio() / NOMBRE_MANIFIESTO, escribir)
+
+
+def meses_archivables(conservar, ahora=None, conexion=connection):
+    """
+    Meses con registros (particiones en PostgreSQL) anteriores a los
+    últimos `conservar` meses cerrados. El mes en curso nunca se archiva.
+    """
+    limite = restar_meses(*mes_de(ahora or timezone.now()), conservar)
+    if conexion.vendor == 'postgresql':
+        return [mes for mes in particiones_existentes(conexion) if mes < limite]
+    fechas = Auditoria.objects.using(conexion.alias).filter(
+        timestamp__lt=inicio_mes(*limite)
+    ).dates('timestamp', 'month')
+    return [(fecha.year, fecha.month) for fecha in fechas]
+
+
+def archivar_mes(anio, mes, conexion=connection):
+    """Exporta el mes a JSONL comprimido y lo elimina de la BD."""
+    desde, hasta = inicio_mes(anio, mes), inicio_mes(*mes_siguiente(anio, mes))
+    if conexion.vendor == 'postgresql':
+        registros_mes = modelo_particion(anio, mes).objects.using(conexion.alias)
+    else:
+        registros_mes = Auditoria.objects.using(conexion.alias).filter(timestamp__gte=desde, timestamp__lt=hasta)
+    campos = [campo.attname for campo in Auditoria._meta.local_fields]
+    tabla = nombre_particion(anio, mes)
+    ruta = _directorio() / f'{tabla}.jsonl.gz'
+    registros = 0
+
+    def escribir(temporal):
+        nonlocal registros
+        filas = registros_mes.order_by('timestamp', 'id').values(*campos)
+        with gzip.open(temporal, 'wt', encoding='utf-8') as salida:
+            for fila in filas.iterator(chunk_size=2000):
+                salida.write(json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+                registros += 1
+        with gzip.open(temporal, 'rt', encoding='utf-8') as entrada:
+            releidos = sum(1 for _ in entrada)
+        if releidos != registros:
+            raise ValueError(f'{ruta.name}: se escribieron {registros} registros y se leyeron {releidos}')
+
+    _escribir_solo_lectura(ruta, escribir)
+    resultado = ArchivoMes(archivo=ruta.name, registros=registros, sha256=_sha256(ruta))
+
+    manifiesto = leer_manifiesto()
+    manifiesto[ruta.name] = {
+        'mes': f'{anio}-{mes:02d}',
+        'registros': resultado.registros,
+        'sha256': resultado.sha256,
+        'archivado': timezone.now().isoformat(),
+    }
+    _guardar_manifiesto(manifiesto)
+
+    with transaction.atomic(using=conexion.alias), conexion.cursor() as cursor:
+        if conexion.vendor == 'postgresql':
+            cursor.execute(f'ALTER TABLE {TABLA_BASE} DETACH PARTITION {tabla}')
+            cursor.execute(f'DROP TABLE {tabla}')
+        else:
+            # DELETE directo: Auditoria.delete() impide eliminar registros,
+            # pero el mes ya quedó en un archivo verificado
+            cursor.execute(
+                f'DELETE FROM "{TABLA_BASE}" WHERE "timestamp" >= %s AND "timestamp" < %s',
+                [conexion.ops.adapt_datetimefield_value(desde), conexion.ops.adapt_datetimefield_value(hasta)],
+            )
+    return resultado
+
+
+def verificar_archivos():
+    """Compara cada archivo del manifiesto con su sha256. Retorna los errores."""
+    directorio = _directorio()
+    errores = []
+    for nombre, entrada in sorted(leer_manifiesto().items()):
+        if entrada.get('purgado'):
+            continue
+        ruta = directorio / nombre
+        if not ruta.exists():
+            errores.append(f'{nombre}: no existe')
+        elif _sha256(ruta) != entrada['sha256']:
+            errores.append(f'{nombre}: sha256 no coincide')
+    return errores
+
+
+def purgar_vencidos(ahora=None):
+    """Elimina los archivos con más de AUDITORIA_RETENCION_ANIOS años."""
+    limite = restar_meses(*mes_de(ahora or timezone.now()), 12 * settings.AUDITORIA_RETENCION_ANIOS)
+    manifiesto = leer_manifiesto()
+    purgados = []
+    for nombre, entrada in sorted(manifiesto.items()):
+        anio, mes = (int(parte) for parte in entrada['mes'].split('-'))
+        if entrada.get('purgado') or (anio, mes) >= limite:
+            continue
+        ruta = _directorio() / nombre
+        if ruta.exists():
+            os.chmod(ruta, stat.S_IWUSR | stat.S_IRUSR)
+            ruta.unlink()
+        entrada['purgado'] = timezone.now().isoformat()
+        purgados.append(nombre)
+    if purgados:
+        _guardar_manifiesto(manifiesto)
+    return purgados
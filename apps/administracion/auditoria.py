@@ -0,0 +1,288 @@
+"""
+Escritura diferida de los registros de auditoría.
+
+registrar_auditoria() no inserta en la BD durante la solicitud. El registro
+se serializa a una línea JSON, se anexa al spool local del proceso
+(AUDITORIA_SPOOL_DIR/auditoria-<pid>.jsonl) y se agrega a una cola en
+memoria. La cola se inserta con un único bulk_create cuando:
+
+- acumula AUDITORIA_LOTE registros, o
+- el registro más antiguo lleva AUDITORIA_INTERVALO segundos esperando.
+
+La condición se revisa al terminar cada solicitud (señal request_finished,
+que el servidor envía después de entregar la respuesta) y al salir del
+proceso. Tras un bulk_create exitoso el spool se reescribe solo con lo que
+siga pendiente.
+
+Si un proceso muere con registros pendientes, su spool queda en disco y el
+siguiente proceso que vacíe su cola lo recupera. La entrega es "al menos
+una vez": una caída entre el insert y la reescritura del spool puede
+duplicar registros, pero no perderlos.
+
+El timestamp se fija al registrar, no al insertar. bulk_create solo inserta,
+por lo que Auditoria.save() y delete() mantienen su inmutabilidad.
+
+Con AUDITORIA_MODO = 'sincrono' cada registro se inserta de inmediato
+(el runner de tests usa este modo). vaciar() fuerza la escritura de todo
+lo pendiente.
+"""
+
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Auditoria
+
+
+logger = logging.getLogger('apps')
+
+_PATRON_SPOOL = re.compile(r'^auditoria-(\d+)(?:-\d+)?\.jsonl$')
+
+
+def _proceso_activo(pid):
+    """Indica si existe un proceso con ese pid."""
+    if os.name == 'nt':
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        codigo = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(codigo))
+        kernel32.CloseHandle(handle)
+        return codigo.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _construir(linea):
+    datos = json.loads(linea)
+    datos['timestamp'] = parse_datetime(datos['timestamp'])
+    return Auditoria(**datos)
+
+
+def _insertar(lineas):
+    """
+    Inserta las líneas con bulk_create. Si el lote falla por integridad
+    (p. ej. un usuario que ya no existe) se reintenta fila a fila para no
+    bloquear al resto; las filas inválidas se registran en el log.
+    """
+    try:
+        with transaction.atomic():
+            Auditoria.objects.bulk_create(
+                [_construir(linea) for linea in lineas],
+                batch_size=settings.AUDITORIA_LOTE,
+            )
+        return len(lineas)
+    except IntegrityError:
+        insertados = 0
+        for linea in lineas:
+            try:
+                with transaction.atomic():
+                    Auditoria.objects.bulk_create([_construir(linea)])
+                insertados += 1
+            except IntegrityError:
+                logger.error('Registro de auditoría descartado por integridad: %s', linea)
+        return insertados
+
+
+class EscritorAuditoria:
+    """Cola en memoria respaldada por un spool en disco, por proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vaciando = threading.Lock()
+        self._pid = None
+        self._pendientes = []
+        self._desde = None
+
+    def _directorio(self):
+        return Path(settings.AUDITORIA_SPOOL_DIR)
+
+    def _ruta_spool(self):
+        return self._directorio() / f'auditoria-{self._pid}.jsonl'
+
+    def _verificar_proceso(self):
+        """
+        Tras un fork la cola heredada pertenece al spool del proceso padre:
+        el hijo parte vacío con su propio spool.
+        """
+        if self._pid != os.getpid():
+            if self._pid is None:
+                atexit.register(self._vaciar_al_salir)
+            self._pid = os.getpid()
+            self._pendientes = []
+            self._desde = None
+
+    def _anexar(self, lineas):
+        ruta = self._ruta_spool()
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        with open(ruta, 'a', encoding='utf-8') as spool:
+            spool.write(''.join(f'{linea}\n' for linea in lineas))
+            spool.flush()
+            if settings.AUDITORIA_SPOOL_FSYNC:
+                os.fsync(spool.fileno())
+        self._pendientes.extend(lineas)
+        if self._desde is None:
+            self._desde = time.monotonic()
+
+    def _reescribir_spool(self):
+        ruta = self._ruta_spool()
+        if not self._pendientes:
+            ruta.unlink(missing_ok=True)
+            return
+        temporal = ruta.with_suffix('.tmp')
+        with open(temporal, 'w', encoding='utf-8') as spool:
+            spool.write(''.join(f'{linea}\n' for linea in self._pendientes))
+        os.replace(temporal, ruta)
+
+    def registrar(self, registro):
+        """Agrega un registro (dict de campos de Auditoria) a la cola."""
+        linea = json.dumps(registro, cls=DjangoJSONEncoder, ensure_ascii=False)
+        with self._lock:
+            self._verificar_proceso()
+            self._anexar([linea])
+
+    def pendientes(self):
+        with self._lock:
+            return len(self._pendientes) if self._pid == os.getpid() else 0
+
+    def debe_vaciar(self):
+        """Indica si se alcanzó el umbral de tamaño o de tiempo."""
+        with self._lock:
+            if self._pid != os.getpid() or not self._pendientes:
+                return False
+            return (
+                len(self._pendientes) >= settings.AUDITORIA_LOTE
+                or time.monotonic() - self._desde >= settings.AUDITORIA_INTERVALO
+            )
+
+    def recuperar_huerfanos(self):
+        """
+        Incorpora a la cola los spools de procesos que ya no existen.
+        Cada archivo se renombra antes de leerlo, de modo que un solo
+        proceso lo reclama.
+        """
+        directorio = self._directorio()
+        if not directorio.is_dir():
+            return 0
+        recuperados = 0
+        for ruta in directorio.iterdir():
+            coincidencia = _PATRON_SPOOL.match(ruta.name)
+            if not coincidencia:
+                continue
+            pid = int(coincidencia.group(1))
+            if pid == os.getpid() or _proceso_activo(pid):
+                continue
+            reclamado = directorio / f'auditoria-{os.getpid()}-{pid}.jsonl'
+            try:
+                os.rename(ruta, reclamado)
+            except OSError:
+                continue  # otro proceso lo reclamó primero
+            with open(reclamado, encoding='utf-8') as spool:
+                lineas = [linea.strip() for linea in spool if linea.strip()]
+            validas = []
+            for linea in lineas:
+                try:
+                    json.loads(linea)
+                except ValueError:
+                    # Línea cortada por la caída del proceso
+                    logger.warning('Línea de spool de auditoría ilegible en %s', ruta.name)
+                    continue
+                validas.append(linea)
+            if validas:
+                with self._lock:
+                    self._verificar_proceso()
+                    self._anexar(validas)
+            reclamado.unlink()
+            recuperados += len(validas)
+        if recuperados:
+            logger.info('Recuperados %s registros de auditoría de spools huérfanos', recuperados)
+        return recuperados
+
+    def vaciar(self):
+        """
+        Inserta todo lo pendiente (incluidos los spools huérfanos) y retorna
+        la cantidad insertada. Si la BD falla, los registros vuelven a la
+        cola y el spool no se toca.
+        """
+        with self._vaciando:
+            self.recuperar_huerfanos()
+            with self._lock:
+                if self._pid != os.getpid() or not self._pendientes:
+                    return 0
+                lote = self._pendientes
+                self._pendientes = []
+                self._desde = None
+            try:
+                insertados = _insertar(lote)
+            except DatabaseError:
+                logger.exception('No se pudo vaciar la cola de auditoría (%s registros)', len(lote))
+                with self._lock:
+                    self._pendientes = lote + self._pendientes
+                    self._desde = time.monotonic()
+                return 0
+            with self._lock:
+                self._reescribir_spool()
+            return insertados
+
+    def _vaciar_al_salir(self):
+        try:
+            self.vaciar()
+        except Exception:  # pragma: no cover - el spool conserva los registros
+            logger.exception('Error al vaciar la cola de auditoría al salir')
+
+
+escritor = EscritorAuditoria()
+
+
+def registrar_auditoria(usuario, accion, descripcion, modelo='', objeto_id=None,
+                        ip_address=None, user_agent='', datos_anteriores=None,
+                        datos_nuevos=None):
+    """
+    Registra una acción de auditoría. Acepta los mismos campos que
+    Auditoria.objects.create().
+    """
+    registro = {
+        'usuario_id': usuario.pk,
+        'accion': accion,
+        'modelo': modelo,
+        'objeto_id': objeto_id,
+        'descripcion': descripcion,
+        'ip_address': ip_address,
+        'user_agent': user_agent,
+        'datos_anteriores': datos_anteriores,
+        'datos_nuevos': datos_nuevos,
+        'timestamp': timezone.now(),
+    }
+    if settings.AUDITORIA_MODO == 'sincrono':
+        Auditoria.objects.create(**registro)
+    else:
+        escritor.registrar(registro)
+
+
+def vaciar():
+    """Escribe en la BD los registros pendientes de este proceso."""
+    return escritor.vaciar()
+
+
+def vaciar_si_corresponde():
+    """Vacía la cola si alcanzó el umbral de tamaño o de tiempo."""
+    if escritor.debe_vaciar():
+        escritor.vaciar()
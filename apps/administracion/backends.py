@@ -1,5 +1,7 @@
 from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
 from apps.administracion.models import Usuario
+from apps.administracion.sesion import cargar_usuario
 
 
 class RUTAuthenticationBackend(ModelBackend):
@@ -10,33 +12,41 @@ class RUTAuthenticationBackend(ModelBackend):
     
     def authenticate(self, request, username=None, password=None, **kwargs):
         """
-        Permite autenticación con RUT además de username.
-        Verifica que la cuenta no esté bloqueada.
+        Permite autenticación con RUT además de username, con una sola
+        búsqueda del usuario. El usuario encontrado queda en
+        request.usuario_login para que login_view registre el fallo sin
+        volver a buscarlo.
+        
+        Una cuenta bloqueada o inactiva no verifica la contraseña real, pero
+        calcula un hash de relleno como un identificador inexistente: el
+        tiempo de respuesta no revela qué cuentas existen ni cuáles están
+        bloqueadas. Si el usuario existe pero no puede ingresar se lanza
+        PermissionDenied para detener la cadena de backends; si no existe se
+        retorna None y los backends siguientes pueden intentarlo.
         """
-        try:
-            # Intentar buscar por RUT primero
-            user = Usuario.objects.get(rut=username)
-        except Usuario.DoesNotExist:
-            try:
-                # Si no existe por RUT, intentar por username
-                user = Usuario.objects.get(username=username)
-            except Usuario.DoesNotExist:
-                return None
+        if username is None or password is None:
+            return None
+        user = Usuario.objects.por_identificador(username)
+        if request is not None:
+            request.usuario_login = user
         
-        # Verificar contraseña
-        if user.check_password(password):
-            # Verificar que la cuenta no esté bloqueada
-            if user.cuenta_bloqueada or not user.activo:
+        if user is None or user.cuenta_bloqueada or not user.activo:
+            # Mismo costo que verificar la contraseña de una cuenta habilitada
+            Usuario().set_password(password)
+            if user is None:
                 return None
-            return user
+            raise PermissionDenied
         
-        return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        raise PermissionDenied
     
     def get_user(self, user_id):
         """
-        Obtiene usuario por ID.
+        Obtiene el usuario de la sesión desde la caché (ver sesion.py).
+        Una cuenta bloqueada o inactiva pierde la sesión.
         """
-        try:
-            return Usuario.objects.get(pk=user_id)
-        except Usuario.DoesNotExist:
+        user = cargar_usuario(user_id)
+        if user is None or user.cuenta_bloqueada or not user.activo or not user.is_active:
             return None
+        return user
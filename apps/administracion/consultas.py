@@ -0,0 +1,226 @@
+"""
+Presupuesto de consultas por solicitud y detección de N+1.
+
+MedidorConsultasMiddleware instala un execute_wrapper sobre la conexión
+primaria y la de la réplica (BD_REPLICA_ALIAS) durante la solicitud, de
+modo que las vistas analíticas también se miden, y registra cuántas consultas se ejecutan, el tiempo
+total en la BD y cuántas veces se repite cada "forma" de SQL (la
+sentencia con los literales reemplazados por ?). Una misma forma repetida
+muchas veces suele ser un N+1: un __str__ o una plantilla que recorre una
+relación por cada fila.
+
+Al terminar, la solicitud se compara con el presupuesto de su vista
+(PRESUPUESTOS, por nombre de URL). Los excesos y las formas repetidas se
+registran en el logger 'apps'. Con CONSULTAS_ESTRICTO se lanza
+PresupuestoExcedido, lo que hace fallar el test que hizo la solicitud
+(ver PresupuestoConsultasMixin).
+
+No depende de DEBUG: el execute_wrapper funciona también en producción.
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+logger = logging.getLogger('apps')
+
+
+# Consultas máximas por nombre de URL (incluye sesión, usuario y auditoría).
+# Una entrada 'espacio:' cubre todas las URL de ese namespace; las vistas
+# sin entrada usan CONSULTAS_PRESUPUESTO_DEFECTO.
+PRESUPUESTOS = {
+    # admin de Django (listados de 100 filas con list_select_related)
+    'admin:': 15,
+    # administracion
+    'metricas': 4,
+    'login': 8,
+    'logout': 6,
+    'dashboard': 4,
+    'dashboard_general': 15,
+    'dashboard_matrona': 15,
+    'dashboard_medico': 15,
+    'dashboard_pediatra': 15,
+    'dashboard_enfermera': 15,
+    'dashboard_puericultura': 15,
+    'dashboard_administrativo': 15,
+    'dashboard_jefe': 15,
+    'historial_auditoria': 10,
+    'lista_usuarios': 6,
+    'crear_usuario': 10,
+    'editar_usuario': 10,
+    'cambiar_password': 10,
+    'restablecer_password': 10,
+    'forzar_cambio_password': 10,
+    'perfil_usuario': 6,
+    'test_error_403': 4,
+    'test_error_404': 4,
+    'test_error_500': 4,
+    # pacientes
+    'buscar_paciente': 8,
+    'detalle_paciente': 12,
+    'api_linea_tiempo': 12,
+    'crear_paciente': 12,
+    # obstetricia
+    'registrar_parto': 25,
+    'detalle_parto': 10,
+    'tamizaje_prenatal': 6,
+    'api_tamizaje': 6,
+    # neonatologia
+    'registrar_recien_nacido': 30,
+    'detalle_recien_nacido': 10,
+    # reportes
+    'generar_pdf_parto': 12,
+    'listado_alertas': 12,
+    'detalle_alerta': 8,
+    'atender_alerta': 10,
+    'resolver_alerta': 10,
+    'dashboard_alertas': 12,
+    'api_alertas_activas': 6,
+    'stream_alertas_activas': 4,
+    'seleccionar_reporte': 4,
+    'generar_reporte_pdf': 12,
+    'estado_reporte': 6,
+    'descargar_reporte': 6,
+    'exportar_reporte': 8,
+}
+
+_NUMEROS = re.compile(r'\b\d+(\.\d+)?\b')
+_CADENAS = re.compile(r"'(?:[^']|'')*'")
+_LISTAS_IN = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+
+
+class PresupuestoExcedido(AssertionError):
+    """La solicitud superó el presupuesto de consultas (modo estricto)."""
+
+
+def forma_sql(sql):
+    """SQL con literales y listas IN normalizados, para agrupar repeticiones."""
+    forma = _CADENAS.sub('?', sql)
+    forma = _NUMEROS.sub('?', forma)
+    return _LISTAS_IN.sub('IN (...)', forma)
+
+
+@dataclass
+class RegistroConsultas:
+    """Consultas ejecutadas durante una solicitud."""
+    total: int = 0
+    duracion: float = 0.0
+    formas: Counter = field(default_factory=Counter)
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duracion += time.perf_counter() - inicio
+            self.total += 1
+            self.formas[forma_sql(sql)] += 1
+
+    def repetidas(self, minimo):
+        """Formas ejecutadas al menos `minimo` veces, de la más repetida a la menos."""
+        return [(forma, veces) for forma, veces in self.formas.most_common() if veces >= minimo]
+
+
+def _alias_medidos():
+    """La primaria y, si está definida, la réplica de lectura."""
+    alias = [DEFAULT_DB_ALIAS]
+    if settings.BD_REPLICA_ALIAS in settings.DATABASES:
+        alias.append(settings.BD_REPLICA_ALIAS)
+    return alias
+
+
+@contextmanager
+def medir_consultas(alias=None):
+    """
+    Context manager que entrega el RegistroConsultas del bloque. Suma las
+    consultas de las conexiones `alias` (por defecto, _alias_medidos()).
+    """
+    registro = RegistroConsultas()
+    with ExitStack() as pila:
+        for nombre in alias or _alias_medidos():
+            pila.enter_context(connections[nombre].execute_wrapper(registro))
+        yield registro
+
+
+def presupuesto_de(nombre_url):
+    """Presupuesto de la vista ('nombre' o 'espacio:nombre')."""
+    if nombre_url in PRESUPUESTOS:
+        return PRESUPUESTOS[nombre_url]
+    espacio, _, _ = (nombre_url or '').rpartition(':')
+    if espacio and f'{espacio}:' in PRESUPUESTOS:
+        return PRESUPUESTOS[f'{espacio}:']
+    return settings.CONSULTAS_PRESUPUESTO_DEFECTO
+
+
+def problemas(registro, nombre_url):
+    """Mensajes con lo que esté fuera de lo esperado; lista vacía si nada."""
+    mensajes = []
+    presupuesto = presupuesto_de(nombre_url)
+    if registro.total > presupuesto:
+        mensajes.append(f'{registro.total} consultas (presupuesto {presupuesto})')
+    for forma, veces in registro.repetidas(settings.CONSULTAS_REPETICIONES_MAX):
+        mensajes.append(f'posible N+1: {veces}x {forma[:200]}')
+    return mensajes
+
+
+class MedidorConsultasMiddleware:
+    """
+    Mide las consultas de cada solicitud y registra las que exceden el
+    presupuesto de su vista o repiten la misma consulta muchas veces.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.CONSULTAS_MEDIR:
+            return self.get_response(request)
+
+        with medir_consultas() as registro:
+            request.consultas = registro
+            response = self.get_response(request)
+
+        coincidencia = getattr(request, 'resolver_match', None)
+        nombre_url = coincidencia.view_name if coincidencia else None
+        response.consultas = registro
+
+        mensajes = problemas(registro, nombre_url)
+        if mensajes:
+            detalle = '; '.join(mensajes)
+            logger.warning(
+                f'Consultas {request.method} {request.path} ({nombre_url}): '
+                f'{registro.total} en {registro.duracion * 1000:.1f} ms - {detalle}'
+            )
+            if settings.CONSULTAS_ESTRICTO:
+                raise PresupuestoExcedido(f'{request.path} ({nombre_url}): {detalle}')
+        return response
+
+
+class PresupuestoConsultasMixin:
+    """
+    Mixin para TestCase: activa la medición en modo estricto, de modo que
+    una solicitud del cliente de pruebas que supere el presupuesto de su
+    vista (o repita una consulta) hace fallar el test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        from django.test import override_settings
+        ajustes = override_settings(CONSULTAS_MEDIR=True, CONSULTAS_ESTRICTO=True)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def assertDentroDelPresupuesto(self, response, nombre_url=None):
+        """Comprueba el registro de consultas que el middleware dejó en la respuesta."""
+        if nombre_url is None:
+            nombre_url = response.resolver_match.view_name
+        mensajes = problemas(response.consultas, nombre_url)
+        if mensajes:
+            self.fail(f'{nombre_url}: ' + '; '.join(mensajes))
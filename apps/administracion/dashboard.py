@@ -0,0 +1,166 @@
+"""
+Datos del dashboard general con consultas agrupadas y caché de corta duración.
+
+Las estadísticas se calculan con pocas consultas (conteos condicionales y
+GROUP BY fecha_parto) y se guardan en caché por fecha y nivel de
+visibilidad del rol. La caché se invalida al crear un Parto, RecienNacido
+o PacienteMadre (ver signals.py) incrementando una versión global.
+"""
+
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Count
+from django.utils import timezone
+
+from .fechas import inicio_dia
+from .metricas import registrar_cache
+
+
+# Roles que ven los listados clínicos (últimos partos y RN con alertas)
+ROLES_CLINICOS = ['matrona', 'medico_obstetra', 'pediatra', 'enfermera_neonatal']
+
+CLAVE_VERSION = 'dashboard:version'
+
+
+def nivel_visibilidad(usuario):
+    """Retorna el nivel de visibilidad del dashboard según el rol."""
+    return 'clinico' if usuario.rol in ROLES_CLINICOS else 'general'
+
+
+def _version():
+    return cache.get_or_set(CLAVE_VERSION, 1, None)
+
+
+def invalidar_dashboard():
+    """Invalida todos los fragmentos en caché del dashboard."""
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, 1, None)
+
+
+def _clave(fragmento, hoy, nivel):
+    return f'dashboard:{_version()}:{hoy.isoformat()}:{nivel}:{fragmento}'
+
+
+def calcular_estadisticas(hoy):
+    """
+    Calcula las estadísticas compartidas por todos los roles.
+    Usa una consulta por grupo de datos en lugar de un .count() por valor.
+    """
+    from apps.obstetricia.models import Parto
+    from apps.neonatologia.models import RecienNacido
+    from apps.pacientes.models import PacienteMadre
+
+    inicio_mes = hoy.replace(day=1)
+    hace_6_dias = hoy - timedelta(days=6)
+    inicio_hoy = inicio_dia(hoy)
+    inicio_manana = inicio_dia(hoy + timedelta(days=1))
+    inicio_mes_dt = inicio_dia(inicio_mes)
+
+    # 1. Partos: hoy, mes y tipos del mes
+    partos = Parto.objects.filter(
+        fecha_parto__gte=min(inicio_mes, hace_6_dias), fecha_parto__lte=hoy
+    )
+    del_mes = Q(fecha_parto__gte=inicio_mes)
+    conteos_partos = partos.aggregate(
+        partos_hoy=Count('id', filter=Q(fecha_parto=hoy)),
+        partos_mes=Count('id', filter=del_mes),
+        partos_vaginales=Count('id', filter=del_mes & Q(tipo_parto='vaginal')),
+        cesareas=Count('id', filter=del_mes & Q(tipo_parto__in=['cesarea_electiva', 'cesarea_urgencia'])),
+    )
+
+    # 2. Últimos 7 días - partos por día (GROUP BY fecha_parto)
+    por_dia = dict(
+        partos.filter(fecha_parto__gte=hace_6_dias).order_by().values('fecha_parto').annotate(
+            total=Count('id')
+        ).values_list('fecha_parto', 'total')
+    )
+    dias = [hace_6_dias + timedelta(days=i) for i in range(7)]
+
+    # 3. Distribución de grupos Robson (mes actual)
+    grupos_robson = list(partos.filter(del_mes).order_by().values('grupo_robson').annotate(
+        total=Count('id')
+    ).order_by('grupo_robson'))
+
+    # 4. Recién nacidos: hoy, APGAR crítico de hoy y peso del mes
+    rn_mes = Q(created_at__gte=inicio_mes_dt)
+    rn_hoy = Q(created_at__gte=inicio_hoy)
+    conteos_rn = RecienNacido.objects.filter(
+        created_at__gte=min(inicio_mes_dt, inicio_hoy), created_at__lt=inicio_manana
+    ).aggregate(
+        rn_hoy=Count('pk', filter=rn_hoy),
+        alertas_criticas=Count('pk', filter=rn_hoy & Q(apgar_5_min__lt=7)),
+        rn_peso_normal=Count('pk', filter=rn_mes & Q(peso_gramos__gte=2500, peso_gramos__lt=4000)),
+        rn_bajo_peso=Count('pk', filter=rn_mes & Q(peso_gramos__lt=2500)),
+        rn_macrosomico=Count('pk', filter=rn_mes & Q(peso_gramos__gte=4000)),
+    )
+
+    # 5. Pacientes nuevas del día
+    pacientes_nuevos_hoy = PacienteMadre.objects.filter(
+        created_at__gte=inicio_hoy, created_at__lt=inicio_manana
+    ).count()
+
+    return {
+        **conteos_partos,
+        **conteos_rn,
+        'pacientes_nuevos_hoy': pacientes_nuevos_hoy,
+        'grupos_robson': grupos_robson,
+        'ultimos_7_dias': [dia.strftime('%d/%m') for dia in dias],
+        'partos_7_dias': [por_dia.get(dia, 0) for dia in dias],
+    }
+
+
+def calcular_listados_clinicos():
+    """Últimos partos y RN con condiciones de alerta (solo roles clínicos)."""
+    from apps.obstetricia.models import Parto
+    from apps.neonatologia.models import RecienNacido
+
+    return {
+        'ultimos_partos': list(
+            Parto.objects.select_related('paciente').order_by('-created_at')[:5]
+        ),
+        'alertas_recientes': list(
+            RecienNacido.objects.filter(
+                Q(apgar_5_min__lt=7) | Q(peso_gramos__lt=2500) | Q(reanimacion_requerida=True)
+            ).select_related('parto__paciente').order_by('-created_at')[:5]
+        ),
+    }
+
+
+def _desde_cache(clave, calcular, ttl):
+    """Como cache.get_or_set, registrando el acierto o fallo en las métricas."""
+    datos = cache.get(clave)
+    registrar_cache('dashboard', datos is not None)
+    if datos is None:
+        datos = calcular()
+        cache.set(clave, datos, ttl)
+    return datos
+
+
+def obtener_datos_dashboard(usuario):
+    """
+    Retorna el contexto del dashboard para el usuario, desde la caché
+    cuando está disponible. Las estadísticas son un fragmento compartido;
+    los listados clínicos se cachean solo para el nivel 'clinico'.
+    """
+    hoy = timezone.localdate()
+    nivel = nivel_visibilidad(usuario)
+    ttl = settings.DASHBOARD_CACHE_TTL
+
+    datos = _desde_cache(
+        _clave('estadisticas', hoy, 'todos'),
+        lambda: calcular_estadisticas(hoy),
+        ttl,
+    )
+
+    listados = {'ultimos_partos': None, 'alertas_recientes': None}
+    if nivel == 'clinico':
+        listados = _desde_cache(
+            _clave('listados', hoy, nivel),
+            calcular_listados_clinicos,
+            ttl,
+        )
+
+    return {**datos, **listados}
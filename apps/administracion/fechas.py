@@ -0,0 +1,58 @@
+"""
+Filtros por rango de fechas locales que aprovechan los índices.
+
+Filtrar con campo__date (o __date__range) envuelve la columna en una
+conversión a fecha (DATE(...) / django_datetime_cast_date en SQLite), y la
+BD ya no puede recorrer el índice sobre el datetime. Aquí las fechas
+locales (America/Santiago) se convierten en un rango semiabierto de
+datetimes aware
+
+    campo >= inicio_del_dia(desde) AND campo < inicio_del_dia(hasta + 1)
+
+que compara la columna tal cual. Con TIME_ZONE de Chile los cambios de
+horario ocurren a medianoche; make_aware resuelve esa medianoche
+inexistente con el desfase anterior, que corresponde al mismo instante
+que la 01:00 del nuevo horario.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db import models
+from django.utils import timezone
+
+
+def inicio_dia(fecha):
+    """Primer instante (aware, hora local) de la fecha."""
+    return timezone.make_aware(datetime.combine(fecha, time.min), timezone.get_current_timezone())
+
+
+def rango_local(desde=None, hasta=None):
+    """
+    Convierte fechas locales (ambas inclusive, cualquiera opcional) en el
+    rango [inicio, fin) de datetimes aware. Los extremos ausentes son None.
+    """
+    inicio = inicio_dia(desde) if desde is not None else None
+    fin = inicio_dia(hasta + timedelta(days=1)) if hasta is not None else None
+    return inicio, fin
+
+
+def filtros_rango(campo, desde=None, hasta=None):
+    """kwargs de filter() para el rango local sobre un campo DateTimeField."""
+    inicio, fin = rango_local(desde, hasta)
+    filtros = {}
+    if inicio is not None:
+        filtros[f'{campo}__gte'] = inicio
+    if fin is not None:
+        filtros[f'{campo}__lt'] = fin
+    return filtros
+
+
+class RangoFechasQuerySet(models.QuerySet):
+    """QuerySet con filtros por fechas locales sobre campos DateTimeField."""
+
+    def entre_fechas(self, campo, desde=None, hasta=None):
+        """Registros cuyo `campo` cae entre las fechas locales (inclusive)."""
+        return self.filter(**filtros_rango(campo, desde, hasta))
+
+    def del_dia(self, campo, fecha):
+        return self.entre_fechas(campo, fecha, fecha)
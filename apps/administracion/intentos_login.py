@@ -0,0 +1,186 @@
+"""
+Límite de intentos de inicio de sesión y bloqueo de cuentas.
+
+Los intentos fallidos se cuentan en la caché durante LOGIN_VENTANA
+segundos, por identificador (RUT canónico o username) y dirección IP, y
+por IP sola. Antes de buscar al usuario y de calcular el hash de la
+contraseña, login_view consulta motivo_rechazo() y rechaza de inmediato:
+
+- un identificador cuya cuenta ya se bloqueó,
+- un identificador con LOGIN_INTENTOS_MAX fallos desde la misma IP,
+- una IP con LOGIN_INTENTOS_IP_MAX fallos con cualquier identificador
+  (relleno de credenciales).
+
+Los fallos de usuarios existentes se suman a Usuario.intentos_fallidos por
+lotes: se acumulan en memoria y se escriben con un UPDATE por grupo cada
+LOGIN_LOTE_INTERVALO segundos (al terminar una solicitud). Al llegar a
+LOGIN_INTENTOS_MAX se escribe de inmediato y se llama a bloquear_cuenta().
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from apps.pacientes.models import descomponer_rut
+from .models import Usuario
+from .sesion import invalidar_usuario
+
+
+logger = logging.getLogger('apps')
+
+# Direcciones IP recordadas por identificador
+MAX_IPS_POR_IDENTIFICADOR = 50
+
+RECHAZO_BLOQUEADA = 'bloqueada'
+RECHAZO_IDENTIFICADOR = 'identificador'
+RECHAZO_IP = 'ip'
+
+
+def normalizar(identificador):
+    """Clave estable del identificador: el RUT en cualquier formato da la misma."""
+    rut = descomponer_rut(identificador)
+    if rut is not None:
+        return f'rut:{rut[0]}-{rut[1]}'
+    return f'usuario:{(identificador or "").strip()}'
+
+
+def _clave(tipo, valor):
+    return f'login:{tipo}:{hashlib.sha256(valor.encode()).hexdigest()[:32]}'
+
+
+def _claves(identificador, ip):
+    return _clave('identificador', normalizar(identificador)), _clave('ip', ip or '-')
+
+
+# ============================================
+# RECHAZO ANTICIPADO
+# ============================================
+
+def motivo_rechazo(identificador, ip):
+    """
+    None si el intento puede continuar; si no, RECHAZO_BLOQUEADA,
+    RECHAZO_IDENTIFICADOR o RECHAZO_IP. Una sola lectura de la caché.
+    """
+    clave_identificador, clave_ip = _claves(identificador, ip)
+    valores = cache.get_many([clave_identificador, clave_ip])
+    estado = valores.get(clave_identificador) or {}
+    if estado.get('bloqueada'):
+        return RECHAZO_BLOQUEADA
+    if estado.get('ips', {}).get(ip or '-', 0) >= settings.LOGIN_INTENTOS_MAX:
+        return RECHAZO_IDENTIFICADOR
+    if valores.get(clave_ip, 0) >= settings.LOGIN_INTENTOS_IP_MAX:
+        return RECHAZO_IP
+    return None
+
+
+def _contar(identificador, ip, bloqueada=False):
+    clave_identificador, clave_ip = _claves(identificador, ip)
+    ip = ip or '-'
+    estado = cache.get(clave_identificador) or {'bloqueada': False, 'ips': {}}
+    ips = estado['ips']
+    ips[ip] = ips.pop(ip, 0) + 1
+    while len(ips) > MAX_IPS_POR_IDENTIFICADOR:
+        ips.pop(next(iter(ips)))
+    estado['bloqueada'] = estado['bloqueada'] or bloqueada
+    cache.set(clave_identificador, estado, settings.LOGIN_VENTANA)
+
+    if cache.add(clave_ip, 1, settings.LOGIN_VENTANA):
+        return
+    try:
+        cache.incr(clave_ip)
+    except ValueError:  # expiró entre add e incr
+        cache.set(clave_ip, 1, settings.LOGIN_VENTANA)
+
+
+def olvidar(usuario):
+    """Borra los contadores del usuario (al desbloquear la cuenta)."""
+    cache.delete_many([
+        _clave('identificador', normalizar(identificador))
+        for identificador in (usuario.username, usuario.rut) if identificador
+    ])
+
+
+# ============================================
+# FALLOS PENDIENTES DE ESCRIBIR
+# ============================================
+
+class FallosPendientes:
+    """Fallos por usuario aún no sumados a intentos_fallidos en la BD."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fallos = Counter()
+        self._ultimo_vaciado = time.monotonic()
+
+    def sumar(self, usuario_id):
+        with self._lock:
+            self._fallos[usuario_id] += 1
+            return self._fallos[usuario_id]
+
+    def descartar(self, usuario_id):
+        with self._lock:
+            self._fallos.pop(usuario_id, None)
+
+    def vaciar(self):
+        """Escribe los fallos acumulados: un UPDATE por cada cantidad distinta."""
+        with self._lock:
+            fallos, self._fallos = self._fallos, Counter()
+            self._ultimo_vaciado = time.monotonic()
+        por_cantidad = defaultdict(list)
+        for usuario_id, cantidad in fallos.items():
+            por_cantidad[cantidad].append(usuario_id)
+        for cantidad, ids in por_cantidad.items():
+            Usuario.objects.filter(pk__in=ids).update(intentos_fallidos=F('intentos_fallidos') + cantidad)
+        for usuario_id in fallos:
+            invalidar_usuario(usuario_id)
+        return len(fallos)
+
+    def vaciar_si_corresponde(self):
+        if self._fallos and time.monotonic() - self._ultimo_vaciado >= settings.LOGIN_LOTE_INTERVALO:
+            self.vaciar()
+
+
+pendientes = FallosPendientes()
+
+
+# ============================================
+# REGISTRO DE RESULTADOS
+# ============================================
+
+def registrar_fallo(identificador, ip, usuario=None):
+    """
+    Cuenta un intento fallido. `usuario` es el encontrado al autenticar
+    (None si el identificador no existe). Retorna True si con este intento
+    se bloqueó la cuenta.
+    """
+    if usuario is None or usuario.cuenta_bloqueada:
+        _contar(identificador, ip)
+        return False
+
+    fallos = pendientes.sumar(usuario.pk)
+    if usuario.intentos_fallidos + fallos < settings.LOGIN_INTENTOS_MAX:
+        _contar(identificador, ip)
+        return False
+
+    pendientes.vaciar()
+    usuario.bloquear_cuenta()
+    for alias in {identificador, usuario.username, usuario.rut}:
+        _contar(alias, ip, bloqueada=True)
+    logger.warning(f'Cuenta {usuario.username} bloqueada tras {settings.LOGIN_INTENTOS_MAX} intentos fallidos')
+    return True
+
+
+def registrar_exito(identificador, ip, usuario):
+    """Inicio de sesión correcto: descarta los fallos del usuario."""
+    pendientes.descartar(usuario.pk)
+    clave_identificador, _ = _claves(identificador, ip)
+    cache.delete(clave_identificador)
+    if usuario.intentos_fallidos:
+        usuario.intentos_fallidos = 0
+        usuario.save(update_fields=['intentos_fallidos'])
@@ -0,0 +1,86 @@
+"""
+Rota y archiva los meses cerrados de auditoría.
+
+Uso:
+    python manage.py archivar_auditoria
+    python manage.py archivar_auditoria --conservar 12 --simular
+    python manage.py archivar_auditoria --verificar
+    python manage.py archivar_auditoria --purgar-vencidos
+
+Primero asegura las particiones (PostgreSQL: crea la del mes en curso y las
+de AUDITORIA_MESES_ADELANTO meses siguientes, y mueve a su partición los
+meses que hayan caído en DEFAULT; SQLite no se particiona). Debe
+programarse una vez al mes. Luego exporta a
+AUDITORIA_ARCHIVO_DIR los meses anteriores a los últimos --conservar meses
+y los elimina de la BD.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.administracion.particiones import asegurar_particiones
+from apps.administracion.archivo_auditoria import (
+    archivar_mes, meses_archivables, purgar_vencidos, verificar_archivos,
+)
+
+
+class Command(BaseCommand):
+    help = 'Archiva en JSONL comprimido los meses cerrados de auditoría'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--conservar',
+            type=int,
+            default=settings.AUDITORIA_MESES_EN_LINEA,
+            help=f'Meses cerrados que se mantienen en la BD (por defecto {settings.AUDITORIA_MESES_EN_LINEA})'
+        )
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Muestra los meses que se archivarían sin modificar nada'
+        )
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Solo comprueba el sha256 de los archivos del manifiesto'
+        )
+        parser.add_argument(
+            '--purgar-vencidos',
+            action='store_true',
+            help=f'Elimina archivos con más de {settings.AUDITORIA_RETENCION_ANIOS} años'
+        )
+
+    def handle(self, *args, **options):
+        if options['verificar']:
+            errores = verificar_archivos()
+            for error in errores:
+                self.stderr.write(f'  {error}')
+            if errores:
+                raise CommandError(f'{len(errores)} archivos con errores')
+            self.stdout.write(self.style.SUCCESS('Todos los archivos coinciden con el manifiesto.'))
+            return
+
+        if options['conservar'] < 0:
+            raise CommandError('--conservar debe ser 0 o mayor')
+
+        if not options['simular']:
+            for (anio, mes), reubicadas in asegurar_particiones().items():
+                self.stdout.write(f'  {anio}-{mes:02d}: {reubicadas} registros reubicados')
+
+        meses = meses_archivables(options['conservar'])
+        for anio, mes in meses:
+            if options['simular']:
+                self.stdout.write(f'  {anio}-{mes:02d}: se archivaría')
+                continue
+            resultado = archivar_mes(anio, mes)
+            self.stdout.write(
+                f'  {anio}-{mes:02d}: {resultado.registros} registros -> '
+                f'{resultado.archivo} (sha256 {resultado.sha256[:12]}…)'
+            )
+
+        if options['purgar_vencidos'] and not options['simular']:
+            for nombre in purgar_vencidos():
+                self.stdout.write(f'  {nombre}: purgado por retención vencida')
+
+        accion = 'por archivar (simulación)' if options['simular'] else 'archivados'
+        self.stdout.write(self.style.SUCCESS(f'{len(meses)} meses {accion}.'))
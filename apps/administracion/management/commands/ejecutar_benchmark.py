@@ -0,0 +1,81 @@
+"""
+Mide las rutas de dashboards, búsquedas, reportes y exportaciones y guarda
+el resultado en JSON, para comparar entre commits sobre la misma carga de
+generar_datos_sinteticos.
+
+Uso:
+    python manage.py ejecutar_benchmark
+    python manage.py ejecutar_benchmark --repeticiones 10 --solo dashboard reporte
+    python manage.py ejecutar_benchmark --comparar benchmarks/anterior.json --umbral 15
+"""
+
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.administracion.rendimiento import comparar, ejecutar_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia y consultas de las rutas de lectura y guarda el resultado en JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--salida', help='Archivo JSON de salida (por defecto benchmarks/<fecha>-<commit>.json)'
+        )
+        parser.add_argument('--repeticiones', type=int, default=5, help='Mediciones por escenario (por defecto 5)')
+        parser.add_argument(
+            '--calentamiento', type=int, default=1, help='Ejecuciones descartadas por escenario (por defecto 1)'
+        )
+        parser.add_argument('--solo', nargs='+', help='Mide solo los escenarios que contienen estos textos')
+        parser.add_argument('--comparar', help='JSON de una ejecución anterior con el cual comparar')
+        parser.add_argument(
+            '--umbral', type=float, default=20,
+            help='Porcentaje de aumento de la mediana considerado regresión (por defecto 20)'
+        )
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 1:
+            raise CommandError('--repeticiones debe ser mayor que cero.')
+        anterior = None
+        if options['comparar']:
+            try:
+                anterior = json.loads(Path(options['comparar']).read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                raise CommandError(f'No se pudo leer {options["comparar"]}: {e}')
+
+        try:
+            resultado = ejecutar_benchmark(
+                repeticiones=options['repeticiones'],
+                calentamiento=max(options['calentamiento'], 0),
+                solo=options['solo'],
+                progreso=self.stdout.write,
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        if options['salida']:
+            salida = Path(options['salida'])
+        else:
+            marca = timezone.localtime().strftime('%Y%m%d-%H%M%S')
+            salida = Path(settings.BASE_DIR) / 'benchmarks' / f"{marca}-{resultado['commit'] or 'sin-commit'}.json"
+        salida.parent.mkdir(parents=True, exist_ok=True)
+        salida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(resultado['escenarios'])} escenarios medidos. Resultado en {salida}"
+        ))
+
+        if anterior is not None:
+            regresiones = 0
+            for nombre, antes, ahora, variacion, regresion in comparar(anterior, resultado, options['umbral']):
+                linea = f'{nombre}: {antes} ms -> {ahora} ms ({variacion:+.1f}%)'
+                if regresion:
+                    regresiones += 1
+                    self.stdout.write(self.style.ERROR(linea))
+                else:
+                    self.stdout.write(linea)
+            if regresiones:
+                raise CommandError(f'{regresiones} escenarios con regresión respecto de {options["comparar"]}.')
@@ -0,0 +1,65 @@
+"""
+Carga datos sintéticos a escala de producción para pruebas de rendimiento.
+
+Uso:
+    python manage.py generar_datos_sinteticos
+    python manage.py generar_datos_sinteticos --anios 10 --partos-por-anio 5000
+    python manage.py generar_datos_sinteticos --anios 1 --partos-por-anio 500 --sin-auditoria
+"""
+
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.administracion.sinteticos import GeneradorSintetico
+
+
+def _parse_fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor}. Use el formato YYYY-MM-DD.')
+
+
+class Command(BaseCommand):
+    help = 'Genera pacientes, partos, recién nacidos, alertas y auditoría sintéticos a escala'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--anios', type=int, default=10, help='Años de actividad (por defecto 10)')
+        parser.add_argument(
+            '--partos-por-anio', type=int, default=5000, help='Partos por año (por defecto 5000)'
+        )
+        parser.add_argument('--hasta', help='Último día generado YYYY-MM-DD (por defecto, hoy)')
+        parser.add_argument('--semilla', type=int, default=42, help='Semilla aleatoria (por defecto 42)')
+        parser.add_argument('--lote', type=int, default=2000, help='Filas por bulk_create (por defecto 2000)')
+        parser.add_argument('--sin-auditoria', action='store_true', help='No generar registros de auditoría')
+        parser.add_argument(
+            '--forzar', action='store_true', help='Permite ejecutar con DEBUG=False'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['forzar']:
+            raise CommandError(
+                'DEBUG=False: este comando llena la BD con datos ficticios. Use --forzar si es intencional.'
+            )
+        if options['anios'] < 1 or options['partos_por_anio'] < 1:
+            raise CommandError('--anios y --partos-por-anio deben ser mayores que cero.')
+
+        generador = GeneradorSintetico(
+            anios=options['anios'],
+            partos_por_anio=options['partos_por_anio'],
+            hasta=_parse_fecha(options['hasta']) if options['hasta'] else None,
+            semilla=options['semilla'],
+            lote=max(options['lote'], 1),
+            auditoria=not options['sin_auditoria'],
+            progreso=self.stdout.write,
+        )
+        resultado = generador.generar()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generados en {resultado.duracion:.1f} s: {resultado.pacientes} pacientes, '
+            f'{resultado.partos} partos, {resultado.recien_nacidos} recién nacidos, '
+            f'{resultado.alertas} alertas, {resultado.auditoria} registros de auditoría '
+            f'({resultado.usuarios} usuarios nuevos).'
+        ))
@@ -0,0 +1,297 @@
+"""
+Métricas de operación en formato de texto de Prometheus.
+
+Cada proceso acumula en memoria contadores e histogramas (latencia y
+consultas por vista, tiempo en la BD, tiempo de generación de PDF,
+aciertos de caché) y los vuelca cada METRICAS_INTERVALO segundos a
+METRICAS_DIR/metricas-<pid>.json, reemplazando el archivo de forma
+atómica. El archivo contiene los totales acumulados del proceso, así que
+el endpoint /metrics suma los archivos de todos los workers.
+
+Cuando un worker termina, su archivo queda en disco. El proceso que arma
+la exposición lo reclama (renombrándolo, igual que el spool de
+auditoría), suma sus valores a los propios y lo elimina después de volcar:
+los contadores nunca retroceden aunque los workers se reciclen.
+
+MetricasMiddleware registra cada solicitud; observar_pdf() y
+registrar_cache() se llaman desde los puntos que generan PDF o consultan
+la caché.
+"""
+
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+from django.conf import settings
+
+from .auditoria import _proceso_activo
+from .consultas import medir_consultas
+
+
+logger = logging.getLogger('apps')
+
+_PATRON_ARCHIVO = re.compile(r'^metricas-(\d+)\.json$')
+
+LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CANTIDAD = (1, 2, 5, 10, 20, 50, 100, 200)
+PDF = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# nombre: (tipo, descripción, cubetas del histograma)
+DEFINICIONES = {
+    'hhm_solicitudes_total': ('counter', 'Solicitudes atendidas por vista, método y clase de estado.', None),
+    'hhm_solicitud_duracion_segundos': ('histogram', 'Latencia de la solicitud por vista.', LATENCIA),
+    'hhm_solicitud_bd_segundos': ('histogram', 'Tiempo en la BD por solicitud y vista.', LATENCIA),
+    'hhm_solicitud_consultas': ('histogram', 'Consultas SQL por solicitud y vista.', CANTIDAD),
+    'hhm_pdf_generacion_segundos': ('histogram', 'Tiempo de generación de PDF por tipo.', PDF),
+    'hhm_cache_consultas_total': ('counter', 'Consultas a la caché por nombre y resultado.', None),
+}
+
+
+def _clave(nombre, etiquetas):
+    return nombre, tuple(sorted(etiquetas.items()))
+
+
+class RegistroMetricas:
+    """Contadores e histogramas del proceso, con volcado periódico a disco."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._contadores = {}
+        self._histogramas = {}
+        self._ultimo_volcado = 0.0
+
+    def _verificar_proceso(self):
+        # Tras un fork el hijo empieza en cero: lo heredado ya lo cuenta el padre
+        if self._pid != os.getpid():
+            if self._pid is None:
+                atexit.register(self._volcar_al_salir)
+            self._pid = os.getpid()
+            self._contadores = {}
+            self._histogramas = {}
+            self._ultimo_volcado = time.monotonic()
+
+    def incrementar(self, nombre, cantidad=1, **etiquetas):
+        clave = _clave(nombre, etiquetas)
+        with self._lock:
+            self._verificar_proceso()
+            self._contadores[clave] = self._contadores.get(clave, 0) + cantidad
+
+    def observar(self, nombre, valor, **etiquetas):
+        cubetas = DEFINICIONES[nombre][2]
+        clave = _clave(nombre, etiquetas)
+        with self._lock:
+            self._verificar_proceso()
+            if clave not in self._histogramas:
+                self._histogramas[clave] = [[0] * len(cubetas), 0.0, 0]
+            conteos, _, _ = histograma = self._histogramas[clave]
+            for i, limite in enumerate(cubetas):
+                if valor <= limite:
+                    conteos[i] += 1
+            histograma[1] += valor
+            histograma[2] += 1
+
+    # -- Persistencia --------------------------------------------------
+
+    def _directorio(self):
+        directorio = Path(settings.METRICAS_DIR)
+        directorio.mkdir(parents=True, exist_ok=True)
+        return directorio
+
+    def _serializar(self):
+        return {
+            'contadores': [[n, list(e), v] for (n, e), v in self._contadores.items()],
+            'histogramas': [[n, list(e), *h] for (n, e), h in self._histogramas.items()],
+        }
+
+    def _sumar(self, datos):
+        """Suma a la memoria los valores de un volcado (de un worker terminado)."""
+        for nombre, etiquetas, valor in datos['contadores']:
+            clave = (nombre, tuple(map(tuple, etiquetas)))
+            self._contadores[clave] = self._contadores.get(clave, 0) + valor
+        for nombre, etiquetas, conteos, suma, cuenta in datos['histogramas']:
+            clave = (nombre, tuple(map(tuple, etiquetas)))
+            actual = self._histogramas.setdefault(clave, [[0] * len(conteos), 0.0, 0])
+            actual[0] = [a + b for a, b in zip(actual[0], conteos)]
+            actual[1] += suma
+            actual[2] += cuenta
+
+    def volcar(self):
+        """Escribe los totales del proceso en su archivo (reemplazo atómico)."""
+        with self._lock:
+            self._verificar_proceso()
+            datos = self._serializar()
+            self._ultimo_volcado = time.monotonic()
+        ruta = self._directorio() / f'metricas-{self._pid}.json'
+        temporal = ruta.with_name(ruta.name + '.tmp')
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(datos, archivo)
+        os.replace(temporal, ruta)
+
+    def volcar_si_corresponde(self):
+        if time.monotonic() - self._ultimo_volcado >= settings.METRICAS_INTERVALO:
+            try:
+                self.volcar()
+            except OSError:
+                logger.exception('No se pudieron volcar las métricas')
+
+    def _volcar_al_salir(self):
+        if self._pid == os.getpid():
+            try:
+                self.volcar()
+            except Exception:
+                pass
+
+    def reclamar_terminados(self):
+        """Incorpora los archivos de workers terminados a este proceso."""
+        directorio = self._directorio()
+        reclamados = []
+        for ruta in directorio.iterdir():
+            coincidencia = _PATRON_ARCHIVO.match(ruta.name)
+            if not coincidencia:
+                continue
+            pid = int(coincidencia.group(1))
+            if pid == os.getpid() or _proceso_activo(pid):
+                continue
+            destino = ruta.with_name(f'reclamado-{os.getpid()}-{pid}.json')
+            try:
+                os.rename(ruta, destino)
+            except OSError:
+                continue  # otro proceso lo reclamó primero
+            with open(destino, encoding='utf-8') as archivo:
+                datos = json.load(archivo)
+            with self._lock:
+                self._verificar_proceso()
+                self._sumar(datos)
+            reclamados.append(destino)
+        if reclamados:
+            self.volcar()
+            for ruta in reclamados:
+                ruta.unlink()
+        return len(reclamados)
+
+    def agregado(self):
+        """Suma de los volcados de todos los procesos (incluido el actual)."""
+        self.volcar()
+        self.reclamar_terminados()
+        total = RegistroMetricas()
+        for ruta in sorted(self._directorio().iterdir()):
+            if not _PATRON_ARCHIVO.match(ruta.name):
+                continue
+            try:
+                with open(ruta, encoding='utf-8') as archivo:
+                    total._sumar(json.load(archivo))
+            except (OSError, ValueError):
+                continue  # el worker terminó y otro proceso lo reclamó
+        return total
+
+    def limpiar(self):
+        with self._lock:
+            self._contadores = {}
+            self._histogramas = {}
+
+
+registro = RegistroMetricas()
+
+
+# ============================================
+# INSTRUMENTACIÓN
+# ============================================
+
+def observar_pdf(tipo, segundos):
+    registro.observar('hhm_pdf_generacion_segundos', segundos, tipo=tipo)
+
+
+@contextmanager
+def cronometro_pdf(tipo):
+    """Mide la generación de un PDF del tipo dado."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar_pdf(tipo, time.perf_counter() - inicio)
+
+
+def registrar_cache(nombre, acierto):
+    registro.incrementar('hhm_cache_consultas_total', cache=nombre, resultado='acierto' if acierto else 'fallo')
+
+
+class MetricasMiddleware:
+    """
+    Registra latencia, consultas y tiempo en la BD de cada solicitud,
+    etiquetados por nombre de vista. Reutiliza el RegistroConsultas de
+    MedidorConsultasMiddleware cuando está activo.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICAS_ACTIVAS:
+            return self.get_response(request)
+
+        consultas = getattr(request, 'consultas', None)
+        inicio = time.perf_counter()
+        contexto = nullcontext(consultas) if consultas is not None else medir_consultas()
+        with contexto as consultas:
+            response = self.get_response(request)
+        duracion = time.perf_counter() - inicio
+
+        coincidencia = getattr(request, 'resolver_match', None)
+        vista = coincidencia.view_name if coincidencia else 'ninguna'
+        registro.incrementar(
+            'hhm_solicitudes_total', vista=vista, metodo=request.method,
+            estado=f'{response.status_code // 100}xx',
+        )
+        registro.observar('hhm_solicitud_duracion_segundos', duracion, vista=vista)
+        registro.observar('hhm_solicitud_bd_segundos', consultas.duracion, vista=vista)
+        registro.observar('hhm_solicitud_consultas', consultas.total, vista=vista)
+        registro.volcar_si_corresponde()
+        return response
+
+
+# ============================================
+# EXPOSICIÓN
+# ============================================
+
+def _formato_etiquetas(etiquetas):
+    if not etiquetas:
+        return ''
+    partes = []
+    for nombre, valor in etiquetas:
+        valor = str(valor).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+        partes.append(f'{nombre}="{valor}"')
+    return '{' + ','.join(partes) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exponer(fuente=None):
+    """Texto de exposición de Prometheus (versión 0.0.4) de las métricas agregadas."""
+    fuente = fuente or registro.agregado()
+    lineas = []
+    for nombre, (tipo, ayuda, cubetas) in DEFINICIONES.items():
+        lineas.append(f'# HELP {nombre} {ayuda}')
+        lineas.append(f'# TYPE {nombre} {tipo}')
+        if tipo == 'counter':
+            for (n, etiquetas), valor in sorted(fuente._contadores.items()):
+                if n == nombre:
+                    lineas.append(f'{nombre}{_formato_etiquetas(etiquetas)} {_numero(valor)}')
+            continue
+        for (n, etiquetas), (conteos, suma, cuenta) in sorted(fuente._histogramas.items()):
+            if n != nombre:
+                continue
+            for limite, conteo in zip(cubetas, conteos):
+                lineas.append(f'{nombre}_bucket{_formato_etiquetas(etiquetas + (("le", limite),))} {conteo}')
+            lineas.append(f'{nombre}_bucket{_formato_etiquetas(etiquetas + (("le", "+Inf"),))} {cuenta}')
+            lineas.append(f'{nombre}_sum{_formato_etiquetas(etiquetas)} {_numero(suma)}')
+            lineas.append(f'{nombre}_count{_formato_etiquetas(etiquetas)} {cuenta}')
+    return '\n'.join(lineas) + '\n'
@@ -0,0 +1,56 @@
+# Generated by Django 4.2 on 2026-10-18 14:04
+
+import apps.administracion.models
+from django.db import migrations, models
+
+from apps.pacientes.models import descomponer_rut
+
+
+def poblar_rut_canonico(apps, schema_editor):
+    Modelo = apps.get_model('administracion', 'Usuario')
+    alias = schema_editor.connection.alias
+    lote = []
+    for registro in Modelo.objects.using(alias).only('id', 'rut').iterator(chunk_size=2000):
+        registro.rut_numero, registro.rut_dv = descomponer_rut(registro.rut) or (None, '')
+        lote.append(registro)
+        if len(lote) >= 2000:
+            Modelo.objects.using(alias).bulk_update(lote, ['rut_numero', 'rut_dv'])
+            lote = []
+    if lote:
+        Modelo.objects.using(alias).bulk_update(lote, ['rut_numero', 'rut_dv'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0002_usuario_requiere_cambio_password'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='usuario',
+            managers=[
+                ('objects', apps.administracion.models.UsuarioManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='rut_dv',
+            field=models.CharField(blank=True, default='', editable=False, max_length=1),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='rut_numero',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='usuario',
+            name='rol',
+            field=models.CharField(choices=[('super_admin', 'Super Administrador'), ('matrona', 'Matrona/Matrón'), ('medico_obstetra', 'Médico Gineco-Obstetra'), ('pediatra', 'Médico Pediatra Neonatología'), ('enfermera_neonatal', 'Enfermera/o Neonatal'), ('puericultura', 'Técnico/a de Puericultura'), ('administrativo', 'Administrativo/a de Servicio'), ('jefe_servicio', 'Jefe/a de Servicio de Obstetricia')], help_text='Rol del usuario en el sistema', max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['rut_numero', 'rut_dv'], name='idx_usuario_rut_numero'),
+        ),
+        migrations.RunPython(poblar_rut_canonico, migrations.RunPython.noop),
+    ]
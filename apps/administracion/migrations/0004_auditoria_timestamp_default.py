@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-18 14:13
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0003_usuario_rut_numero'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditoria',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='Fecha y hora exacta de la acción'),
+        ),
+    ]
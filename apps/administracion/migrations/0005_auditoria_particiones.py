@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from apps.administracion.particiones import convertir_a_particionada
+
+
+def particionar_auditoria(apps, schema_editor):
+    convertir_a_particionada(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """
+    En PostgreSQL convierte auditoria en tabla particionada por mes. En
+    SQLite no cambia el esquema: auditoria no se particiona y
+    asegurar_particiones() reintegra las tablas mensuales de rotaciones
+    anteriores (ver apps.administracion.particiones).
+    """
+
+    dependencies = [
+        ('administracion', '0004_auditoria_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar_auditoria, migrations.RunPython.noop),
+    ]
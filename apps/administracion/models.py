@@ -1,7 +1,9 @@
 from django.contrib.auth.models import AbstractUser, UserManager as DjangoUserManager
 from django.db import models
+from django.utils import timezone
 from django.core.validators import RegexValidator
-from apps.pacientes.models import validar_rut
+from apps.pacientes.models import validar_rut, descomponer_rut
+from .fechas import RangoFechasQuerySet
 
 
 class UsuarioManager(DjangoUserManager):
@@ -30,6 +32,25 @@ class UsuarioManager(DjangoUserManager):
             raise ValueError('Debe especificar un rol para el usuario.')
         
         return self._create_user(username, email, password, **extra_fields)
+    
+    def por_identificador(self, identificador):
+        """
+        Busca un usuario por RUT o username con una sola consulta.
+        Las entradas con forma de RUT (con o sin puntos y guión) se buscan
+        por el RUT canónico indexado y también por username, porque un
+        username como '12345678' tiene forma de RUT; si ambos coinciden con
+        usuarios distintos prevalece el RUT. El resto, solo por username.
+        """
+        rut = descomponer_rut(identificador)
+        if rut is None:
+            return self.filter(username=identificador).first()
+        candidatos = list(self.filter(
+            models.Q(rut_numero=rut[0], rut_dv=rut[1]) | models.Q(username=identificador)
+        )[:2])
+        for candidato in candidatos:
+            if (candidato.rut_numero, candidato.rut_dv) == rut:
+                return candidato
+        return candidatos[0] if candidatos else None
 
 
 class Usuario(AbstractUser):
@@ -52,6 +73,10 @@ class Usuario(AbstractUser):
         help_text='RUT del profesional. Formato: 12.345.678-9'
     )
     
+    # RUT canónico (cuerpo numérico + DV) para login con una búsqueda exacta
+    rut_numero = models.PositiveIntegerField(null=True, editable=False)
+    rut_dv = models.CharField(max_length=1, blank=True, default='', editable=False)
+    
     # Roles del sistema (8 roles - 7 según documentación + super_admin)
     ROL_CHOICES = [
         ('super_admin', 'Super Administrador'),
@@ -114,12 +139,21 @@ class Usuario(AbstractUser):
         ordering = ['rol', 'last_name', 'first_name']
         indexes = [
             models.Index(fields=['rut'], name='idx_usuario_rut'),
+            models.Index(fields=['rut_numero', 'rut_dv'], name='idx_usuario_rut_numero'),
             models.Index(fields=['rol'], name='idx_usuario_rol'),
         ]
     
     def __str__(self):
         return f"{self.get_full_name()} ({self.get_rol_display()}) - {self.rut}"
     
+    def save(self, *args, **kwargs):
+        """Override save para mantener el RUT canónico"""
+        self.rut_numero, self.rut_dv = descomponer_rut(self.rut) or (None, '')
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'rut' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'rut_numero', 'rut_dv'}
+        super().save(*args, **kwargs)
+    
     @property
     def nombre_completo(self):
         """Retorna el nombre completo del usuario"""
@@ -239,12 +273,17 @@ class Auditoria(models.Model):
         help_text='Estado nuevo del objeto (para ediciones)'
     )
     
-    # Timestamp (inmutable)
+    # Timestamp (inmutable). Se fija al registrar la acción, no al insertar
+    # el lote diferido (ver apps.administracion.auditoria)
     timestamp = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
+        editable=False,
         help_text='Fecha y hora exacta de la acción'
     )
     
+    # Filtros por rango de fechas locales (ver apps.administracion.fechas)
+    objects = RangoFechasQuerySet.as_manager()
+    
     class Meta:
         db_table = 'auditoria'
         verbose_name = 'Registro de Auditoría'
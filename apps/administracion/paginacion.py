@@ -0,0 +1,164 @@
+"""
+Paginación por keyset (cursor) para listados ordenados por fecha.
+
+En vez de COUNT(*) + OFFSET, cada página se pide a partir de la última
+fila vista: WHERE (fecha, id) < (fecha_cursor, id_cursor) ORDER BY fecha
+DESC, id DESC LIMIT n+1. La condición se escribe como
+
+    fecha <= f AND (fecha < f OR id < i)
+
+para que el primer término recorra el índice por rango. El costo de
+"siguiente" y "anterior" es el mismo en la primera página y en la
+milésima. El cursor viaja en la URL como base64 de un JSON con la
+dirección y los valores de la fila límite.
+
+El total es opcional y estimado: en PostgreSQL se toma del plan de
+ejecución (EXPLAIN, sin recorrer la tabla) y en otros motores se cuenta
+hasta TOPE_CONTEO filas.
+"""
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+
+
+TOPE_CONTEO = 10000
+
+
+@dataclass
+class PaginaKeyset:
+    """Filas de una página y cursores para moverse a las vecinas."""
+    objetos: list
+    cursor_siguiente: str = None
+    cursor_anterior: str = None
+    total_estimado: int = None
+    total_exacto: bool = False
+    url_siguiente: str = None
+    url_anterior: str = None
+    url_primera: str = None
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+    @property
+    def tiene_otras(self):
+        return bool(self.cursor_siguiente or self.cursor_anterior)
+
+    def con_enlaces(self, query_dict, parametro='cursor'):
+        """Arma las URLs relativas (?...) conservando los demás parámetros GET."""
+        for atributo, cursor in [('url_siguiente', self.cursor_siguiente), ('url_anterior', self.cursor_anterior)]:
+            if cursor:
+                parametros = query_dict.copy()
+                parametros[parametro] = cursor
+                setattr(self, atributo, '?' + parametros.urlencode())
+        if self.cursor_anterior:
+            parametros = query_dict.copy()
+            parametros.pop(parametro, None)
+            self.url_primera = '?' + parametros.urlencode()
+        return self
+
+
+def codificar_cursor(direccion, valores):
+    # isoformat() directo: DjangoJSONEncoder trunca los microsegundos y el
+    # cursor debe reproducir el valor exacto de la fila límite
+    valores = [valor.isoformat() if hasattr(valor, 'isoformat') else valor for valor in valores]
+    datos = json.dumps([direccion, valores], separators=(',', ':'))
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, modelo, campos):
+    """
+    Retorna (direccion, valores) o (None, None) si el cursor es inválido.
+    Los valores se convierten al tipo de cada campo del modelo.
+    """
+    if not cursor:
+        return None, None
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        direccion, valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if direccion not in ('siguiente', 'anterior') or len(valores) != len(campos):
+            return None, None
+        return direccion, [
+            modelo._meta.get_field(campo).to_python(valor)
+            for campo, valor in zip(campos, valores)
+        ]
+    except (ValueError, TypeError, binascii.Error, ValidationError):
+        return None, None
+
+
+def condicion_keyset(campos, valores, descendente):
+    """Q de las filas posteriores (en el orden dado) a la fila con esos valores."""
+    (campo, ultimo), (desempate, id_limite) = zip(campos, valores)
+    operador = 'lt' if descendente else 'gt'
+    return (
+        Q(**{f'{campo}__{operador}e': ultimo})
+        & (Q(**{f'{campo}__{operador}': ultimo}) | Q(**{f'{desempate}__{operador}': id_limite}))
+    )
+
+
+def estimar_total(queryset):
+    """
+    Retorna (total, exacto). En PostgreSQL usa las filas estimadas por el
+    plan; en otros motores cuenta como máximo TOPE_CONTEO + 1 filas.
+    """
+    if connection.vendor == 'postgresql':
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows']), False
+    total = queryset.order_by()[:TOPE_CONTEO + 1].count()
+    return min(total, TOPE_CONTEO), total <= TOPE_CONTEO
+
+
+def paginar_keyset(consulta, modelo, cursor=None, tamano=25,
+                   campos=('timestamp', 'id'), descendente=True, contar=False):
+    """
+    Retorna la PaginaKeyset correspondiente al cursor.
+
+    `consulta` es un queryset, o una función que recibe un Q adicional (o
+    None) y retorna el queryset filtrado; la función permite aplicar la
+    condición del cursor antes de combinar consultas (p. ej. UNION de
+    particiones).
+    `campos` es (campo de orden, desempate único) y debe coincidir con un
+    índice compuesto.
+    """
+    if not callable(consulta):
+        queryset = consulta
+
+        def consulta(condicion):
+            return queryset.filter(condicion) if condicion is not None else queryset
+
+    campos = list(campos)
+    direccion, valores = decodificar_cursor(cursor, modelo, campos)
+
+    hacia_atras = direccion == 'anterior'
+    orden_descendente = descendente != hacia_atras
+    condicion = condicion_keyset(campos, valores, orden_descendente) if valores else None
+    prefijo = '-' if orden_descendente else ''
+    filas = list(consulta(condicion).order_by(*[prefijo + campo for campo in campos])[:tamano + 1])
+
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    if hacia_atras:
+        if not hay_mas:
+            # Se llegó al inicio: mostrar la primera página completa
+            return paginar_keyset(consulta, modelo, None, tamano, campos, descendente, contar)
+        filas.reverse()
+
+    def valores_de(fila):
+        return [getattr(fila, campo) for campo in campos]
+
+    pagina = PaginaKeyset(objetos=filas)
+    if filas and (hay_mas or hacia_atras):
+        pagina.cursor_siguiente = codificar_cursor('siguiente', valores_de(filas[-1]))
+    if filas and direccion is not None:
+        pagina.cursor_anterior = codificar_cursor('anterior', valores_de(filas[0]))
+    if contar:
+        pagina.total_estimado, pagina.total_exacto = estimar_total(consulta(None))
+    return pagina
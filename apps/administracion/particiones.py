@@ -0,0 +1,268 @@
+"""
+Particionamiento mensual de la tabla de auditoría.
+
+Cada mes local (America/Santiago) tiene su partición auditoria_AAAA_MM:
+
+- PostgreSQL: la migración 0005 convierte auditoria en una tabla
+  particionada por rango de timestamp (PARTITION BY RANGE) con una
+  partición DEFAULT. asegurar_particiones() crea la partición del mes en
+  curso y las de los AUDITORIA_MESES_ADELANTO siguientes, y da partición
+  propia a los meses que hayan caído en DEFAULT (cargas históricas, o si
+  el comando mensual archivar_auditoria no corrió a tiempo). Las
+  consultas con un rango timestamp >= inicio AND timestamp < fin solo
+  leen las particiones que lo intersectan (partition pruning).
+- SQLite: auditoria no se particiona. Todos los lectores (admin,
+  métricas, historial) ven la tabla completa y la FK PROTECT sigue
+  protegiendo cada registro. asegurar_particiones() reintegra a
+  auditoria las tablas mensuales que hayan dejado rotaciones anteriores.
+
+Los meses cerrados se archivan con el comando archivar_auditoria (JSONL
+comprimido + manifiesto con sha256): en PostgreSQL se elimina la
+partición y en SQLite los registros del mes.
+"""
+
+import re
+from datetime import datetime
+
+from django.apps.registry import Apps
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from .models import Auditoria
+
+
+TABLA_BASE = Auditoria._meta.db_table
+
+_PATRON_PARTICION = re.compile(r'^auditoria_(\d{4})_(\d{2})$')
+
+# Registro aislado: los modelos de partición no aparecen en el registro
+# global de apps (migraciones, permisos, admin)
+_registro = Apps()
+_modelos = {}
+
+
+def nombre_particion(anio, mes):
+    return f'{TABLA_BASE}_{anio}_{mes:02d}'
+
+
+def mes_siguiente(anio, mes):
+    return (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+
+def inicio_mes(anio, mes):
+    """Primer instante (aware, hora local) del mes."""
+    return timezone.make_aware(datetime(anio, mes, 1))
+
+
+def mes_de(fecha_hora):
+    local = timezone.localtime(fecha_hora)
+    return local.year, local.month
+
+
+def _solo_lectura(self, *args, **kwargs):
+    raise Exception('Las particiones de auditoría son de solo lectura')
+
+
+def modelo_particion(anio, mes):
+    """
+    Modelo no administrado con las mismas columnas que Auditoria sobre la
+    tabla del mes. La FK a usuario se reemplaza por la columna usuario_id
+    (las particiones solo se leen o se unen con la tabla base). Igual que
+    Auditoria, no permite modificar ni eliminar registros.
+    """
+    tabla = nombre_particion(anio, mes)
+    if tabla not in _modelos:
+        atributos = {
+            '__module__': __name__,
+            'Meta': type('Meta', (), {
+                'db_table': tabla,
+                'managed': False,
+                'app_label': Auditoria._meta.app_label,
+                'apps': _registro,
+            }),
+            'save': _solo_lectura,
+            'delete': _solo_lectura,
+        }
+        for campo in Auditoria._meta.local_fields:
+            if campo.is_relation:
+                atributos[campo.attname] = models.BigIntegerField(db_column=campo.column)
+            else:
+                atributos[campo.name] = campo.clone()
+        _modelos[tabla] = type(f'Auditoria_{anio}_{mes:02d}', (models.Model,), atributos)
+    return _modelos[tabla]
+
+
+def particiones_existentes(conexion=connection):
+    """Meses (anio, mes) con tabla de partición, en orden cronológico."""
+    with conexion.cursor() as cursor:
+        tablas = conexion.introspection.table_names(cursor)
+    meses = []
+    for tabla in tablas:
+        coincidencia = _PATRON_PARTICION.match(tabla)
+        if coincidencia:
+            meses.append((int(coincidencia.group(1)), int(coincidencia.group(2))))
+    return sorted(meses)
+
+
+def _columnas(conexion):
+    return ', '.join(
+        conexion.ops.quote_name(campo.column) for campo in Auditoria._meta.local_fields
+    )
+
+
+def _crear_particion_postgresql(conexion, anio, mes):
+    """
+    Crea la partición del mes y retorna las filas que se le movieron desde
+    DEFAULT. Con filas del mes en DEFAULT, CREATE TABLE ... PARTITION OF
+    fallaría: se crea la tabla suelta, se mueven las filas y se adjunta,
+    con DEFAULT bloqueada para que no lleguen filas nuevas del mes.
+    """
+    tabla = nombre_particion(anio, mes)
+    desde = inicio_mes(anio, mes)
+    hasta = inicio_mes(*mes_siguiente(anio, mes))
+    rango = f"FOR VALUES FROM ('{desde.isoformat()}') TO ('{hasta.isoformat()}')"
+    condicion = '"timestamp" >= %s AND "timestamp" < %s'
+    with transaction.atomic(using=conexion.alias), conexion.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s)', [tabla])
+        if cursor.fetchone()[0] is not None:
+            return 0
+        cursor.execute(f'LOCK TABLE {TABLA_BASE}_default IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM {TABLA_BASE}_default WHERE {condicion})', [desde, hasta]
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(f'CREATE TABLE {tabla} PARTITION OF {TABLA_BASE} {rango}')
+            return 0
+        cursor.execute(f'CREATE TABLE {tabla} (LIKE {TABLA_BASE} INCLUDING DEFAULTS)')
+        cursor.execute(
+            f'WITH movidas AS (DELETE FROM {TABLA_BASE}_default WHERE {condicion} RETURNING *) '
+            f'INSERT INTO {tabla} SELECT * FROM movidas',
+            [desde, hasta],
+        )
+        movidas = cursor.rowcount
+        cursor.execute(f'ALTER TABLE {TABLA_BASE} ATTACH PARTITION {tabla} {rango}')
+    return movidas
+
+
+def _meses_en_default(conexion):
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            f'SELECT DISTINCT date_trunc(\'month\', "timestamp" AT TIME ZONE %s) FROM {TABLA_BASE}_default',
+            [timezone.get_current_timezone_name()],
+        )
+        return {(fila[0].year, fila[0].month) for fila in cursor.fetchall()}
+
+
+def crear_particion(anio, mes, conexion=connection):
+    """
+    Crea la partición del mes (solo PostgreSQL; SQLite no se particiona).
+    Retorna las filas movidas desde la partición DEFAULT.
+    """
+    if conexion.vendor == 'postgresql':
+        return _crear_particion_postgresql(conexion, anio, mes)
+    return 0
+
+
+def convertir_a_particionada(conexion):
+    """
+    PostgreSQL: reemplaza la tabla auditoria por una tabla particionada por
+    mes con las mismas columnas, índices y FK, y copia los registros
+    existentes a sus particiones. La llave primaria pasa a ser
+    (id, timestamp) porque PostgreSQL exige incluir la columna de partición.
+    El id deja de ser IDENTITY (no admitido en tablas particionadas antes de
+    PostgreSQL 17) y toma su valor de la secuencia auditoria_id_seq.
+    """
+    if conexion.vendor != 'postgresql':
+        return
+    usuario = Auditoria._meta.get_field('usuario').related_model._meta.db_table
+    with conexion.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {TABLA_BASE} RENAME TO {TABLA_BASE}_sin_particionar')
+        cursor.execute(
+            f'CREATE TABLE {TABLA_BASE} (LIKE {TABLA_BASE}_sin_particionar '
+            f'INCLUDING DEFAULTS) PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(f'ALTER TABLE {TABLA_BASE} ADD PRIMARY KEY (id, "timestamp")')
+        cursor.execute(f'CREATE TABLE {TABLA_BASE}_default PARTITION OF {TABLA_BASE} DEFAULT')
+        cursor.execute(
+            f'SELECT DISTINCT date_trunc(\'month\', "timestamp" AT TIME ZONE %s) '
+            f'FROM {TABLA_BASE}_sin_particionar',
+            [timezone.get_current_timezone_name()],
+        )
+        meses = {(fila[0].year, fila[0].month) for fila in cursor.fetchall()}
+        actual = mes_de(timezone.now())
+        meses.update({actual, mes_siguiente(*actual)})
+        for anio, mes in sorted(meses):
+            _crear_particion_postgresql(conexion, anio, mes)
+        cursor.execute(f'INSERT INTO {TABLA_BASE} SELECT * FROM {TABLA_BASE}_sin_particionar')
+        # Al eliminar la tabla original se elimina su secuencia IDENTITY,
+        # cuyo nombre toma la nueva secuencia
+        cursor.execute(f'DROP TABLE {TABLA_BASE}_sin_particionar')
+        cursor.execute(f'CREATE SEQUENCE {TABLA_BASE}_id_seq AS bigint OWNED BY {TABLA_BASE}.id')
+        cursor.execute(
+            f"ALTER TABLE {TABLA_BASE} ALTER COLUMN id SET DEFAULT nextval('{TABLA_BASE}_id_seq')"
+        )
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{TABLA_BASE}', 'id'), "
+            f'COALESCE((SELECT MAX(id) FROM {TABLA_BASE}), 0) + 1, false)'
+        )
+        for sql in [
+            f'CREATE INDEX idx_auditoria_timestamp ON {TABLA_BASE} ("timestamp" DESC)',
+            f'CREATE INDEX idx_auditoria_usuario ON {TABLA_BASE} (usuario_id, "timestamp" DESC)',
+            f'CREATE INDEX idx_auditoria_accion ON {TABLA_BASE} (accion)',
+            f'CREATE INDEX idx_auditoria_objeto ON {TABLA_BASE} (modelo, objeto_id)',
+            f'ALTER TABLE {TABLA_BASE} ADD CONSTRAINT {TABLA_BASE}_usuario_id_fk '
+            f'FOREIGN KEY (usuario_id) REFERENCES {usuario} (id) DEFERRABLE INITIALLY DEFERRED',
+        ]:
+            cursor.execute(sql)
+
+
+def _reintegrar_sqlite(conexion, anio, mes):
+    """Devuelve a la tabla base las filas de una tabla mensual y la elimina."""
+    tabla = nombre_particion(anio, mes)
+    columnas = _columnas(conexion)
+    with transaction.atomic(using=conexion.alias), conexion.cursor() as cursor:
+        cursor.execute(f'INSERT INTO "{TABLA_BASE}" ({columnas}) SELECT {columnas} FROM "{tabla}"')
+        reintegradas = cursor.rowcount
+        cursor.execute(f'DROP TABLE "{tabla}"')
+    return reintegradas
+
+
+def asegurar_particiones(conexion=connection, ahora=None):
+    """
+    PostgreSQL: crea las particiones del mes en curso, de los
+    AUDITORIA_MESES_ADELANTO siguientes y de los meses con filas en DEFAULT.
+    SQLite: reintegra a auditoria las tablas mensuales que existan.
+    Retorna {(anio, mes): filas reubicadas} con los meses que tenían filas.
+    """
+    if conexion.vendor == 'postgresql':
+        meses = [mes_de(ahora or timezone.now())]
+        for _ in range(settings.AUDITORIA_MESES_ADELANTO):
+            meses.append(mes_siguiente(*meses[-1]))
+        reubicadas = {}
+        for anio, mes in sorted(set(meses) | _meses_en_default(conexion)):
+            movidas = crear_particion(anio, mes, conexion=conexion)
+            if movidas:
+                reubicadas[(anio, mes)] = movidas
+        return reubicadas
+
+    return {
+        (anio, mes): _reintegrar_sqlite(conexion, anio, mes)
+        for anio, mes in particiones_existentes(conexion)
+    }
+
+
+def consultar_auditoria(inicio=None, fin=None, condicion=None, **filtros):
+    """
+    Queryset sin orden de los registros de auditoría en [inicio, fin) que
+    cumplen los filtros. `condicion` es un Q adicional (p. ej. la de un
+    cursor). En PostgreSQL el rango sobre timestamp permite descartar
+    particiones; en SQLite es la tabla única.
+    """
+    extra = [condicion] if condicion is not None else []
+    rango = {}
+    if inicio is not None:
+        rango['timestamp__gte'] = inicio
+    if fin is not None:
+        rango['timestamp__lt'] = fin
+    return Auditoria.objects.filter(*extra, **rango, **filtros).order_by()
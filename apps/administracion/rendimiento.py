@@ -0,0 +1,214 @@
+"""
+Benchmark de las rutas de lectura: dashboards, búsquedas, fichas, reportes
+y exportaciones.
+
+Cada escenario se ejecuta `repeticiones` veces (después de `calentamiento`
+ejecuciones descartadas) con el cliente de pruebas de Django sobre la BD
+configurada, autenticado con el personal sintético de la carga de
+generar_datos_sinteticos. Se registra la latencia (mediana, p95, mínimo y
+máximo), las consultas y el tiempo en la BD de cada escenario.
+
+El resultado es un JSON con el commit, el motor de BD y el volumen de datos,
+de modo que dos ejecuciones sobre la misma carga sintética se pueden
+comparar con comparar().
+"""
+
+import statistics
+import subprocess
+from dataclasses import dataclass
+from datetime import timedelta
+from time import perf_counter
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.pacientes.models import PacienteMadre
+from apps.obstetricia.models import Parto
+from apps.neonatologia.models import RecienNacido
+from apps.reportes.exportar import EXPORTACIONES
+from apps.reportes.models import Alerta
+from apps.reportes.views import REPORTES, construir_reporte
+from .consultas import medir_consultas
+from .models import Auditoria, Usuario
+
+
+@dataclass
+class Escenario:
+    nombre: str
+    rol: str
+    ejecutar: Callable  # recibe el Client autenticado con el rol
+    frio: bool = False  # limpia la caché antes de cada repetición
+
+
+def _get(url, **parametros):
+    def ejecutar(cliente):
+        response = cliente.get(url, parametros)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} respondió {response.status_code}')
+        if response.streaming:
+            b''.join(response.streaming_content)
+    return ejecutar
+
+
+def escenarios():
+    """Escenarios a medir, con muestras tomadas de los datos existentes."""
+    hoy = timezone.localdate()
+    hace_un_anio = hoy - timedelta(days=365)
+    hace_un_mes = hoy - timedelta(days=30)
+    parto = Parto.objects.select_related('paciente').order_by('-pk').first()
+    if parto is None:
+        raise RuntimeError('No hay partos registrados: ejecute generar_datos_sinteticos primero.')
+    paciente = parto.paciente
+
+    lista = [
+        Escenario('dashboard_general_frio', 'jefe_servicio', _get(reverse('dashboard_jefe')), frio=True),
+        Escenario('dashboard_general_cache', 'jefe_servicio', _get(reverse('dashboard_jefe'))),
+        Escenario('dashboard_matrona', 'matrona', _get(reverse('dashboard_matrona'))),
+        Escenario('dashboard_alertas', 'jefe_servicio', _get(reverse('dashboard_alertas'))),
+        Escenario('listado_alertas', 'jefe_servicio', _get(reverse('listado_alertas'))),
+        Escenario('api_alertas_activas', 'matrona', _get(reverse('api_alertas_activas'))),
+        Escenario('historial_auditoria', 'jefe_servicio', _get(reverse('historial_auditoria'))),
+        Escenario('historial_auditoria_mes', 'jefe_servicio', _get(
+            reverse('historial_auditoria'), fecha_inicio=hace_un_mes.isoformat(), fecha_fin=hoy.isoformat(),
+        )),
+        Escenario('buscar_paciente_rut', 'matrona', _get(reverse('buscar_paciente'), query=paciente.rut)),
+        Escenario('buscar_paciente_nombre', 'matrona', _get(
+            reverse('buscar_paciente'), query=paciente.apellido_paterno,
+        )),
+        Escenario('buscar_paciente_fechas', 'matrona', _get(
+            reverse('buscar_paciente'), fecha_desde=hace_un_mes.isoformat(), fecha_hasta=hoy.isoformat(),
+        )),
+        Escenario('detalle_paciente', 'matrona', _get(reverse('detalle_paciente', args=[paciente.pk]))),
+        Escenario('linea_tiempo_paciente', 'matrona', _get(reverse('api_linea_tiempo', args=[paciente.pk]))),
+        Escenario('detalle_parto', 'matrona', _get(reverse('detalle_parto', args=[parto.pk]))),
+        Escenario('tamizaje_prenatal', 'matrona', _get(reverse('tamizaje_prenatal'))),
+    ]
+    if RecienNacido.objects.filter(pk=parto.pk).exists():
+        lista.append(Escenario(
+            'detalle_recien_nacido', 'pediatra', _get(reverse('detalle_recien_nacido', args=[parto.pk]))
+        ))
+
+    for tipo in REPORTES:
+        def ejecutar(cliente, tipo=tipo):
+            construir_reporte(tipo, hace_un_anio, hoy)
+        lista.append(Escenario(f'reporte_{tipo}', 'jefe_servicio', ejecutar))
+
+    for tipo in EXPORTACIONES:
+        lista.append(Escenario(f'exportar_{tipo}', 'jefe_servicio', _get(
+            reverse('exportar_reporte', args=[tipo]),
+            fecha_inicio=hace_un_anio.isoformat(), fecha_fin=hoy.isoformat(),
+        )))
+    return lista
+
+
+def _percentil(valores, percentil):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, round(percentil / 100 * (len(ordenados) - 1)))
+    return ordenados[indice]
+
+
+def _clientes():
+    clientes = {}
+    for rol in ('jefe_servicio', 'matrona', 'pediatra'):
+        usuario = (
+            Usuario.objects.filter(rol=rol, is_active=True, username__startswith='sintetico_').first()
+            or Usuario.objects.filter(rol=rol, is_active=True).first()
+        )
+        if usuario is None:
+            raise RuntimeError(f'No hay un usuario activo con rol {rol}.')
+        cliente = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost')
+        cliente.force_login(usuario)
+        cliente.usuario = usuario
+        clientes[rol] = cliente
+    return clientes
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def medir(escenario, cliente, repeticiones=5, calentamiento=1):
+    """Estadísticas de un escenario (tiempos en milisegundos)."""
+    for _ in range(calentamiento):
+        if escenario.frio:
+            cache.clear()
+        escenario.ejecutar(cliente)
+
+    tiempos, consultas, tiempos_bd = [], [], []
+    for _ in range(repeticiones):
+        if escenario.frio:
+            cache.clear()
+        with medir_consultas() as registro:
+            inicio = perf_counter()
+            escenario.ejecutar(cliente)
+            tiempos.append((perf_counter() - inicio) * 1000)
+        consultas.append(registro.total)
+        tiempos_bd.append(registro.duracion * 1000)
+
+    return {
+        'rol': escenario.rol,
+        'mediana_ms': round(statistics.median(tiempos), 2),
+        'p95_ms': round(_percentil(tiempos, 95), 2),
+        'min_ms': round(min(tiempos), 2),
+        'max_ms': round(max(tiempos), 2),
+        'consultas': max(consultas),
+        'bd_ms': round(statistics.median(tiempos_bd), 2),
+    }
+
+
+def ejecutar_benchmark(repeticiones=5, calentamiento=1, solo=None, progreso=None):
+    """Mide todos los escenarios (o los que contienen alguno de `solo`)."""
+    progreso = progreso or (lambda mensaje: None)
+    clientes = _clientes()
+    resultados = {}
+    for escenario in escenarios():
+        if solo and not any(filtro in escenario.nombre for filtro in solo):
+            continue
+        resultados[escenario.nombre] = medir(
+            escenario, clientes[escenario.rol], repeticiones, calentamiento
+        )
+        datos = resultados[escenario.nombre]
+        progreso(f"{escenario.nombre}: {datos['mediana_ms']} ms, {datos['consultas']} consultas")
+
+    return {
+        'generado': timezone.now().isoformat(),
+        'commit': _commit(),
+        'motor': connection.vendor,
+        'repeticiones': repeticiones,
+        'volumen': {
+            'pacientes': PacienteMadre.objects.count(),
+            'partos': Parto.objects.count(),
+            'recien_nacidos': RecienNacido.objects.count(),
+            'alertas': Alerta.objects.count(),
+            'auditoria': Auditoria.objects.count(),
+        },
+        'escenarios': resultados,
+    }
+
+
+def comparar(anterior, actual, umbral=20):
+    """
+    Compara dos resultados de ejecutar_benchmark(). Retorna una lista de
+    (escenario, mediana anterior, mediana actual, variación %, regresión),
+    donde regresión indica una mediana `umbral`% más lenta o más consultas.
+    """
+    filas = []
+    for nombre, datos in actual['escenarios'].items():
+        previo = anterior['escenarios'].get(nombre)
+        if previo is None:
+            continue
+        variacion = (datos['mediana_ms'] - previo['mediana_ms']) / max(previo['mediana_ms'], 0.01) * 100
+        regresion = variacion > umbral or datos['consultas'] > previo['consultas']
+        filas.append((nombre, previo['mediana_ms'], datos['mediana_ms'], round(variacion, 1), regresion))
+    return filas
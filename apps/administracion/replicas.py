@@ -0,0 +1,202 @@
+"""
+Lecturas analíticas en una réplica de la BD.
+
+Los reportes (construir_reporte), el dashboard general, el de alertas y el
+historial de auditoría solo leen, y sus consultas de agregación compiten
+con el registro de partos y recién nacidos. Con BD_REPLICA=True,
+RouterReplica envía a la réplica (alias BD_REPLICA_ALIAS) las lecturas
+hechas dentro de lectura_analitica() o de una vista decorada con
+@en_replica. Todo lo demás, y todas las escrituras, van a la primaria.
+
+Se vuelve a la primaria cuando:
+
+- La solicitud ya escribió algo, o el navegador escribió hace menos de
+  BD_REPLICA_ADHERENCIA segundos (cookie COOKIE_PRIMARIA que deja
+  ReplicaMiddleware): quien acaba de registrar un parto lo ve en el
+  dashboard aunque la réplica aún no lo tenga. Las escrituras de auditoría
+  y de sesión no cuentan, ya que ocurren en casi todas las solicitudes.
+- La réplica está atrasada más de BD_REPLICA_RETRASO_MAX segundos o no
+  responde. El retraso se mide cada BD_REPLICA_VERIFICAR_CADA segundos
+  por proceso.
+
+Para probar localmente basta con dos archivos SQLite (BD_REPLICA_SQLITE_NOMBRE)
+o dos servidores PostgreSQL (BD_REPLICA_HOST).
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+
+logger = logging.getLogger('apps')
+
+COOKIE_PRIMARIA = 'hhm_primaria'
+
+# Modelos cuya escritura no obliga a leer de la primaria
+ESCRITURAS_SIN_ADHERENCIA = {'administracion.auditoria', 'sessions.session'}
+
+_analitica = ContextVar('lectura_analitica', default=False)
+_solicitud = ContextVar('estado_replica', default=None)
+
+
+@dataclass
+class EstadoSolicitud:
+    fijada: bool = False  # las lecturas de esta solicitud van a la primaria
+    escribio: bool = False
+
+
+@contextmanager
+def lectura_analitica():
+    """Las lecturas del bloque pueden ir a la réplica."""
+    token = _analitica.set(True)
+    try:
+        yield
+    finally:
+        _analitica.reset(token)
+
+
+def en_replica(funcion):
+    """Decorador: ejecuta la función (o vista) dentro de lectura_analitica()."""
+    @wraps(funcion)
+    def envoltura(*args, **kwargs):
+        with lectura_analitica():
+            return funcion(*args, **kwargs)
+    return envoltura
+
+
+def fijar_primaria():
+    """
+    Las lecturas que quedan de la solicitud van a la primaria, sin dejar la
+    cookie de adherencia. Para vistas que acaban de escribir algo que deben
+    mostrar, aunque sea un modelo de ESCRITURAS_SIN_ADHERENCIA.
+    """
+    estado = _solicitud.get()
+    if estado is not None:
+        estado.fijada = True
+
+
+# ============================================
+# RETRASO DE LA RÉPLICA
+# ============================================
+
+def retraso_replica(alias):
+    """
+    Segundos de retraso de la réplica. En PostgreSQL se compara la última
+    transacción reproducida con la hora actual (0 si ya reprodujo todo lo
+    recibido o si el servidor no es un standby). Otros motores no informan
+    retraso y se considera 0.
+    """
+    conexion = connections[alias]
+    if conexion.vendor != 'postgresql':
+        return 0.0
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            "SELECT CASE "
+            "WHEN NOT pg_is_in_recovery() THEN 0 "
+            "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+        )
+        return float(cursor.fetchone()[0])
+
+
+class _EstadoReplica:
+    """Resultado de la última medición de retraso, por proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.medido = None
+        self.disponible = False
+
+    def consultar(self):
+        ahora = time.monotonic()
+        with self._lock:
+            if self.medido is not None and ahora - self.medido < settings.BD_REPLICA_VERIFICAR_CADA:
+                return self.disponible
+            self.medido = ahora
+        try:
+            retraso = retraso_replica(settings.BD_REPLICA_ALIAS)
+        except DatabaseError:
+            logger.warning('Réplica no disponible; las lecturas analíticas van a la primaria', exc_info=True)
+            disponible = False
+        else:
+            disponible = retraso <= settings.BD_REPLICA_RETRASO_MAX
+            if not disponible:
+                logger.warning(f'Réplica atrasada {retraso:.1f} s; las lecturas analíticas van a la primaria')
+        self.disponible = disponible
+        return disponible
+
+    def reiniciar(self):
+        with self._lock:
+            self.medido = None
+
+
+estado_replica = _EstadoReplica()
+
+
+def replica_disponible():
+    if not settings.BD_REPLICA or settings.BD_REPLICA_ALIAS not in settings.DATABASES:
+        return False
+    return estado_replica.consultar()
+
+
+# ============================================
+# ROUTER Y MIDDLEWARE
+# ============================================
+
+class RouterReplica:
+    """Envía las lecturas analíticas a la réplica y fija la primaria tras escribir."""
+
+    def db_for_read(self, model, **hints):
+        if not _analitica.get():
+            return None
+        estado = _solicitud.get()
+        if estado is not None and estado.fijada:
+            return None
+        if replica_disponible():
+            return settings.BD_REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        estado = _solicitud.get()
+        if estado is not None and model._meta.label_lower not in ESCRITURAS_SIN_ADHERENCIA:
+            estado.fijada = estado.escribio = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # La réplica tiene los mismos datos que la primaria
+        return True
+
+
+class ReplicaMiddleware:
+    """
+    Lleva el estado de la solicitud para RouterReplica y, si la solicitud
+    escribió, deja una cookie que fija la primaria durante
+    BD_REPLICA_ADHERENCIA segundos.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.BD_REPLICA:
+            return self.get_response(request)
+
+        estado = EstadoSolicitud(fijada=COOKIE_PRIMARIA in request.COOKIES)
+        token = _solicitud.set(estado)
+        try:
+            response = self.get_response(request)
+        finally:
+            _solicitud.reset(token)
+        if estado.escribio:
+            response.set_cookie(
+                COOKIE_PRIMARIA, '1', max_age=settings.BD_REPLICA_ADHERENCIA,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,52 @@
+"""
+Usuario de la sesión servido desde la caché.
+
+Cada solicitud autenticada carga request.user con
+RUTAuthenticationBackend.get_user. En vez de leer la fila de Usuario en
+cada solicitud, se guarda en caché una instantánea de sus columnas durante
+SESION_USUARIO_TTL segundos y se reconstruye la instancia sin consultar la
+BD. request.user sigue siendo un Usuario completo (rol, nombre, hash de la
+contraseña para verificar la sesión), así que los decoradores de rol, las
+plantillas y las claves foráneas no cambian.
+
+La instantánea se invalida al guardar o eliminar el usuario (bloquear y
+desbloquear la cuenta, cambiar la contraseña, registrar el acceso), ver
+signals.py, y quien actualice Usuario con queryset.update() debe llamar a
+invalidar_usuario(). En otros procesos con caché local la revocación se
+aplica al vencer el TTL.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metricas import registrar_cache
+from .models import Usuario
+
+
+CAMPOS = [campo.attname for campo in Usuario._meta.concrete_fields]
+
+
+def _clave(usuario_id):
+    return f'sesion:usuario:{usuario_id}'
+
+
+def instantanea(usuario):
+    return tuple(getattr(usuario, campo) for campo in CAMPOS)
+
+
+def cargar_usuario(usuario_id):
+    """Usuario con ese id desde la caché, o desde la BD si no está. None si no existe."""
+    clave = _clave(usuario_id)
+    valores = cache.get(clave)
+    registrar_cache('sesion_usuario', valores is not None)
+    if valores is not None:
+        return Usuario.from_db('default', CAMPOS, valores)
+
+    usuario = Usuario.objects.filter(pk=usuario_id).first()
+    if usuario is not None:
+        cache.set(clave, instantanea(usuario), settings.SESION_USUARIO_TTL)
+    return usuario
+
+
+def invalidar_usuario(usuario_id):
+    cache.delete(_clave(usuario_id))
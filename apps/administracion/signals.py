@@ -0,0 +1,62 @@
+"""
+Señales que invalidan la caché del dashboard general al registrar
+nuevos partos, recién nacidos o pacientes, que invalidan el usuario de
+sesión en caché y los contadores de intentos de login al modificar un
+Usuario, que vacían la cola de auditoría y los intentos fallidos
+pendientes al terminar cada solicitud y que ajustan cada conexión SQLite
+nueva con SQLITE_PRAGMAS.
+"""
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.pacientes.models import PacienteMadre
+from apps.obstetricia.models import Parto
+from apps.neonatologia.models import RecienNacido
+from .dashboard import invalidar_dashboard
+from .auditoria import vaciar_si_corresponde
+from .models import Usuario
+from .sesion import invalidar_usuario
+from . import intentos_login
+
+
+@receiver(post_save, sender=PacienteMadre)
+@receiver(post_save, sender=Parto)
+@receiver(post_save, sender=RecienNacido)
+def invalidar_dashboard_al_crear(sender, instance, created, **kwargs):
+    if created:
+        invalidar_dashboard()
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_usuario_en_cache(sender, instance, **kwargs):
+    invalidar_usuario(instance.pk)
+
+
+@receiver(post_save, sender=Usuario)
+def olvidar_intentos_al_desbloquear(sender, instance, update_fields=None, **kwargs):
+    if not instance.cuenta_bloqueada and (update_fields is None or 'cuenta_bloqueada' in update_fields):
+        intentos_login.olvidar(instance)
+
+
+@receiver(request_finished)
+def vaciar_auditoria_pendiente(sender, **kwargs):
+    vaciar_si_corresponde()
+
+
+@receiver(request_finished)
+def vaciar_intentos_login_pendientes(sender, **kwargs):
+    intentos_login.pendientes.vaciar_si_corresponde()
+
+
+@receiver(connection_created)
+def aplicar_pragmas_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for nombre, valor in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {nombre} = {valor}')
@@ -0,0 +1,403 @@
+"""
+Generación de datos sintéticos a escala de un servicio real.
+
+Crea pacientes, controles prenatales, partos, recién nacidos con su APGAR
+detallado, alertas y auditoría para un período de varios años (por
+ejemplo, 10 años de un servicio con 5.000 partos al año), con RUTs de
+dígito verificador válido y distribuciones clínicas plausibles: tipos de
+parto, edad gestacional, peso según edad gestacional, APGAR y grupo
+Robson calculado con el mismo algoritmo del modelo Parto.
+
+Todo se inserta con bulk_create por lotes, un año por transacción. Como
+bulk_create no llama a save() ni respeta fechas en campos auto_now_add,
+el RUT canónico y el texto de búsqueda se calculan antes de insertar y
+created_at se corrige después con bulk_update, para que los reportes
+filtrados por fecha de registro vean datos históricos.
+
+Al terminar se reconstruye EstadisticaDiaria, se invalidan los dashboards
+y se aseguran las particiones de auditoría (solo PostgreSQL las usa).
+
+Con la misma semilla y la misma BD de partida los datos son idénticos, lo
+que permite comparar benchmarks entre commits.
+"""
+
+import random
+from time import perf_counter
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.pacientes.importacion import digito_verificador, formatear_rut
+from apps.pacientes.models import PacienteMadre
+from apps.obstetricia.models import ControlPrenatal, Parto
+from apps.neonatologia.models import APGARDetalle, RecienNacido
+from apps.reportes.models import Alerta
+from .models import Auditoria, Usuario
+
+
+NOMBRES = [
+    'María', 'Francisca', 'Catalina', 'Javiera', 'Constanza', 'Valentina', 'Camila',
+    'Fernanda', 'Daniela', 'Carolina', 'Paula', 'Antonia', 'Isidora', 'Josefa',
+    'Macarena', 'Andrea', 'Claudia', 'Paz', 'Ignacia', 'Belén', 'Sofía', 'Florencia',
+]
+APELLIDOS = [
+    'González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva',
+    'Martínez', 'Sepúlveda', 'Morales', 'Rodríguez', 'López', 'Fuentes', 'Hernández',
+    'Torres', 'Araya', 'Flores', 'Espinoza', 'Valenzuela', 'Castillo', 'Tapia',
+    'Reyes', 'Gutiérrez', 'Castro', 'Pizarro', 'Álvarez', 'Vásquez', 'Sánchez', 'Fernández',
+]
+COMUNAS = [
+    'Chillán', 'Chillán Viejo', 'San Carlos', 'Bulnes', 'Coihueco', 'Quirihue',
+    'Yungay', 'El Carmen', 'Pinto', 'San Ignacio', 'Quillón', 'Coelemu',
+]
+CALLES = ['Av. Libertad', 'Arauco', 'Constitución', 'El Roble', '5 de Abril', 'Maipón', 'Collín']
+
+# (valor, peso relativo)
+TIPOS_PARTO = [('eutocico', 55), ('cesarea_electiva', 15), ('cesarea_urgencia', 20), ('forceps', 3), ('ventosa', 7)]
+PRESENTACIONES = [('cefalica', 95), ('podalica', 4), ('transversa', 1)]
+PREVISIONES = [('fonasa_A', 25), ('fonasa_B', 35), ('fonasa_C', 15), ('fonasa_D', 10), ('isapre', 13), ('particular', 2)]
+ESCOLARIDADES = [
+    ('basica_completa', 8), ('media_incompleta', 12), ('media_completa', 40),
+    ('tecnica', 20), ('universitaria_incompleta', 8), ('universitaria_completa', 12),
+]
+ESTADOS_CIVILES = [('soltera', 45), ('casada', 25), ('conviviente', 28), ('divorciada', 2)]
+ROLES = [('matrona', 12), ('medico_obstetra', 4), ('pediatra', 4), ('enfermera_neonatal', 4), ('jefe_servicio', 1), ('administrativo', 2)]
+
+
+@dataclass
+class ResultadoGeneracion:
+    """Cantidades creadas por generar()."""
+    usuarios: int = 0
+    pacientes: int = 0
+    controles: int = 0
+    partos: int = 0
+    recien_nacidos: int = 0
+    apgar: int = 0
+    alertas: int = 0
+    auditoria: int = 0
+    duracion: float = 0.0
+
+
+def _elegir(rng, opciones):
+    valores, pesos = zip(*opciones)
+    return rng.choices(valores, weights=pesos)[0]
+
+
+def componentes_apgar(rng, total):
+    """Reparte un total de APGAR (0-10) en los cinco componentes de 0 a 2."""
+    componentes = [2] * 5
+    for _ in range(10 - total):
+        indice = rng.choice([i for i, valor in enumerate(componentes) if valor > 0])
+        componentes[indice] -= 1
+    return componentes
+
+
+class GeneradorSintetico:
+    """
+    Genera `anios` años de actividad hasta la fecha `hasta` (inclusive) con
+    `partos_por_anio` partos al año.
+    """
+
+    def __init__(self, anios=10, partos_por_anio=5000, hasta=None, semilla=42,
+                 lote=2000, auditoria=True, progreso=None):
+        self.anios = anios
+        self.partos_por_anio = partos_por_anio
+        self.hasta = hasta or timezone.localdate()
+        self.rng = random.Random(semilla)
+        self.lote = lote
+        self.con_auditoria = auditoria
+        self.progreso = progreso or (lambda mensaje: None)
+        self.resultado = ResultadoGeneracion()
+        self.tz = timezone.get_current_timezone()
+        # paciente_id -> [partos previos, cesáreas previas, fecha del último parto]
+        self.historial = {}
+
+    # -- Utilidades ----------------------------------------------------
+
+    def _momento(self, fecha, hora=None):
+        hora = hora or time(self.rng.randrange(24), self.rng.randrange(60))
+        return timezone.make_aware(datetime.combine(fecha, hora), self.tz)
+
+    def _fijar_created_at(self, modelo, objetos, fechas):
+        for objeto, fecha in zip(objetos, fechas):
+            objeto.created_at = fecha
+        modelo.objects.bulk_update(objetos, ['created_at'], batch_size=self.lote)
+
+    def _nuevo_rut(self, anio_nacimiento):
+        # El correlativo del RUT crece con el año de nacimiento
+        base = 6_000_000 + (anio_nacimiento - 1960) * 330_000
+        while True:
+            cuerpo = base + self.rng.randrange(330_000)
+            if cuerpo not in self.ruts_usados:
+                self.ruts_usados.add(cuerpo)
+                return formatear_rut(cuerpo, digito_verificador(cuerpo))
+
+    # -- Generación ----------------------------------------------------
+
+    def _usuarios(self):
+        """Personal sintético (sintetico_<rol>_<n>), reutilizado entre ejecuciones."""
+        usuarios = {}
+        for rol, cantidad in ROLES:
+            usuarios[rol] = []
+            for n in range(1, cantidad + 1):
+                username = f'sintetico_{rol}_{n}'
+                usuario = Usuario.objects.filter(username=username).first()
+                if usuario is None:
+                    usuario = Usuario(
+                        username=username,
+                        first_name=self.rng.choice(NOMBRES),
+                        last_name=self.rng.choice(APELLIDOS),
+                        rut=self._nuevo_rut(self.rng.randrange(1965, 2000)),
+                        rol=rol,
+                    )
+                    usuario.set_unusable_password()
+                    usuario.save()
+                    self.resultado.usuarios += 1
+                usuarios[rol].append(usuario)
+        return usuarios
+
+    def _paciente(self, fecha_parto):
+        edad = min(max(int(self.rng.gauss(28, 6)), 15), 45)
+        nacimiento = fecha_parto - timedelta(days=edad * 365 + self.rng.randrange(365))
+        paciente = PacienteMadre(
+            rut=self._nuevo_rut(nacimiento.year),
+            nombre=self.rng.choice(NOMBRES),
+            apellido_paterno=self.rng.choice(APELLIDOS),
+            apellido_materno=self.rng.choice(APELLIDOS),
+            fecha_nacimiento=nacimiento,
+            estado_civil=_elegir(self.rng, ESTADOS_CIVILES),
+            escolaridad=_elegir(self.rng, ESCOLARIDADES),
+            prevision=_elegir(self.rng, PREVISIONES),
+            pueblo_originario=self.rng.random() < 0.08,
+            direccion=f'{self.rng.choice(CALLES)} {self.rng.randrange(10, 2500)}',
+            comuna=self.rng.choice(COMUNAS),
+            region='Ñuble',
+            telefono=f'+569{self.rng.randrange(10_000_000, 99_999_999)}',
+        )
+        paciente.actualizar_rut_canonico()
+        paciente.actualizar_texto_busqueda()
+        return paciente
+
+    def _generar_periodo(self, desde, hasta, cantidad):
+        rng = self.rng
+        dias = (hasta - desde).days + 1
+        fechas = sorted(desde + timedelta(days=rng.randrange(dias)) for _ in range(cantidad))
+
+        # 1. Pacientes: ~20% de los partos son de pacientes con partos anteriores
+        anteriores = [
+            pid for pid, (_, _, ultima) in self.historial.items() if (desde - ultima).days > 450
+        ]
+        rng.shuffle(anteriores)
+        pacientes, nuevas = [], []
+        for fecha in fechas:
+            if anteriores and rng.random() < 0.2:
+                pacientes.append(PacienteMadre(pk=anteriores.pop()))
+            else:
+                paciente = self._paciente(fecha)
+                nuevas.append((paciente, fecha))
+                pacientes.append(paciente)
+        PacienteMadre.objects.bulk_create([p for p, _ in nuevas], batch_size=self.lote)
+        self._fijar_created_at(PacienteMadre, [p for p, _ in nuevas], [
+            self._momento(fecha - timedelta(days=rng.randrange(60, 240))) for _, fecha in nuevas
+        ])
+        self.resultado.pacientes += len(nuevas)
+
+        # 2. Controles prenatales y partos
+        controles, partos = [], []
+        for paciente, fecha in zip(pacientes, fechas):
+            previos, cesareas_previas, _ = self.historial.get(paciente.pk, (0, 0, None))
+            semanas = 40 - abs(int(rng.gauss(0, 1.4))) if rng.random() > 0.08 else rng.randrange(28, 37)
+            gemelar = rng.random() < 0.015
+            control = ControlPrenatal(
+                paciente_id=paciente.pk,
+                fur=fecha - timedelta(weeks=semanas, days=rng.randrange(7)),
+                num_controles_realizados=rng.randrange(4, 12),
+                grupo_sanguineo=_elegir(rng, [('O', 56), ('A', 30), ('B', 11), ('AB', 3)]),
+                factor_rh='negativo' if rng.random() < 0.06 else 'positivo',
+                num_gestas_previas=previos + (1 if rng.random() < 0.15 else 0),
+                num_partos_previos=previos,
+                num_cesareas_previas=cesareas_previas,
+                embarazo_gemelar=gemelar,
+                hipertension=rng.random() < 0.06,
+                diabetes_gestacional=rng.random() < 0.1,
+                preeclampsia=rng.random() < 0.04,
+            )
+            presentacion = _elegir(rng, PRESENTACIONES)
+            tipo = _elegir(rng, TIPOS_PARTO)
+            if presentacion != 'cefalica' and tipo not in ('cesarea_electiva', 'cesarea_urgencia'):
+                tipo = 'cesarea_urgencia'
+            if tipo == 'cesarea_electiva':
+                inicio = 'cesarea_sin_trabajo'
+            else:
+                inicio = 'inducido' if rng.random() < 0.25 else 'espontaneo'
+            parto = Parto(
+                paciente_id=paciente.pk,
+                control_prenatal=control,
+                usuario_registro=rng.choice(self.usuarios['matrona']),
+                fecha_parto=fecha,
+                hora_parto=time(rng.randrange(24), rng.randrange(60)),
+                edad_gestacional_semanas=semanas,
+                edad_gestacional_dias=rng.randrange(7),
+                tipo_parto=tipo,
+                presentacion=presentacion,
+                inicio_trabajo_parto=inicio,
+                primigesta=previos == 0,
+                multigesta=previos > 0,
+                cicatriz_uterina=cesareas_previas > 0,
+                acompanamiento_parto=rng.random() < 0.8,
+            )
+            parto.grupo_robson = parto.calcular_grupo_robson()
+            controles.append(control)
+            partos.append(parto)
+            self.historial[paciente.pk] = (
+                previos + 1, cesareas_previas + (tipo.startswith('cesarea')), fecha
+            )
+        ControlPrenatal.objects.bulk_create(controles, batch_size=self.lote)
+        Parto.objects.bulk_create(partos, batch_size=self.lote)
+        momentos = [self._momento(p.fecha_parto, p.hora_parto) for p in partos]
+        self._fijar_created_at(ControlPrenatal, controles, [
+            self._momento(c.fur + timedelta(weeks=8)) for c in controles
+        ])
+        self._fijar_created_at(Parto, partos, momentos)
+        self.resultado.controles += len(controles)
+        self.resultado.partos += len(partos)
+
+        # 3. Recién nacidos y APGAR detallado
+        recien_nacidos, detalles = [], []
+        for parto, momento in zip(partos, momentos):
+            semanas = parto.edad_gestacional_semanas
+            peso = int(rng.gauss(3400 - (40 - semanas) * (200 if semanas >= 37 else 260), 420))
+            peso = min(max(peso, 600), 5400)
+            if semanas < 32 or rng.random() < 0.02:
+                apgar_1 = rng.randrange(2, 7)
+            else:
+                apgar_1 = _elegir(rng, [(7, 8), (8, 45), (9, 42), (10, 5)])
+            apgar_5 = min(10, apgar_1 + rng.randrange(0, 3))
+            rn = RecienNacido(
+                parto=parto,
+                sexo=_elegir(rng, [('femenino', 49), ('masculino', 51)]),
+                peso_gramos=peso,
+                talla_cm=round(min(max(rng.gauss(49 + (peso - 3400) / 400, 1.5), 30), 58), 1),
+                circunferencia_craneana_cm=round(min(max(rng.gauss(34.5 + (peso - 3400) / 700, 1.2), 22), 40), 1),
+                apgar_1_min=apgar_1,
+                apgar_5_min=apgar_5,
+                reanimacion_requerida=apgar_1 < 4,
+                apego_piel_a_piel=apgar_5 >= 7 and rng.random() < 0.85,
+                lactancia_inmediata=apgar_5 >= 7 and rng.random() < 0.7,
+                vitamina_k_administrada=True,
+                vacuna_hepatitis_b=rng.random() < 0.97,
+                profilaxis_ocular=True,
+                destino='neonatologia' if peso < 2000 or apgar_5 < 7 else 'alojamiento_conjunto',
+            )
+            recien_nacidos.append(rn)
+            evaluador = rng.choice(self.usuarios['pediatra'])
+            for minuto, total in ((1, apgar_1), (5, apgar_5)):
+                fc, respiracion, tono, reflejos, color = componentes_apgar(rng, total)
+                detalles.append(APGARDetalle(
+                    recien_nacido=rn, minuto=minuto, frecuencia_cardiaca=fc,
+                    esfuerzo_respiratorio=respiracion, tono_muscular=tono,
+                    irritabilidad_refleja=reflejos, color_piel=color,
+                    usuario_evaluador=evaluador,
+                ))
+        RecienNacido.objects.bulk_create(recien_nacidos, batch_size=self.lote)
+        self._fijar_created_at(RecienNacido, recien_nacidos, [m + timedelta(minutes=15) for m in momentos])
+        APGARDetalle.objects.bulk_create(detalles, batch_size=self.lote)
+        self.resultado.recien_nacidos += len(recien_nacidos)
+        self.resultado.apgar += len(detalles)
+
+        # 4. Alertas
+        alertas = []
+        limite_activas = self.hasta - timedelta(days=2)
+        for parto, rn, momento in zip(partos, recien_nacidos, momentos):
+            candidatas = []
+            if rn.apgar_5_min < 7:
+                candidatas.append(('APGAR_CRITICO', 'CRITICA', f'APGAR {rn.apgar_5_min} a los 5 minutos'))
+            if rn.peso_gramos < 2500:
+                candidatas.append(('BAJO_PESO', 'ALTA', f'Recién nacido de {rn.peso_gramos} g'))
+            if parto.tipo_parto == 'cesarea_urgencia' and rng.random() < 0.3:
+                candidatas.append(('CESAREA_EMERGENCIA', 'ALTA', 'Cesárea de urgencia'))
+            if rng.random() < 0.02:
+                candidatas.append(('HEMORRAGIA', 'CRITICA', 'Hemorragia postparto'))
+            for tipo, nivel, titulo in candidatas:
+                de_rn = tipo in ('APGAR_CRITICO', 'BAJO_PESO')
+                alerta = Alerta(
+                    tipo=tipo, nivel_urgencia=nivel, titulo=titulo,
+                    descripcion=f'{titulo}. Generada automáticamente.',
+                    paciente_id=parto.paciente_id, parto=parto,
+                    recien_nacido=rn if de_rn else None,
+                    # Misma clave que reglas_alertas, para que reproducir_alertas no las duplique
+                    clave_regla=f'{tipo}:reciennacido:{rn.pk}' if de_rn else '',
+                    usuario_genera=parto.usuario_registro,
+                    fecha_hora_alerta=momento + timedelta(minutes=rng.randrange(5, 30)),
+                )
+                if parto.fecha_parto < limite_activas:
+                    alerta.estado = 'RESUELTA'
+                    alerta.usuario_atiende = rng.choice(self.usuarios['medico_obstetra'])
+                    alerta.fecha_hora_atencion = alerta.fecha_hora_alerta + timedelta(minutes=rng.randrange(2, 40))
+                    alerta.fecha_hora_resolucion = alerta.fecha_hora_atencion + timedelta(minutes=rng.randrange(10, 240))
+                alertas.append(alerta)
+        Alerta.objects.bulk_create(alertas, batch_size=self.lote)
+        self._fijar_created_at(Alerta, alertas, [a.fecha_hora_alerta for a in alertas])
+        self.resultado.alertas += len(alertas)
+
+        # 5. Auditoría: registro del parto y del RN, consultas a la ficha y logins diarios
+        if self.con_auditoria:
+            registros = []
+            for parto, rn, momento in zip(partos, recien_nacidos, momentos):
+                registros.append(Auditoria(
+                    usuario=parto.usuario_registro, accion='crear', modelo='Parto',
+                    objeto_id=parto.pk, descripcion=f'Registro de parto {parto.pk}',
+                    ip_address=f'10.20.{rng.randrange(256)}.{rng.randrange(1, 255)}',
+                    timestamp=momento + timedelta(minutes=10),
+                ))
+                registros.append(Auditoria(
+                    usuario=rng.choice(self.usuarios['pediatra']), accion='crear', modelo='RecienNacido',
+                    objeto_id=parto.pk, descripcion=f'Registro de recién nacido del parto {parto.pk}',
+                    timestamp=momento + timedelta(minutes=20),
+                ))
+                for _ in range(rng.randrange(1, 4)):
+                    registros.append(Auditoria(
+                        usuario=rng.choice(self.usuarios['matrona'] + self.usuarios['medico_obstetra']),
+                        accion='ver', modelo='PacienteMadre', objeto_id=parto.paciente_id,
+                        descripcion=f'Consulta ficha paciente {parto.paciente_id}',
+                        timestamp=momento + timedelta(hours=rng.randrange(1, 72)),
+                    ))
+            personal = [u for grupo in self.usuarios.values() for u in grupo]
+            for dia in range(dias):
+                fecha = desde + timedelta(days=dia)
+                for usuario in rng.sample(personal, k=max(1, len(personal) // 2)):
+                    registros.append(Auditoria(
+                        usuario=usuario, accion='login', descripcion='Inicio de sesión exitoso',
+                        timestamp=self._momento(fecha),
+                    ))
+            Auditoria.objects.bulk_create(registros, batch_size=self.lote)
+            self.resultado.auditoria += len(registros)
+
+    def generar(self):
+        """Genera todo el período. Retorna un ResultadoGeneracion."""
+        from apps.reportes.estadisticas import reconstruir_rango
+        from .dashboard import invalidar_dashboard
+        from .particiones import asegurar_particiones
+
+        inicio_proceso = perf_counter()
+        self.ruts_usados = set(PacienteMadre.objects.values_list('rut_numero', flat=True))
+        self.ruts_usados.update(Usuario.objects.exclude(rut_numero=None).values_list('rut_numero', flat=True))
+        self.usuarios = self._usuarios()
+
+        inicio = self.hasta - timedelta(days=round(365.25 * self.anios) - 1)
+        desde = inicio
+        while desde <= self.hasta:
+            hasta = min(date(desde.year, 12, 31), self.hasta)
+            cantidad = round(self.partos_por_anio * ((hasta - desde).days + 1) / 365)
+            with transaction.atomic():
+                self._generar_periodo(desde, hasta, cantidad)
+            self.progreso(f'{desde} a {hasta}: {cantidad} partos')
+            desde = hasta + timedelta(days=1)
+
+        reconstruir_rango(inicio, self.hasta)
+        invalidar_dashboard()
+        asegurar_particiones()
+        self.resultado.duracion = perf_counter() - inicio_proceso
+        return self.resultado
@@ -1,9 +1,10 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client
 from django.urls import reverse
 from django.contrib.auth import get_user_model, authenticate
 from django.utils import timezone
 from datetime import timedelta
 from .models import Usuario, Auditoria
+from .consultas import PresupuestoConsultasMixin
 
 Usuario = get_user_model()
 
@@ -146,6 +147,44 @@ class LoginViewTest(TestCase):
         self.assertIsNotNone(user)
         self.assertEqual(user.rut, '12.345.678-5')
     
+    def test_autenticacion_con_rut_sin_formato(self):
+        """El RUT se reconoce sin puntos ni guión con una sola consulta"""
+        from apps.administracion.backends import RUTAuthenticationBackend
+        backend = RUTAuthenticationBackend()
+        
+        for rut in ['12345678-5', '123456785', ' 12.345.678-5 ']:
+            with self.assertNumQueries(1):
+                user = backend.authenticate(None, username=rut, password='testpass123')
+            self.assertEqual(user, self.usuario)
+    
+    def test_username_con_forma_de_rut(self):
+        """Un username numérico que parece RUT también puede ingresar"""
+        from django.contrib.auth import authenticate
+        numerico = Usuario.objects.create_user(
+            username='12345678', rut='9.876.543-3', password='otraclave123', rol='matrona'
+        )
+        self.assertEqual(authenticate(username='12345678', password='otraclave123'), numerico)
+
+    def test_identificador_inexistente_retorna_none(self):
+        """Sin usuario el backend cede a los siguientes en vez de lanzar PermissionDenied"""
+        from unittest import mock
+        from apps.administracion.backends import RUTAuthenticationBackend
+        backend = RUTAuthenticationBackend()
+
+        with mock.patch.object(Usuario, 'set_password') as hash_falso:
+            self.assertIsNone(backend.authenticate(None, username='no_existe', password='x'))
+        hash_falso.assert_called_once_with('x')
+
+    def test_rut_canonico_se_mantiene_al_guardar(self):
+        """rut_numero y rut_dv se actualizan cuando cambia el RUT"""
+        self.assertEqual((self.usuario.rut_numero, self.usuario.rut_dv), (12345678, '5'))
+        
+        self.usuario.rut = '9.876.543-k'
+        self.usuario.save(update_fields=['rut'])
+        self.usuario.refresh_from_db()
+        
+        self.assertEqual((self.usuario.rut_numero, self.usuario.rut_dv), (9876543, 'K'))
+    
     def test_autenticacion_credenciales_incorrectas(self):
         """Test autenticación con credenciales incorrectas"""
         from django.contrib.auth import authenticate
@@ -264,6 +303,425 @@ class AuditoriaModelTest(TestCase):
         self.assertEqual(registros[2].objeto_id, 0)
 
 
+
+class AuditoriaDiferidaTest(TestCase):
+    """Tests de la escritura diferida de auditoría (cola + spool)"""
+    
+    def setUp(self):
+        """Escritor nuevo con spool en un directorio temporal"""
+        import tempfile
+        import shutil
+        from unittest import mock
+        from django.test import override_settings
+        from . import auditoria
+        
+        self.spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool_dir, ignore_errors=True)
+        ajustes = override_settings(
+            AUDITORIA_MODO='diferido',
+            AUDITORIA_SPOOL_DIR=self.spool_dir,
+            AUDITORIA_LOTE=3,
+            AUDITORIA_INTERVALO=60,
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        
+        self.escritor = auditoria.EscritorAuditoria()
+        parche = mock.patch.object(auditoria, 'escritor', self.escritor)
+        parche.start()
+        self.addCleanup(parche.stop)
+        
+        self.usuario = Usuario.objects.create_user(
+            username='test_user',
+            rut='12.345.678-5',
+            password='testpass123',
+            rol='matrona'
+        )
+    
+    def registrar(self, descripcion='Acción'):
+        from .auditoria import registrar_auditoria
+        registrar_auditoria(
+            usuario=self.usuario,
+            accion='crear',
+            modelo='PacienteMadre',
+            objeto_id=1,
+            descripcion=descripcion,
+            ip_address='127.0.0.1',
+            datos_nuevos={'fecha': timezone.localdate()},
+        )
+    
+    def spools(self):
+        import os
+        return sorted(os.listdir(self.spool_dir))
+    
+    def test_registro_queda_en_cola_y_spool(self):
+        """Test que registrar no inserta y deja el registro en el spool"""
+        self.registrar()
+        
+        self.assertEqual(Auditoria.objects.count(), 0)
+        self.assertEqual(self.escritor.pendientes(), 1)
+        self.assertEqual(len(self.spools()), 1)
+    
+    def test_vaciar_inserta_lote_con_timestamp_de_registro(self):
+        """Test que vaciar inserta con bulk_create y conserva el timestamp original"""
+        from .auditoria import vaciar
+        antes = timezone.now()
+        self.registrar('Primera')
+        self.registrar('Segunda')
+        
+        with self.assertNumQueries(3):  # SAVEPOINT + INSERT + RELEASE
+            self.assertEqual(vaciar(), 2)
+        
+        self.assertEqual(Auditoria.objects.count(), 2)
+        self.assertEqual(self.escritor.pendientes(), 0)
+        self.assertEqual(self.spools(), [])
+        registro = Auditoria.objects.get(descripcion='Primera')
+        self.assertLess(registro.timestamp - antes, timedelta(seconds=5))
+        self.assertEqual(registro.datos_nuevos['fecha'], timezone.localdate().isoformat())
+        with self.assertRaises(Exception):
+            registro.save()
+    
+    def test_umbral_tamano_y_tiempo(self):
+        """Test que la cola se vacía al llegar al lote o al vencer el intervalo"""
+        import time
+        self.registrar()
+        self.assertFalse(self.escritor.debe_vaciar())
+        
+        self.escritor._desde = time.monotonic() - 61
+        self.assertTrue(self.escritor.debe_vaciar())
+        
+        self.escritor._desde = time.monotonic()
+        self.registrar()
+        self.registrar()
+        self.assertTrue(self.escritor.debe_vaciar())
+    
+    def test_solicitud_terminada_vacia_cola(self):
+        """Test que el login se registra al terminar la solicitud que alcanza el lote"""
+        self.registrar()
+        self.registrar()
+        
+        self.client.post(reverse('login'), {
+            'username': 'test_user',
+            'password': 'testpass123'
+        })
+        
+        self.assertEqual(Auditoria.objects.count(), 3)
+        self.assertTrue(Auditoria.objects.filter(accion='login').exists())
+    
+    def test_error_bd_conserva_registros(self):
+        """Test que un fallo de BD devuelve los registros a la cola sin tocar el spool"""
+        from unittest import mock
+        from django.db import OperationalError
+        self.registrar()
+        
+        with mock.patch('apps.administracion.auditoria._insertar', side_effect=OperationalError):
+            self.assertEqual(self.escritor.vaciar(), 0)
+        
+        self.assertEqual(self.escritor.pendientes(), 1)
+        self.assertEqual(len(self.spools()), 1)
+        self.assertEqual(self.escritor.vaciar(), 1)
+    
+    def test_recupera_spool_de_proceso_terminado(self):
+        """Test que el spool de un proceso muerto se inserta y se elimina"""
+        import json
+        import os
+        registro = {
+            'usuario_id': self.usuario.pk, 'accion': 'logout', 'modelo': '',
+            'objeto_id': None, 'descripcion': 'Cierre de sesión', 'ip_address': None,
+            'user_agent': '', 'datos_anteriores': None, 'datos_nuevos': None,
+            'timestamp': '2024-03-01T10:00:00-03:00',
+        }
+        ruta = os.path.join(self.spool_dir, 'auditoria-99999999.jsonl')
+        with open(ruta, 'w', encoding='utf-8') as spool:
+            spool.write(json.dumps(registro) + '\n')
+            spool.write(json.dumps(registro) + '\n')
+            spool.write('{"usuario_id": 1, "acc')  # línea cortada
+        
+        self.assertEqual(self.escritor.vaciar(), 2)
+        
+        self.assertEqual(Auditoria.objects.filter(accion='logout').count(), 2)
+        self.assertEqual(self.spools(), [])
+        self.assertEqual(
+            Auditoria.objects.first().timestamp,
+            timezone.datetime(2024, 3, 1, 13, 0, tzinfo=timezone.utc)
+        )
+
+
+class ParticionesAuditoriaTest(TestCase):
+    """Tests de particiones mensuales y archivo de auditoría"""
+    
+    def setUp(self):
+        """Registros en enero y marzo de 2024 y en el mes en curso"""
+        import tempfile
+        import shutil
+        from django.test import override_settings
+        
+        self.archivo_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archivo_dir, ignore_errors=True)
+        ajustes = override_settings(AUDITORIA_ARCHIVO_DIR=self.archivo_dir)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        
+        self.usuario = Usuario.objects.create_user(
+            username='jefe_test',
+            rut='12.345.678-5',
+            password='testpass123',
+            rol='jefe_servicio'
+        )
+        for fecha in [timezone.datetime(2024, 1, 15, 10), timezone.datetime(2024, 3, 31, 23, 30)]:
+            self.crear(timezone.make_aware(fecha), f'Acción {fecha:%Y-%m}')
+        self.crear(timezone.now(), 'Acción actual')
+    
+    def crear(self, timestamp, descripcion):
+        return Auditoria.objects.create(
+            usuario=self.usuario,
+            accion='ver',
+            descripcion=descripcion,
+            timestamp=timestamp
+        )
+    
+    def test_sqlite_conserva_la_tabla_unica(self):
+        """Test que en SQLite asegurar_particiones no saca registros de auditoria"""
+        from django.db import models
+        from .particiones import asegurar_particiones, particiones_existentes
+        
+        self.assertEqual(asegurar_particiones(), {})
+        
+        self.assertEqual(particiones_existentes(), [])
+        self.assertEqual(Auditoria.objects.count(), 3)
+        with self.assertRaises(models.ProtectedError):
+            self.usuario.delete()
+    
+    def test_reintegra_tablas_mensuales_anteriores(self):
+        """Test que las tablas mensuales de rotaciones anteriores vuelven a auditoria"""
+        from django.db import connection
+        from .particiones import _columnas, asegurar_particiones, particiones_existentes, modelo_particion
+        
+        sql, params = connection.schema_editor(atomic=False).table_sql(modelo_particion(2023, 12))
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+        antiguo = self.crear(timezone.make_aware(timezone.datetime(2023, 12, 10, 12)), 'Acción 2023-12')
+        with connection.cursor() as cursor:
+            # Como lo dejaba la rotación anterior: la fila solo en la tabla mensual
+            columnas = _columnas(connection)
+            cursor.execute(
+                f'INSERT INTO auditoria_2023_12 ({columnas}) SELECT {columnas} FROM auditoria WHERE id = %s',
+                [antiguo.pk],
+            )
+            cursor.execute('DELETE FROM auditoria WHERE id = %s', [antiguo.pk])
+        
+        self.assertEqual(asegurar_particiones(), {(2023, 12): 1})
+        self.assertEqual(particiones_existentes(), [])
+        self.assertTrue(Auditoria.objects.filter(descripcion='Acción 2023-12').exists())
+    
+    def test_consulta_por_rango(self):
+        """Test que la consulta por rango usa [inicio, fin) en hora local"""
+        from .particiones import consultar_auditoria, inicio_mes
+        
+        registros = consultar_auditoria(inicio_mes(2024, 3), inicio_mes(2024, 4)).order_by('-timestamp')
+        
+        self.assertEqual([r.descripcion for r in registros], ['Acción 2024-03'])
+    
+    def test_historial_por_rango(self):
+        """Test que el historial muestra los registros del rango con su usuario"""
+        self.client.login(username='jefe_test', password='testpass123')
+        
+        response = self.client.get(reverse('historial_auditoria'), {
+            'fecha_inicio': '2024-01-01', 'fecha_fin': '2024-03-31'
+        })
+        
+        self.assertEqual(response.status_code, 200)
+        logs = list(response.context['page_obj'])
+        self.assertEqual([log.descripcion for log in logs], ['Acción 2024-03', 'Acción 2024-01'])
+        self.assertEqual(logs[0].usuario, self.usuario)
+    
+    def test_archivar_exporta_y_elimina_el_mes(self):
+        """Test que el comando archiva los meses cerrados con manifiesto verificable"""
+        import gzip
+        import hashlib
+        import json
+        import os
+        from io import StringIO
+        from django.core.management import call_command
+        
+        call_command('archivar_auditoria', conservar=0, stdout=StringIO())
+        
+        self.assertEqual(list(Auditoria.objects.values_list('descripcion', flat=True)), ['Acción actual'])
+        ruta = os.path.join(self.archivo_dir, 'auditoria_2024_03.jsonl.gz')
+        with gzip.open(ruta, 'rt', encoding='utf-8') as archivo:
+            filas = [json.loads(linea) for linea in archivo]
+        self.assertEqual([fila['descripcion'] for fila in filas], ['Acción 2024-03'])
+        self.assertEqual(filas[0]['usuario_id'], self.usuario.pk)
+        
+        with open(os.path.join(self.archivo_dir, 'manifiesto.json'), encoding='utf-8') as archivo:
+            manifiesto = json.load(archivo)
+        with open(ruta, 'rb') as archivo:
+            self.assertEqual(manifiesto['auditoria_2024_03.jsonl.gz']['sha256'], hashlib.sha256(archivo.read()).hexdigest())
+        self.assertEqual(os.stat(ruta).st_mode & 0o222, 0)
+        
+        call_command('archivar_auditoria', verificar=True, stdout=StringIO())
+        self.assertEqual(Auditoria.objects.count(), 1)
+
+
+class PaginacionKeysetTest(TestCase):
+    """Tests de paginación por cursor sobre (timestamp, id)"""
+    
+    def setUp(self):
+        """30 registros; los 10 primeros comparten timestamp"""
+        self.usuario = Usuario.objects.create_user(
+            username='jefe_test',
+            rut='12.345.678-5',
+            password='testpass123',
+            rol='jefe_servicio'
+        )
+        base = timezone.now() - timedelta(days=1)
+        for i in range(30):
+            Auditoria.objects.create(
+                usuario=self.usuario,
+                accion='ver',
+                descripcion=f'Acción {i}',
+                timestamp=base if i < 10 else base + timedelta(minutes=i)
+            )
+        self.orden = list(Auditoria.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+    
+    def test_recorre_paginas_en_ambos_sentidos(self):
+        """Test que avanzar y retroceder entrega todas las filas sin repetir"""
+        from .paginacion import paginar_keyset
+        
+        paginas = [paginar_keyset(Auditoria.objects.all(), Auditoria, tamano=7)]
+        while paginas[-1].cursor_siguiente:
+            paginas.append(paginar_keyset(
+                Auditoria.objects.all(), Auditoria, paginas[-1].cursor_siguiente, tamano=7
+            ))
+        
+        vistos = [objeto.id for pagina in paginas for objeto in pagina]
+        self.assertEqual(vistos, self.orden)
+        self.assertIsNone(paginas[0].cursor_anterior)
+        
+        anterior = paginar_keyset(Auditoria.objects.all(), Auditoria, paginas[2].cursor_anterior, tamano=7)
+        self.assertEqual([o.id for o in anterior], [o.id for o in paginas[1]])
+        primera = paginar_keyset(Auditoria.objects.all(), Auditoria, paginas[1].cursor_anterior, tamano=7)
+        self.assertEqual([o.id for o in primera], [o.id for o in paginas[0]])
+        self.assertIsNone(primera.cursor_anterior)
+    
+    def test_pagina_profunda_sin_offset_ni_conteo(self):
+        """Test que una página cualquiera cuesta una consulta sin OFFSET"""
+        from .paginacion import paginar_keyset, codificar_cursor
+        limite = Auditoria.objects.get(id=self.orden[19])
+        cursor = codificar_cursor('siguiente', [limite.timestamp, limite.id])
+        
+        with self.assertNumQueries(1) as consultas:
+            pagina = paginar_keyset(Auditoria.objects.all(), Auditoria, cursor, tamano=5)
+        
+        self.assertEqual([o.id for o in pagina], self.orden[20:25])
+        self.assertNotIn('OFFSET', consultas.captured_queries[0]['sql'])
+    
+    def test_cursor_invalido_muestra_primera_pagina(self):
+        """Test que un cursor manipulado no produce error"""
+        from .paginacion import paginar_keyset
+        
+        pagina = paginar_keyset(Auditoria.objects.all(), Auditoria, 'no-es-un-cursor', tamano=5, contar=True)
+        
+        self.assertEqual([o.id for o in pagina], self.orden[:5])
+        self.assertEqual((pagina.total_estimado, pagina.total_exacto), (30, True))
+    
+    def test_historial_con_cursor(self):
+        """Test que el historial enlaza la página siguiente conservando los filtros"""
+        self.client.login(username='jefe_test', password='testpass123')
+        
+        response = self.client.get(reverse('historial_auditoria'), {'accion': 'ver'})
+        pagina = response.context['page_obj']
+        self.assertEqual(len(pagina), 25)
+        self.assertIn('accion=ver', pagina.url_siguiente)
+        
+        response = self.client.get(reverse('historial_auditoria') + pagina.url_siguiente)
+        self.assertEqual([o.id for o in response.context['page_obj']], self.orden[25:])
+        self.assertIsNone(response.context['page_obj'].url_siguiente)
+
+
+class FiltroFechasLocalesTest(TestCase):
+    """Tests de rangos de fechas locales (America/Santiago) sobre DateTimeField"""
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(
+            username='jefe_test',
+            rut='12.345.678-5',
+            password='testpass123',
+            rol='jefe_servicio'
+        )
+
+    def _crear(self, momento):
+        return Auditoria.objects.create(
+            usuario=self.usuario, accion='ver', descripcion='x', timestamp=momento
+        )
+
+    def test_rango_semiabierto_en_hora_local(self):
+        """Test que el día local empieza a medianoche de Chile y excluye la siguiente"""
+        from datetime import date, datetime
+        from .fechas import rango_local
+
+        inicio, fin = rango_local(date(2024, 1, 15), date(2024, 1, 15))
+
+        self.assertEqual(timezone.localtime(inicio).replace(tzinfo=None), datetime(2024, 1, 15))
+        self.assertEqual(fin - inicio, timedelta(days=1))
+        self.assertEqual(rango_local(), (None, None))
+
+    def test_del_dia_incluye_bordes_locales(self):
+        """Test que 00:00 y 23:59 locales pertenecen al día y las 00:00 siguientes no"""
+        from datetime import date, datetime
+        tz = timezone.get_current_timezone()
+        dentro = [
+            self._crear(timezone.make_aware(datetime(2024, 1, 15, 0, 0), tz)),
+            self._crear(timezone.make_aware(datetime(2024, 1, 15, 23, 59, 59), tz)),
+        ]
+        self._crear(timezone.make_aware(datetime(2024, 1, 16, 0, 0), tz))
+        self._crear(timezone.make_aware(datetime(2024, 1, 14, 23, 59), tz))
+
+        encontrados = Auditoria.objects.del_dia('timestamp', date(2024, 1, 15))
+
+        self.assertCountEqual(encontrados, dentro)
+
+    def test_dia_con_cambio_de_horario(self):
+        """Test que el día en que se adelanta la hora (sin medianoche) se filtra completo"""
+        from datetime import date, datetime
+        tz = timezone.get_current_timezone()
+        # 2024-09-08: en Chile el reloj pasa de 00:00 a 01:00
+        temprano = self._crear(timezone.make_aware(datetime(2024, 9, 8, 1, 30), tz))
+        self._crear(timezone.make_aware(datetime(2024, 9, 7, 23, 30), tz))
+
+        encontrados = Auditoria.objects.del_dia('timestamp', date(2024, 9, 8))
+
+        self.assertEqual(list(encontrados), [temprano])
+
+    def test_sql_compara_la_columna_sin_convertirla(self):
+        """Test que el filtro no envuelve la columna en una conversión a fecha"""
+        from datetime import date
+        from apps.reportes.models import Alerta
+        from apps.neonatologia.models import RecienNacido
+        from apps.pacientes.models import PacienteMadre
+
+        consultas = [
+            (Auditoria.objects.entre_fechas('timestamp', date(2024, 1, 1), date(2024, 1, 31)), 'timestamp'),
+            (Alerta.objects.del_dia('fecha_hora_alerta', date(2024, 1, 1)), 'fecha_hora_alerta'),
+            (RecienNacido.objects.entre_fechas('created_at', desde=date(2024, 1, 1)), 'created_at'),
+            (PacienteMadre.objects.entre_fechas('created_at', hasta=date(2024, 1, 1)), 'created_at'),
+        ]
+        for consulta, columna in consultas:
+            sql = str(consulta.query)
+            self.assertNotIn('cast_date', sql)
+            self.assertNotIn('DATE(', sql.upper())
+            self.assertRegex(sql, rf'"{columna}" (>=|<) ')
+
+    def test_plan_usa_indice(self):
+        """Test que la BD recorre el índice del campo fecha"""
+        from datetime import date
+        from apps.reportes.models import Alerta
+
+        plan = Alerta.objects.del_dia('fecha_hora_alerta', date(2024, 1, 1)).only('id').explain()
+
+        self.assertIn('idx_alerta_fecha', plan)
+
+
 class PermisosRolTest(TestCase):
     """Tests de permisos según rol de usuario"""
     
@@ -321,3 +779,805 @@ class PermisosRolTest(TestCase):
         
         self.assertTrue(usuario.puede_gestionar_usuarios())
         self.assertTrue(usuario.puede_generar_reportes())
+
+
+class DashboardGeneralTest(TestCase):
+    """Tests para el dashboard general con caché"""
+    
+    def setUp(self):
+        """Configuración inicial"""
+        from django.core.cache import cache
+        cache.clear()
+        
+        self.client = Client()
+        self.usuario = Usuario.objects.create_user(
+            username='matrona',
+            rut='12.345.678-5',
+            password='test123',
+            rol='matrona'
+        )
+        self.client.login(username='matrona', password='test123')
+    
+    def crear_parto(self, fecha):
+        from datetime import date
+        from apps.pacientes.models import PacienteMadre
+        from apps.obstetricia.models import Parto
+        
+        paciente = PacienteMadre.objects.create(
+            rut=f'{PacienteMadre.objects.count() + 10}.111.111-1',
+            nombre='Ana',
+            apellido_paterno='Test',
+            apellido_materno='Prueba',
+            fecha_nacimiento=date(1990, 1, 1)
+        )
+        return Parto.objects.create(
+            paciente=paciente,
+            usuario_registro=self.usuario,
+            fecha_parto=fecha,
+            hora_parto=timezone.now().time(),
+            edad_gestacional_semanas=39,
+            tipo_parto='cesarea_electiva',
+            presentacion='cefalica',
+            inicio_trabajo_parto='espontaneo',
+            grupo_robson=2
+        )
+    
+    def test_serie_7_dias_agrupada(self):
+        """Test serie de partos de los últimos 7 días"""
+        hoy = timezone.localdate()
+        self.crear_parto(hoy)
+        self.crear_parto(hoy - timedelta(days=2))
+        self.crear_parto(hoy - timedelta(days=2))
+        
+        response = self.client.get(reverse('dashboard_general'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['partos_7_dias'], [0, 0, 0, 0, 2, 0, 1])
+        self.assertEqual(response.context['partos_hoy'], 1)
+    
+    def test_segunda_carga_usa_cache(self):
+        """Test que la segunda carga no recalcula las estadísticas"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as primera:
+            self.client.get(reverse('dashboard_general'))
+        with CaptureQueriesContext(connection) as segunda:
+            self.client.get(reverse('dashboard_general'))
+        
+        self.assertLessEqual(len(primera), 10)
+        self.assertLess(len(segunda), len(primera))
+        self.assertFalse(any('"parto"' in q['sql'] for q in segunda.captured_queries))
+    
+    def test_crear_parto_invalida_cache(self):
+        """Test que registrar un parto invalida la caché"""
+        response = self.client.get(reverse('dashboard_general'))
+        self.assertEqual(response.context['partos_hoy'], 0)
+        
+        self.crear_parto(timezone.localdate())
+        
+        response = self.client.get(reverse('dashboard_general'))
+        self.assertEqual(response.context['partos_hoy'], 1)
+    
+    def test_rol_no_clinico_sin_listados(self):
+        """Test que roles no clínicos no reciben listados clínicos"""
+        Usuario.objects.create_user(
+            username='admin_user',
+            rut='98.765.432-1',
+            password='test123',
+            rol='administrativo'
+        )
+        self.client.login(username='admin_user', password='test123')
+        
+        response = self.client.get(reverse('dashboard_general'))
+        
+        self.assertIsNone(response.context['ultimos_partos'])
+        self.assertIsNone(response.context['alertas_recientes'])
+
+
+class PresupuestoConsultasTest(PresupuestoConsultasMixin, TestCase):
+    """Tests del middleware de presupuesto de consultas y detección de N+1"""
+    
+    def setUp(self):
+        """Jefe de servicio con una paciente, un parto, su RN y alertas"""
+        from datetime import date
+        from apps.pacientes.models import PacienteMadre
+        from apps.obstetricia.models import Parto
+        from apps.neonatologia.models import RecienNacido
+        from apps.reportes.models import Alerta
+        
+        super().setUp()
+        self.usuario = Usuario.objects.create_user(
+            username='jefe_test',
+            rut='12.345.678-5',
+            password='testpass123',
+            rol='jefe_servicio',
+            is_staff=True,
+            is_superuser=True
+        )
+        for i in range(6):
+            paciente = PacienteMadre.objects.create(
+                rut=f'{i + 10}.111.111-{i}',
+                nombre='Ana',
+                apellido_paterno='González',
+                apellido_materno='Silva',
+                fecha_nacimiento=date(1990, 5, 15),
+                comuna='Chillán',
+                region='Ñuble'
+            )
+            parto = Parto.objects.create(
+                paciente=paciente,
+                usuario_registro=self.usuario,
+                fecha_parto=timezone.localdate(),
+                hora_parto=timezone.now().time(),
+                edad_gestacional_semanas=39,
+                tipo_parto='eutocico',
+                presentacion='cefalica',
+                inicio_trabajo_parto='espontaneo',
+                primigesta=True,
+                grupo_robson=1,
+            )
+            rn = RecienNacido.objects.create(
+                parto=parto,
+                sexo='femenino',
+                peso_gramos=3200,
+                talla_cm=50.0,
+                circunferencia_craneana_cm=35.0,
+                apgar_1_min=8,
+                apgar_5_min=5,
+                destino='alojamiento_conjunto'
+            )
+            alerta = Alerta.objects.create(
+                tipo='APGAR_CRITICO',
+                nivel_urgencia='ALTA',
+                titulo='APGAR bajo',
+                descripcion='Prueba',
+                usuario_genera=self.usuario,
+                paciente=paciente,
+                recien_nacido=rn,
+            )
+        self.paciente, self.parto, self.rn, self.alerta = paciente, parto, rn, alerta
+        self.client.force_login(self.usuario)
+    
+    def test_forma_sql_agrupa_literales(self):
+        """Test que consultas que solo difieren en literales tienen la misma forma"""
+        from .consultas import forma_sql
+        
+        self.assertEqual(
+            forma_sql("SELECT * FROM t WHERE id = 1 AND rut = '11.111.111-1'"),
+            forma_sql("SELECT * FROM t WHERE id = 22 AND rut = '9.999.999-9'"),
+        )
+        self.assertEqual(
+            forma_sql('SELECT * FROM t WHERE id IN (%s, %s)'),
+            forma_sql('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+        )
+    
+    def test_detecta_consulta_repetida(self):
+        """Test que recorrer una relación por fila aparece como N+1"""
+        from apps.reportes.models import Alerta
+        from .consultas import medir_consultas
+        
+        with medir_consultas() as registro:
+            for alerta in Alerta.objects.all():
+                str(alerta.recien_nacido)
+        
+        repetidas = registro.repetidas(5)
+        self.assertEqual(len(repetidas), 3)  # recien_nacido, parto y paciente
+        self.assertTrue(all(veces == 6 for _, veces in repetidas))
+        self.assertGreater(registro.duracion, 0)
+    
+    def test_exceso_se_registra_en_logger(self):
+        """Test que sin modo estricto el exceso solo se registra"""
+        from unittest import mock
+        from django.test import override_settings
+        
+        with override_settings(CONSULTAS_ESTRICTO=False), \
+                mock.patch.dict('apps.administracion.consultas.PRESUPUESTOS', {'perfil_usuario': 0}), \
+                self.assertLogs('apps', level='WARNING') as logs:
+            response = self.client.get(reverse('perfil_usuario'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('perfil_usuario', logs.output[0])
+        self.assertIn('presupuesto 0', logs.output[0])
+    
+    def test_modo_estricto_falla(self):
+        """Test que en modo estricto la solicitud que excede el presupuesto falla"""
+        from unittest import mock
+        from .consultas import PresupuestoExcedido
+        
+        with mock.patch.dict('apps.administracion.consultas.PRESUPUESTOS', {'perfil_usuario': 0}):
+            with self.assertRaises(PresupuestoExcedido):
+                self.client.get(reverse('perfil_usuario'))
+    
+    def test_todas_las_urls_tienen_presupuesto(self):
+        """Test que cada URL con nombre del proyecto tiene presupuesto propio"""
+        from django.urls import get_resolver
+        from .consultas import PRESUPUESTOS
+        
+        nombres = [
+            nombre for nombre in get_resolver().reverse_dict
+            if isinstance(nombre, str)
+        ]
+        
+        self.assertTrue(nombres)
+        self.assertEqual([nombre for nombre in nombres if nombre not in PRESUPUESTOS], [])
+        self.assertIn('admin:', PRESUPUESTOS)
+    
+    def test_vistas_dentro_del_presupuesto(self):
+        """Test que las vistas de lectura no exceden su presupuesto ni repiten consultas"""
+        urls = [
+            reverse('dashboard_general'),
+            reverse('historial_auditoria'),
+            reverse('lista_usuarios'),
+            reverse('perfil_usuario'),
+            reverse('buscar_paciente') + '?query=Ana',
+            reverse('detalle_paciente', args=[self.paciente.id]),
+            reverse('detalle_parto', args=[self.parto.id]),
+            reverse('detalle_recien_nacido', args=[self.rn.pk]),
+            reverse('listado_alertas'),
+            reverse('detalle_alerta', args=[self.alerta.id]),
+            reverse('dashboard_alertas'),
+            reverse('api_alertas_activas'),
+            reverse('seleccionar_reporte'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+    
+    def test_listados_admin_sin_n_mas_1(self):
+        """Test que los listados del admin no consultan la relación por cada fila"""
+        for modelo in ['reportes_alerta', 'neonatologia_reciennacido', 'obstetricia_parto']:
+            with self.subTest(modelo=modelo):
+                response = self.client.get(reverse(f'admin:{modelo}_changelist'))
+                self.assertEqual(response.status_code, 200)
+
+
+class MetricasTest(TestCase):
+    """Tests del endpoint /metrics y la agregación entre procesos"""
+    
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+        from .metricas import registro
+        
+        directorio = tempfile.mkdtemp(prefix='metricas-')
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(METRICAS_DIR=directorio, METRICAS_TOKEN='secreto')
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.directorio = directorio
+        registro.limpiar()
+        
+        self.usuario = Usuario.objects.create_user(
+            username='jefe_test',
+            rut='12.345.678-5',
+            password='testpass123',
+            rol='jefe_servicio'
+        )
+    
+    def test_exposicion_por_vista(self):
+        """Test que /metrics expone solicitudes, latencia y consultas por vista"""
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('perfil_usuario'))
+        self.client.get(reverse('perfil_usuario'))
+        
+        response = self.client.get(reverse('metricas'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texto = response.content.decode()
+        self.assertIn('# TYPE hhm_solicitud_duracion_segundos histogram', texto)
+        self.assertIn('hhm_solicitudes_total{estado="2xx",metodo="GET",vista="perfil_usuario"} 2', texto)
+        self.assertIn('hhm_solicitud_duracion_segundos_bucket{vista="perfil_usuario",le="+Inf"} 2', texto)
+        self.assertIn('hhm_solicitud_consultas_count{vista="perfil_usuario"} 2', texto)
+    
+    def test_acceso_restringido(self):
+        """Test que solo jefe de servicio, staff o el recolector con token acceden"""
+        url = reverse('metricas')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer secreto').status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer otro').status_code, 401)
+        
+        Usuario.objects.create_user(
+            username='matrona_test',
+            rut='9.876.543-3',
+            password='testpass123',
+            rol='matrona'
+        )
+        self.client.login(username='matrona_test', password='testpass123')
+        self.assertEqual(self.client.get(url).status_code, 403)
+    
+    def test_suma_procesos_y_reclama_terminados(self):
+        """Test que se suman los volcados de otros workers y se conservan los de workers terminados"""
+        import json
+        import os
+        from pathlib import Path
+        from .metricas import registro, exponer
+        
+        def volcado(valor):
+            return {
+                'contadores': [['hhm_solicitudes_total', [['estado', '2xx'], ['metodo', 'GET'], ['vista', 'login']], valor]],
+                'histogramas': [],
+            }
+        directorio = Path(self.directorio)
+        (directorio / f'metricas-{os.getppid()}.json').write_text(json.dumps(volcado(3)))
+        (directorio / 'metricas-999999999.json').write_text(json.dumps(volcado(4)))
+        registro.incrementar('hhm_solicitudes_total', estado='2xx', metodo='GET', vista='login')
+        
+        texto = exponer()
+        
+        self.assertIn('hhm_solicitudes_total{estado="2xx",metodo="GET",vista="login"} 8', texto)
+        self.assertFalse((directorio / 'metricas-999999999.json').exists())
+        self.assertIn('vista="login"} 8', exponer())
+    
+    def test_aciertos_de_cache_del_dashboard(self):
+        """Test que el dashboard registra el fallo y luego el acierto de caché"""
+        from django.core.cache import cache
+        from .metricas import exponer
+        cache.clear()
+        self.client.force_login(self.usuario)
+        
+        self.client.get(reverse('dashboard_general'))
+        self.client.get(reverse('dashboard_general'))
+        
+        texto = exponer()
+        self.assertIn('hhm_cache_consultas_total{cache="dashboard",resultado="acierto"} 1', texto)
+        self.assertIn('hhm_cache_consultas_total{cache="dashboard",resultado="fallo"} 1', texto)
+
+
+class DatosSinteticosTest(TestCase):
+    """Tests del generador de datos sintéticos y del benchmark"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from datetime import date
+        from .sinteticos import GeneradorSintetico
+        cls.hasta = date(2024, 6, 30)
+        cls.resultado = GeneradorSintetico(anios=2, partos_por_anio=60, hasta=cls.hasta, semilla=7).generar()
+
+    def test_cantidades_y_relaciones(self):
+        """Cada parto tiene control prenatal, recién nacido y APGAR a los 1 y 5 minutos"""
+        from apps.obstetricia.models import Parto
+        from apps.neonatologia.models import APGARDetalle, RecienNacido
+        self.assertAlmostEqual(self.resultado.partos, 120, delta=2)
+        self.assertEqual(Parto.objects.count(), self.resultado.partos)
+        self.assertEqual(Parto.objects.filter(control_prenatal__isnull=True).count(), 0)
+        self.assertEqual(RecienNacido.objects.count(), self.resultado.partos)
+        self.assertEqual(APGARDetalle.objects.count(), 2 * self.resultado.partos)
+        self.assertLessEqual(self.resultado.pacientes, self.resultado.partos)
+        self.assertGreater(self.resultado.auditoria, self.resultado.partos)
+
+    def test_ruts_validos_y_unicos(self):
+        """Los RUT generados tienen dígito verificador válido"""
+        from apps.pacientes.importacion import digito_verificador
+        from apps.pacientes.models import PacienteMadre
+        ruts = list(PacienteMadre.objects.values_list('rut_numero', 'rut_dv'))
+        self.assertEqual(len(ruts), len({numero for numero, _ in ruts}))
+        for numero, dv in ruts:
+            self.assertEqual(dv, digito_verificador(numero))
+
+    def test_robson_consistente(self):
+        """El grupo Robson guardado coincide con el algoritmo del modelo"""
+        from apps.obstetricia.models import Parto
+        for parto in Parto.objects.select_related('control_prenatal'):
+            self.assertEqual(parto.grupo_robson, parto.calcular_grupo_robson())
+
+    def test_fechas_historicas_y_estadisticas(self):
+        """created_at sigue la fecha del parto y EstadisticaDiaria queda reconstruida"""
+        from apps.obstetricia.models import Parto
+        from apps.reportes.models import EstadisticaDiaria
+        for parto in Parto.objects.all()[:20]:
+            self.assertEqual(timezone.localtime(parto.created_at).date(), parto.fecha_parto)
+        self.assertFalse(Parto.objects.filter(fecha_parto__gt=self.hasta).exists())
+        self.assertEqual(
+            sum(EstadisticaDiaria.objects.values_list('partos_total', flat=True)),
+            self.resultado.partos,
+        )
+
+    def test_misma_semilla_mismos_datos(self):
+        """Con la misma semilla la generación es reproducible"""
+        from .sinteticos import GeneradorSintetico
+        generador = GeneradorSintetico(anios=1, partos_por_anio=5, hasta=self.hasta, semilla=7)
+        otro = GeneradorSintetico(anios=1, partos_por_anio=5, hasta=self.hasta, semilla=7)
+        generador.ruts_usados, otro.ruts_usados = set(), set()
+        self.assertEqual(generador._nuevo_rut(1990), otro._nuevo_rut(1990))
+
+    def test_benchmark_produce_resultados_comparables(self):
+        """El benchmark mide los escenarios y compara dos ejecuciones"""
+        from .rendimiento import comparar, ejecutar_benchmark
+        resultado = ejecutar_benchmark(repeticiones=1, calentamiento=0, solo=['dashboard', 'exportar_alertas'])
+        self.assertIn('dashboard_general_frio', resultado['escenarios'])
+        self.assertIn('exportar_alertas', resultado['escenarios'])
+        self.assertEqual(resultado['volumen']['partos'], self.resultado.partos)
+        datos = resultado['escenarios']['dashboard_general_frio']
+        self.assertGreater(datos['consultas'], 0)
+        filas = comparar(resultado, resultado)
+        self.assertEqual(len(filas), len(resultado['escenarios']))
+        self.assertFalse(any(regresion for *_, regresion in filas))
+
+
+class PerfilesBaseDatosTest(TestCase):
+    """Tests de los perfiles de BD seleccionados con BD_PERFIL"""
+
+    def cargar_settings(self, **entorno):
+        import os
+        import runpy
+        from unittest import mock
+        from django.conf import settings
+        ruta = settings.BASE_DIR / 'hospital_hhm' / 'settings.py'
+        with mock.patch.dict(os.environ, entorno):
+            return runpy.run_path(str(ruta))
+
+    def test_perfil_postgresql(self):
+        """Conexiones persistentes con health check y límites de tiempo"""
+        ajustes = self.cargar_settings(BD_PERFIL='postgresql', BD_STATEMENT_TIMEOUT_MS='15000')
+        bd = ajustes['DATABASES']['default']
+        self.assertEqual(bd['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(bd['CONN_MAX_AGE'], 60)
+        self.assertTrue(bd['CONN_HEALTH_CHECKS'])
+        self.assertFalse(bd['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertIn('-c statement_timeout=15000', bd['OPTIONS']['options'])
+        self.assertIn('-c lock_timeout=', bd['OPTIONS']['options'])
+
+    def test_perfil_postgresql_con_pgbouncer(self):
+        """Con PgBouncer no se usan cursores con nombre ni opciones de arranque"""
+        bd = self.cargar_settings(BD_PERFIL='postgresql', BD_PGBOUNCER='True')['DATABASES']['default']
+        self.assertTrue(bd['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertNotIn('options', bd['OPTIONS'])
+
+    def test_perfil_invalido(self):
+        """Un perfil desconocido falla al cargar la configuración"""
+        with self.assertRaises(ValueError):
+            self.cargar_settings(BD_PERFIL='oracle')
+
+    def test_pragmas_sqlite_en_conexion_nueva(self):
+        """Cada conexión SQLite nueva queda en WAL con synchronous=NORMAL"""
+        import tempfile
+        import shutil
+        from django.db.utils import ConnectionHandler
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        conexion = ConnectionHandler({'default': {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': f'{directorio}/prueba.sqlite3',
+        }})['default']
+        self.addCleanup(conexion.close)
+        with conexion.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertGreater(cursor.fetchone()[0], 0)
+
+
+class CompatibilidadMigracionesTest(TransactionTestCase):
+    """
+    Migraciones en el motor configurado. scripts/migraciones/matriz_compatibilidad.sh
+    ejecuta esta clase con cada BD_PERFIL.
+    """
+
+    # makemigrations revisa el historial de todas las bases, incluida la réplica
+    databases = {'default', 'replica'}
+
+    def test_sin_cambios_pendientes(self):
+        """Los modelos no tienen cambios sin migración"""
+        from django.core.management import call_command
+        call_command('makemigrations', '--check', '--dry-run', verbosity=0)
+
+    def test_migraciones_reversibles(self):
+        """Todas las migraciones se revierten y se vuelven a aplicar"""
+        from django.core.management import call_command
+        from django.db import connection
+        from django.db.migrations.recorder import MigrationRecorder
+        apps_locales = ['administracion', 'reportes', 'neonatologia', 'obstetricia', 'pacientes']
+        for app in apps_locales:
+            call_command('migrate', app, 'zero', verbosity=0)
+        aplicadas = MigrationRecorder(connection).applied_migrations()
+        self.assertFalse([clave for clave in aplicadas if clave[0] in apps_locales])
+
+        call_command('migrate', verbosity=0)
+        self.assertIn('auditoria', connection.introspection.table_names())
+        Usuario.objects.create_user(username='post_migracion', rut='12.345.678-5', password='x')
+        self.assertEqual(Usuario.objects.get(username='post_migracion').rut_numero, 12345678)
+
+    def test_relleno_escribe_en_la_base_migrada(self):
+        """Los rellenos de datos escriben en la base indicada con --database"""
+        from django.core.management import call_command
+        from django.db import connections
+        from django.db.migrations.executor import MigrationExecutor
+        call_command('migrate', 'pacientes', '0001', database='replica', verbosity=0)
+        estado = MigrationExecutor(connections['replica']).loader.project_state(('pacientes', '0001_initial'))
+        estado.apps.get_model('pacientes', 'PacienteMadre').objects.using('replica').create(
+            rut='12.345.678-5', nombre='Ana', apellido_paterno='Pérez', apellido_materno='López',
+            fecha_nacimiento='1990-01-01', comuna='Chillán', region='Ñuble',
+        )
+        call_command('migrate', 'pacientes', database='replica', verbosity=0)
+
+        from apps.pacientes.models import PacienteMadre
+        paciente = PacienteMadre.objects.using('replica').get()
+        self.assertEqual((paciente.rut_numero, paciente.rut_dv), (12345678, '5'))
+        self.assertEqual(paciente.texto_busqueda, '123456785 ana perez lopez')
+
+
+class ReplicaLecturaTest(TestCase):
+    """Tests del router de réplica con dos bases SQLite"""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        from unittest import mock
+        from django.test import override_settings
+        from .replicas import estado_replica
+        ajustes = override_settings(BD_REPLICA=True)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        estado_replica.reiniciar()
+        self.addCleanup(estado_replica.reiniciar)
+        parche = mock.patch('apps.administracion.replicas.retraso_replica', return_value=0.0)
+        self.retraso = parche.start()
+        self.addCleanup(parche.stop)
+
+        self.usuario = Usuario.objects.create_user(
+            username='jefe_test', rut='12.345.678-5', password='testpass123', rol='jefe_servicio'
+        )
+        from apps.reportes.models import Alerta
+        self.alerta = Alerta.objects.create(
+            tipo='BAJO_PESO', nivel_urgencia='ALTA', titulo='Solo en la primaria', descripcion='-'
+        )
+        Alerta.objects.using('replica').create(
+            tipo='APGAR_CRITICO', nivel_urgencia='CRITICA', titulo='Solo en la réplica', descripcion='-'
+        )
+
+    def titulos(self):
+        from apps.reportes.models import Alerta
+        return list(Alerta.objects.values_list('titulo', flat=True))
+
+    def test_lectura_analitica_va_a_la_replica(self):
+        """Dentro de lectura_analitica se lee de la réplica; fuera, de la primaria"""
+        from .replicas import lectura_analitica
+        self.assertEqual(self.titulos(), ['Solo en la primaria'])
+        with lectura_analitica():
+            self.assertEqual(self.titulos(), ['Solo en la réplica'])
+
+    def test_sin_replica_configurada(self):
+        """Con BD_REPLICA=False todo se lee de la primaria"""
+        from django.test import override_settings
+        from .replicas import lectura_analitica
+        with override_settings(BD_REPLICA=False), lectura_analitica():
+            self.assertEqual(self.titulos(), ['Solo en la primaria'])
+
+    def test_replica_atrasada_o_caida(self):
+        """Si la réplica está atrasada o no responde se usa la primaria"""
+        from django.db import OperationalError
+        from .replicas import estado_replica, lectura_analitica
+        self.retraso.return_value = 120.0
+        with lectura_analitica():
+            self.assertEqual(self.titulos(), ['Solo en la primaria'])
+
+        estado_replica.reiniciar()
+        self.retraso.side_effect = OperationalError('sin conexión')
+        with lectura_analitica():
+            self.assertEqual(self.titulos(), ['Solo en la primaria'])
+
+    def test_retraso_se_mide_una_vez_por_intervalo(self):
+        """El retraso no se consulta en cada lectura"""
+        from .replicas import lectura_analitica
+        with lectura_analitica():
+            for _ in range(3):
+                self.titulos()
+        self.assertEqual(self.retraso.call_count, 1)
+
+    def test_lee_sus_propias_escrituras(self):
+        """Tras escribir, las vistas analíticas leen de la primaria durante la adherencia"""
+        from django.db import connections
+        from django.test.utils import CaptureQueriesContext
+        from .replicas import COOKIE_PRIMARIA
+        self.client.login(username='jefe_test', password='testpass123')
+
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.client.get(reverse('dashboard_alertas'))
+        self.assertGreater(len(replica), 0)
+
+        response = self.client.get(reverse('atender_alerta', args=[self.alerta.pk]))
+        self.assertIn(COOKIE_PRIMARIA, response.cookies)
+
+        with CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(reverse('dashboard_alertas'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(replica), 0)
+
+    def test_auditoria_no_fija_la_primaria(self):
+        """Registrar auditoría no cuenta como escritura del usuario"""
+        from .replicas import COOKIE_PRIMARIA
+        self.client.login(username='jefe_test', password='testpass123')
+        response = self.client.get(reverse('historial_auditoria'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(COOKIE_PRIMARIA, response.cookies)
+
+    def test_historial_muestra_la_auditoria_en_cola(self):
+        """Lo que el historial vacía en la primaria se lee de la primaria"""
+        from django.test import override_settings
+        from .auditoria import registrar_auditoria, vaciar
+        self.client.login(username='jefe_test', password='testpass123')
+        vaciar()
+
+        with override_settings(AUDITORIA_MODO='diferido'):
+            registrar_auditoria(self.usuario, 'VIEW', 'Registro en cola')
+            response = self.client.get(reverse('historial_auditoria'))
+
+        descripciones = [log.descripcion for log in response.context['logs'].objetos]
+        self.assertIn('Registro en cola', descripciones)
+
+    def test_medicion_incluye_la_replica(self):
+        """El presupuesto de consultas cuenta también las de la réplica"""
+        from .consultas import medir_consultas
+        from .replicas import lectura_analitica
+        with medir_consultas() as registro, lectura_analitica():
+            self.titulos()
+        self.assertEqual(registro.total, 1)
+
+
+class SesionUsuarioCacheTest(TestCase):
+    """Tests del usuario de sesión servido desde la caché"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.usuario = Usuario.objects.create_user(
+            username='jefe_test', rut='12.345.678-5', password='testpass123', rol='jefe_servicio'
+        )
+        self.client.login(username='jefe_test', password='testpass123')
+        self.url = reverse('lista_usuarios')
+
+    def consultas_usuario(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.url)
+        return response, [c['sql'] for c in consultas if 'FROM "usuario"' in c['sql'] and '"usuario"."id" =' in c['sql']]
+
+    def test_rol_sin_consultar_usuario(self):
+        """Tras la primera solicitud el usuario de la sesión no se lee de la BD"""
+        self.client.get(self.url)
+        response, consultas = self.consultas_usuario()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(consultas, [])
+        self.assertEqual(response.wsgi_request.user.rol, 'jefe_servicio')
+        self.assertIsInstance(response.wsgi_request.user, Usuario)
+
+    def test_bloquear_cuenta_cierra_la_sesion(self):
+        """bloquear_cuenta invalida la instantánea y la sesión deja de ser válida"""
+        self.client.get(self.url)
+        self.usuario.bloquear_cuenta()
+        response = self.client.get(self.url)
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    def test_cambio_de_rol_se_aplica(self):
+        """Guardar el usuario invalida la instantánea"""
+        self.client.get(self.url)
+        self.usuario.rol = 'matrona'
+        self.usuario.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_cambio_de_password_invalida_la_sesion(self):
+        """Cambiar la contraseña invalida las sesiones abiertas"""
+        self.client.get(self.url)
+        self.usuario.set_password('otra-clave-segura-123')
+        self.usuario.save()
+        response = self.client.get(self.url)
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    def test_revocacion_en_otro_proceso_vence_con_el_ttl(self):
+        """Un cambio que no pasa por save() se aplica al vencer la instantánea"""
+        from .sesion import invalidar_usuario
+        self.client.get(self.url)
+        Usuario.objects.filter(pk=self.usuario.pk).update(activo=False)
+        response = self.client.get(self.url)
+        self.assertTrue(response.wsgi_request.user.is_authenticated)
+
+        invalidar_usuario(self.usuario.pk)  # equivale a que venza el TTL
+        response = self.client.get(self.url)
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+
+class IntentosLoginTest(TestCase):
+    """Tests del límite de intentos de inicio de sesión"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .intentos_login import pendientes
+        cache.clear()
+        self.addCleanup(cache.clear)
+        pendientes.vaciar()
+        self.usuario = Usuario.objects.create_user(
+            username='matrona_test', rut='12.345.678-5', password='testpass123', rol='matrona'
+        )
+        self.url = reverse('login')
+
+    def intentar(self, identificador='12.345.678-5', password='incorrecta', ip='10.0.0.1'):
+        return self.client.post(
+            self.url, {'username': identificador, 'password': password}, REMOTE_ADDR=ip
+        )
+
+    def test_fallo_cuesta_una_busqueda(self):
+        """Un intento fallido busca al usuario una sola vez"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as consultas:
+            self.intentar()
+        busquedas = [c for c in consultas if c['sql'].startswith('SELECT') and 'FROM "usuario"' in c['sql']]
+        self.assertEqual(len(busquedas), 1)
+        self.assertEqual(Auditoria.objects.filter(accion='login_fallido', usuario=self.usuario).count(), 1)
+
+    def test_fallos_se_escriben_por_lotes(self):
+        """intentos_fallidos se actualiza al vaciar los pendientes"""
+        from .intentos_login import pendientes
+        self.intentar()
+        self.intentar(ip='10.0.0.2')
+        self.usuario.refresh_from_db()
+        self.assertEqual(self.usuario.intentos_fallidos, 0)
+        self.assertEqual(pendientes.vaciar(), 1)
+        self.usuario.refresh_from_db()
+        self.assertEqual(self.usuario.intentos_fallidos, 2)
+
+    def test_bloqueo_tras_el_maximo(self):
+        """Al quinto fallo la cuenta se bloquea y los intentos siguientes no consultan la BD"""
+        from unittest import mock
+        for _ in range(5):
+            self.intentar()
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.cuenta_bloqueada)
+        self.assertEqual(self.usuario.intentos_fallidos, 5)
+
+        with mock.patch('django.contrib.auth.hashers.PBKDF2PasswordHasher.encode') as hash_, \
+                self.assertNumQueries(0):
+            response = self.intentar(identificador='matrona_test', password='testpass123', ip='10.9.9.9')
+        self.assertEqual(response.status_code, 403)
+        hash_.assert_not_called()
+
+    def test_cuenta_bloqueada_no_verifica_la_contrasena(self):
+        """Una cuenta bloqueada no verifica la contraseña, pero paga el hash de relleno"""
+        from unittest import mock
+        from django.core.exceptions import PermissionDenied
+        from apps.administracion.backends import RUTAuthenticationBackend
+        self.usuario.bloquear_cuenta()
+        with mock.patch.object(Usuario, 'check_password') as verificar, \
+                mock.patch.object(Usuario, 'set_password') as hash_falso:
+            with self.assertRaises(PermissionDenied):
+                RUTAuthenticationBackend().authenticate(None, username='12.345.678-5', password='testpass123')
+        verificar.assert_not_called()
+        hash_falso.assert_called_once_with('testpass123')
+
+    def test_desbloquear_permite_ingresar(self):
+        """desbloquear_cuenta borra los contadores"""
+        for _ in range(5):
+            self.intentar()
+        self.usuario.refresh_from_db()
+        self.usuario.desbloquear_cuenta()
+        response = self.intentar(password='testpass123')
+        self.assertEqual(response.status_code, 302)
+        self.usuario.refresh_from_db()
+        self.assertEqual(self.usuario.intentos_fallidos, 0)
+
+    def test_relleno_de_credenciales_por_ip(self):
+        """Muchos identificadores desde una IP se rechazan sin buscar usuarios"""
+        from django.test import override_settings
+        with override_settings(LOGIN_INTENTOS_IP_MAX=3):
+            for n in range(3):
+                self.intentar(identificador=f'no_existe_{n}')
+            with self.assertNumQueries(0):
+                response = self.intentar(identificador='otro')
+        self.assertEqual(response.status_code, 429)
+        response = self.intentar(identificador='matrona_test', password='testpass123', ip='10.0.0.7')
+        self.assertEqual(response.status_code, 302)
+
+    def test_identificador_inexistente_por_ip(self):
+        """Un identificador inexistente se rechaza tras el máximo desde la misma IP"""
+        for _ in range(5):
+            self.intentar(identificador='no_existe')
+        with self.assertNumQueries(0):
+            response = self.intentar(identificador='no_existe')
+        self.assertEqual(response.status_code, 429)
@@ -2,9 +2,23 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date
 from .decorators import rol_requerido, puede_gestionar_usuarios, puede_ver_auditoria
 from .models import Auditoria, Usuario
+from .auditoria import registrar_auditoria, vaciar as vaciar_auditoria
 from .forms import UsuarioCreationForm, UsuarioChangeForm
+from .dashboard import obtener_datos_dashboard
+from .particiones import consultar_auditoria
+from .paginacion import paginar_keyset
+from .fechas import rango_local
+from .metricas import exponer
+from .replicas import en_replica, fijar_primaria
+from . import intentos_login
 
 
 def login_view(request):
@@ -17,20 +31,31 @@ def login_view(request):
     if request.method == 'POST':
         username = request.POST.get('username')
         password = request.POST.get('password')
+        ip = get_client_ip(request)
+        
+        # Rechazo sin consultar la BD ni calcular el hash (ver intentos_login.py)
+        motivo = intentos_login.motivo_rechazo(username, ip)
+        if motivo == intentos_login.RECHAZO_BLOQUEADA:
+            messages.error(request, 'Cuenta bloqueada por intentos fallidos. Contacte al administrador.')
+            return render(request, 'administracion/login.html', status=403)
+        if motivo is not None:
+            messages.error(request, 'Demasiados intentos fallidos. Espere unos minutos e intente nuevamente.')
+            return render(request, 'administracion/login.html', status=429)
         
         # Autenticar usuario (usa RUTAuthenticationBackend)
         user = authenticate(request, username=username, password=password)
         
         if user is not None:
             # Login exitoso
+            intentos_login.registrar_exito(username, ip, user)
             login(request, user)
             
             # Registrar en auditoría
-            Auditoria.objects.create(
+            registrar_auditoria(
                 usuario=user,
                 accion='login',
                 descripcion=f'Inicio de sesión exitoso - Rol: {user.get_rol_display()}',
-                ip_address=get_client_ip(request),
+                ip_address=ip,
                 user_agent=request.META.get('HTTP_USER_AGENT', '')
             )
             
@@ -42,22 +67,23 @@ def login_view(request):
             messages.success(request, f'¡Bienvenido/a {user.get_full_name()}!')
             return redirect('dashboard')
         else:
-            # Login fallido - registrar en auditoría
-            # Intentar obtener el usuario para registrar intento fallido
-            from apps.administracion.models import Usuario
-            try:
-                failed_user = Usuario.objects.get(rut=username) if '.' in username else Usuario.objects.get(username=username)
-                Auditoria.objects.create(
+            # Login fallido: el backend deja el usuario encontrado (si existe)
+            failed_user = getattr(request, 'usuario_login', None)
+            bloqueada = intentos_login.registrar_fallo(username, ip, failed_user)
+            if failed_user is not None:
+                registrar_auditoria(
                     usuario=failed_user,
                     accion='login_fallido',
-                    descripcion=f'Intento de inicio de sesión fallido',
-                    ip_address=get_client_ip(request),
+                    descripcion='Cuenta bloqueada por intentos fallidos' if bloqueada
+                    else 'Intento de inicio de sesión fallido',
+                    ip_address=ip,
                     user_agent=request.META.get('HTTP_USER_AGENT', '')
                 )
-            except Usuario.DoesNotExist:
-                pass
             
-            messages.error(request, 'RUT/Usuario o contraseña incorrectos.')
+            if bloqueada or (failed_user is not None and failed_user.cuenta_bloqueada):
+                messages.error(request, 'Cuenta bloqueada por intentos fallidos. Contacte al administrador.')
+            else:
+                messages.error(request, 'RUT/Usuario o contraseña incorrectos.')
     
     return render(request, 'administracion/login.html')
 
@@ -68,7 +94,7 @@ def logout_view(request):
     """
     if request.user.is_authenticated:
         # Registrar en auditoría
-        Auditoria.objects.create(
+        registrar_auditoria(
             usuario=request.user,
             accion='logout',
             descripcion='Cierre de sesión',
@@ -106,101 +132,16 @@ def dashboard_view(request):
 
 
 @login_required
+@en_replica
 def dashboard_general(request):
     """
     Dashboard general con estadísticas en tiempo real.
+    Los datos se calculan con consultas agrupadas y se guardan en caché
+    por pocos segundos (ver dashboard.py).
     """
-    from datetime import date, timedelta
-    from django.db.models import Count, Q
-    from apps.obstetricia.models import Parto
-    from apps.neonatologia.models import RecienNacido
-    from apps.pacientes.models import PacienteMadre
-    
-    hoy = date.today()
-    inicio_mes = hoy.replace(day=1)
-    
-    # Estadísticas del día
-    partos_hoy = Parto.objects.filter(fecha_parto=hoy).count()
-    rn_hoy = RecienNacido.objects.filter(created_at__date=hoy).count()
-    pacientes_nuevos_hoy = PacienteMadre.objects.filter(created_at__date=hoy).count()
-    
-    # Alertas críticas (APGAR < 7 en las últimas 24 horas)
-    alertas_criticas = RecienNacido.objects.filter(
-        apgar_5_min__lt=7,
-        created_at__gte=hoy
-    ).count()
-    
-    # Estadísticas del mes
-    partos_mes = Parto.objects.filter(fecha_parto__gte=inicio_mes).count()
-    
-    # Datos para gráficos
-    # 1. Partos por tipo (mes actual)
-    partos_vaginales = Parto.objects.filter(fecha_parto__gte=inicio_mes, tipo_parto='vaginal').count()
-    cesareas = Parto.objects.filter(fecha_parto__gte=inicio_mes, tipo_parto__in=['cesarea_electiva', 'cesarea_urgencia']).count()
-    
-    # 2. Distribución de grupos Robson (mes actual)
-    from django.db.models import Count
-    grupos_robson = list(Parto.objects.filter(
-        fecha_parto__gte=inicio_mes
-    ).values('grupo_robson').annotate(
-        total=Count('id')
-    ).order_by('grupo_robson'))
-    
-    # 3. Peso de RN (mes actual)
-    rn_peso_normal = RecienNacido.objects.filter(
-        created_at__date__gte=inicio_mes,
-        peso_gramos__gte=2500,
-        peso_gramos__lt=4000
-    ).count()
-    rn_bajo_peso = RecienNacido.objects.filter(
-        created_at__date__gte=inicio_mes,
-        peso_gramos__lt=2500
-    ).count()
-    rn_macrosomico = RecienNacido.objects.filter(
-        created_at__date__gte=inicio_mes,
-        peso_gramos__gte=4000
-    ).count()
-    
-    # 4. Últimos 7 días - partos por día
-    from datetime import timedelta
-    ultimos_7_dias = []
-    partos_7_dias = []
-    for i in range(6, -1, -1):
-        dia = hoy - timedelta(days=i)
-        ultimos_7_dias.append(dia.strftime('%d/%m'))
-        count = Parto.objects.filter(fecha_parto=dia).count()
-        partos_7_dias.append(count)
-    
-    # Últimos partos registrados - SOLO para roles clínicos
-    ultimos_partos = None
-    if request.user.rol in ['matrona', 'medico_obstetra', 'pediatra', 'enfermera_neonatal']:
-        ultimos_partos = Parto.objects.select_related('paciente').order_by('-created_at')[:5]
-    
-    # Alertas recientes (RN con APGAR bajo o que requieren atención) - SOLO para roles clínicos
-    alertas_recientes = None
-    if request.user.rol in ['matrona', 'medico_obstetra', 'pediatra', 'enfermera_neonatal']:
-        alertas_recientes = RecienNacido.objects.filter(
-            Q(apgar_5_min__lt=7) | Q(peso_gramos__lt=2500) | Q(reanimacion_requerida=True)
-        ).select_related('parto__paciente').order_by('-created_at')[:5]
-    
     context = {
         'user': request.user,
-        'partos_hoy': partos_hoy,
-        'rn_hoy': rn_hoy,
-        'pacientes_nuevos_hoy': pacientes_nuevos_hoy,
-        'alertas_criticas': alertas_criticas,
-        'partos_mes': partos_mes,
-        'ultimos_partos': ultimos_partos,
-        'alertas_recientes': alertas_recientes,
-        # Datos para gráficos
-        'partos_vaginales': partos_vaginales,
-        'cesareas': cesareas,
-        'grupos_robson': grupos_robson,
-        'rn_peso_normal': rn_peso_normal,
-        'rn_bajo_peso': rn_bajo_peso,
-        'rn_macrosomico': rn_macrosomico,
-        'ultimos_7_dias': ultimos_7_dias,
-        'partos_7_dias': partos_7_dias,
+        **obtener_datos_dashboard(request.user),
     }
     
     return render(request, 'general/dashboard.html', context)
@@ -220,44 +161,48 @@ def get_client_ip(request):
 
 @login_required
 @puede_ver_auditoria
+@en_replica
 def historial_auditoria(request):
     """
     Vista para ver el historial de auditoría (logs).
     Solo accesible para Jefe de Servicio.
     """
-    from django.core.paginator import Paginator
+    # Incluir los registros que este proceso aún tiene en cola. Recién
+    # insertados en la primaria, la réplica puede no tenerlos todavía
+    if vaciar_auditoria():
+        fijar_primaria()
     
     # Filtros
-    logs = Auditoria.objects.select_related('usuario').all()
-    
     usuario_id = request.GET.get('usuario')
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
+    fecha_inicio = parse_date(request.GET.get('fecha_inicio') or '')
+    fecha_fin = parse_date(request.GET.get('fecha_fin') or '')
     accion = request.GET.get('accion')
     
+    filtros = {}
     if usuario_id:
-        logs = logs.filter(usuario_id=usuario_id)
-    
-    if fecha_inicio:
-        logs = logs.filter(timestamp__date__gte=fecha_inicio)
-        
-    if fecha_fin:
-        logs = logs.filter(timestamp__date__lte=fecha_fin)
-        
+        filtros['usuario_id'] = usuario_id
     if accion:
-        logs = logs.filter(accion=accion)
+        filtros['accion'] = accion
+    
+    # Rango [inicio, fin) sobre timestamp: solo se leen las particiones
+    # mensuales que lo intersectan
+    inicio, fin = rango_local(fecha_inicio, fecha_fin)
     
-    # Paginación (25 registros por página)
-    paginator = Paginator(logs, 25)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    def consulta(condicion):
+        return consultar_auditoria(inicio, fin, condicion, **filtros)
+    
+    # Paginación por cursor sobre (timestamp, id), 25 registros por página
+    pagina = paginar_keyset(
+        consulta, Auditoria, request.GET.get('cursor'), tamano=25, contar=True
+    ).con_enlaces(request.GET)
+    prefetch_related_objects(pagina.objetos, 'usuario')
         
     # Obtener lista de usuarios para el filtro
     usuarios = Usuario.objects.all().order_by('last_name')
     
     return render(request, 'administracion/auditoria_list.html', {
-        'page_obj': page_obj,
-        'logs': page_obj,  # Para compatibilidad con template actual
+        'page_obj': pagina,
+        'logs': pagina,  # Para compatibilidad con template actual
         'usuarios': usuarios,
         'ACCION_CHOICES': Auditoria.ACCION_CHOICES,
     })
@@ -289,7 +234,7 @@ def crear_usuario(request):
             user = form.save()
             
             # Auditoría
-            Auditoria.objects.create(
+            registrar_auditoria(
                 usuario=request.user,
                 accion='crear',
                 modelo='Usuario',
@@ -321,7 +266,7 @@ def editar_usuario(request, usuario_id):
             user = form.save()
             
             # Auditoría
-            Auditoria.objects.create(
+            registrar_auditoria(
                 usuario=request.user,
                 accion='editar',
                 modelo='Usuario',
@@ -375,7 +320,7 @@ def perfil_usuario(request):
         request.user.save()
         
         # Auditoría
-        Auditoria.objects.create(
+        registrar_auditoria(
             usuario=request.user,
             accion='editar',
             modelo='Usuario',
@@ -430,7 +375,7 @@ def cambiar_password(request, usuario_id):
         usuario.save()
         
         # Auditoría
-        Auditoria.objects.create(
+        registrar_auditoria(
             usuario=request.user,
             accion='cambiar_password',
             modelo='Usuario',
@@ -472,7 +417,7 @@ def restablecer_password(request, usuario_id):
         usuario.save()
         
         # Auditoría
-        Auditoria.objects.create(
+        registrar_auditoria(
             usuario=request.user,
             accion='restablecer_password',
             modelo='Usuario',
@@ -530,7 +475,7 @@ def forzar_cambio_password(request):
         request.user.save()
         
         # Auditoría
-        Auditoria.objects.create(
+        registrar_auditoria(
             usuario=request.user,
             accion='cambio_password_forzado',
             modelo='Usuario',
@@ -549,6 +494,23 @@ def forzar_cambio_password(request):
     return render(request, 'administracion/forzar_cambio_password.html')
 
 
+def metricas(request):
+    """
+    Métricas de operación en formato de texto de Prometheus.
+    Acceso para jefe de servicio y staff, o con el token del recolector.
+    """
+    token = settings.METRICAS_TOKEN
+    autorizacion = request.headers.get('Authorization', '')
+    con_token = bool(token) and constant_time_compare(autorizacion, f'Bearer {token}')
+    usuario = request.user
+    if not con_token:
+        if not usuario.is_authenticated:
+            return HttpResponse('Autenticación requerida', status=401, content_type='text/plain')
+        if not (usuario.is_staff or usuario.rol == 'jefe_servicio'):
+            raise PermissionDenied('No tiene permisos para ver las métricas.')
+    return HttpResponse(exponer(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 # ===================================================================
 # VISTAS DE ERROR PERSONALIZADAS
 # ===================================================================
@@ -6,6 +6,7 @@ from .models import RecienNacido, SeguimientoNeonatal
 class RecienNacidoAdmin(admin.ModelAdmin):
     list_display = ('parto', 'sexo', 'peso_gramos', 'clasificacion_peso', 'apgar_1_min', 
                     'apgar_5_min', 'apgar_5_critico', 'destino')
+    list_select_related = ('parto__paciente',)
     list_filter = ('sexo', 'destino', 'reanimacion_requerida', 'malformaciones')
     search_fields = ('parto__paciente__nombre', 'parto__paciente__rut')
     readonly_fields = ('created_at', 'updated_at', 'clasificacion_peso', 'apgar_5_critico', 
@@ -47,6 +48,7 @@ class RecienNacidoAdmin(admin.ModelAdmin):
 class SeguimientoNeonatalAdmin(admin.ModelAdmin):
     list_display = ('recien_nacido', 'fecha_hora', 'temperatura_celsius', 'frecuencia_cardiaca',
                     'frecuencia_respiratoria', 'tipo_alimentacion', 'usuario_registro')
+    list_select_related = ('recien_nacido__parto__paciente', 'usuario_registro')
     list_filter = ('tipo_alimentacion', 'fecha_hora')
     search_fields = ('recien_nacido__parto__paciente__nombre',)
     readonly_fields = ('fecha_hora',)
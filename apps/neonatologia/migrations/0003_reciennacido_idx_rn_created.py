@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 13:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('neonatologia', '0002_reciennacido_apego_piel_a_piel_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reciennacido',
+            index=models.Index(fields=['created_at'], name='idx_rn_created'),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
 from apps.obstetricia.models import Parto
+from apps.administracion.fechas import RangoFechasQuerySet
 
 
 class RecienNacido(models.Model):
@@ -218,6 +219,9 @@ class RecienNacido(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Filtros por rango de fechas locales (ver apps.administracion.fechas)
+    objects = RangoFechasQuerySet.as_manager()
+    
     class Meta:
         db_table = 'recien_nacido'
         verbose_name = 'Recién Nacido'
@@ -230,6 +234,7 @@ class RecienNacido(models.Model):
                 condition=models.Q(apgar_5_min__lt=7)
             ),
             models.Index(fields=['destino'], name='idx_rn_destino'),
+            models.Index(fields=['created_at'], name='idx_rn_created'),
         ]
     
     def __str__(self):
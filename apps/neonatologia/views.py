@@ -3,7 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from apps.administracion.decorators import rol_requerido
 from apps.obstetricia.models import Parto
-from apps.reportes.models import Alerta
+from apps.reportes.reglas_alertas import evaluar as evaluar_alertas
 from .models import RecienNacido
 from .forms import RecienNacidoForm
 
@@ -28,23 +28,8 @@ def registrar_recien_nacido(request, parto_id):
             rn.parto = parto
             rn.save()
             
-            # Crear alertas automáticas según condiciones críticas
-            alertas_creadas = []
-            
-            # Alerta por APGAR crítico
-            alerta_apgar = Alerta.crear_alerta_apgar_critico(rn, request.user)
-            if alerta_apgar:
-                alertas_creadas.append('APGAR crítico')
-            
-            # Alerta por bajo peso
-            alerta_peso = Alerta.crear_alerta_bajo_peso(rn, request.user)
-            if alerta_peso:
-                alertas_creadas.append('Bajo peso')
-            
-            # Alerta si requirió reanimación
-            alerta_reanimacion = Alerta.crear_alerta_reanimacion(rn, request.user)
-            if alerta_reanimacion:
-                alertas_creadas.append('Reanimación')
+            # Alertas automáticas: todas las reglas del RN en una pasada
+            alertas_creadas = [alerta.get_tipo_display() for alerta in evaluar_alertas(rn, usuario=request.user)]
             
             # Mostrar mensaje según alertas creadas
             if alertas_creadas:
@@ -5,6 +5,7 @@ from .models import ControlPrenatal, ExamenPrenatal, Parto
 @admin.register(ControlPrenatal)
 class ControlPrenatalAdmin(admin.ModelAdmin):
     list_display = ('paciente', 'fur', 'edad_gestacional_semanas', 'num_controles_realizados', 'embarazo_gemelar')
+    list_select_related = ('paciente',)
     list_filter = ('embarazo_gemelar', 'hipertension', 'diabetes_gestacional', 'preeclampsia')
     search_fields = ('paciente__rut', 'paciente__nombre')
     readonly_fields = ('created_at', 'updated_at')
@@ -34,7 +35,8 @@ class ControlPrenatalAdmin(admin.ModelAdmin):
 @admin.register(ExamenPrenatal)
 class ExamenPrenatalAdmin(admin.ModelAdmin):
     list_display = ('control_prenatal', 'tipo_examen', 'resultado', 'fecha_examen', 'es_critico')
-    list_filter = ('tipo_examen', 'resultado', 'fecha_examen')
+    list_select_related = ('control_prenatal__paciente',)
+    list_filter = ('es_critico', 'tipo_examen', 'resultado', 'fecha_examen')
     search_fields = ('control_prenatal__paciente__nombre',)
     readonly_fields = ('created_at',)
 
@@ -42,6 +44,7 @@ class ExamenPrenatalAdmin(admin.ModelAdmin):
 @admin.register(Parto)
 class PartoAdmin(admin.ModelAdmin):
     list_display = ('paciente', 'fecha_parto', 'tipo_parto', 'grupo_robson', 'presentacion', 'usuario_registro')
+    list_select_related = ('paciente', 'usuario_registro')
     list_filter = ('tipo_parto', 'grupo_robson', 'presentacion', 'fecha_parto')
     search_fields = ('paciente__rut', 'paciente__nombre')
     readonly_fields = ('created_at', 'updated_at')
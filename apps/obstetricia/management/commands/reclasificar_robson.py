@@ -0,0 +1,66 @@
+"""
+Recalcula el grupo Robson de los partos registrados.
+
+Uso:
+    python manage.py reclasificar_robson --simular
+    python manage.py reclasificar_robson --desde 2024-01-01 --hasta 2024-12-31
+    python manage.py reclasificar_robson --reporte cambios_robson.csv
+
+Útil tras cambiar los criterios de clasificación o corregir presentación,
+cicatriz uterina u otros datos de partos antiguos.
+"""
+
+import csv
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.obstetricia.reclasificacion import reclasificar_robson
+
+
+def _parse_fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor}. Use el formato YYYY-MM-DD.')
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el grupo Robson del historial de partos por lotes e informa los cambios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha de parto inicial YYYY-MM-DD')
+        parser.add_argument('--hasta', help='Fecha de parto final YYYY-MM-DD')
+        parser.add_argument(
+            '--lote', type=int, default=2000, help='Partos leídos y actualizados por lote (por defecto 2000)'
+        )
+        parser.add_argument('--simular', action='store_true', help='Informa los cambios sin guardarlos')
+        parser.add_argument('--reporte', help='Ruta de un CSV con cada parto que cambia de grupo')
+
+    def handle(self, *args, **options):
+        desde = _parse_fecha(options['desde']) if options['desde'] else None
+        hasta = _parse_fecha(options['hasta']) if options['hasta'] else None
+        if desde and hasta and desde > hasta:
+            raise CommandError('La fecha --desde no puede ser mayor que --hasta.')
+
+        inicio = time.monotonic()
+        resultado = reclasificar_robson(
+            desde=desde, hasta=hasta, tamano_lote=max(options['lote'], 1), simular=options['simular'],
+        )
+
+        if options['reporte']:
+            with open(options['reporte'], 'w', encoding='utf-8', newline='') as archivo:
+                escritor = csv.writer(archivo)
+                escritor.writerow(['parto_id', 'fecha_parto', 'grupo_anterior', 'grupo_nuevo'])
+                for cambio in resultado.cambios:
+                    escritor.writerow([cambio.parto_id, cambio.fecha_parto, cambio.anterior, cambio.nuevo])
+
+        for (anterior, nuevo), cantidad in sorted(resultado.transiciones.items()):
+            self.stdout.write(f'  Grupo {anterior} -> {nuevo}: {cantidad}')
+
+        verbo = 'cambiarían' if options['simular'] else 'cambiaron'
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.revisados} partos revisados en {time.monotonic() - inicio:.1f} s: '
+            f'{len(resultado.cambios)} {verbo} de grupo Robson.'
+        ))
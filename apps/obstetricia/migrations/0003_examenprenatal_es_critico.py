@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+# Copia congelada de obstetricia.models.EXAMENES_CRITICOS
+EXAMENES_CRITICOS = {
+    'vih': 'positivo',
+    'vdrl': 'reactivo',
+    'hepatitis_b': 'positivo',
+    'streptococo_b': 'positivo',
+}
+
+
+def marcar_examenes_criticos(apps, schema_editor):
+    Modelo = apps.get_model('obstetricia', 'ExamenPrenatal')
+    examenes = Modelo.objects.using(schema_editor.connection.alias)
+    for tipo, resultado in EXAMENES_CRITICOS.items():
+        examenes.filter(tipo_examen=tipo, resultado=resultado).update(es_critico=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('obstetricia', '0002_protocolovih_parto_acompanamiento_parto_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examenprenatal',
+            name='es_critico',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(marcar_examenes_criticos, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='examenprenatal',
+            index=models.Index(condition=models.Q(('es_critico', True)), fields=['-fecha_examen'], name='idx_examen_critico'),
+        ),
+    ]
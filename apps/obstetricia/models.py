@@ -2,6 +2,7 @@ from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
 from apps.pacientes.models import PacienteMadre
+from .robson import clasificar as clasificar_robson
 from django.utils import timezone
 
 
@@ -115,6 +116,15 @@ class ControlPrenatal(models.Model):
         return dias // 7
 
 
+# Resultado que hace crítico a cada tipo de examen (requiere protocolo especial)
+EXAMENES_CRITICOS = {
+    'vih': 'positivo',
+    'vdrl': 'reactivo',
+    'hepatitis_b': 'positivo',
+    'streptococo_b': 'positivo',
+}
+
+
 class ExamenPrenatal(models.Model):
     """
     Modelo para exámenes prenatales obligatorios.
@@ -163,6 +173,10 @@ class ExamenPrenatal(models.Model):
     # Observaciones
     observaciones = models.TextField(blank=True)
     
+    # Resultado crítico, calculado al guardar (ver EXAMENES_CRITICOS).
+    # Los update() masivos de tipo_examen o resultado deben recalcularlo.
+    es_critico = models.BooleanField(default=False, editable=False)
+    
     # Auditoría
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -174,25 +188,28 @@ class ExamenPrenatal(models.Model):
         indexes = [
             models.Index(fields=['tipo_examen', 'resultado'], name='idx_examen_tipo_resultado'),
             models.Index(fields=['-fecha_examen'], name='idx_examen_fecha'),
+            # Índice parcial para la lista de tamizaje (solo resultados críticos)
+            models.Index(
+                fields=['-fecha_examen'],
+                name='idx_examen_critico',
+                condition=models.Q(es_critico=True)
+            ),
         ]
     
     def __str__(self):
         return f"{self.get_tipo_examen_display()}: {self.get_resultado_display()}"
     
-    @property
-    def es_critico(self):
+    def calcular_es_critico(self):
         """Determina si el resultado requiere protocolo especial"""
-        examenes_criticos = {
-            'vih': 'positivo',
-            'vdrl': 'reactivo',
-            'hepatitis_b': 'positivo',
-            'streptococo_b': 'positivo',
-        }
-        
-        if self.tipo_examen in examenes_criticos:
-            return self.resultado == examenes_criticos[self.tipo_examen]
-        
-        return False
+        return EXAMENES_CRITICOS.get(self.tipo_examen) == self.resultado
+    
+    def save(self, *args, **kwargs):
+        """Override save para mantener es_critico sincronizado"""
+        self.es_critico = self.calcular_es_critico()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'tipo_examen', 'resultado'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'es_critico'}
+        super().save(*args, **kwargs)
 
 
 class Parto(models.Model):
@@ -547,47 +564,11 @@ class Parto(models.Model):
         10: Únicos, cefálicos, <37 sem (incluye cicatriz)
         """
         
-        # Grupo 8: Embarazos múltiples
-        if self.control_prenatal and self.control_prenatal.embarazo_gemelar:
-            return 8
-        
-        # Grupo 9: Presentación transversa
-        if self.presentacion == 'transversa':
-            return 9
-        
-        # Grupo 10: Prematuros (<37 semanas)
-        if self.edad_gestacional_semanas < 37:
-            return 10
-        
-        # Grupos 6-7: Presentación podálica
-        if self.presentacion == 'podalica':
-            if self.primigesta:
-                return 6
-            else:
-                return 7
-        
-        # Grupos 1-5: Presentación cefálica, ≥37 semanas
-        if self.presentacion == 'cefalica' and self.edad_gestacional_semanas >= 37:
-            # Grupo 5: Multíparas con cicatriz
-            if self.multigesta and self.cicatriz_uterina:
-                return 5
-            
-            # Grupos 1-2: Nulíparas
-            if self.primigesta:
-                if self.inicio_trabajo_parto == 'espontaneo':
-                    return 1
-                else:
-                    return 2
-            
-            # Grupos 3-4: Multíparas sin cicatriz
-            if self.multigesta and not self.cicatriz_uterina:
-                if self.inicio_trabajo_parto == 'espontaneo':
-                    return 3
-                else:
-                    return 4
-        
-        # Por defecto, retornar grupo 10 (casos no clasificados)
-        return 10
+        gemelar = bool(self.control_prenatal and self.control_prenatal.embarazo_gemelar)
+        return clasificar_robson(
+            gemelar, self.presentacion, self.edad_gestacional_semanas, self.primigesta,
+            self.multigesta, self.cicatriz_uterina, self.inicio_trabajo_parto,
+        )
     
     def save(self, *args, **kwargs):
         """Override save para calcular Robson automáticamente"""
@@ -0,0 +1,97 @@
+"""
+Reclasificación de Robson del historial de partos.
+
+Recorre los partos por lotes en orden de id (sin cargar la tabla completa ni
+instanciar modelos), clasifica cada lote con robson.clasificar_filas() y
+escribe solo los que cambian de grupo con bulk_update, un lote por
+transacción. Luego reconstruye EstadisticaDiaria de los días afectados e
+invalida el dashboard. bulk_update no toca updated_at por sí solo, así que
+se actualiza explícitamente para que las fichas en PDF en caché se regeneren.
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Parto
+from .robson import CAMPOS_ROBSON, clasificar_filas
+
+
+@dataclass
+class CambioRobson:
+    parto_id: int
+    fecha_parto: object
+    anterior: int
+    nuevo: int
+
+
+@dataclass
+class ResultadoReclasificacion:
+    revisados: int = 0
+    cambios: list = field(default_factory=list)
+
+    @property
+    def transiciones(self):
+        """Counter de (grupo anterior, grupo nuevo)."""
+        return Counter((cambio.anterior, cambio.nuevo) for cambio in self.cambios)
+
+
+def _rangos_contiguos(fechas):
+    """Agrupa fechas en rangos (inicio, fin) de días consecutivos."""
+    rangos = []
+    for fecha in sorted(fechas):
+        if rangos and fecha - rangos[-1][1] <= timedelta(days=1):
+            rangos[-1][1] = fecha
+        else:
+            rangos.append([fecha, fecha])
+    return [tuple(rango) for rango in rangos]
+
+
+def reclasificar_robson(desde=None, hasta=None, tamano_lote=2000, simular=False):
+    """
+    Recalcula grupo_robson de los partos con fecha_parto en [desde, hasta]
+    (sin límite si se omiten). Con simular=True solo informa los cambios.
+    """
+    from apps.administracion.dashboard import invalidar_dashboard
+    from apps.reportes.estadisticas import reconstruir_rango
+
+    partos = Parto.objects.all()
+    if desde is not None:
+        partos = partos.filter(fecha_parto__gte=desde)
+    if hasta is not None:
+        partos = partos.filter(fecha_parto__lte=hasta)
+
+    resultado = ResultadoReclasificacion()
+    ultimo_id = 0
+    while True:
+        filas = list(
+            partos.filter(pk__gt=ultimo_id).order_by('pk')
+            .values('pk', 'fecha_parto', 'grupo_robson', *CAMPOS_ROBSON)[:tamano_lote]
+        )
+        if not filas:
+            break
+        ultimo_id = filas[-1]['pk']
+        resultado.revisados += len(filas)
+
+        cambios = [
+            CambioRobson(fila['pk'], fila['fecha_parto'], fila['grupo_robson'], grupo)
+            for fila, grupo in zip(filas, clasificar_filas(filas))
+            if grupo != fila['grupo_robson']
+        ]
+        resultado.cambios.extend(cambios)
+        if cambios and not simular:
+            ahora = timezone.now()
+            with transaction.atomic():
+                Parto.objects.bulk_update(
+                    [Parto(pk=c.parto_id, grupo_robson=c.nuevo, updated_at=ahora) for c in cambios],
+                    ['grupo_robson', 'updated_at'],
+                )
+
+    if resultado.cambios and not simular:
+        for inicio, fin in _rangos_contiguos({cambio.fecha_parto for cambio in resultado.cambios}):
+            reconstruir_rango(inicio, fin)
+        invalidar_dashboard()
+    return resultado
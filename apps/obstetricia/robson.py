@@ -0,0 +1,108 @@
+"""
+Clasificación de Robson por lotes.
+
+clasificar() es el algoritmo OMS sobre valores simples; lo usan tanto
+Parto.calcular_grupo_robson como la clasificación por lotes. Como todos los
+criterios son categóricos (o, en la edad gestacional, un umbral), el grupo
+depende de una combinación finita de rasgos: TABLA_ROBSON precalcula el
+grupo de cada combinación una vez, y clasificar_columnas() /
+clasificar_filas() clasifican miles de partos con una búsqueda en un
+diccionario por fila, sin instanciar modelos ni seguir la relación con
+ControlPrenatal.
+
+Para reclasificar el historial (cambio de criterios o corrección de datos)
+ver el comando reclasificar_robson.
+"""
+
+from itertools import product
+
+
+# Columnas de Parto.objects.values() que usa la clasificación
+CAMPOS_ROBSON = (
+    'control_prenatal__embarazo_gemelar',
+    'presentacion',
+    'edad_gestacional_semanas',
+    'primigesta',
+    'multigesta',
+    'cicatriz_uterina',
+    'inicio_trabajo_parto',
+)
+
+SEMANAS_TERMINO = 37
+
+
+def clasificar(gemelar, presentacion, semanas, primigesta, multigesta, cicatriz, inicio):
+    """Grupo Robson (1-10) según el algoritmo OMS (ver Parto.calcular_grupo_robson)."""
+    # Grupo 8: Embarazos múltiples
+    if gemelar:
+        return 8
+
+    # Grupo 9: Presentación transversa
+    if presentacion == 'transversa':
+        return 9
+
+    # Grupo 10: Prematuros (<37 semanas)
+    if semanas < SEMANAS_TERMINO:
+        return 10
+
+    # Grupos 6-7: Presentación podálica
+    if presentacion == 'podalica':
+        return 6 if primigesta else 7
+
+    # Grupos 1-5: Presentación cefálica, ≥37 semanas
+    if presentacion == 'cefalica':
+        # Grupo 5: Multíparas con cicatriz
+        if multigesta and cicatriz:
+            return 5
+        # Grupos 1-2: Nulíparas
+        if primigesta:
+            return 1 if inicio == 'espontaneo' else 2
+        # Grupos 3-4: Multíparas sin cicatriz
+        if multigesta:
+            return 3 if inicio == 'espontaneo' else 4
+
+    # Por defecto, grupo 10 (casos no clasificados)
+    return 10
+
+
+def _rasgos(gemelar, presentacion, semanas, primigesta, multigesta, cicatriz, inicio):
+    """Reduce una fila a los rasgos discretos de los que depende el grupo."""
+    return (
+        bool(gemelar),
+        presentacion if presentacion in ('cefalica', 'podalica', 'transversa') else None,
+        semanas < SEMANAS_TERMINO,
+        bool(primigesta),
+        bool(multigesta),
+        bool(cicatriz),
+        inicio == 'espontaneo',
+    )
+
+
+def _construir_tabla():
+    tabla = {}
+    for gemelar, presentacion, prematuro, primigesta, multigesta, cicatriz, espontaneo in product(
+        (False, True), ('cefalica', 'podalica', 'transversa', None),
+        (False, True), (False, True), (False, True), (False, True), (False, True),
+    ):
+        tabla[(gemelar, presentacion, prematuro, primigesta, multigesta, cicatriz, espontaneo)] = clasificar(
+            gemelar, presentacion, SEMANAS_TERMINO - 1 if prematuro else SEMANAS_TERMINO,
+            primigesta, multigesta, cicatriz, 'espontaneo' if espontaneo else 'inducido',
+        )
+    return tabla
+
+
+TABLA_ROBSON = _construir_tabla()
+
+
+def clasificar_columnas(columnas):
+    """
+    Grupos de varias filas dadas como columnas: un dict con una secuencia
+    por cada nombre de CAMPOS_ROBSON, todas del mismo largo.
+    """
+    filas = zip(*(columnas[campo] for campo in CAMPOS_ROBSON))
+    return [TABLA_ROBSON[_rasgos(*fila)] for fila in filas]
+
+
+def clasificar_filas(filas):
+    """Grupos de filas de Parto.objects.values(*CAMPOS_ROBSON) (dicts)."""
+    return [TABLA_ROBSON[_rasgos(*(fila[campo] for campo in CAMPOS_ROBSON))] for fila in filas]
@@ -0,0 +1,103 @@
+"""
+Lista de tamizaje: pacientes con exámenes prenatales críticos pendientes.
+
+Un examen crítico (VIH positivo, VDRL reactivo, Hepatitis B o
+Streptococo B positivos; ver EXAMENES_CRITICOS) queda pendiente mientras
+su embarazo siga abierto: sin parto registrado y con FUR dentro de las
+últimas TAMIZAJE_SEMANAS_EMBARAZO semanas. El embarazo es el control
+prenatal del examen; los partos registrados sin control se asocian por
+paciente, si ocurrieron después de la FUR. Así salen de la lista todos
+los resultados, no solo los que activan un ProtocoloVIH (que exige parto).
+
+La lista se pagina por paciente, la de examen más reciente primero:
+conteo, página de pacientes (agrupando los exámenes críticos, que recorre
+el índice parcial idx_examen_critico) y exámenes de esas pacientes con la
+paciente en el mismo JOIN. Tres consultas por página.
+"""
+
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Exists, F, Max, OuterRef, Q
+from django.utils import timezone
+
+from apps.pacientes.models import PacienteMadre
+from .models import ExamenPrenatal, Parto
+
+
+@dataclass
+class PacientePendiente:
+    paciente: PacienteMadre
+    examenes: list = field(default_factory=list)  # más reciente primero
+
+    @property
+    def ultimo_examen(self):
+        return self.examenes[0]
+
+    def como_dict(self):
+        return {
+            'paciente': {
+                'id': self.paciente.pk,
+                'rut': self.paciente.rut,
+                'nombre': self.paciente.nombre_completo,
+            },
+            'examenes': [
+                {
+                    'id': examen.pk,
+                    'tipo': examen.tipo_examen,
+                    'tipo_display': examen.get_tipo_examen_display(),
+                    'resultado': examen.resultado,
+                    'fecha_examen': examen.fecha_examen,
+                }
+                for examen in self.examenes
+            ],
+        }
+
+
+def examenes_criticos_pendientes():
+    """Exámenes críticos de embarazos abiertos (sin parto y con FUR reciente)."""
+    fur_minima = timezone.localdate() - timedelta(weeks=settings.TAMIZAJE_SEMANAS_EMBARAZO)
+    parto = Parto.objects.filter(
+        Q(control_prenatal=OuterRef('control_prenatal'))
+        | Q(
+            control_prenatal__isnull=True,
+            paciente=OuterRef('control_prenatal__paciente'),
+            fecha_parto__gte=OuterRef('control_prenatal__fur'),
+        )
+    )
+    return (
+        ExamenPrenatal.objects
+        .filter(es_critico=True, control_prenatal__fur__gte=fur_minima)
+        .exclude(Exists(parto))
+    )
+
+
+def pagina_tamizaje(numero=1, tamano=None):
+    """
+    Página `numero` de la lista (Page de Django). object_list son los
+    PacientePendiente de la página, la de examen más reciente primero.
+    """
+    examenes = examenes_criticos_pendientes()
+    por_paciente = (
+        examenes.values('control_prenatal__paciente')
+        .annotate(ultimo=Max('fecha_examen'))
+        .order_by(F('ultimo').desc(nulls_last=True), '-control_prenatal__paciente')
+    )
+    pagina = Paginator(por_paciente, tamano or settings.TAMIZAJE_POR_PAGINA).get_page(numero)
+
+    pendientes = {fila['control_prenatal__paciente']: None for fila in pagina.object_list}
+    consulta = (
+        examenes.filter(control_prenatal__paciente__in=list(pendientes))
+        .select_related('control_prenatal__paciente')
+        .order_by(F('fecha_examen').desc(nulls_last=True), '-pk')
+    )
+    for examen in consulta:
+        paciente = examen.control_prenatal.paciente
+        if pendientes[paciente.pk] is None:
+            pendientes[paciente.pk] = PacientePendiente(paciente)
+        pendientes[paciente.pk].examenes.append(examen)
+    # Una paciente que salió de la lista entre ambas consultas queda fuera
+    pagina.object_list = [pendiente for pendiente in pendientes.values() if pendiente is not None]
+    return pagina
@@ -1,4 +1,5 @@
 from django.test import TestCase
+from io import StringIO
 from django.utils import timezone
 from apps.pacientes.models import PacienteMadre
 from apps.obstetricia.models import Parto
@@ -340,3 +341,234 @@ class ValidacionCamposPartoTest(TestCase):
         
         self.assertEqual(parto.paciente, self.paciente)
         self.assertIn(parto, self.paciente.partos.all())
+
+
+class ReclasificacionRobsonTest(TestCase):
+    """Clasificación de Robson por lotes y comando reclasificar_robson"""
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(username='matrona_test', rut='12.345.678-9', rol='matrona')
+        self.paciente = PacienteMadre.objects.create(
+            rut='11.111.111-1', nombre='Ana', apellido_paterno='Test', apellido_materno='Prueba',
+            fecha_nacimiento='1990-01-01', estado_civil='soltera', escolaridad='media_completa',
+            prevision='fonasa_b', direccion='Calle Falsa 123', comuna='Chillán', region='Ñuble',
+        )
+
+    def create_parto(self, **kwargs):
+        defaults = {
+            'paciente': self.paciente,
+            'usuario_registro': self.usuario,
+            'fecha_parto': timezone.now().date(),
+            'hora_parto': timezone.now().time(),
+            'edad_gestacional_semanas': 39,
+            'edad_gestacional_dias': 0,
+            'tipo_parto': 'eutocico',
+            'presentacion': 'cefalica',
+            'inicio_trabajo_parto': 'espontaneo',
+            'primigesta': True,
+            'multigesta': False,
+            'cicatriz_uterina': False,
+        }
+        defaults.update(kwargs)
+        return Parto.objects.create(**defaults)
+
+    def test_tabla_coincide_con_algoritmo(self):
+        """La tabla precalculada da el mismo grupo que clasificar() en todas las combinaciones"""
+        from itertools import product
+        from apps.obstetricia.robson import CAMPOS_ROBSON, clasificar, clasificar_columnas, clasificar_filas
+
+        combinaciones = list(product(
+            (False, True), ('cefalica', 'podalica', 'transversa', 'otra'), (30, 36, 37, 41),
+            (False, True), (False, True), (False, True), ('espontaneo', 'inducido', 'cesarea_electiva'),
+        ))
+        esperados = [clasificar(*combinacion) for combinacion in combinaciones]
+        filas = [dict(zip(CAMPOS_ROBSON, combinacion)) for combinacion in combinaciones]
+        columnas = {campo: [fila[campo] for fila in filas] for campo in CAMPOS_ROBSON}
+
+        self.assertEqual(clasificar_filas(filas), esperados)
+        self.assertEqual(clasificar_columnas(columnas), esperados)
+
+    def test_clasificar_filas_coincide_con_modelo(self):
+        """La clasificación por lotes coincide con Parto.calcular_grupo_robson"""
+        from apps.obstetricia.robson import CAMPOS_ROBSON, clasificar_filas
+
+        self.create_parto()
+        self.create_parto(primigesta=False, multigesta=True, cicatriz_uterina=True)
+        self.create_parto(presentacion='podalica', primigesta=False, multigesta=True)
+        self.create_parto(edad_gestacional_semanas=34)
+        self.create_parto(inicio_trabajo_parto='inducido')
+
+        partos = list(Parto.objects.order_by('pk'))
+        filas = list(Parto.objects.order_by('pk').values(*CAMPOS_ROBSON))
+        self.assertEqual(clasificar_filas(filas), [parto.calcular_grupo_robson() for parto in partos])
+
+    def test_comando_corrige_grupos(self):
+        """reclasificar_robson corrige por lotes los grupos desactualizados"""
+        from django.core.management import call_command
+
+        correcto = self.create_parto()
+        erroneo = self.create_parto(presentacion='podalica')
+        Parto.objects.filter(pk=erroneo.pk).update(grupo_robson=1)
+        antes = Parto.objects.get(pk=erroneo.pk).updated_at
+
+        call_command('reclasificar_robson', '--lote', '1', stdout=StringIO())
+
+        erroneo = Parto.objects.get(pk=erroneo.pk)
+        self.assertEqual(erroneo.grupo_robson, 6)
+        self.assertGreater(erroneo.updated_at, antes)
+        self.assertEqual(Parto.objects.get(pk=correcto.pk).grupo_robson, 1)
+
+    def test_comando_simular_y_reporte(self):
+        """--simular no guarda cambios y --reporte lista cada parto que cambia"""
+        import csv
+        import os
+        import shutil
+        import tempfile
+        from django.core.management import call_command
+
+        parto = self.create_parto(edad_gestacional_semanas=33)
+        Parto.objects.filter(pk=parto.pk).update(grupo_robson=2)
+
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ruta = os.path.join(directorio, 'cambios.csv')
+        salida = StringIO()
+        call_command('reclasificar_robson', '--simular', '--reporte', ruta, stdout=salida)
+
+        self.assertEqual(Parto.objects.get(pk=parto.pk).grupo_robson, 2)
+        self.assertIn('Grupo 2 -> 10: 1', salida.getvalue())
+        with open(ruta, encoding='utf-8') as archivo:
+            filas = list(csv.DictReader(archivo))
+        self.assertEqual(len(filas), 1)
+        self.assertEqual(filas[0]['parto_id'], str(parto.pk))
+        self.assertEqual((filas[0]['grupo_anterior'], filas[0]['grupo_nuevo']), ('2', '10'))
+
+
+class TamizajePrenatalTest(TestCase):
+    """es_critico persistido y lista de tamizaje de exámenes críticos"""
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(
+            username='matrona_test', password='Clave.Segura.2024', rut='12.345.678-9', rol='matrona'
+        )
+
+    def crear_control(self, rut, semanas=20):
+        from datetime import timedelta
+        from apps.obstetricia.models import ControlPrenatal
+        paciente = PacienteMadre.objects.create(
+            rut=rut, nombre='Ana', apellido_paterno='Test', apellido_materno='Prueba',
+            fecha_nacimiento='1990-01-01', estado_civil='soltera', escolaridad='media_completa',
+            prevision='fonasa_b', direccion='Calle Falsa 123', comuna='Chillán', region='Ñuble',
+        )
+        return ControlPrenatal.objects.create(
+            paciente=paciente, fur=timezone.localdate() - timedelta(weeks=semanas),
+        )
+
+    def crear_examen(self, control, tipo, resultado):
+        from datetime import timedelta
+        from apps.obstetricia.models import ExamenPrenatal
+        return ExamenPrenatal.objects.create(
+            control_prenatal=control, tipo_examen=tipo, resultado=resultado,
+            fecha_examen=control.fur + timedelta(weeks=12),
+        )
+
+    def crear_parto(self, paciente, control=None):
+        return Parto.objects.create(
+            paciente=paciente, control_prenatal=control, usuario_registro=self.usuario,
+            fecha_parto=timezone.now().date(), hora_parto=timezone.now().time(), edad_gestacional_semanas=39,
+            tipo_parto='cesarea_electiva', presentacion='cefalica', inicio_trabajo_parto='cesarea_electiva',
+        )
+
+    def test_es_critico_se_guarda(self):
+        """es_critico se calcula al guardar y al cambiar el resultado"""
+        from apps.obstetricia.models import ExamenPrenatal
+        control = self.crear_control('11.111.111-1')
+
+        self.assertTrue(self.crear_examen(control, 'vih', 'positivo').es_critico)
+        self.assertTrue(self.crear_examen(control, 'vdrl', 'reactivo').es_critico)
+        self.assertFalse(self.crear_examen(control, 'vdrl', 'positivo').es_critico)
+        self.assertFalse(self.crear_examen(control, 'glicemia', 'positivo').es_critico)
+
+        examen = self.crear_examen(control, 'hepatitis_b', 'pendiente')
+        examen.resultado = 'positivo'
+        examen.save(update_fields=['resultado'])
+        self.assertTrue(ExamenPrenatal.objects.get(pk=examen.pk).es_critico)
+
+    def test_lista_solo_embarazos_abiertos(self):
+        """Solo quedan pendientes los embarazos sin parto y con FUR reciente"""
+        from apps.obstetricia.models import ProtocoloVIH
+        from apps.obstetricia.tamizaje import pagina_tamizaje
+
+        pendiente = self.crear_control('11.111.111-1')
+        self.crear_examen(pendiente, 'vih', 'positivo')
+        self.crear_examen(pendiente, 'streptococo_b', 'positivo')
+        self.crear_examen(pendiente, 'hemograma', 'negativo')
+
+        atendida = self.crear_control('22.222.222-2')
+        self.crear_examen(atendida, 'vih', 'positivo')
+        ProtocoloVIH.objects.create(parto=self.crear_parto(atendida.paciente, atendida)).activar_protocolo()
+
+        # Sin protocolo VIH: el parto basta para cerrar el embarazo
+        parida = self.crear_control('44.444.444-4')
+        self.crear_examen(parida, 'vdrl', 'reactivo')
+        self.crear_parto(parida.paciente, parida)
+
+        # Parto registrado sin control prenatal, posterior a la FUR
+        parida_sin_control = self.crear_control('55.555.555-5')
+        self.crear_examen(parida_sin_control, 'hepatitis_b', 'positivo')
+        self.crear_parto(parida_sin_control.paciente)
+
+        # Sin parto registrado, pero con la FUR fuera de plazo
+        antigua = self.crear_control('66.666.666-6', semanas=60)
+        self.crear_examen(antigua, 'streptococo_b', 'positivo')
+
+        sin_criticos = self.crear_control('33.333.333-3')
+        self.crear_examen(sin_criticos, 'vih', 'negativo')
+
+        with self.assertNumQueries(3):
+            pendientes = pagina_tamizaje().object_list
+
+        self.assertEqual([p.paciente.pk for p in pendientes], [pendiente.paciente.pk])
+        self.assertEqual(
+            sorted(examen.tipo_examen for examen in pendientes[0].examenes), ['streptococo_b', 'vih']
+        )
+
+    def test_api_tamizaje(self):
+        """La API responde la lista y exige un rol clínico"""
+        from django.urls import reverse
+        self.crear_examen(self.crear_control('11.111.111-1'), 'vdrl', 'reactivo')
+
+        self.client.force_login(self.usuario)
+        response = self.client.get(reverse('api_tamizaje'))
+        self.assertEqual(response.status_code, 200)
+        datos = response.json()
+        self.assertEqual(datos['total'], 1)
+        self.assertEqual(datos['pacientes'][0]['examenes'][0]['tipo'], 'vdrl')
+        self.assertEqual(self.client.get(reverse('tamizaje_prenatal')).status_code, 200)
+
+        pediatra = Usuario.objects.create_user(
+            username='pediatra_test', password='Clave.Segura.2024', rut='9.876.543-3', rol='pediatra'
+        )
+        self.client.force_login(pediatra)
+        self.assertNotEqual(self.client.get(reverse('api_tamizaje')).status_code, 200)
+
+    def test_paginacion_por_paciente(self):
+        """Vista y API se paginan por paciente, sin separar sus exámenes"""
+        from django.test import override_settings
+        from django.urls import reverse
+        for indice, semanas in enumerate([30, 10, 20]):
+            control = self.crear_control(f'1{indice}.111.111-1', semanas=semanas)
+            self.crear_examen(control, 'vih', 'positivo')
+            self.crear_examen(control, 'vdrl', 'reactivo')
+
+        self.client.force_login(self.usuario)
+        with override_settings(TAMIZAJE_POR_PAGINA=2):
+            primera = self.client.get(reverse('api_tamizaje')).json()
+            segunda = self.client.get(reverse('api_tamizaje'), {'page': 2}).json()
+            vista = self.client.get(reverse('tamizaje_prenatal'), {'page': 2})
+
+        self.assertEqual((primera['total'], primera['paginas']), (3, 2))
+        self.assertEqual([p['paciente']['rut'] for p in primera['pacientes']], ['11.111.111-1', '12.111.111-1'])
+        self.assertEqual([p['paciente']['rut'] for p in segunda['pacientes']], ['10.111.111-1'])
+        self.assertTrue(all(len(p['examenes']) == 2 for p in primera['pacientes'] + segunda['pacientes']))
+        self.assertEqual([p.paciente.rut for p in vista.context['page_obj']], ['10.111.111-1'])
@@ -4,4 +4,6 @@ from . import views
 urlpatterns = [
     path('parto/registrar/<int:paciente_id>/', views.registrar_parto, name='registrar_parto'),
     path('parto/detalle/<int:parto_id>/', views.detalle_parto, name='detalle_parto'),
+    path('tamizaje/', views.tamizaje_prenatal, name='tamizaje_prenatal'),
+    path('api/tamizaje/', views.api_tamizaje, name='api_tamizaje'),
 ]
@@ -1,11 +1,13 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.http import JsonResponse
 from django.utils import timezone
-from apps.administracion.decorators import puede_registrar_parto
+from apps.administracion.decorators import puede_registrar_parto, rol_requerido
 from apps.pacientes.models import PacienteMadre
 from .models import Parto
 from .forms import PartoForm, ControlPrenatalForm
+from .tamizaje import pagina_tamizaje
 
 @login_required
 @puede_registrar_parto
@@ -55,3 +57,28 @@ def detalle_parto(request, parto_id):
     return render(request, 'obstetricia/detalle_parto.html', {
         'parto': parto
     })
+
+
+@login_required
+@rol_requerido('matrona', 'medico_obstetra', 'jefe_servicio')
+def tamizaje_prenatal(request):
+    """
+    Lista paginada de pacientes con exámenes prenatales críticos en
+    embarazos abiertos (ver apps.obstetricia.tamizaje).
+    """
+    return render(request, 'obstetricia/tamizaje.html', {
+        'page_obj': pagina_tamizaje(request.GET.get('page')),
+    })
+
+
+@login_required
+@rol_requerido('matrona', 'medico_obstetra', 'jefe_servicio')
+def api_tamizaje(request):
+    """API JSON de la lista de tamizaje prenatal, paginada con ?page=N."""
+    pagina = pagina_tamizaje(request.GET.get('page'))
+    return JsonResponse({
+        'total': pagina.paginator.count,
+        'pagina': pagina.number,
+        'paginas': pagina.paginator.num_pages,
+        'pacientes': [pendiente.como_dict() for pendiente in pagina.object_list],
+    })
@@ -1,5 +1,21 @@
-from django.contrib import admin
+import io
+from django import forms
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from .models import PacienteMadre
+from .importacion import importar_pacientes
+
+
+class ImportarPacientesForm(forms.Form):
+    """Formulario de carga del CSV de pacientes."""
+    archivo = forms.FileField(label='Archivo CSV (UTF-8)')
+    delimitador = forms.ChoiceField(
+        label='Separador',
+        choices=[(',', 'Coma (,)'), (';', 'Punto y coma (;)')],
+    )
+    simular = forms.BooleanField(label='Solo validar (no insertar)', required=False)
 
 
 @admin.register(PacienteMadre)
@@ -8,6 +24,7 @@ class PacienteMadreAdmin(admin.ModelAdmin):
     list_filter = ('estado_civil', 'prevision', 'pueblo_originario')
     search_fields = ('rut', 'nombre', 'apellido_paterno', 'apellido_materno')
     readonly_fields = ('created_at', 'updated_at')
+    change_list_template = 'admin/pacientes/pacientemadre/change_list.html'
     
     fieldsets = (
         ('Identificación', {
@@ -30,3 +47,47 @@ class PacienteMadreAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    
+    def get_urls(self):
+        urls = [
+            path(
+                'importar/',
+                self.admin_site.admin_view(self.importar_view),
+                name='pacientes_pacientemadre_importar',
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def importar_view(self, request):
+        """Carga masiva de pacientes desde CSV (ver importacion.py)."""
+        if not self.has_add_permission(request):
+            return redirect('admin:pacientes_pacientemadre_changelist')
+        
+        resultado = None
+        form = ImportarPacientesForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            archivo = io.TextIOWrapper(form.cleaned_data['archivo'].file, encoding='utf-8-sig', newline='')
+            try:
+                resultado = importar_pacientes(
+                    archivo,
+                    delimitador=form.cleaned_data['delimitador'],
+                    simular=form.cleaned_data['simular'],
+                )
+            except (ValueError, UnicodeDecodeError) as e:
+                messages.error(request, f'No se pudo leer el archivo: {e}')
+            else:
+                messages.success(
+                    request,
+                    f'{resultado.procesadas} filas procesadas: {resultado.importadas} '
+                    f'{"válidas" if form.cleaned_data["simular"] else "importadas"}, '
+                    f'{resultado.rechazadas} rechazadas.'
+                )
+        
+        return TemplateResponse(request, 'admin/pacientes/pacientemadre/importar.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Importar pacientes',
+            'form': form,
+            'resultado': resultado,
+            'rechazos': resultado.rechazos[:200] if resultado else [],
+        })
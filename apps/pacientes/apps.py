@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def asegurar_indice_busqueda(sender, using, **kwargs):
+    """Repara el índice de búsqueda de pacientes después de cada migrate."""
+    from django.db import connections
+    from .busqueda import crear_indice, indice_instalable
+
+    conexion = connections[using]
+    if indice_instalable(conexion):
+        crear_indice(conexion)
 
 
 class PacientesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.pacientes'
+
+    def ready(self):
+        post_migrate.connect(asegurar_indice_busqueda, sender=self)
@@ -0,0 +1,164 @@
+"""
+Búsqueda de pacientes sobre la columna normalizada texto_busqueda.
+
+PacienteMadre.save() guarda en texto_busqueda el RUT compacto y los nombres
+en minúsculas y sin tildes. Sobre esa columna se crea un índice según el
+motor de BD:
+
+- PostgreSQL: índice GIN con gin_trgm_ops (extensión pg_trgm). Los
+  LIKE '%termino%' usan el índice y los resultados se ordenan por
+  similitud de trigramas.
+- SQLite: tabla virtual FTS5 con tokenizador trigram, sincronizada con
+  triggers sobre paciente_madre. La coincidencia y el bm25 se calculan en
+  subconsultas de la misma consulta SQL, de modo que los demás filtros
+  (fechas) y el conteo del paginador ven todos los resultados.
+
+En otros motores se usa LIKE sobre la columna normalizada sin índice.
+Si la consulta es un RUT completo se busca primero por igualdad en
+(rut_numero, rut_dv); solo si no hay coincidencia se usa el índice.
+Los términos de menos de 3 caracteres no generan trigramas y se filtran
+con LIKE sobre los resultados del índice.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import PacienteMadre, normalizar_texto, compactar_rut, descomponer_rut
+
+
+TABLA_FTS = 'paciente_busqueda_fts'
+
+_PATRON_RUT = re.compile(r'^[\d.]+-?[\dkK]?$')
+
+_SQL_SQLITE = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5(
+        texto_busqueda, content='paciente_madre', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS paciente_busqueda_ai AFTER INSERT ON paciente_madre BEGIN
+        INSERT INTO {TABLA_FTS}(rowid, texto_busqueda) VALUES (new.id, new.texto_busqueda);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS paciente_busqueda_ad AFTER DELETE ON paciente_madre BEGIN
+        INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, texto_busqueda) VALUES ('delete', old.id, old.texto_busqueda);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS paciente_busqueda_au AFTER UPDATE ON paciente_madre BEGIN
+        INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, texto_busqueda) VALUES ('delete', old.id, old.texto_busqueda);
+        INSERT INTO {TABLA_FTS}(rowid, texto_busqueda) VALUES (new.id, new.texto_busqueda);
+    END""",
+]
+
+_TRIGGERS_SQLITE = {'paciente_busqueda_ai', 'paciente_busqueda_ad', 'paciente_busqueda_au'}
+
+_SQL_POSTGRESQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS idx_paciente_busqueda_trgm '
+    'ON paciente_madre USING gin (texto_busqueda gin_trgm_ops)',
+]
+
+
+def crear_indice(conexion):
+    """
+    Crea (o repara) el índice de búsqueda para el motor de la conexión.
+    Es idempotente: se ejecuta desde la migración y después de cada migrate,
+    porque en SQLite reconstruir la tabla paciente_madre elimina sus triggers.
+    """
+    with conexion.cursor() as cursor:
+        if conexion.vendor == 'postgresql':
+            for sql in _SQL_POSTGRESQL:
+                cursor.execute(sql)
+        elif conexion.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'paciente_madre'"
+            )
+            existentes = {fila[0] for fila in cursor.fetchall()}
+            if _TRIGGERS_SQLITE <= existentes:
+                return
+            for sql in _SQL_SQLITE:
+                cursor.execute(sql)
+            # Los triggers faltaban: el índice puede estar desfasado
+            cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+
+
+def eliminar_indice(conexion):
+    """Elimina el índice de búsqueda (reversa de la migración)."""
+    with conexion.cursor() as cursor:
+        if conexion.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS idx_paciente_busqueda_trgm')
+        elif conexion.vendor == 'sqlite':
+            for trigger in sorted(_TRIGGERS_SQLITE):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+            cursor.execute(f'DROP TABLE IF EXISTS {TABLA_FTS}')
+
+
+def indice_instalable(conexion):
+    """Indica si paciente_madre ya tiene la columna texto_busqueda."""
+    with conexion.cursor() as cursor:
+        if 'paciente_madre' not in conexion.introspection.table_names(cursor):
+            return False
+        columnas = conexion.introspection.get_table_description(cursor, 'paciente_madre')
+    return any(columna.name == 'texto_busqueda' for columna in columnas)
+
+
+def normalizar_consulta(query):
+    """Convierte la consulta en términos normalizados; los RUT se compactan."""
+    query = (query or '').strip()
+    if _PATRON_RUT.match(query):
+        return [compactar_rut(query)]
+    return normalizar_texto(query).split()
+
+
+def _filtrar_fts(queryset, terminos):
+    """
+    Pacientes del queryset que contienen todos los términos, anotados con
+    su bm25 (menor es más relevante). El índice resuelve el IN y el bm25
+    se calcula solo para las filas que quedan tras los demás filtros.
+    """
+    consulta = ' '.join(f'"{termino}"' for termino in terminos)
+    tabla = PacienteMadre._meta.db_table
+    return queryset.filter(
+        id__in=RawSQL(f'SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s', [consulta])
+    ).annotate(relevancia=RawSQL(
+        f'SELECT bm25({TABLA_FTS}) FROM {TABLA_FTS} '
+        f'WHERE {TABLA_FTS} MATCH %s AND {TABLA_FTS}.rowid = "{tabla}"."id"',
+        [consulta], output_field=FloatField(),
+    ))
+
+
+def buscar_pacientes(query, queryset=None):
+    """
+    Retorna un queryset de PacienteMadre que contiene todos los términos de
+    la consulta, ordenado por relevancia (y luego por fecha de registro).
+    """
+    queryset = PacienteMadre.objects.all() if queryset is None else queryset
+    
+    rut = descomponer_rut(query)
+    if rut is not None:
+        exacto = queryset.filter(rut_numero=rut[0], rut_dv=rut[1])
+        if exacto.exists():
+            return exacto
+    
+    terminos = normalizar_consulta(query)
+    if not terminos:
+        return queryset.none()
+
+    largos = [termino for termino in terminos if len(termino) >= 3]
+    cortos = [termino for termino in terminos if len(termino) < 3]
+
+    if connection.vendor == 'sqlite' and largos:
+        queryset = _filtrar_fts(queryset, largos)
+        for termino in cortos:
+            queryset = queryset.filter(texto_busqueda__contains=termino)
+        return queryset.order_by('relevancia', '-created_at')
+
+    for termino in terminos:
+        queryset = queryset.filter(texto_busqueda__contains=termino)
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+        return queryset.annotate(
+            relevancia=TrigramSimilarity('texto_busqueda', ' '.join(terminos))
+        ).order_by('-relevancia', '-created_at')
+
+    return queryset.order_by('-created_at')
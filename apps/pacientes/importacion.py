@@ -0,0 +1,192 @@
+"""
+Importación masiva de pacientes desde CSV.
+
+El archivo se lee fila a fila y se procesa en lotes. En cada lote:
+1. Se validan y normalizan las filas en memoria (RUT, dígito verificador,
+   campos obligatorios, fecha de nacimiento y opciones).
+2. Se consulta una sola vez la BD para descartar RUTs existentes, por el
+   RUT canónico (rut_numero__in), sin depender del formato almacenado.
+3. Se insertan las filas válidas con bulk_create.
+
+bulk_create no llama a save(), por lo que el RUT canónico y el texto de
+búsqueda se calculan antes de insertar. Las filas rechazadas se informan
+con su número de línea y motivo.
+"""
+
+import csv
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+from .models import PacienteMadre, descomponer_rut
+
+
+CAMPOS_OBLIGATORIOS = ['rut', 'nombre', 'apellido_paterno', 'apellido_materno', 'fecha_nacimiento']
+CAMPOS_OPCIONALES = [
+    'estado_civil', 'escolaridad', 'pueblo_originario', 'direccion', 'comuna',
+    'region', 'prevision', 'consultorio_origen', 'telefono',
+]
+CAMPOS_OPCIONES = {
+    'estado_civil': {valor for valor, _ in PacienteMadre.ESTADO_CIVIL_CHOICES},
+    'escolaridad': {valor for valor, _ in PacienteMadre.ESCOLARIDAD_CHOICES},
+    'prevision': {valor for valor, _ in PacienteMadre.PREVISION_CHOICES},
+}
+LARGOS_MAXIMOS = {
+    campo.name: campo.max_length
+    for campo in PacienteMadre._meta.get_fields()
+    if getattr(campo, 'max_length', None) and campo.name in CAMPOS_OBLIGATORIOS + CAMPOS_OPCIONALES
+}
+FORMATOS_FECHA = ['%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y']
+VALORES_VERDADEROS = {'1', 'si', 'sí', 'true', 'x'}
+
+
+@dataclass
+class ResultadoImportacion:
+    """Resumen de una importación."""
+    procesadas: int = 0
+    importadas: int = 0
+    rechazos: list = field(default_factory=list)
+
+    @property
+    def rechazadas(self):
+        return len(self.rechazos)
+
+    def rechazar(self, linea, rut, motivo):
+        self.rechazos.append({'linea': linea, 'rut': rut, 'motivo': motivo})
+
+
+def digito_verificador(cuerpo):
+    """Calcula el dígito verificador (módulo 11) de un cuerpo de RUT entero."""
+    suma = 0
+    multiplo = 2
+    while cuerpo:
+        cuerpo, digito = divmod(cuerpo, 10)
+        suma += digito * multiplo
+        multiplo = 2 if multiplo == 7 else multiplo + 1
+    resto = 11 - suma % 11
+    return {11: '0', 10: 'K'}.get(resto, str(resto))
+
+
+def formatear_rut(cuerpo, dv):
+    """Formatea un RUT como lo almacena el sistema: 12.345.678-5"""
+    return f'{cuerpo:,}'.replace(',', '.') + f'-{dv}'
+
+
+def _parse_fecha(valor):
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _edad(fecha_nacimiento, hoy):
+    return hoy.year - fecha_nacimiento.year - (
+        (hoy.month, hoy.day) < (fecha_nacimiento.month, fecha_nacimiento.day)
+    )
+
+
+def validar_fila(fila, hoy):
+    """
+    Valida y normaliza una fila del CSV.
+    Retorna (PacienteMadre sin guardar, None) o (None, motivo de rechazo).
+    """
+    datos = {campo: (fila.get(campo) or '').strip() for campo in CAMPOS_OBLIGATORIOS + CAMPOS_OPCIONALES}
+
+    faltantes = [campo for campo in CAMPOS_OBLIGATORIOS if not datos[campo]]
+    if faltantes:
+        return None, f'Campos obligatorios vacíos: {", ".join(faltantes)}'
+
+    rut = descomponer_rut(datos['rut'])
+    if rut is None:
+        return None, 'Formato RUT inválido'
+    cuerpo, dv = rut
+    if digito_verificador(cuerpo) != dv:
+        return None, 'RUT inválido. Dígito verificador incorrecto.'
+    datos['rut'] = formatear_rut(cuerpo, dv)
+
+    fecha_nacimiento = _parse_fecha(datos['fecha_nacimiento'])
+    if fecha_nacimiento is None:
+        return None, 'Fecha de nacimiento inválida'
+    if not 10 <= _edad(fecha_nacimiento, hoy) <= 60:
+        return None, 'La edad debe estar entre 10 y 60 años'
+    datos['fecha_nacimiento'] = fecha_nacimiento
+
+    for campo, opciones in CAMPOS_OPCIONES.items():
+        if datos[campo] and datos[campo] not in opciones:
+            return None, f'Valor no válido para {campo}: {datos[campo]}'
+
+    for campo, largo in LARGOS_MAXIMOS.items():
+        if len(datos[campo]) > largo:
+            return None, f'{campo} supera {largo} caracteres'
+
+    datos['pueblo_originario'] = datos['pueblo_originario'].lower() in VALORES_VERDADEROS
+
+    paciente = PacienteMadre(**datos)
+    paciente.actualizar_rut_canonico()
+    paciente.actualizar_texto_busqueda()
+    return paciente, None
+
+
+def _procesar_lote(lote, resultado, simular):
+    """Descarta RUTs existentes con una consulta e inserta el resto."""
+    existentes = set(
+        PacienteMadre.objects.filter(
+            rut_numero__in=[paciente.rut_numero for _, paciente in lote]
+        ).order_by().values_list('rut_numero', flat=True)
+    )
+
+    nuevos = []
+    for linea, paciente in lote:
+        if paciente.rut_numero in existentes:
+            resultado.rechazar(linea, paciente.rut, 'RUT ya registrado')
+        else:
+            nuevos.append(paciente)
+
+    if nuevos and not simular:
+        PacienteMadre.objects.bulk_create(nuevos, batch_size=len(nuevos))
+    resultado.importadas += len(nuevos)
+
+
+def importar_pacientes(archivo, tamano_lote=1000, delimitador=',', simular=False):
+    """
+    Importa pacientes desde un archivo de texto CSV con encabezados.
+    Con simular=True valida todo pero no inserta.
+    """
+    resultado = ResultadoImportacion()
+    lector = csv.DictReader(archivo, delimiter=delimitador)
+
+    faltantes = [campo for campo in CAMPOS_OBLIGATORIOS if campo not in (lector.fieldnames or [])]
+    if faltantes:
+        raise ValueError(f'Faltan columnas obligatorias: {", ".join(faltantes)}')
+
+    hoy = date.today()
+    vistos = set()
+    lote = []
+
+    for fila in lector:
+        resultado.procesadas += 1
+        linea = lector.line_num
+        paciente, motivo = validar_fila(fila, hoy)
+        if paciente is None:
+            resultado.rechazar(linea, (fila.get('rut') or '').strip(), motivo)
+            continue
+        if paciente.rut in vistos:
+            resultado.rechazar(linea, paciente.rut, 'RUT duplicado en el archivo')
+            continue
+        vistos.add(paciente.rut)
+        lote.append((linea, paciente))
+
+        if len(lote) >= tamano_lote:
+            _procesar_lote(lote, resultado, simular)
+            lote = []
+
+    if lote:
+        _procesar_lote(lote, resultado, simular)
+
+    if resultado.importadas and not simular:
+        # bulk_create no dispara señales: invalidar el dashboard una vez
+        from apps.administracion.dashboard import invalidar_dashboard
+        invalidar_dashboard()
+
+    return resultado
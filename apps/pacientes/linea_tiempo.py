@@ -0,0 +1,180 @@
+"""
+Línea de tiempo clínica de una paciente.
+
+cargar_historial() trae la historia obstétrica completa con un número fijo
+de consultas, sin importar cuántos controles, partos o recién nacidos
+tenga la paciente:
+
+    1. paciente
+    2. controles prenatales      5. complicaciones maternas
+    3. exámenes prenatales       6. seguimientos neonatales
+    4. partos + RN + VIH         7. complicaciones neonatales
+                                 8. alertas
+
+(las consultas 3 y 5-7 se omiten si no hay controles, partos o RN).
+linea_tiempo() une todo en una sola lista de Evento ordenada por fecha.
+Las fechas sin hora (control, examen) se ubican al inicio del día local y
+las complicaciones, que no tienen fecha clínica propia, en su registro.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.administracion.fechas import inicio_dia
+from apps.neonatologia.models import ComplicacionNeonatal, SeguimientoNeonatal
+from apps.obstetricia.models import ComplicacionMaterna, ControlPrenatal, ExamenPrenatal, Parto
+from apps.reportes.models import Alerta
+from .models import PacienteMadre
+
+
+NIVEL_INFO = 'info'
+NIVEL_ADVERTENCIA = 'advertencia'
+NIVEL_CRITICO = 'critico'
+
+# Orden entre eventos del mismo instante
+PRIORIDAD = {
+    'control': 0, 'examen': 1, 'parto': 2, 'protocolo_vih': 3, 'complicacion_materna': 4,
+    'nacimiento': 5, 'complicacion_neonatal': 6, 'seguimiento': 7, 'alerta': 8,
+}
+
+NIVEL_SEVERIDAD = {'leve': NIVEL_INFO, 'moderada': NIVEL_ADVERTENCIA, 'grave': NIVEL_CRITICO, 'critica': NIVEL_CRITICO}
+NIVEL_ALERTA = {'BAJA': NIVEL_INFO, 'MEDIA': NIVEL_ADVERTENCIA, 'ALTA': NIVEL_CRITICO, 'CRITICA': NIVEL_CRITICO}
+
+
+@dataclass
+class Evento:
+    momento: datetime  # aware
+    tipo: str  # clave de PRIORIDAD
+    titulo: str
+    detalle: str = ''
+    nivel: str = NIVEL_INFO
+    url: str = ''
+    pk: int = 0
+
+    def como_dict(self):
+        return {
+            'momento': timezone.localtime(self.momento).isoformat(),
+            'tipo': self.tipo,
+            'titulo': self.titulo,
+            'detalle': self.detalle,
+            'nivel': self.nivel,
+            'url': self.url,
+        }
+
+
+def _momento_parto(parto):
+    return timezone.make_aware(datetime.combine(parto.fecha_parto, parto.hora_parto))
+
+
+def cargar_historial(paciente_id):
+    """PacienteMadre con toda su historia obstétrica precargada (8 consultas)."""
+    partos = Parto.objects.select_related('recien_nacido', 'protocolo_vih').prefetch_related(
+        Prefetch('complicaciones_maternas', queryset=ComplicacionMaterna.objects.order_by('created_at')),
+        Prefetch('recien_nacido__seguimientos', queryset=SeguimientoNeonatal.objects.order_by('fecha_hora')),
+        Prefetch(
+            'recien_nacido__complicaciones_neonatales',
+            queryset=ComplicacionNeonatal.objects.order_by('created_at'),
+        ),
+    )
+    return get_object_or_404(
+        PacienteMadre.objects.prefetch_related(
+            Prefetch('controles_prenatales', queryset=ControlPrenatal.objects.prefetch_related(
+                Prefetch('examenes', queryset=ExamenPrenatal.objects.order_by('fecha_examen', 'pk'))
+            )),
+            Prefetch('partos', queryset=partos),
+            Prefetch('alertas', queryset=Alerta.objects.order_by('fecha_hora_alerta')),
+        ),
+        pk=paciente_id,
+    )
+
+
+def _eventos_control(control):
+    fecha = control.fecha_primer_control
+    yield Evento(
+        inicio_dia(fecha) if fecha else control.created_at, 'control', 'Control prenatal',
+        detalle=f'FUR {control.fur:%d/%m/%Y}' if control.fur else '', pk=control.pk,
+    )
+    for examen in control.examenes.all():
+        yield Evento(
+            inicio_dia(examen.fecha_examen) if examen.fecha_examen else examen.created_at, 'examen',
+            f'Examen {examen.get_tipo_examen_display()}', detalle=examen.get_resultado_display(),
+            nivel=NIVEL_CRITICO if examen.es_critico else NIVEL_INFO, pk=examen.pk,
+        )
+
+
+def _eventos_parto(parto):
+    momento = _momento_parto(parto)
+    yield Evento(
+        momento, 'parto', f'Parto {parto.get_tipo_parto_display()}',
+        detalle=f'{parto.edad_gestacional_semanas}+{parto.edad_gestacional_dias} sem, Robson {parto.grupo_robson}',
+        url=reverse('detalle_parto', args=[parto.pk]), pk=parto.pk,
+    )
+
+    try:
+        protocolo = parto.protocolo_vih
+    except Parto.protocolo_vih.RelatedObjectDoesNotExist:
+        protocolo = None
+    if protocolo is not None and protocolo.activado:
+        yield Evento(
+            protocolo.fecha_activacion or protocolo.created_at, 'protocolo_vih', 'Protocolo VIH activado',
+            nivel=NIVEL_CRITICO, pk=protocolo.pk,
+        )
+
+    for complicacion in parto.complicaciones_maternas.all():
+        yield Evento(
+            complicacion.created_at, 'complicacion_materna', complicacion.get_tipo_display(),
+            detalle=f'{complicacion.codigo_cie10} ({complicacion.get_severidad_display()})',
+            nivel=NIVEL_SEVERIDAD.get(complicacion.severidad, NIVEL_INFO), pk=complicacion.pk,
+        )
+
+    try:
+        rn = parto.recien_nacido
+    except Parto.recien_nacido.RelatedObjectDoesNotExist:
+        return
+    url_rn = reverse('detalle_recien_nacido', args=[rn.pk])
+    yield Evento(
+        momento, 'nacimiento', f'Nacimiento ({rn.get_sexo_display()})',
+        detalle=f'{rn.peso_gramos} g, APGAR {rn.apgar_1_min}/{rn.apgar_5_min}',
+        url=url_rn, pk=rn.pk,
+    )
+    for complicacion in rn.complicaciones_neonatales.all():
+        yield Evento(
+            complicacion.created_at, 'complicacion_neonatal', complicacion.get_tipo_display(),
+            detalle=f'{complicacion.codigo_cie10} ({complicacion.get_severidad_display()})',
+            nivel=NIVEL_SEVERIDAD.get(complicacion.severidad, NIVEL_INFO), url=url_rn, pk=complicacion.pk,
+        )
+    for seguimiento in rn.seguimientos.all():
+        yield Evento(
+            seguimiento.fecha_hora, 'seguimiento', 'Seguimiento neonatal',
+            detalle=(
+                f'T° {seguimiento.temperatura_celsius} °C, FC {seguimiento.frecuencia_cardiaca}, '
+                f'FR {seguimiento.frecuencia_respiratoria}'
+            ),
+            url=url_rn, pk=seguimiento.pk,
+        )
+
+
+def linea_tiempo(paciente, reciente_primero=True):
+    """
+    Eventos de una paciente cargada con cargar_historial(), ordenados por
+    fecha. No hace consultas.
+    """
+    eventos = []
+    for control in paciente.controles_prenatales.all():
+        eventos.extend(_eventos_control(control))
+    for parto in paciente.partos.all():
+        eventos.extend(_eventos_parto(parto))
+    for alerta in paciente.alertas.all():
+        eventos.append(Evento(
+            alerta.fecha_hora_alerta, 'alerta', alerta.titulo,
+            detalle=alerta.get_estado_display(), nivel=NIVEL_ALERTA.get(alerta.nivel_urgencia, NIVEL_INFO),
+            url=reverse('detalle_alerta', args=[alerta.pk]), pk=alerta.pk,
+        ))
+
+    eventos.sort(key=lambda evento: (evento.momento, PRIORIDAD[evento.tipo], evento.pk), reverse=reciente_primero)
+    return eventos
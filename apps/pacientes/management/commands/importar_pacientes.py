@@ -0,0 +1,79 @@
+"""
+Importa pacientes madre desde un archivo CSV.
+
+Uso:
+    python manage.py importar_pacientes pacientes.csv
+    python manage.py importar_pacientes pacientes.csv --delimitador ";" --rechazos rechazos.csv
+    python manage.py importar_pacientes pacientes.csv --simular
+
+Columnas obligatorias: rut, nombre, apellido_paterno, apellido_materno,
+fecha_nacimiento. Opcionales: estado_civil, escolaridad, pueblo_originario,
+direccion, comuna, region, prevision, consultorio_origen, telefono.
+"""
+
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.pacientes.importacion import importar_pacientes
+
+
+class Command(BaseCommand):
+    help = 'Importa pacientes madre desde un CSV validando RUTs por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo CSV (UTF-8)')
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Filas validadas e insertadas por lote (por defecto 1000)'
+        )
+        parser.add_argument(
+            '--delimitador',
+            default=',',
+            help='Separador de columnas (por defecto ",")'
+        )
+        parser.add_argument(
+            '--rechazos',
+            help='Ruta de un CSV donde escribir las filas rechazadas'
+        )
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Valida el archivo sin insertar pacientes'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        try:
+            with open(options['archivo'], encoding='utf-8-sig', newline='') as archivo:
+                resultado = importar_pacientes(
+                    archivo,
+                    tamano_lote=max(options['lote'], 1),
+                    delimitador=options['delimitador'],
+                    simular=options['simular'],
+                )
+        except FileNotFoundError:
+            raise CommandError(f'No existe el archivo: {options["archivo"]}')
+        except ValueError as e:
+            raise CommandError(str(e))
+        duracion = time.monotonic() - inicio
+
+        for rechazo in resultado.rechazos[:20]:
+            self.stdout.write(f'  Línea {rechazo["linea"]} ({rechazo["rut"]}): {rechazo["motivo"]}')
+        if resultado.rechazadas > 20:
+            self.stdout.write(f'  ... y {resultado.rechazadas - 20} rechazos más')
+
+        if options['rechazos'] and resultado.rechazos:
+            with open(options['rechazos'], 'w', encoding='utf-8', newline='') as salida:
+                escritor = csv.DictWriter(salida, fieldnames=['linea', 'rut', 'motivo'])
+                escritor.writeheader()
+                escritor.writerows(resultado.rechazos)
+
+        accion = 'validadas (simulación)' if options['simular'] else 'importadas'
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.procesadas} filas procesadas en {duracion:.1f}s: '
+            f'{resultado.importadas} {accion}, {resultado.rechazadas} rechazadas.'
+        ))
@@ -0,0 +1,48 @@
+from django.db import migrations, models
+
+from apps.pacientes.busqueda import crear_indice, eliminar_indice
+from apps.pacientes.models import normalizar_texto, compactar_rut
+
+
+def poblar_texto_busqueda(apps, schema_editor):
+    PacienteMadre = apps.get_model('pacientes', 'PacienteMadre')
+    alias = schema_editor.connection.alias
+    lote = []
+    for paciente in PacienteMadre.objects.using(alias).iterator(chunk_size=2000):
+        paciente.texto_busqueda = ' '.join([
+            compactar_rut(paciente.rut),
+            normalizar_texto(paciente.nombre),
+            normalizar_texto(paciente.apellido_paterno),
+            normalizar_texto(paciente.apellido_materno),
+        ])
+        lote.append(paciente)
+        if len(lote) >= 2000:
+            PacienteMadre.objects.using(alias).bulk_update(lote, ['texto_busqueda'])
+            lote = []
+    if lote:
+        PacienteMadre.objects.using(alias).bulk_update(lote, ['texto_busqueda'])
+
+
+def crear_indice_busqueda(apps, schema_editor):
+    crear_indice(schema_editor.connection)
+
+
+def eliminar_indice_busqueda(apps, schema_editor):
+    eliminar_indice(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pacientes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pacientemadre',
+            name='texto_busqueda',
+            field=models.CharField(blank=True, default='', editable=False, max_length=400),
+        ),
+        migrations.RunPython(poblar_texto_busqueda, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice_busqueda, eliminar_indice_busqueda),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-18 14:04
+
+from django.db import migrations, models
+
+from apps.pacientes.models import descomponer_rut
+
+
+def poblar_rut_canonico(apps, schema_editor):
+    Modelo = apps.get_model('pacientes', 'PacienteMadre')
+    alias = schema_editor.connection.alias
+    lote = []
+    for registro in Modelo.objects.using(alias).only('id', 'rut').iterator(chunk_size=2000):
+        registro.rut_numero, registro.rut_dv = descomponer_rut(registro.rut) or (None, '')
+        lote.append(registro)
+        if len(lote) >= 2000:
+            Modelo.objects.using(alias).bulk_update(lote, ['rut_numero', 'rut_dv'])
+            lote = []
+    if lote:
+        Modelo.objects.using(alias).bulk_update(lote, ['rut_numero', 'rut_dv'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pacientes', '0002_paciente_texto_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pacientemadre',
+            name='rut_dv',
+            field=models.CharField(blank=True, default='', editable=False, max_length=1),
+        ),
+        migrations.AddField(
+            model_name='pacientemadre',
+            name='rut_numero',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='pacientemadre',
+            index=models.Index(fields=['rut_numero', 'rut_dv'], name='idx_paciente_rut_numero'),
+        ),
+        migrations.RunPython(poblar_rut_canonico, migrations.RunPython.noop),
+    ]
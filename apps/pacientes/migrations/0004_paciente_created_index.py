@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 14:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pacientes', '0003_paciente_rut_numero'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pacientemadre',
+            index=models.Index(fields=['created_at'], name='idx_paciente_created'),
+        ),
+    ]
@@ -1,6 +1,9 @@
+import re
+import unicodedata
 from django.db import models
 from django.core.validators import RegexValidator, MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
+from apps.administracion.fechas import RangoFechasQuerySet
 
 
 def validar_rut(rut):
@@ -42,6 +45,37 @@ def validar_rut(rut):
         raise ValidationError(f'RUT inválido. Dígito verificador incorrecto.')
 
 
+def normalizar_texto(texto):
+    """
+    Normaliza texto para búsqueda: minúsculas, sin tildes y con los
+    separadores reducidos a un espacio. 'Pérez-Núñez' -> 'perez nunez'
+    """
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(re.split(r'[^0-9a-z]+', texto.lower())).strip()
+
+
+def compactar_rut(rut):
+    """Quita puntos, guión y espacios de un RUT: '12.345.678-5' -> '123456785'"""
+    return re.sub(r'[^0-9kK]', '', rut or '').lower()
+
+
+_PATRON_RUT_COMPLETO = re.compile(r'^(\d{1,2}\.\d{3}\.\d{3}|\d{7,8})-?([\dkK])$')
+
+
+def descomponer_rut(texto):
+    """
+    Separa un RUT completo en (cuerpo como entero, dígito verificador).
+    Acepta '12.345.678-5', '12345678-5' o '123456785'. Retorna None si el
+    texto no tiene forma de RUT. No valida el dígito verificador.
+    """
+    coincidencia = _PATRON_RUT_COMPLETO.match((texto or '').strip())
+    if not coincidencia:
+        return None
+    cuerpo, dv = coincidencia.groups()
+    return int(cuerpo.replace('.', '')), dv.upper()
+
+
 class PacienteMadre(models.Model):
     """
     Modelo para pacientes madres del servicio de obstetricia.
@@ -132,10 +166,21 @@ class PacienteMadre(models.Model):
     # Contacto
     telefono = models.CharField(max_length=20, blank=True)
     
+    # RUT canónico (cuerpo numérico + DV) para búsqueda exacta indexada
+    rut_numero = models.PositiveIntegerField(null=True, editable=False)
+    rut_dv = models.CharField(max_length=1, blank=True, default='', editable=False)
+    
+    # Texto normalizado para búsqueda (RUT compacto y nombres sin tildes).
+    # Se mantiene en save(); ver busqueda.py para el índice de búsqueda.
+    texto_busqueda = models.CharField(max_length=400, blank=True, default='', editable=False)
+    
     # Auditoría
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Filtros por rango de fechas locales (ver apps.administracion.fechas)
+    objects = RangoFechasQuerySet.as_manager()
+    
     class Meta:
         db_table = 'paciente_madre'
         verbose_name = 'Paciente Madre'
@@ -143,8 +188,10 @@ class PacienteMadre(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['rut'], name='idx_paciente_rut'),
+            models.Index(fields=['rut_numero', 'rut_dv'], name='idx_paciente_rut_numero'),
             models.Index(fields=['nombre', 'apellido_paterno'], name='idx_paciente_nombre'),
             models.Index(fields=['comuna'], name='idx_paciente_comuna'),
+            models.Index(fields=['created_at'], name='idx_paciente_created'),
         ]
     
     def __str__(self):
@@ -164,6 +211,28 @@ class PacienteMadre(models.Model):
             (today.month, today.day) < (self.fecha_nacimiento.month, self.fecha_nacimiento.day)
         )
     
+    def actualizar_texto_busqueda(self):
+        """Recalcula texto_busqueda. Llamar antes de bulk_create/bulk_update."""
+        self.texto_busqueda = ' '.join([
+            compactar_rut(self.rut),
+            normalizar_texto(self.nombre),
+            normalizar_texto(self.apellido_paterno),
+            normalizar_texto(self.apellido_materno),
+        ])
+    
+    def actualizar_rut_canonico(self):
+        """Recalcula rut_numero y rut_dv desde el RUT formateado."""
+        self.rut_numero, self.rut_dv = descomponer_rut(self.rut) or (None, '')
+    
+    def save(self, *args, **kwargs):
+        """Override save para mantener el RUT canónico y el texto de búsqueda"""
+        self.actualizar_rut_canonico()
+        self.actualizar_texto_busqueda()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'rut_numero', 'rut_dv', 'texto_busqueda'}
+        super().save(*args, **kwargs)
+    
     def clean(self):
         """Validaciones adicionales del modelo"""
         super().clean()
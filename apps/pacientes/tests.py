@@ -1,4 +1,5 @@
 from django.test import TestCase
+from django.urls import reverse
 from django.core.exceptions import ValidationError
 from datetime import date
 from apps.pacientes.models import PacienteMadre, validar_rut
@@ -274,3 +275,345 @@ class CrearPacienteTest(TestCase):
                 comuna='Chillán',
                 region='Ñuble'
             )
+
+
+class IndiceBusquedaPacienteTest(TestCase):
+    """Tests para la búsqueda normalizada y rankeada de pacientes"""
+    
+    def setUp(self):
+        """Configuración inicial"""
+        self.ana = self.crear('12.345.678-5', 'Ana', 'Pérez', 'López')
+        self.maria = self.crear('98.765.432-1', 'María José', 'González', 'Pérez')
+    
+    def crear(self, rut, nombre, apellido_paterno, apellido_materno):
+        return PacienteMadre.objects.create(
+            rut=rut,
+            nombre=nombre,
+            apellido_paterno=apellido_paterno,
+            apellido_materno=apellido_materno,
+            fecha_nacimiento=date(1990, 1, 1),
+            comuna='Chillán',
+            region='Ñuble'
+        )
+    
+    def buscar(self, query):
+        from apps.pacientes.busqueda import buscar_pacientes
+        return list(buscar_pacientes(query))
+    
+    def test_texto_busqueda_normalizado(self):
+        """El texto de búsqueda no tiene tildes ni puntos del RUT"""
+        self.assertEqual(self.maria.texto_busqueda, '987654321 maria jose gonzalez perez')
+    
+    def test_busqueda_sin_tildes_ni_mayusculas(self):
+        """'perez' encuentra 'Pérez' como apellido paterno y materno"""
+        self.assertCountEqual(self.buscar('PEREZ'), [self.ana, self.maria])
+        self.assertEqual(self.buscar('maría gonzá'), [self.maria])
+    
+    def test_busqueda_por_rut_parcial(self):
+        """El RUT se busca con o sin puntos"""
+        self.assertEqual(self.buscar('12.345.678'), [self.ana])
+        self.assertEqual(self.buscar('98765432-1'), [self.maria])
+    
+    def test_rut_completo_busca_por_igualdad(self):
+        """Un RUT completo, con o sin formato, se resuelve por igualdad sin el índice"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from apps.pacientes.busqueda import TABLA_FTS, buscar_pacientes
+        
+        for rut in ['12.345.678-5', '12345678-5', '123456785']:
+            with CaptureQueriesContext(connection) as consultas:
+                self.assertEqual(list(buscar_pacientes(rut)), [self.ana])
+            self.assertEqual(len(consultas), 2)  # EXISTS y la lectura
+            self.assertFalse(any(TABLA_FTS in consulta['sql'] for consulta in consultas))
+    
+    def test_descomponer_rut(self):
+        """Solo las entradas con forma de RUT completo se descomponen"""
+        from apps.pacientes.models import descomponer_rut
+        
+        self.assertEqual(descomponer_rut('9.876.543-k'), (9876543, 'K'))
+        self.assertEqual(descomponer_rut('98765432-1'), (98765432, '1'))
+        self.assertIsNone(descomponer_rut('12.345.678'))
+        self.assertIsNone(descomponer_rut('Ana Pérez'))
+    
+    def test_termino_corto_filtra_resultados(self):
+        """Los términos de menos de 3 letras se aplican como filtro"""
+        self.assertEqual(self.buscar('perez jo'), [self.maria])
+    
+    def test_ranking_por_relevancia(self):
+        """Coincidencias más específicas aparecen primero"""
+        perezoso = self.crear('11.111.111-1', 'Pérez', 'Pérez', 'Pérez')
+        
+        self.assertEqual(self.buscar('perez')[0], perezoso)
+    
+    def test_sin_tope_de_resultados_antes_de_filtrar(self):
+        """Un apellido frecuente entrega todas las coincidencias, también con filtro de fecha"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from apps.pacientes.busqueda import buscar_pacientes
+        
+        for i in range(210):
+            self.crear(f'{30000000 + i}-0', f'Paciente{i}', 'Soto', 'Rojas')
+        antigua = PacienteMadre.objects.filter(nombre='Paciente209').get()
+        PacienteMadre.objects.filter(pk=antigua.pk).update(created_at=timezone.now() - timedelta(days=3650))
+        
+        self.assertEqual(buscar_pacientes('soto').count(), 210)
+        filtradas = PacienteMadre.objects.filter(created_at__lt=timezone.now() - timedelta(days=365))
+        self.assertEqual(list(buscar_pacientes('soto', filtradas)), [antigua])
+    
+    def test_indice_se_actualiza_al_editar_y_eliminar(self):
+        """Editar o eliminar una paciente actualiza el índice"""
+        self.ana.apellido_paterno = 'Muñoz'
+        self.ana.save()
+        self.assertEqual(self.buscar('munoz'), [self.ana])
+        self.assertEqual(self.buscar('perez'), [self.maria])
+        
+        self.maria.delete()
+        self.assertEqual(self.buscar('perez'), [])
+    
+    def test_vista_buscar_paciente(self):
+        """La vista de búsqueda usa el índice"""
+        from apps.administracion.models import Usuario
+        usuario = Usuario.objects.create_user(
+            username='admin_test', rut='22.222.222-2', password='testpass123', rol='administrativo'
+        )
+        self.client.force_login(usuario)
+        
+        response = self.client.get(reverse('buscar_paciente'), {'query': 'lopez'})
+        
+        self.assertEqual(list(response.context['page_obj']), [self.ana])
+
+
+class ImportarPacientesTest(TestCase):
+    """Tests para la importación masiva de pacientes desde CSV"""
+    
+    ENCABEZADO = 'rut,nombre,apellido_paterno,apellido_materno,fecha_nacimiento,comuna,prevision\n'
+    
+    def setUp(self):
+        """Configuración inicial"""
+        PacienteMadre.objects.create(
+            rut='11.111.111-1',
+            nombre='Existente',
+            apellido_paterno='Registrada',
+            apellido_materno='Antes',
+            fecha_nacimiento=date(1990, 1, 1),
+        )
+    
+    def importar(self, filas, **kwargs):
+        import io
+        from apps.pacientes.importacion import importar_pacientes
+        return importar_pacientes(io.StringIO(self.ENCABEZADO + filas), **kwargs)
+    
+    def test_importa_filas_validas_y_rechaza_invalidas(self):
+        """Las filas válidas se insertan y las inválidas se informan con su línea"""
+        resultado = self.importar(
+            '12345678-5,Ana,Pérez,López,1990-05-15,Chillán,fonasa_A\n'
+            '9.876.543-3,Rosa,Muñoz,Soto,15/05/1995,Chillán,\n'
+            '12.345.678-9,Mala,Digito,Verificador,1990-01-01,,\n'
+            '11.111.111-1,Otra,Vez,Igual,1990-01-01,,\n'
+            '123456785,Ana,Repetida,Archivo,1990-01-01,,\n'
+            '22.222.222-2,Sin,Fecha,Valida,31-31-1990,,\n'
+            '33.333.333-3,Opcion,No,Valida,1990-01-01,,fonasa_Z\n'
+        )
+        
+        self.assertEqual(resultado.procesadas, 7)
+        self.assertEqual(resultado.importadas, 2)
+        self.assertEqual(
+            [(rechazo['linea'], rechazo['motivo']) for rechazo in resultado.rechazos],
+            [
+                (4, 'RUT inválido. Dígito verificador incorrecto.'),
+                (6, 'RUT duplicado en el archivo'),
+                (7, 'Fecha de nacimiento inválida'),
+                (8, 'Valor no válido para prevision: fonasa_Z'),
+                (5, 'RUT ya registrado'),
+            ]
+        )
+        
+        ana = PacienteMadre.objects.get(rut='12.345.678-5')
+        self.assertEqual(ana.rut_numero, 12345678)
+        self.assertEqual(ana.texto_busqueda, '123456785 ana perez lopez')
+        self.assertTrue(PacienteMadre.objects.filter(rut='9.876.543-3').exists())
+    
+    def test_una_consulta_de_unicidad_por_lote(self):
+        """Cada lote hace una consulta rut__in y un bulk_create"""
+        from apps.pacientes.importacion import digito_verificador, formatear_rut
+        filas = ''.join(
+            f'{formatear_rut(n, digito_verificador(n))},Nombre,Apellido,Materno,1990-01-01,,\n'
+            for n in range(20000000, 20000050)
+        )
+        
+        # 2 lotes x (SELECT rut_numero__in + INSERT)
+        with self.assertNumQueries(4):
+            resultado = self.importar(filas, tamano_lote=25)
+        
+        self.assertEqual(resultado.importadas, 50)
+    
+    def test_simular_no_inserta(self):
+        """Con simular=True solo se valida"""
+        resultado = self.importar('12345678-5,Ana,Pérez,López,1990-05-15,,\n', simular=True)
+        
+        self.assertEqual(resultado.importadas, 1)
+        self.assertFalse(PacienteMadre.objects.filter(rut='12.345.678-5').exists())
+    
+    def test_comando_importar_pacientes(self):
+        """El comando lee el archivo y escribe el reporte de rechazos"""
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        
+        directorio = tempfile.mkdtemp()
+        archivo = os.path.join(directorio, 'pacientes.csv')
+        rechazos = os.path.join(directorio, 'rechazos.csv')
+        with open(archivo, 'w', encoding='utf-8') as f:
+            f.write(self.ENCABEZADO + '12345678-5,Ana,Pérez,López,1990-05-15,,\n11.111.111-1,A,B,C,1990-01-01,,\n')
+        
+        salida = StringIO()
+        call_command('importar_pacientes', archivo, '--rechazos', rechazos, stdout=salida)
+        
+        self.assertIn('1 importadas, 1 rechazadas', salida.getvalue())
+        with open(rechazos, encoding='utf-8') as f:
+            self.assertIn('RUT ya registrado', f.read())
+    
+    def test_carga_desde_admin(self):
+        """El admin permite subir el CSV"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from apps.administracion.models import Usuario
+        admin = Usuario.objects.create_superuser(
+            username='admin', rut='22.222.222-2', password='testpass123', rol='super_admin'
+        )
+        self.client.force_login(admin)
+        archivo = SimpleUploadedFile(
+            'pacientes.csv',
+            (self.ENCABEZADO + '12345678-5,Ana,Pérez,López,1990-05-15,,\n').encode('utf-8'),
+        )
+        
+        response = self.client.post(
+            reverse('admin:pacientes_pacientemadre_importar'),
+            {'archivo': archivo, 'delimitador': ','},
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(PacienteMadre.objects.filter(rut='12.345.678-5').exists())
+
+
+class LineaTiempoPacienteTest(TestCase):
+    """Línea de tiempo clínica con número fijo de consultas"""
+    
+    def setUp(self):
+        from apps.administracion.models import Usuario
+        self.usuario = Usuario.objects.create_user(
+            username='matrona_linea', password='Clave.Segura.2024', rut='12.345.678-5', rol='matrona'
+        )
+        self.client.force_login(self.usuario)
+    
+    def crear_paciente(self, rut):
+        return PacienteMadre.objects.create(
+            rut=rut, nombre='Ana', apellido_paterno='Pérez', apellido_materno='López',
+            fecha_nacimiento=date(1990, 1, 1), estado_civil='soltera', escolaridad='media_completa',
+            prevision='fonasa_b', direccion='Calle 1', comuna='Chillán', region='Ñuble',
+        )
+    
+    def agregar_embarazo(self, paciente, fecha_parto):
+        """Control, exámenes, parto, complicación, RN, seguimientos y alertas"""
+        from datetime import datetime, time, timedelta
+        from django.utils import timezone
+        from apps.obstetricia.models import ComplicacionMaterna, ControlPrenatal, ExamenPrenatal, Parto
+        from apps.neonatologia.models import RecienNacido, SeguimientoNeonatal
+        from apps.reportes.models import Alerta
+        
+        control = ControlPrenatal.objects.create(
+            paciente=paciente, fur=fecha_parto - timedelta(days=280),
+            fecha_primer_control=fecha_parto - timedelta(days=250),
+        )
+        ExamenPrenatal.objects.create(
+            control_prenatal=control, tipo_examen='vih', resultado='negativo',
+            fecha_examen=fecha_parto - timedelta(days=200),
+        )
+        vdrl = ExamenPrenatal.objects.create(
+            control_prenatal=control, tipo_examen='vdrl', resultado='reactivo',
+            fecha_examen=fecha_parto - timedelta(days=100),
+        )
+        parto = Parto.objects.create(
+            paciente=paciente, control_prenatal=control, usuario_registro=self.usuario,
+            fecha_parto=fecha_parto, hora_parto=time(10, 30), edad_gestacional_semanas=39,
+            edad_gestacional_dias=0, tipo_parto='eutocico', presentacion='cefalica',
+            inicio_trabajo_parto='espontaneo', primigesta=True,
+        )
+        nacimiento = timezone.make_aware(datetime.combine(fecha_parto, time(10, 30)))
+        complicacion = ComplicacionMaterna.objects.create(
+            parto=parto, codigo_cie10='O72', descripcion_cie10='Hemorragia postparto',
+            tipo='hemorragia', severidad='grave', usuario_registro=self.usuario,
+        )
+        # Registrada media hora después del parto
+        ComplicacionMaterna.objects.filter(pk=complicacion.pk).update(created_at=nacimiento + timedelta(minutes=30))
+        rn = RecienNacido.objects.create(
+            parto=parto, sexo='femenino', peso_gramos=3200, talla_cm=50.0,
+            circunferencia_craneana_cm=35.0, apgar_1_min=8, apgar_5_min=9, destino='alojamiento_conjunto',
+        )
+        for horas in (2, 8):
+            SeguimientoNeonatal.objects.create(
+                recien_nacido=rn, fecha_hora=nacimiento + timedelta(hours=horas), usuario_registro=self.usuario,
+                temperatura_celsius=36.8, frecuencia_cardiaca=140, frecuencia_respiratoria=45,
+            )
+        # Alertas de las reglas (VDRL reactivo y hemorragia), una hora después del parto
+        Alerta.objects.filter(clave_regla__in=[
+            f'EXAMEN_CRITICO:examenprenatal:{vdrl.pk}', f'HEMORRAGIA:complicacionmaterna:{complicacion.pk}',
+        ]).update(fecha_hora_alerta=nacimiento + timedelta(hours=1))
+    
+    def test_consultas_fijas(self):
+        """La historia completa se carga en 8 consultas, sin importar su tamaño"""
+        from apps.pacientes.linea_tiempo import cargar_historial, linea_tiempo
+        
+        primigesta = self.crear_paciente('11.111.111-1')
+        self.agregar_embarazo(primigesta, date(2023, 3, 10))
+        multipara = self.crear_paciente('22.222.222-2')
+        for anio in (2019, 2021, 2023):
+            self.agregar_embarazo(multipara, date(anio, 3, 10))
+        
+        for paciente, embarazos in ((primigesta, 1), (multipara, 3)):
+            with self.assertNumQueries(8):
+                eventos = linea_tiempo(cargar_historial(paciente.pk))
+            self.assertEqual(len(eventos), embarazos * 10)
+    
+    def test_detalle_cuesta_lo_mismo(self):
+        """Abrir la ficha de una multípara cuesta las mismas consultas que la de una primigesta"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        primigesta = self.crear_paciente('11.111.111-1')
+        self.agregar_embarazo(primigesta, date(2023, 3, 10))
+        multipara = self.crear_paciente('22.222.222-2')
+        for anio in (2015, 2017, 2019, 2021, 2023):
+            self.agregar_embarazo(multipara, date(anio, 3, 10))
+        
+        self.client.get(reverse('detalle_paciente', args=[primigesta.pk]))  # sesión en caché
+        totales = []
+        for paciente in (primigesta, multipara):
+            with CaptureQueriesContext(connection) as consultas:
+                response = self.client.get(reverse('detalle_paciente', args=[paciente.pk]))
+            self.assertEqual(response.status_code, 200)
+            totales.append(len(consultas))
+        self.assertEqual(totales[0], totales[1])
+    
+    def test_api_orden_cronologico(self):
+        """La API entrega un solo flujo de eventos ordenado por fecha"""
+        paciente = self.crear_paciente('11.111.111-1')
+        self.agregar_embarazo(paciente, date(2023, 3, 10))
+        
+        response = self.client.get(reverse('api_linea_tiempo', args=[paciente.pk]), {'orden': 'asc'})
+        
+        self.assertEqual(response.status_code, 200)
+        eventos = response.json()['eventos']
+        self.assertEqual(
+            [evento['tipo'] for evento in eventos],
+            ['control', 'examen', 'examen', 'parto', 'nacimiento', 'complicacion_materna',
+             'alerta', 'alerta', 'seguimiento', 'seguimiento'],
+        )
+        momentos = [evento['momento'] for evento in eventos]
+        self.assertEqual(momentos, sorted(momentos))
+        self.assertEqual(eventos[2]['nivel'], 'critico')  # VDRL reactivo
+    
+    def test_api_paciente_inexistente(self):
+        """Paciente inexistente responde 404"""
+        response = self.client.get(reverse('api_linea_tiempo', args=[999999]))
+        self.assertEqual(response.status_code, 404)
@@ -4,5 +4,6 @@ from . import views
 urlpatterns = [
     path('buscar/', views.buscar_paciente, name='buscar_paciente'),
     path('<int:paciente_id>/', views.detalle_paciente, name='detalle_paciente'),
+    path('<int:paciente_id>/linea-tiempo/', views.api_linea_tiempo, name='api_linea_tiempo'),
     path('crear/', views.crear_paciente, name='crear_paciente'),
 ]
@@ -1,9 +1,11 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
+from django.http import JsonResponse
 from apps.administracion.decorators import rol_requerido
 from .models import PacienteMadre
+from .busqueda import buscar_pacientes
+from .linea_tiempo import cargar_historial, linea_tiempo
 from .forms import BusquedaPacienteForm, PacienteMadreForm
 
 
@@ -30,34 +32,26 @@ def buscar_paciente(request):
         mostrar_resultados = True
         pacientes_list = PacienteMadre.objects.all()
         
-        # Filtro por búsqueda de texto (RUT o nombre)
-        if query:
-            pacientes_list = pacientes_list.filter(
-                Q(rut__icontains=query) |
-                Q(nombre__icontains=query) |
-                Q(apellido_paterno__icontains=query) |
-                Q(apellido_materno__icontains=query)
-            )
-        
         # Filtro por fecha de registro
         if fecha_desde:
             try:
                 fecha_desde_obj = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
-                pacientes_list = pacientes_list.filter(created_at__date__gte=fecha_desde_obj)
+                pacientes_list = pacientes_list.entre_fechas('created_at', desde=fecha_desde_obj)
             except ValueError:
                 messages.error(request, 'Formato de fecha inválido.')
         
         if fecha_hasta:
             try:
                 fecha_hasta_obj = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
-                pacientes_list = pacientes_list.filter(created_at__date__lte=fecha_hasta_obj)
+                pacientes_list = pacientes_list.entre_fechas('created_at', hasta=fecha_hasta_obj)
             except ValueError:
                 messages.error(request, 'Formato de fecha inválido.')
         
-        pacientes_list = pacientes_list.order_by('-created_at')
-        
-        if not pacientes_list.exists():
-            messages.info(request, 'No se encontraron pacientes con los criterios especificados.')
+        # Filtro por búsqueda de texto (RUT o nombre), ordenado por relevancia
+        if query:
+            pacientes_list = buscar_pacientes(query, pacientes_list)
+        else:
+            pacientes_list = pacientes_list.order_by('-created_at')
     else:
         # Mostrar últimos 10 registros por defecto
         pacientes_list = PacienteMadre.objects.all().order_by('-created_at')[:10]
@@ -68,6 +62,9 @@ def buscar_paciente(request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
+    if (query or fecha_desde or fecha_hasta) and paginator.count == 0:
+        messages.info(request, 'No se encontraron pacientes con los criterios especificados.')
+    
     return render(request, 'pacientes/buscar.html', {
         'form': form,
         'page_obj': page_obj,
@@ -83,15 +80,29 @@ def buscar_paciente(request):
 def detalle_paciente(request, paciente_id):
     """
     Vista de detalle de un paciente.
+    La historia obstétrica completa se carga con un número fijo de consultas.
     """
-    paciente = get_object_or_404(PacienteMadre, pk=paciente_id)
-    
-    # Obtener partos con sus recién nacidos (relación OneToOne)
-    partos = paciente.partos.select_related('recien_nacido').order_by('-fecha_parto')
+    paciente = cargar_historial(paciente_id)
     
     return render(request, 'pacientes/detalle.html', {
         'paciente': paciente,
-        'partos': partos,
+        'partos': paciente.partos.all(),
+        'eventos': linea_tiempo(paciente),
+    })
+
+
+@login_required
+@rol_requerido('matrona', 'medico_obstetra', 'pediatra', 'enfermera_neonatal', 'puericultura', 'administrativo', 'jefe_servicio')
+def api_linea_tiempo(request, paciente_id):
+    """
+    API JSON con la línea de tiempo clínica de la paciente.
+    ?orden=asc entrega los eventos del más antiguo al más reciente.
+    """
+    paciente = cargar_historial(paciente_id)
+    eventos = linea_tiempo(paciente, reciente_primero=request.GET.get('orden') != 'asc')
+    return JsonResponse({
+        'paciente': {'id': paciente.pk, 'rut': paciente.rut, 'nombre': paciente.nombre_completo},
+        'eventos': [evento.como_dict() for evento in eventos],
     })
 
 
@@ -1,22 +1,23 @@
 from django.contrib import admin
-from .models import Alerta
+from .models import Alerta, EstadisticaDiaria
 
 
 @admin.register(Alerta)
 class AlertaAdmin(admin.ModelAdmin):
     list_display = ['id', 'tipo', 'nivel_urgencia', 'estado', 'paciente', 'recien_nacido', 
                     'fecha_hora_alerta', 'usuario_genera', 'tiempo_sin_atencion_display']
+    list_select_related = ['paciente', 'recien_nacido__parto__paciente', 'usuario_genera']
     list_filter = ['tipo', 'nivel_urgencia', 'estado', 'fecha_hora_alerta']
     search_fields = ['titulo', 'descripcion', 'paciente__nombre', 'paciente__apellido_paterno']
     readonly_fields = ['fecha_hora_alerta', 'fecha_hora_atencion', 'fecha_hora_resolucion', 
-                       'tiempo_sin_atencion']
+                       'tiempo_sin_atencion', 'clave_regla']
     
     fieldsets = (
         ('Información de la Alerta', {
             'fields': ('tipo', 'nivel_urgencia', 'estado', 'titulo', 'descripcion')
         }),
         ('Referencias', {
-            'fields': ('recien_nacido', 'parto', 'paciente')
+            'fields': ('recien_nacido', 'parto', 'paciente', 'clave_regla')
         }),
         ('Gestión', {
             'fields': ('usuario_genera', 'usuario_atiende', 'observaciones')
@@ -32,3 +33,15 @@ class AlertaAdmin(admin.ModelAdmin):
             return f"{obj.tiempo_sin_atencion} min"
         return "-"
     tiempo_sin_atencion_display.short_description = 'Tiempo sin atención'
+
+
+@admin.register(EstadisticaDiaria)
+class EstadisticaDiariaAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'partos_total', 'rn_total', 'alertas_total', 'updated_at']
+    date_hierarchy = 'fecha'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,278 @@
+"""
+Capa de agregación para los reportes estadísticos.
+
+Cada función recibe un queryset ya filtrado por período y construye todos
+los contadores del reporte con una única consulta de agregación condicional
+(Count con filter=Q(...), Avg), en lugar de un .count() por cada categoría.
+Los resultados se entregan como objetos tipados con los porcentajes ya
+calculados.
+"""
+
+from dataclasses import dataclass, field
+from django.db.models import Q, Count, Avg
+
+
+TIPOS_CESAREA = ['cesarea_electiva', 'cesarea_urgencia']
+ESTADOS_PENDIENTES = ['ACTIVA', 'EN_ATENCION']
+
+
+def porcentaje(parte, total, decimales=2):
+    """Retorna parte/total en porcentaje redondeado, o 0 si no hay total."""
+    return round((parte / total * 100), decimales) if total > 0 else 0
+
+
+def _redondear(valor, decimales):
+    """Redondea promedios que pueden venir como None desde la BD."""
+    return round(valor, decimales) if valor else 0
+
+
+# ============================================
+# PARTOS
+# ============================================
+
+@dataclass
+class ResumenPartos:
+    """Contadores de partos por tipo para un período."""
+    total: int = 0
+    vaginales: int = 0
+    cesareas_electiva: int = 0
+    cesareas_urgencia: int = 0
+
+    @property
+    def cesareas(self):
+        return self.cesareas_electiva + self.cesareas_urgencia
+
+    @property
+    def tasa_cesarea(self):
+        return porcentaje(self.cesareas, self.total)
+
+    @property
+    def porcentaje_vaginales(self):
+        return porcentaje(self.vaginales, self.total)
+
+
+def agregar_partos(partos):
+    """Calcula los contadores de tipo de parto en una sola consulta."""
+    datos = partos.aggregate(
+        total=Count('id'),
+        vaginales=Count('id', filter=Q(tipo_parto='vaginal')),
+        cesareas_electiva=Count('id', filter=Q(tipo_parto='cesarea_electiva')),
+        cesareas_urgencia=Count('id', filter=Q(tipo_parto='cesarea_urgencia')),
+    )
+    return ResumenPartos(**datos)
+
+
+@dataclass
+class ResumenRobson:
+    """Distribución de partos y cesáreas por grupo Robson."""
+    total: int = 0
+    grupos: list = field(default_factory=list)
+
+
+def agregar_robson(partos):
+    """
+    Agrupa por grupo Robson con el conteo de cesáreas de cada grupo.
+    El total del período se obtiene sumando los grupos (sin COUNT extra).
+    """
+    grupos = list(partos.order_by().values('grupo_robson').annotate(
+        total=Count('id'),
+        cesareas=Count('id', filter=Q(tipo_parto__in=TIPOS_CESAREA))
+    ).order_by('grupo_robson'))
+
+    total = sum(grupo['total'] for grupo in grupos)
+    for grupo in grupos:
+        grupo['porcentaje'] = porcentaje(grupo['total'], total)
+        grupo['tasa_cesarea'] = porcentaje(grupo['cesareas'], grupo['total'])
+
+    return ResumenRobson(total=total, grupos=grupos)
+
+
+# ============================================
+# RECIÉN NACIDOS
+# ============================================
+
+@dataclass
+class ResumenRecienNacidos:
+    """Contadores de peso, APGAR y reanimación de recién nacidos."""
+    total: int = 0
+    muy_bajo_peso: int = 0
+    bajo_peso: int = 0
+    peso_normal: int = 0
+    macrosomico: int = 0
+    apgar_1_critico: int = 0
+    apgar_1_moderado: int = 0
+    apgar_1_normal: int = 0
+    apgar_5_critico: int = 0
+    apgar_5_moderado: int = 0
+    apgar_5_normal: int = 0
+    apgar_5_bajo: int = 0
+    reanimacion: int = 0
+    peso_promedio: float = 0
+    apgar_1_promedio: float = 0
+    apgar_5_promedio: float = 0
+
+    @property
+    def no_reanimacion(self):
+        return self.total - self.reanimacion
+
+
+def agregar_recien_nacidos(recien_nacidos):
+    """
+    Calcula bandas de peso, bandas de APGAR, reanimación y promedios
+    en una sola consulta.
+    """
+    datos = recien_nacidos.aggregate(
+        total=Count('pk'),
+        muy_bajo_peso=Count('pk', filter=Q(peso_gramos__lt=1500)),
+        bajo_peso=Count('pk', filter=Q(peso_gramos__gte=1500, peso_gramos__lt=2500)),
+        peso_normal=Count('pk', filter=Q(peso_gramos__gte=2500, peso_gramos__lt=4000)),
+        macrosomico=Count('pk', filter=Q(peso_gramos__gte=4000)),
+        apgar_1_critico=Count('pk', filter=Q(apgar_1_min__lte=3)),
+        apgar_1_moderado=Count('pk', filter=Q(apgar_1_min__gte=4, apgar_1_min__lte=6)),
+        apgar_1_normal=Count('pk', filter=Q(apgar_1_min__gte=7)),
+        apgar_5_critico=Count('pk', filter=Q(apgar_5_min__lte=3)),
+        apgar_5_moderado=Count('pk', filter=Q(apgar_5_min__gte=4, apgar_5_min__lte=6)),
+        apgar_5_normal=Count('pk', filter=Q(apgar_5_min__gte=7)),
+        apgar_5_bajo=Count('pk', filter=Q(apgar_5_min__lt=7)),
+        reanimacion=Count('pk', filter=Q(reanimacion_requerida=True)),
+        peso_promedio=Avg('peso_gramos'),
+        apgar_1_promedio=Avg('apgar_1_min'),
+        apgar_5_promedio=Avg('apgar_5_min'),
+    )
+    datos['peso_promedio'] = _redondear(datos['peso_promedio'], 0)
+    datos['apgar_1_promedio'] = _redondear(datos['apgar_1_promedio'], 1)
+    datos['apgar_5_promedio'] = _redondear(datos['apgar_5_promedio'], 1)
+    return ResumenRecienNacidos(**datos)
+
+
+@dataclass
+class ResumenApgarCritico:
+    """Contadores de recién nacidos con APGAR < 7 al minuto 1 o 5."""
+    total: int = 0
+    apgar_1_critico: int = 0
+    apgar_5_critico: int = 0
+    reanimacion: int = 0
+
+
+def agregar_apgar_critico(recien_nacidos):
+    """Contadores del reporte de APGAR crítico en una sola consulta."""
+    datos = recien_nacidos.aggregate(
+        total=Count('pk'),
+        apgar_1_critico=Count('pk', filter=Q(apgar_1_min__lt=7)),
+        apgar_5_critico=Count('pk', filter=Q(apgar_5_min__lt=7)),
+        reanimacion=Count('pk', filter=Q(reanimacion_requerida=True)),
+    )
+    return ResumenApgarCritico(**datos)
+
+
+@dataclass
+class ResumenBajoPeso:
+    """Contadores de recién nacidos con peso < 2500g."""
+    total: int = 0
+    muy_bajo_peso: int = 0
+    pretermino: int = 0
+    peso_promedio: float = 0
+
+
+def agregar_bajo_peso(recien_nacidos):
+    """Contadores del reporte de bajo peso en una sola consulta."""
+    datos = recien_nacidos.aggregate(
+        total=Count('pk'),
+        muy_bajo_peso=Count('pk', filter=Q(peso_gramos__lt=1500)),
+        pretermino=Count('pk', filter=Q(parto__edad_gestacional_semanas__lt=37)),
+        peso_promedio=Avg('peso_gramos'),
+    )
+    datos['peso_promedio'] = _redondear(datos['peso_promedio'], 0)
+    return ResumenBajoPeso(**datos)
+
+
+# ============================================
+# ALERTAS
+# ============================================
+
+@dataclass
+class ResumenAlertas:
+    """Distribución de alertas por tipo, nivel de urgencia y estado."""
+    total: int = 0
+    criticas: int = 0
+    pendientes: int = 0
+    resueltas: int = 0
+    por_tipo: list = field(default_factory=list)
+    por_nivel: list = field(default_factory=list)
+    por_estado: list = field(default_factory=list)
+
+    @property
+    def tasa_resolucion(self):
+        return porcentaje(self.resueltas, self.total)
+
+
+def agregar_alertas(alertas):
+    """
+    Obtiene todas las combinaciones (tipo, nivel, estado) con su conteo
+    en una sola consulta agrupada y las pliega en Python. El número de
+    filas está acotado por las opciones de cada campo, no por el volumen.
+    """
+    filas = alertas.order_by().values(
+        'tipo', 'nivel_urgencia', 'estado'
+    ).annotate(total=Count('id'))
+
+    resumen = ResumenAlertas()
+    por_tipo = {}
+    por_nivel = {}
+    por_estado = {}
+
+    for fila in filas:
+        total = fila['total']
+        critica = fila['nivel_urgencia'] == 'CRITICA'
+        pendiente = fila['estado'] in ESTADOS_PENDIENTES
+        resuelta = fila['estado'] == 'RESUELTA'
+
+        resumen.total += total
+        resumen.criticas += total if critica else 0
+        resumen.pendientes += total if pendiente else 0
+        resumen.resueltas += total if resuelta else 0
+
+        tipo = por_tipo.setdefault(fila['tipo'], {'total': 0, 'criticas': 0})
+        tipo['total'] += total
+        tipo['criticas'] += total if critica else 0
+
+        nivel = por_nivel.setdefault(
+            fila['nivel_urgencia'], {'total': 0, 'pendientes': 0, 'resueltas': 0}
+        )
+        nivel['total'] += total
+        nivel['pendientes'] += total if pendiente else 0
+        nivel['resueltas'] += total if resuelta else 0
+
+        por_estado[fila['estado']] = por_estado.get(fila['estado'], 0) + total
+
+    resumen.por_tipo = sorted([
+        {
+            'tipo': tipo,
+            'total': datos['total'],
+            'porcentaje': porcentaje(datos['total'], resumen.total),
+            'criticas': datos['criticas'],
+        }
+        for tipo, datos in por_tipo.items()
+    ], key=lambda item: -item['total'])
+
+    resumen.por_nivel = [
+        {
+            'nivel': nivel.lower() if nivel else 'bajo',
+            'total': datos['total'],
+            'porcentaje': porcentaje(datos['total'], resumen.total),
+            'pendientes': datos['pendientes'],
+            'resueltas': datos['resueltas'],
+        }
+        for nivel, datos in por_nivel.items()
+    ]
+
+    resumen.por_estado = [
+        {
+            'estado': estado.lower() if estado else 'pendiente',
+            'total': total,
+            'porcentaje': porcentaje(total, resumen.total),
+        }
+        for estado, total in por_estado.items()
+    ]
+
+    return resumen
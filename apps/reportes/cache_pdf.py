@@ -0,0 +1,133 @@
+"""
+Caché en disco de las fichas clínicas en PDF.
+
+Cada PDF se guarda bajo una clave derivada del id del parto y de los
+updated_at del Parto, su PacienteMadre y su RecienNacido: cualquier
+modificación de esos registros produce una clave nueva, por lo que una
+entrada nunca queda obsoleta y las demás versiones de la misma ficha se
+pueden borrar. La misma clave se usa como ETag.
+
+El archivo en caché no lleva pie: es el mismo para todos los usuarios.
+con_pie() estampa en cada página, por solicitud, quién y cuándo lo
+descargó, sin volver a renderizar el HTML.
+
+El directorio tiene un tamaño máximo (FICHA_PDF_CACHE_MAX_BYTES). Cada
+acierto actualiza el mtime del archivo y, al guardar, se eliminan los
+archivos con mtime más antiguo hasta volver bajo el límite (LRU).
+"""
+
+import hashlib
+import os
+import tempfile
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from pypdf import PdfReader, PdfWriter
+from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+
+
+def _directorio():
+    directorio = Path(settings.FICHA_PDF_CACHE_DIR)
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
+
+
+def clave_ficha(parto_id, versiones):
+    """
+    Clave de contenido de la ficha de un parto.
+
+    versiones es el diccionario con los updated_at del parto, la paciente y
+    el recién nacido (None si aún no se registra).
+    """
+    partes = [
+        str(parto_id),
+        str(versiones['updated_at']),
+        str(versiones['paciente__updated_at']),
+        str(versiones['recien_nacido__updated_at']),
+    ]
+    return hashlib.sha256(':'.join(partes).encode()).hexdigest()[:32]
+
+
+def _ruta(parto_id, clave):
+    return _directorio() / f'{parto_id}_{clave}.pdf'
+
+
+def obtener(parto_id, clave):
+    """Retorna la ruta del PDF en caché, o None si no existe."""
+    ruta = _ruta(parto_id, clave)
+    try:
+        os.utime(ruta)
+    except FileNotFoundError:
+        return None
+    return ruta
+
+
+def guardar(parto_id, clave, contenido):
+    """
+    Guarda el PDF en caché y retorna su ruta. Elimina las versiones
+    anteriores de la misma ficha y aplica el límite de tamaño.
+    """
+    directorio = _directorio()
+    ruta = _ruta(parto_id, clave)
+
+    # Escritura atómica: nunca se sirve un archivo a medio escribir
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as destino:
+        destino.write(contenido)
+    os.replace(temporal, ruta)
+
+    for anterior in directorio.glob(f'{parto_id}_*.pdf'):
+        if anterior != ruta:
+            anterior.unlink(missing_ok=True)
+
+    podar(excluir=ruta)
+    return ruta
+
+
+def _lamina_pie(ancho, alto, texto):
+    """Página transparente con el pie centrado bajo el margen inferior."""
+    destino = BytesIO()
+    lienzo = canvas.Canvas(destino, pagesize=(ancho, alto))
+    lienzo.setStrokeColorRGB(0.87, 0.87, 0.87)
+    lienzo.line(2 * cm, 1.6 * cm, ancho - 2 * cm, 1.6 * cm)
+    lienzo.setFillColorRGB(0.6, 0.6, 0.6)
+    lienzo.setFont('Helvetica', 8)
+    lienzo.drawCentredString(ancho / 2, 1.1 * cm, texto)
+    lienzo.save()
+    return PdfReader(destino).pages[0]
+
+
+def con_pie(ruta, texto):
+    """Contenido del PDF en caché con `texto` como pie de cada página."""
+    escritor = PdfWriter(clone_from=ruta)
+    laminas = {}
+    for pagina in escritor.pages:
+        tamano = (float(pagina.mediabox.width), float(pagina.mediabox.height))
+        if tamano not in laminas:
+            laminas[tamano] = _lamina_pie(*tamano, texto)
+        pagina.merge_page(laminas[tamano])
+    destino = BytesIO()
+    escritor.write(destino)
+    return destino.getvalue()
+
+
+def podar(excluir=None):
+    """Elimina los PDF usados hace más tiempo hasta respetar el tamaño máximo."""
+    archivos = []
+    for ruta in _directorio().glob('*.pdf'):
+        try:
+            estado = ruta.stat()
+        except FileNotFoundError:
+            continue
+        archivos.append((estado.st_mtime, estado.st_size, ruta))
+
+    total = sum(tamano for _, tamano, _ in archivos)
+    for _, tamano, ruta in sorted(archivos, key=lambda archivo: archivo[0]):
+        if total <= settings.FICHA_PDF_CACHE_MAX_BYTES:
+            break
+        if ruta == excluir:
+            continue
+        ruta.unlink(missing_ok=True)
+        total -= tamano
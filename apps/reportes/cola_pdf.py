@@ -0,0 +1,219 @@
+"""
+Cola de generación de reportes PDF en segundo plano.
+
+La vista crea un TrabajoReporte y retorna de inmediato; el PDF se genera
+en un pool local de procesos (sin broker externo) y se guarda en
+REPORTES_PDF_DIR. Cada proceso del pool inicializa Django una sola vez y
+procesa trabajos por id, leyendo y actualizando el estado en la BD.
+
+Solicitudes con el mismo (tipo, fecha_inicio, fecha_fin) reutilizan:
+- el último PDF completado, si los datos del período no han cambiado desde
+  que se generó (version_datos) o si tiene menos de
+  REPORTES_PDF_REUTILIZAR_TTL segundos;
+- el trabajo pendiente o en proceso, si no ha superado REPORTES_PDF_TIMEOUT.
+
+El PDF compartido no lleva usuario: descargar_reporte estampa en el pie
+quién lo descarga y cuándo.
+"""
+
+import hashlib
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from apps.administracion import metricas
+from apps.administracion.fechas import filtros_rango
+from apps.administracion.models import Usuario
+from apps.neonatologia.models import RecienNacido
+from apps.obstetricia.models import Parto
+from apps.pacientes.models import PacienteMadre
+from .models import Alerta, EstadisticaDiaria, TrabajoReporte
+
+
+logger = logging.getLogger('apps')
+
+_pool = None
+
+
+def _inicializar_worker(modulo_settings):
+    """Prepara Django en cada proceso del pool."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', modulo_settings)
+    import django
+    django.setup()
+
+
+def _obtener_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.REPORTES_PDF_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_inicializar_worker,
+            initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'hospital_hhm.settings'),),
+        )
+    return _pool
+
+
+def _reiniciar_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+def ruta_archivo(trabajo):
+    """Ruta absoluta del PDF de un trabajo, o None si aún no tiene archivo."""
+    if not trabajo.archivo:
+        return None
+    return Path(settings.REPORTES_PDF_DIR) / trabajo.archivo
+
+
+def version_datos(fecha_inicio, fecha_fin):
+    """
+    Huella de los registros que leen los reportes del período (REPORTES en
+    views.py): total y última modificación de cada fuente. Cambia al crear,
+    editar o eliminar cualquiera de ellos, incluidas las pacientes, los
+    partos de los recién nacidos y los usuarios que aparecen en el PDF.
+    """
+    partos = Parto.objects.filter(fecha_parto__range=[fecha_inicio, fecha_fin])
+    recien_nacidos = RecienNacido.objects.entre_fechas('created_at', fecha_inicio, fecha_fin)
+    alertas = Alerta.objects.entre_fechas('fecha_hora_alerta', fecha_inicio, fecha_fin)
+    fuentes = (
+        partos,
+        recien_nacidos,
+        alertas,
+        EstadisticaDiaria.objects.filter(fecha__range=[fecha_inicio, fecha_fin]),
+        # Parto de cada recién nacido (fecha y edad gestacional en el PDF)
+        Parto.objects.filter(pk__in=recien_nacidos.values('parto')),
+        # Pacientes nuevas del período y las nombradas en partos, RN y alertas
+        PacienteMadre.objects.filter(
+            Q(**filtros_rango('created_at', fecha_inicio, fecha_fin))
+            | Q(pk__in=partos.values('paciente'))
+            | Q(pk__in=recien_nacidos.values('parto__paciente'))
+            | Q(pk__in=alertas.values('paciente'))
+        ),
+        Usuario.objects.filter(
+            Q(pk__in=partos.values('usuario_registro')) | Q(pk__in=alertas.values('usuario_genera'))
+        ),
+    )
+    partes = []
+    for consulta in fuentes:
+        resumen = consulta.order_by().aggregate(total=Count('pk'), ultima=Max('updated_at'))
+        partes.append(f"{resumen['total']}:{resumen['ultima'].isoformat() if resumen['ultima'] else ''}")
+    return hashlib.sha256('|'.join(partes).encode()).hexdigest()
+
+
+def _reutilizable(trabajo, version):
+    """Indica si el PDF de un trabajo completado sirve para una nueva solicitud."""
+    ruta = ruta_archivo(trabajo)
+    if ruta is None or not ruta.exists():
+        return False
+    vigente = trabajo.fecha_hora_fin_proceso >= timezone.now() - timedelta(
+        seconds=settings.REPORTES_PDF_REUTILIZAR_TTL
+    )
+    return vigente or trabajo.version_datos == version
+
+
+def buscar_reutilizable(tipo, fecha_inicio, fecha_fin):
+    """Retorna un trabajo existente que pueda atender la solicitud, o None."""
+    trabajos = TrabajoReporte.objects.filter(
+        tipo=tipo, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin
+    ).order_by('-created_at')
+
+    completado = trabajos.filter(estado='COMPLETADO').first()
+    if completado and _reutilizable(completado, version_datos(fecha_inicio, fecha_fin)):
+        return completado
+
+    limite = timezone.now() - timedelta(seconds=settings.REPORTES_PDF_TIMEOUT)
+    return trabajos.filter(
+        estado__in=['PENDIENTE', 'PROCESANDO'], created_at__gte=limite
+    ).first()
+
+
+def encolar_reporte(tipo, fecha_inicio, fecha_fin, usuario):
+    """
+    Retorna el trabajo que atenderá la solicitud: uno existente reutilizable
+    o uno nuevo, despachado al pool cuando se confirma la transacción.
+    """
+    trabajo = buscar_reutilizable(tipo, fecha_inicio, fecha_fin)
+    if trabajo is not None:
+        return trabajo
+
+    trabajo = TrabajoReporte.objects.create(
+        tipo=tipo,
+        fecha_inicio=fecha_inicio,
+        fecha_fin=fecha_fin,
+        usuario_solicita=usuario,
+    )
+    transaction.on_commit(lambda: despachar(trabajo.id))
+    return trabajo
+
+
+def despachar(trabajo_id):
+    """Envía un trabajo al pool de procesos, o lo procesa en línea en modo síncrono."""
+    if settings.REPORTES_PDF_MODO == 'sincrono':
+        procesar_trabajo(trabajo_id)
+        return
+
+    try:
+        _obtener_pool().submit(procesar_trabajo, trabajo_id)
+    except (BrokenProcessPool, RuntimeError) as e:
+        logger.error(f"Pool de reportes no disponible para trabajo {trabajo_id}: {e}")
+        _reiniciar_pool()
+        TrabajoReporte.objects.filter(pk=trabajo_id).update(
+            estado='ERROR', error='El servicio de reportes no está disponible.',
+            fecha_hora_fin_proceso=timezone.now(),
+        )
+
+
+def procesar_trabajo(trabajo_id):
+    """
+    Genera el PDF de un trabajo y actualiza su estado.
+    Se ejecuta dentro de un proceso del pool (o en línea en modo síncrono).
+    """
+    from xhtml2pdf import pisa
+    from .views import construir_reporte
+
+    trabajo = TrabajoReporte.objects.get(pk=trabajo_id)
+    trabajo.estado = 'PROCESANDO'
+    trabajo.fecha_hora_inicio_proceso = timezone.now()
+    trabajo.save(update_fields=['estado', 'fecha_hora_inicio_proceso'])
+
+    try:
+        # Antes de leer los datos: un cambio durante la generación invalida el PDF
+        trabajo.version_datos = version_datos(trabajo.fecha_inicio, trabajo.fecha_fin)
+        html, nombre = construir_reporte(trabajo.tipo, trabajo.fecha_inicio, trabajo.fecha_fin)
+        directorio = Path(settings.REPORTES_PDF_DIR)
+        directorio.mkdir(parents=True, exist_ok=True)
+        archivo = f'{trabajo.pk}_{nombre}'
+
+        with open(directorio / archivo, 'wb') as destino, metricas.cronometro_pdf(trabajo.tipo):
+            pisa_status = pisa.CreatePDF(html, dest=destino)
+
+        if pisa_status.err:
+            raise RuntimeError('Error al generar el PDF')
+
+        trabajo.archivo = archivo
+        trabajo.nombre_descarga = nombre
+        trabajo.estado = 'COMPLETADO'
+    except Exception as e:
+        logger.exception(f"Error generando reporte {trabajo.tipo} (trabajo {trabajo.pk})")
+        trabajo.estado = 'ERROR'
+        trabajo.error = str(e)
+
+    trabajo.fecha_hora_fin_proceso = timezone.now()
+    trabajo.save(update_fields=[
+        'estado', 'archivo', 'nombre_descarga', 'error', 'version_datos', 'fecha_hora_fin_proceso',
+    ])
+    # Los procesos del pool no atienden solicitudes: se vuelca tras cada trabajo
+    metricas.registro.volcar()
+    return trabajo.estado
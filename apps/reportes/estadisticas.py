@@ -0,0 +1,423 @@
+"""
+Mantenimiento y lectura de la tabla de resumen EstadisticaDiaria.
+
+Las funciones de reconstrucción calculan los contadores de un rango de días
+con una consulta agrupada por modelo (Parto, RecienNacido, Alerta) y
+reemplazan las filas del rango; las usan los comandos y las cargas masivas.
+
+Las señales de guardado no reconstruyen: aplicar_cambio() suma o resta el
+aporte de una sola instancia (su día, tipo, peso, nivel, etc.) sobre la fila
+del día, bloqueada con select_for_update. Si lo que cambió no afecta los
+contadores (por ejemplo, el estado de una Alerta) no se escribe nada.
+
+Las funciones de lectura suman las filas diarias (a lo más 365 para un año)
+y entregan los mismos objetos de resultado que la capa de agregación.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Count, Sum, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.administracion.fechas import rango_local
+from apps.obstetricia.models import Parto
+from apps.neonatologia.models import RecienNacido
+from .models import Alerta, EstadisticaDiaria
+from .agregaciones import (
+    TIPOS_CESAREA, porcentaje, ResumenPartos, ResumenRobson, ResumenRecienNacidos,
+)
+
+
+def _sumar_en(diccionario, clave, valor):
+    clave = str(clave)
+    diccionario[clave] = diccionario.get(clave, 0) + valor
+
+
+# ============================================
+# RECONSTRUCCIÓN
+# ============================================
+
+def _calcular_rango(fecha_inicio, fecha_fin):
+    """
+    Calcula los contadores por día del rango. Retorna un diccionario
+    {fecha: EstadisticaDiaria} sin guardar; solo contiene días con datos.
+    """
+    dias = {}
+
+    def dia(fecha):
+        if fecha not in dias:
+            dias[fecha] = EstadisticaDiaria(fecha=fecha)
+        return dias[fecha]
+
+    # Partos: una fila por (día, tipo, grupo Robson)
+    partos = Parto.objects.filter(
+        fecha_parto__range=[fecha_inicio, fecha_fin]
+    ).order_by().values('fecha_parto', 'tipo_parto', 'grupo_robson').annotate(total=Count('id'))
+
+    for fila in partos:
+        estadistica = dia(fila['fecha_parto'])
+        estadistica.partos_total += fila['total']
+        _sumar_en(estadistica.partos_por_tipo, fila['tipo_parto'], fila['total'])
+        _sumar_en(estadistica.partos_por_robson, fila['grupo_robson'], fila['total'])
+        if fila['tipo_parto'] in TIPOS_CESAREA:
+            _sumar_en(estadistica.cesareas_por_robson, fila['grupo_robson'], fila['total'])
+
+    # Recién nacidos: una fila por día con todos los contadores condicionales
+    inicio, fin = rango_local(fecha_inicio, fecha_fin)
+    recien_nacidos = RecienNacido.objects.filter(
+        created_at__gte=inicio, created_at__lt=fin
+    ).annotate(dia=TruncDate('created_at')).order_by().values('dia').annotate(
+        total=Count('pk'),
+        muy_bajo_peso=Count('pk', filter=Q(peso_gramos__lt=1500)),
+        bajo_peso=Count('pk', filter=Q(peso_gramos__gte=1500, peso_gramos__lt=2500)),
+        peso_normal=Count('pk', filter=Q(peso_gramos__gte=2500, peso_gramos__lt=4000)),
+        macrosomico=Count('pk', filter=Q(peso_gramos__gte=4000)),
+        apgar_1_critico=Count('pk', filter=Q(apgar_1_min__lte=3)),
+        apgar_1_moderado=Count('pk', filter=Q(apgar_1_min__gte=4, apgar_1_min__lte=6)),
+        apgar_1_normal=Count('pk', filter=Q(apgar_1_min__gte=7)),
+        apgar_5_critico=Count('pk', filter=Q(apgar_5_min__lte=3)),
+        apgar_5_moderado=Count('pk', filter=Q(apgar_5_min__gte=4, apgar_5_min__lte=6)),
+        apgar_5_normal=Count('pk', filter=Q(apgar_5_min__gte=7)),
+        reanimacion=Count('pk', filter=Q(reanimacion_requerida=True)),
+        peso_suma=Sum('peso_gramos'),
+        apgar_1_suma=Sum('apgar_1_min'),
+        apgar_5_suma=Sum('apgar_5_min'),
+    )
+
+    for fila in recien_nacidos:
+        estadistica = dia(fila.pop('dia'))
+        for campo, valor in fila.items():
+            setattr(estadistica, f'rn_{campo}', valor or 0)
+
+    # Alertas: una fila por (día, tipo, nivel)
+    alertas = Alerta.objects.filter(
+        fecha_hora_alerta__gte=inicio, fecha_hora_alerta__lt=fin
+    ).annotate(dia=TruncDate('fecha_hora_alerta')).order_by().values(
+        'dia', 'tipo', 'nivel_urgencia'
+    ).annotate(total=Count('id'))
+
+    for fila in alertas:
+        estadistica = dia(fila['dia'])
+        estadistica.alertas_total += fila['total']
+        _sumar_en(estadistica.alertas_por_tipo, fila['tipo'], fila['total'])
+        _sumar_en(estadistica.alertas_por_nivel, fila['nivel_urgencia'], fila['total'])
+
+    return dias
+
+
+@transaction.atomic
+def reconstruir_rango(fecha_inicio, fecha_fin):
+    """
+    Recalcula y reemplaza las filas de EstadisticaDiaria del rango.
+    Retorna el número de días con datos.
+    """
+    dias = _calcular_rango(fecha_inicio, fecha_fin)
+    EstadisticaDiaria.objects.filter(fecha__range=[fecha_inicio, fecha_fin]).delete()
+    EstadisticaDiaria.objects.bulk_create(dias.values(), batch_size=500)
+    return len(dias)
+
+
+def _como_fecha(valor):
+    if isinstance(valor, str):
+        valor = date.fromisoformat(valor[:10])
+    if isinstance(valor, datetime):
+        return timezone.localdate(valor) if timezone.is_aware(valor) else valor.date()
+    return valor
+
+
+CAMPOS_CONTADORES = [
+    campo.attname for campo in EstadisticaDiaria._meta.concrete_fields
+    if campo.attname not in ('id', 'fecha', 'updated_at')
+]
+
+
+def _fila_bloqueada(fecha):
+    """Fila del día bloqueada hasta el fin de la transacción; la crea si falta."""
+    try:
+        return EstadisticaDiaria.objects.select_for_update().get(fecha=fecha)
+    except EstadisticaDiaria.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic():
+            return EstadisticaDiaria.objects.create(fecha=fecha)
+    except IntegrityError:
+        # Otra transacción la creó entre la consulta y el INSERT
+        return EstadisticaDiaria.objects.select_for_update().get(fecha=fecha)
+
+
+def _guardar_o_eliminar(fila):
+    if fila.partos_total or fila.rn_total or fila.alertas_total:
+        fila.save()
+    else:
+        fila.delete()
+
+
+def recalcular_dia(fecha):
+    """
+    Recalcula desde los datos la fila de un día, con la fila bloqueada.
+    Las señales lo usan solo cuando no conocen el aporte anterior de la
+    instancia (cargada con only() o defer()).
+    """
+    fecha = _como_fecha(fecha)
+    if fecha is None:
+        return
+    with transaction.atomic():
+        fila = _fila_bloqueada(fecha)
+        calculada = _calcular_rango(fecha, fecha).get(fecha) or EstadisticaDiaria(fecha=fecha)
+        for campo in CAMPOS_CONTADORES:
+            setattr(fila, campo, getattr(calculada, campo))
+        _guardar_o_eliminar(fila)
+
+
+# ============================================
+# ACTUALIZACIÓN INCREMENTAL
+# ============================================
+
+# Campos de cada modelo que determinan su aporte a EstadisticaDiaria
+CAMPOS_APORTE = {
+    Parto: ('fecha_parto', 'tipo_parto', 'grupo_robson'),
+    RecienNacido: ('created_at', 'peso_gramos', 'apgar_1_min', 'apgar_5_min', 'reanimacion_requerida'),
+    Alerta: ('fecha_hora_alerta', 'tipo', 'nivel_urgencia'),
+}
+
+
+def valores_aporte(instancia):
+    """Valores de CAMPOS_APORTE de la instancia, o None si alguno está diferido."""
+    try:
+        return tuple(instancia.__dict__[campo] for campo in CAMPOS_APORTE[type(instancia)])
+    except KeyError:
+        return None
+
+
+def _rango_apgar(valor):
+    if valor <= 3:
+        return 'critico'
+    return 'moderado' if valor <= 6 else 'normal'
+
+
+def _rango_peso(peso):
+    if peso < 1500:
+        return 'muy_bajo_peso'
+    if peso < 2500:
+        return 'bajo_peso'
+    return 'peso_normal' if peso < 4000 else 'macrosomico'
+
+
+def _aporte_parto(fecha_parto, tipo_parto, grupo_robson):
+    grupo = str(grupo_robson)
+    aporte = {'partos_total': 1, 'partos_por_tipo': {tipo_parto: 1}, 'partos_por_robson': {grupo: 1}}
+    if tipo_parto in TIPOS_CESAREA:
+        aporte['cesareas_por_robson'] = {grupo: 1}
+    return fecha_parto, aporte
+
+
+def _aporte_rn(created_at, peso_gramos, apgar_1_min, apgar_5_min, reanimacion_requerida):
+    aporte = {
+        'rn_total': 1,
+        'rn_peso_suma': peso_gramos or 0,
+        'rn_apgar_1_suma': apgar_1_min or 0,
+        'rn_apgar_5_suma': apgar_5_min or 0,
+        'rn_reanimacion': 1 if reanimacion_requerida else 0,
+    }
+    if peso_gramos is not None:
+        aporte[f'rn_{_rango_peso(peso_gramos)}'] = 1
+    if apgar_1_min is not None:
+        aporte[f'rn_apgar_1_{_rango_apgar(apgar_1_min)}'] = 1
+    if apgar_5_min is not None:
+        aporte[f'rn_apgar_5_{_rango_apgar(apgar_5_min)}'] = 1
+    return created_at, aporte
+
+
+def _aporte_alerta(fecha_hora_alerta, tipo, nivel_urgencia):
+    return fecha_hora_alerta, {
+        'alertas_total': 1, 'alertas_por_tipo': {tipo: 1}, 'alertas_por_nivel': {nivel_urgencia: 1},
+    }
+
+
+APORTES = {Parto: _aporte_parto, RecienNacido: _aporte_rn, Alerta: _aporte_alerta}
+
+
+def _acumular(destino, delta, signo=1):
+    """Suma delta (anidado, para los JSONField) en destino, quitando los ceros."""
+    for campo, valor in delta.items():
+        if isinstance(valor, dict):
+            interno = destino.setdefault(campo, {})
+            _acumular(interno, valor, signo)
+            if not interno:
+                del destino[campo]
+        else:
+            total = destino.get(campo, 0) + signo * valor
+            if total:
+                destino[campo] = total
+            else:
+                destino.pop(campo, None)
+
+
+def _deltas(modelo, cambios):
+    """{fecha: delta} netos de una lista de (valores, signo)."""
+    deltas = {}
+    for valores, signo in cambios:
+        if valores is None:
+            continue
+        fecha, aporte = APORTES[modelo](*valores)
+        fecha = _como_fecha(fecha)
+        if fecha is not None:
+            _acumular(deltas.setdefault(fecha, {}), aporte, signo)
+    return {fecha: delta for fecha, delta in deltas.items() if delta}
+
+
+def _aplicar_deltas(deltas):
+    # Días en orden para que dos transacciones no se bloqueen mutuamente
+    for fecha in sorted(deltas):
+        with transaction.atomic():
+            fila = _fila_bloqueada(fecha)
+            for campo, valor in deltas[fecha].items():
+                if isinstance(valor, dict):
+                    _acumular(getattr(fila, campo), valor)
+                else:
+                    setattr(fila, campo, getattr(fila, campo) + valor)
+            _guardar_o_eliminar(fila)
+
+
+def aplicar_cambio(modelo, anteriores, actuales):
+    """
+    Resta el aporte de los valores anteriores y suma el de los actuales
+    (tuplas de valores_aporte(); None si la instancia es nueva o se
+    eliminó). Solo escribe los días cuyo contador cambia.
+    """
+    _aplicar_deltas(_deltas(modelo, [(anteriores, -1), (actuales, 1)]))
+
+
+def sumar_creadas(instancias):
+    """Suma el aporte de instancias creadas sin señales (bulk_create)."""
+    if instancias:
+        modelo = type(instancias[0])
+        _aplicar_deltas(_deltas(modelo, [(valores_aporte(instancia), 1) for instancia in instancias]))
+
+
+def primera_fecha_con_datos():
+    """Retorna la fecha más antigua registrada en partos, RN o alertas."""
+    candidatas = [
+        Parto.objects.aggregate(minimo=Min('fecha_parto'))['minimo'],
+        RecienNacido.objects.aggregate(minimo=Min('created_at'))['minimo'],
+        Alerta.objects.aggregate(minimo=Min('fecha_hora_alerta'))['minimo'],
+    ]
+    fechas = [
+        timezone.localdate(valor) if isinstance(valor, datetime) else valor
+        for valor in candidatas if valor is not None
+    ]
+    return min(fechas) if fechas else None
+
+
+# ============================================
+# LECTURA
+# ============================================
+
+@dataclass
+class ResumenRango:
+    """Suma de las filas diarias de un rango de fechas."""
+    dias: int = 0
+    partos_total: int = 0
+    partos_por_tipo: dict = field(default_factory=dict)
+    partos_por_robson: dict = field(default_factory=dict)
+    cesareas_por_robson: dict = field(default_factory=dict)
+    rn: dict = field(default_factory=dict)
+    alertas_total: int = 0
+    alertas_por_tipo: dict = field(default_factory=dict)
+    alertas_por_nivel: dict = field(default_factory=dict)
+
+    def partos(self):
+        """Contadores de tipo de parto del rango."""
+        return ResumenPartos(
+            total=self.partos_total,
+            vaginales=self.partos_por_tipo.get('vaginal', 0),
+            cesareas_electiva=self.partos_por_tipo.get('cesarea_electiva', 0),
+            cesareas_urgencia=self.partos_por_tipo.get('cesarea_urgencia', 0),
+        )
+
+    def robson(self):
+        """Distribución por grupo Robson con el mismo formato que agregar_robson."""
+        grupos = []
+        for grupo in sorted(self.partos_por_robson, key=int):
+            total = self.partos_por_robson[grupo]
+            cesareas = self.cesareas_por_robson.get(grupo, 0)
+            grupos.append({
+                'grupo_robson': int(grupo),
+                'total': total,
+                'cesareas': cesareas,
+                'porcentaje': porcentaje(total, self.partos_total),
+                'tasa_cesarea': porcentaje(cesareas, total),
+            })
+        return ResumenRobson(total=self.partos_total, grupos=grupos)
+
+    def recien_nacidos(self):
+        """Contadores neonatales del rango, con promedios desde las sumas."""
+        rn = self.rn
+        total = rn.get('total', 0)
+
+        def promedio(suma, decimales):
+            return round(rn.get(suma, 0) / total, decimales) if total else 0
+
+        return ResumenRecienNacidos(
+            total=total,
+            muy_bajo_peso=rn.get('muy_bajo_peso', 0),
+            bajo_peso=rn.get('bajo_peso', 0),
+            peso_normal=rn.get('peso_normal', 0),
+            macrosomico=rn.get('macrosomico', 0),
+            apgar_1_critico=rn.get('apgar_1_critico', 0),
+            apgar_1_moderado=rn.get('apgar_1_moderado', 0),
+            apgar_1_normal=rn.get('apgar_1_normal', 0),
+            apgar_5_critico=rn.get('apgar_5_critico', 0),
+            apgar_5_moderado=rn.get('apgar_5_moderado', 0),
+            apgar_5_normal=rn.get('apgar_5_normal', 0),
+            apgar_5_bajo=rn.get('apgar_5_critico', 0) + rn.get('apgar_5_moderado', 0),
+            reanimacion=rn.get('reanimacion', 0),
+            peso_promedio=promedio('peso_suma', 0),
+            apgar_1_promedio=promedio('apgar_1_suma', 1),
+            apgar_5_promedio=promedio('apgar_5_suma', 1),
+        )
+
+
+CAMPOS_RN = [
+    'total', 'muy_bajo_peso', 'bajo_peso', 'peso_normal', 'macrosomico',
+    'apgar_1_critico', 'apgar_1_moderado', 'apgar_1_normal',
+    'apgar_5_critico', 'apgar_5_moderado', 'apgar_5_normal',
+    'reanimacion', 'peso_suma', 'apgar_1_suma', 'apgar_5_suma',
+]
+
+
+def resumir_rango(fecha_inicio, fecha_fin):
+    """Suma las filas diarias del rango en un ResumenRango (una consulta)."""
+    resumen = ResumenRango()
+    for fila in EstadisticaDiaria.objects.filter(fecha__range=[fecha_inicio, fecha_fin]):
+        resumen.dias += 1
+        resumen.partos_total += fila.partos_total
+        resumen.alertas_total += fila.alertas_total
+        for origen, destino in [
+            (fila.partos_por_tipo, resumen.partos_por_tipo),
+            (fila.partos_por_robson, resumen.partos_por_robson),
+            (fila.cesareas_por_robson, resumen.cesareas_por_robson),
+            (fila.alertas_por_tipo, resumen.alertas_por_tipo),
+            (fila.alertas_por_nivel, resumen.alertas_por_nivel),
+        ]:
+            for clave, valor in origen.items():
+                _sumar_en(destino, clave, valor)
+        for campo in CAMPOS_RN:
+            _sumar_en(resumen.rn, campo, getattr(fila, f'rn_{campo}'))
+    return resumen
+
+
+def serie_diaria(fecha_inicio, fecha_fin, campo):
+    """Retorna [(fecha, valor)] para cada día del rango, con 0 en días sin fila."""
+    valores = dict(
+        EstadisticaDiaria.objects.filter(
+            fecha__range=[fecha_inicio, fecha_fin]
+        ).values_list('fecha', campo)
+    )
+    dias = (fecha_fin - fecha_inicio).days + 1
+    return [
+        (fecha_inicio + timedelta(days=i), valores.get(fecha_inicio + timedelta(days=i), 0))
+        for i in range(dias)
+    ]
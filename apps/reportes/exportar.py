@@ -0,0 +1,171 @@
+"""
+Exportación de los datos de los reportes en CSV y XLSX.
+
+Las filas se leen con values_list() e .iterator(chunk_size=...), por lo que
+la BD entrega el resultado por bloques y nunca se cargan todos los modelos
+en memoria. El CSV se escribe fila a fila en un StreamingHttpResponse.
+El XLSX (requiere openpyxl) se escribe en modo write_only sobre un archivo
+temporal y se envía desde el disco.
+"""
+
+import csv
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.obstetricia.models import Parto
+from apps.neonatologia.models import RecienNacido
+from .models import Alerta
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # pragma: no cover - dependencia opcional
+    Workbook = None
+
+
+TAMANO_BLOQUE = 2000
+
+
+@dataclass
+class Exportacion:
+    """Columnas (encabezado, campo) y consulta de un conjunto de datos."""
+    nombre: str
+    columnas: list
+    consulta: Callable
+
+    def encabezados(self):
+        return [encabezado for encabezado, _ in self.columnas]
+
+    def filas(self, fecha_inicio, fecha_fin):
+        """Itera las filas del período por bloques, con valores ya formateados."""
+        campos = [campo for _, campo in self.columnas]
+        queryset = self.consulta(fecha_inicio, fecha_fin).values_list(*campos)
+        for fila in queryset.iterator(chunk_size=TAMANO_BLOQUE):
+            yield [_formatear(valor) for valor in fila]
+
+
+def _formatear(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).strftime('%Y-%m-%d %H:%M')
+    return valor
+
+
+def _partos(fecha_inicio, fecha_fin):
+    return Parto.objects.filter(
+        fecha_parto__range=[fecha_inicio, fecha_fin]
+    ).order_by('fecha_parto', 'id')
+
+
+def _recien_nacidos(fecha_inicio, fecha_fin):
+    return RecienNacido.objects.entre_fechas(
+        'created_at', fecha_inicio, fecha_fin
+    ).order_by('created_at', 'pk')
+
+
+def _apgar_critico(fecha_inicio, fecha_fin):
+    return _recien_nacidos(fecha_inicio, fecha_fin).filter(
+        Q(apgar_1_min__lt=7) | Q(apgar_5_min__lt=7)
+    )
+
+
+def _bajo_peso(fecha_inicio, fecha_fin):
+    return _recien_nacidos(fecha_inicio, fecha_fin).filter(peso_gramos__lt=2500)
+
+
+def _alertas(fecha_inicio, fecha_fin):
+    return Alerta.objects.entre_fechas(
+        'fecha_hora_alerta', fecha_inicio, fecha_fin
+    ).order_by('fecha_hora_alerta', 'id')
+
+
+COLUMNAS_PARTO = [
+    ('ID Parto', 'id'),
+    ('Fecha', 'fecha_parto'),
+    ('Hora', 'hora_parto'),
+    ('RUT Paciente', 'paciente__rut'),
+    ('Nombre', 'paciente__nombre'),
+    ('Apellido Paterno', 'paciente__apellido_paterno'),
+    ('Apellido Materno', 'paciente__apellido_materno'),
+    ('Edad Gestacional (sem)', 'edad_gestacional_semanas'),
+    ('Tipo de Parto', 'tipo_parto'),
+    ('Presentación', 'presentacion'),
+    ('Inicio Trabajo de Parto', 'inicio_trabajo_parto'),
+    ('Grupo Robson', 'grupo_robson'),
+    ('Registrado por', 'usuario_registro__username'),
+]
+
+COLUMNAS_RECIEN_NACIDO = [
+    ('ID Parto', 'parto_id'),
+    ('Fecha Parto', 'parto__fecha_parto'),
+    ('RUT Madre', 'parto__paciente__rut'),
+    ('Sexo', 'sexo'),
+    ('Peso (g)', 'peso_gramos'),
+    ('Talla (cm)', 'talla_cm'),
+    ('Edad Gestacional (sem)', 'parto__edad_gestacional_semanas'),
+    ('APGAR 1 min', 'apgar_1_min'),
+    ('APGAR 5 min', 'apgar_5_min'),
+    ('Reanimación', 'reanimacion_requerida'),
+    ('Destino', 'destino'),
+    ('Registrado', 'created_at'),
+]
+
+COLUMNAS_ALERTA = [
+    ('ID Alerta', 'id'),
+    ('Fecha y Hora', 'fecha_hora_alerta'),
+    ('Tipo', 'tipo'),
+    ('Nivel de Urgencia', 'nivel_urgencia'),
+    ('Estado', 'estado'),
+    ('Título', 'titulo'),
+    ('RUT Paciente', 'paciente__rut'),
+    ('ID Parto', 'parto_id'),
+    ('Generada por', 'usuario_genera__username'),
+    ('Atención', 'fecha_hora_atencion'),
+    ('Resolución', 'fecha_hora_resolucion'),
+]
+
+EXPORTACIONES = {
+    'partos_periodo': Exportacion('Partos', COLUMNAS_PARTO, _partos),
+    'neonatologia': Exportacion('Recien_Nacidos', COLUMNAS_RECIEN_NACIDO, _recien_nacidos),
+    'apgar_critico': Exportacion('APGAR_Critico', COLUMNAS_RECIEN_NACIDO, _apgar_critico),
+    'bajo_peso': Exportacion('Bajo_Peso', COLUMNAS_RECIEN_NACIDO, _bajo_peso),
+    'alertas': Exportacion('Alertas', COLUMNAS_ALERTA, _alertas),
+}
+
+
+class _Eco:
+    """Pseudo-buffer para csv.writer: retorna cada línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def filas_csv(exportacion, fecha_inicio, fecha_fin):
+    """Generador de líneas CSV (con BOM para que Excel reconozca UTF-8)."""
+    escritor = csv.writer(_Eco())
+    yield '\ufeff' + escritor.writerow(exportacion.encabezados())
+    for fila in exportacion.filas(fecha_inicio, fecha_fin):
+        yield escritor.writerow(fila)
+
+
+def xlsx_disponible():
+    return Workbook is not None
+
+
+def archivo_xlsx(exportacion, fecha_inicio, fecha_fin):
+    """Escribe el XLSX en un archivo temporal y lo retorna abierto al inicio."""
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(exportacion.nombre[:31])
+    hoja.append(exportacion.encabezados())
+    for fila in exportacion.filas(fecha_inicio, fecha_fin):
+        hoja.append(fila)
+
+    archivo = tempfile.TemporaryFile(suffix='.xlsx')
+    libro.save(archivo)
+    archivo.seek(0)
+    return archivo
@@ -0,0 +1,119 @@
+"""
+Canal de cambios de alertas activas compartido por todos los clientes.
+
+Cada proceso mantiene una única instancia de FeedAlertas con la última
+instantánea de alertas activas (top 10, total y críticas). Los clientes
+SSE esperan sobre la misma condición; solo uno de ellos consulta la BD
+por intervalo, con una consulta de firma (conteos y último id). La lista
+se recarga únicamente cuando la firma cambia, así N clientes conectados
+cuestan una consulta por intervalo y no N.
+
+Los cambios hechos en este proceso (creación de alertas y
+marcar_en_atencion / marcar_resuelta vía post_save, y las alertas
+creadas en bloque por reglas_alertas) despiertan a los clientes de
+inmediato; los hechos en otros procesos se detectan en la
+siguiente revisión de firma.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Q, Count, Max
+
+from .models import Alerta
+
+
+class FeedAlertas:
+    """Instantánea versionada de las alertas activas."""
+
+    def __init__(self):
+        self._condicion = threading.Condition()
+        self._version = 0
+        self._firma = None
+        self._instantanea = None
+        self._ultima_revision = 0.0
+        self._revisando = False
+
+    @staticmethod
+    def _consultar_firma():
+        return tuple(Alerta.objects.filter(estado='ACTIVA').aggregate(
+            total=Count('id'),
+            criticas=Count('id', filter=Q(nivel_urgencia='CRITICA')),
+            ultimo_id=Max('id'),
+        ).values())
+
+    @staticmethod
+    def _consultar_alertas():
+        return list(Alerta.objects.filter(
+            estado='ACTIVA'
+        ).values(
+            'id', 'tipo', 'nivel_urgencia', 'titulo',
+            'descripcion', 'fecha_hora_alerta'
+        ).order_by('-nivel_urgencia', '-fecha_hora_alerta')[:10])
+
+    def _revisar(self):
+        """Consulta la firma y, si cambió, recarga la instantánea."""
+        firma = self._consultar_firma()
+        if firma == self._firma and self._instantanea is not None:
+            return
+        total, criticas, _ = firma
+        instantanea = {
+            'alertas': self._consultar_alertas(),
+            'total': total,
+            'criticas': criticas,
+        }
+        with self._condicion:
+            self._firma = firma
+            self._version += 1
+            self._instantanea = {**instantanea, 'version': self._version}
+            self._condicion.notify_all()
+
+    def notificar(self):
+        """Fuerza una revisión inmediata (llamado al guardar una Alerta)."""
+        with self._condicion:
+            self._ultima_revision = 0.0
+            self._condicion.notify_all()
+
+    def actual(self):
+        """Retorna la instantánea vigente, revisando la BD si está vencida."""
+        return self.esperar(version=None, timeout=0)
+
+    def esperar(self, version, timeout):
+        """
+        Espera hasta timeout segundos a que exista una versión distinta de
+        `version` y retorna la instantánea vigente. Un único hilo por
+        proceso revisa la BD en cada intervalo; el resto solo espera.
+        """
+        limite = time.monotonic() + timeout
+        intervalo = settings.ALERTAS_FEED_INTERVALO
+        while True:
+            with self._condicion:
+                instantanea = self._instantanea
+                if instantanea is not None and instantanea['version'] != version:
+                    vencida = time.monotonic() - self._ultima_revision >= intervalo
+                    if not vencida or self._revisando:
+                        return instantanea
+                restante = limite - time.monotonic()
+                debe_revisar = (
+                    not self._revisando
+                    and time.monotonic() - self._ultima_revision >= intervalo
+                )
+                if debe_revisar:
+                    self._revisando = True
+                    self._ultima_revision = time.monotonic()
+                elif restante <= 0 and instantanea is not None:
+                    return instantanea
+                else:
+                    espera = intervalo - (time.monotonic() - self._ultima_revision)
+                    self._condicion.wait(max(0.05, min(max(restante, 0), espera)))
+                    continue
+            try:
+                self._revisar()
+            finally:
+                with self._condicion:
+                    self._revisando = False
+                    self._condicion.notify_all()
+
+
+feed = FeedAlertas()
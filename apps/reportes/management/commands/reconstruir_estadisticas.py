@@ -0,0 +1,62 @@
+"""
+Reconstruye la tabla EstadisticaDiaria para un rango de fechas.
+
+Uso:
+    python manage.py reconstruir_estadisticas
+    python manage.py reconstruir_estadisticas --desde 2024-01-01 --hasta 2024-12-31
+"""
+
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.reportes.estadisticas import reconstruir_rango, primera_fecha_con_datos
+
+
+def _parse_fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor}. Use el formato YYYY-MM-DD.')
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye las estadísticas diarias (partos, RN, alertas) para un rango de fechas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde',
+            help='Fecha inicial YYYY-MM-DD (por defecto, la primera fecha con datos)'
+        )
+        parser.add_argument(
+            '--hasta',
+            help='Fecha final YYYY-MM-DD (por defecto, hoy)'
+        )
+        parser.add_argument(
+            '--dias-por-lote',
+            type=int,
+            default=31,
+            help='Días reconstruidos por transacción (por defecto 31)'
+        )
+
+    def handle(self, *args, **options):
+        hasta = _parse_fecha(options['hasta']) if options['hasta'] else timezone.localdate()
+        desde = _parse_fecha(options['desde']) if options['desde'] else primera_fecha_con_datos()
+
+        if desde is None:
+            self.stdout.write('No hay datos clínicos registrados. Nada que reconstruir.')
+            return
+        if desde > hasta:
+            raise CommandError('La fecha --desde no puede ser mayor que --hasta.')
+
+        lote = max(options['dias_por_lote'], 1)
+        inicio = desde
+        dias_con_datos = 0
+        while inicio <= hasta:
+            fin = min(inicio + timedelta(days=lote - 1), hasta)
+            dias_con_datos += reconstruir_rango(inicio, fin)
+            inicio = fin + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Estadísticas reconstruidas del {desde} al {hasta}: {dias_con_datos} días con datos.'
+        ))
@@ -0,0 +1,57 @@
+"""
+Aplica las reglas de alertas (reglas_alertas) a los datos históricos.
+
+Crea las alertas que las reglas habrían generado y que no existen con la
+misma clave, en cualquier estado. Útil tras agregar una regla o cargar
+datos sin pasar por las vistas de registro.
+
+Uso:
+    python manage.py reproducir_alertas --simular
+    python manage.py reproducir_alertas --desde 2024-01-01 --hasta 2024-12-31
+    python manage.py reproducir_alertas --modelo examenprenatal protocolovih
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.reportes.reglas_alertas import ENTIDADES, reproducir
+
+
+def _parse_fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor}. Use el formato YYYY-MM-DD.')
+
+
+class Command(BaseCommand):
+    help = 'Evalúa las reglas de alertas sobre el historial por lotes y crea las alertas faltantes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha clínica inicial YYYY-MM-DD')
+        parser.add_argument('--hasta', help='Fecha clínica final YYYY-MM-DD')
+        parser.add_argument(
+            '--modelo', nargs='+', choices=[modelo._meta.model_name for modelo in ENTIDADES],
+            help='Evalúa solo las reglas de estos modelos'
+        )
+        parser.add_argument(
+            '--lote', type=int, default=500, help='Entidades evaluadas por lote (por defecto 500)'
+        )
+        parser.add_argument('--simular', action='store_true', help='Informa las alertas sin crearlas')
+
+    def handle(self, *args, **options):
+        desde = _parse_fecha(options['desde']) if options['desde'] else None
+        hasta = _parse_fecha(options['hasta']) if options['hasta'] else None
+        if desde and hasta and desde > hasta:
+            raise CommandError('La fecha --desde no puede ser mayor que --hasta.')
+
+        creadas = reproducir(
+            desde=desde, hasta=hasta, modelos=options['modelo'],
+            tamano_lote=max(options['lote'], 1), simular=options['simular'],
+        )
+
+        for tipo, cantidad in sorted(creadas.items()):
+            self.stdout.write(f'  {tipo}: {cantidad}')
+        verbo = 'se crearían' if options['simular'] else 'creadas'
+        self.stdout.write(self.style.SUCCESS(f'{sum(creadas.values())} alertas {verbo}.'))
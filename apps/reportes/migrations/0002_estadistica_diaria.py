@@ -0,0 +1,53 @@
+# Generated by Django 4.2 on 2026-10-18 13:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True, verbose_name='Fecha')),
+                ('partos_total', models.IntegerField(default=0)),
+                ('partos_por_tipo', models.JSONField(default=dict, help_text='Conteo por Parto.tipo_parto: {"cesarea_electiva": n, ...}')),
+                ('partos_por_robson', models.JSONField(default=dict, help_text='Conteo por grupo Robson: {"1": n, ...}')),
+                ('cesareas_por_robson', models.JSONField(default=dict, help_text='Conteo de cesáreas por grupo Robson')),
+                ('rn_total', models.IntegerField(default=0)),
+                ('rn_muy_bajo_peso', models.IntegerField(default=0, help_text='< 1500g')),
+                ('rn_bajo_peso', models.IntegerField(default=0, help_text='1500-2499g')),
+                ('rn_peso_normal', models.IntegerField(default=0, help_text='2500-3999g')),
+                ('rn_macrosomico', models.IntegerField(default=0, help_text='>= 4000g')),
+                ('rn_apgar_1_critico', models.IntegerField(default=0, help_text='APGAR 1 min 0-3')),
+                ('rn_apgar_1_moderado', models.IntegerField(default=0, help_text='APGAR 1 min 4-6')),
+                ('rn_apgar_1_normal', models.IntegerField(default=0, help_text='APGAR 1 min 7-10')),
+                ('rn_apgar_5_critico', models.IntegerField(default=0, help_text='APGAR 5 min 0-3')),
+                ('rn_apgar_5_moderado', models.IntegerField(default=0, help_text='APGAR 5 min 4-6')),
+                ('rn_apgar_5_normal', models.IntegerField(default=0, help_text='APGAR 5 min 7-10')),
+                ('rn_reanimacion', models.IntegerField(default=0)),
+                ('rn_peso_suma', models.BigIntegerField(default=0)),
+                ('rn_apgar_1_suma', models.IntegerField(default=0)),
+                ('rn_apgar_5_suma', models.IntegerField(default=0)),
+                ('alertas_total', models.IntegerField(default=0)),
+                ('alertas_por_tipo', models.JSONField(default=dict, help_text='Conteo por tipo de alerta: {"APGAR_CRITICO": n, ...}')),
+                ('alertas_por_nivel', models.JSONField(default=dict, help_text='Conteo por nivel de urgencia: {"CRITICA": n, ...}')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha Actualización')),
+            ],
+            options={
+                'verbose_name': 'Estadística Diaria',
+                'verbose_name_plural': 'Estadísticas Diarias',
+                'db_table': 'estadistica_diaria',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='alerta',
+            index=models.Index(fields=['fecha_hora_alerta'], name='idx_alerta_fecha'),
+        ),
+    ]
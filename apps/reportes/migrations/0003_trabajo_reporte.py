@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-18 13:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reportes', '0002_estadistica_diaria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoReporte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=30, verbose_name='Tipo de Reporte')),
+                ('fecha_inicio', models.DateField(verbose_name='Fecha Inicio')),
+                ('fecha_fin', models.DateField(verbose_name='Fecha Fin')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('PROCESANDO', 'Procesando'), ('COMPLETADO', 'Completado'), ('ERROR', 'Error')], default='PENDIENTE', max_length=15, verbose_name='Estado')),
+                ('archivo', models.CharField(blank=True, max_length=255, verbose_name='Archivo')),
+                ('nombre_descarga', models.CharField(blank=True, max_length=150, verbose_name='Nombre de Descarga')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha Solicitud')),
+                ('fecha_hora_inicio_proceso', models.DateTimeField(blank=True, null=True, verbose_name='Inicio de Proceso')),
+                ('fecha_hora_fin_proceso', models.DateTimeField(blank=True, null=True, verbose_name='Fin de Proceso')),
+                ('usuario_solicita', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos_reporte', to=settings.AUTH_USER_MODEL, verbose_name='Usuario que solicita')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Reporte',
+                'verbose_name_plural': 'Trabajos de Reporte',
+                'db_table': 'trabajo_reporte',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trabajoreporte',
+            index=models.Index(fields=['tipo', 'fecha_inicio', 'fecha_fin', '-created_at'], name='idx_trabajo_reporte_params'),
+        ),
+    ]
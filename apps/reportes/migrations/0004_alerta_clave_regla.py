@@ -0,0 +1,42 @@
+# Generated by Django 4.2 on 2026-10-18 15:10
+
+from django.db import migrations, models
+from django.db.models.functions import Cast, Concat
+
+
+def asignar_clave_regla(apps, schema_editor):
+    # Alertas de RN creadas antes del registro de reglas, para que no se dupliquen
+    Alerta = apps.get_model('reportes', 'Alerta')
+    alertas = Alerta.objects.using(schema_editor.connection.alias)
+    for tipo in ('APGAR_CRITICO', 'BAJO_PESO', 'REANIMACION'):
+        alertas.filter(tipo=tipo, recien_nacido__isnull=False, clave_regla='').update(
+            clave_regla=Concat(
+                models.Value(f'{tipo}:reciennacido:'), Cast('recien_nacido_id', models.CharField()),
+                output_field=models.CharField(),
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0003_trabajo_reporte'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alerta',
+            name='clave_regla',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100, verbose_name='Clave de Regla'),
+        ),
+        migrations.AlterField(
+            model_name='alerta',
+            name='tipo',
+            field=models.CharField(choices=[('APGAR_CRITICO', 'APGAR Crítico (< 7)'), ('BAJO_PESO', 'Recién Nacido Bajo Peso (< 2500g)'), ('REANIMACION', 'Reanimación Requerida'), ('HEMORRAGIA', 'Hemorragia Materna'), ('PREECLAMPSIA', 'Pre-eclampsia/Eclampsia'), ('SUFRIMIENTO_FETAL', 'Sufrimiento Fetal'), ('CESAREA_EMERGENCIA', 'Cesárea de Emergencia'), ('UCI_NEONATAL', 'Derivación UCI Neonatal'), ('COMPLICACION_MADRE', 'Complicación Materna Grave'), ('COMPLICACION_RN', 'Complicación RN Grave'), ('EXAMEN_CRITICO', 'Examen Prenatal Crítico'), ('PROTOCOLO_VIH', 'Protocolo VIH Activado')], max_length=30, verbose_name='Tipo de Alerta'),
+        ),
+        migrations.RunPython(asignar_clave_regla, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='alerta',
+            index=models.Index(fields=['clave_regla', 'estado'], name='idx_alerta_clave_regla'),
+        ),
+    ]
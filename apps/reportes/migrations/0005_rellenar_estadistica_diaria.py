@@ -0,0 +1,87 @@
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+# Copia congelada de estadisticas._calcular_rango sobre toda la historia
+TIPOS_CESAREA = ('cesarea_electiva', 'cesarea_urgencia')
+
+
+def _sumar_en(diccionario, clave, valor):
+    clave = str(clave)
+    diccionario[clave] = diccionario.get(clave, 0) + valor
+
+
+def rellenar_estadistica_diaria(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    Parto = apps.get_model('obstetricia', 'Parto')
+    RecienNacido = apps.get_model('neonatologia', 'RecienNacido')
+    Alerta = apps.get_model('reportes', 'Alerta')
+    EstadisticaDiaria = apps.get_model('reportes', 'EstadisticaDiaria')
+
+    dias = {}
+
+    def dia(fecha):
+        if fecha not in dias:
+            dias[fecha] = EstadisticaDiaria(fecha=fecha)
+        return dias[fecha]
+
+    partos = Parto.objects.using(alias).order_by().values(
+        'fecha_parto', 'tipo_parto', 'grupo_robson'
+    ).annotate(total=Count('id'))
+    for fila in partos:
+        estadistica = dia(fila['fecha_parto'])
+        estadistica.partos_total += fila['total']
+        _sumar_en(estadistica.partos_por_tipo, fila['tipo_parto'], fila['total'])
+        _sumar_en(estadistica.partos_por_robson, fila['grupo_robson'], fila['total'])
+        if fila['tipo_parto'] in TIPOS_CESAREA:
+            _sumar_en(estadistica.cesareas_por_robson, fila['grupo_robson'], fila['total'])
+
+    recien_nacidos = RecienNacido.objects.using(alias).annotate(
+        dia=TruncDate('created_at')
+    ).order_by().values('dia').annotate(
+        total=Count('pk'),
+        muy_bajo_peso=Count('pk', filter=Q(peso_gramos__lt=1500)),
+        bajo_peso=Count('pk', filter=Q(peso_gramos__gte=1500, peso_gramos__lt=2500)),
+        peso_normal=Count('pk', filter=Q(peso_gramos__gte=2500, peso_gramos__lt=4000)),
+        macrosomico=Count('pk', filter=Q(peso_gramos__gte=4000)),
+        apgar_1_critico=Count('pk', filter=Q(apgar_1_min__lte=3)),
+        apgar_1_moderado=Count('pk', filter=Q(apgar_1_min__gte=4, apgar_1_min__lte=6)),
+        apgar_1_normal=Count('pk', filter=Q(apgar_1_min__gte=7)),
+        apgar_5_critico=Count('pk', filter=Q(apgar_5_min__lte=3)),
+        apgar_5_moderado=Count('pk', filter=Q(apgar_5_min__gte=4, apgar_5_min__lte=6)),
+        apgar_5_normal=Count('pk', filter=Q(apgar_5_min__gte=7)),
+        reanimacion=Count('pk', filter=Q(reanimacion_requerida=True)),
+        peso_suma=Sum('peso_gramos'),
+        apgar_1_suma=Sum('apgar_1_min'),
+        apgar_5_suma=Sum('apgar_5_min'),
+    )
+    for fila in recien_nacidos:
+        estadistica = dia(fila.pop('dia'))
+        for campo, valor in fila.items():
+            setattr(estadistica, f'rn_{campo}', valor or 0)
+
+    alertas = Alerta.objects.using(alias).annotate(
+        dia=TruncDate('fecha_hora_alerta')
+    ).order_by().values('dia', 'tipo', 'nivel_urgencia').annotate(total=Count('id'))
+    for fila in alertas:
+        estadistica = dia(fila['dia'])
+        estadistica.alertas_total += fila['total']
+        _sumar_en(estadistica.alertas_por_tipo, fila['tipo'], fila['total'])
+        _sumar_en(estadistica.alertas_por_nivel, fila['nivel_urgencia'], fila['total'])
+
+    EstadisticaDiaria.objects.using(alias).all().delete()
+    EstadisticaDiaria.objects.using(alias).bulk_create(dias.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0004_alerta_clave_regla'),
+        ('obstetricia', '0003_examenprenatal_es_critico'),
+        ('neonatologia', '0003_reciennacido_idx_rn_created'),
+    ]
+
+    operations = [
+        migrations.RunPython(rellenar_estadistica_diaria, migrations.RunPython.noop),
+    ]
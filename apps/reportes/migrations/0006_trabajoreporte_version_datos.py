@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0005_rellenar_estadistica_diaria'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajoreporte',
+            name='version_datos',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Versión de Datos'),
+        ),
+    ]
@@ -9,6 +9,7 @@ from apps.neonatologia.models import RecienNacido
 from apps.obstetricia.models import Parto
 from apps.pacientes.models import PacienteMadre
 from apps.administracion.models import Usuario
+from apps.administracion.fechas import RangoFechasQuerySet
 
 
 class Alerta(models.Model):
@@ -27,6 +28,8 @@ class Alerta(models.Model):
         ('UCI_NEONATAL', 'Derivación UCI Neonatal'),
         ('COMPLICACION_MADRE', 'Complicación Materna Grave'),
         ('COMPLICACION_RN', 'Complicación RN Grave'),
+        ('EXAMEN_CRITICO', 'Examen Prenatal Crítico'),
+        ('PROTOCOLO_VIH', 'Protocolo VIH Activado'),
     ]
     
     NIVEL_URGENCIA_CHOICES = [
@@ -98,10 +101,16 @@ class Alerta(models.Model):
     fecha_hora_atencion = models.DateTimeField('Fecha y Hora de Atención', null=True, blank=True)
     fecha_hora_resolucion = models.DateTimeField('Fecha y Hora de Resolución', null=True, blank=True)
     
+    # Regla que generó la alerta, "<tipo>:<modelo>:<id>" (ver reglas_alertas)
+    clave_regla = models.CharField('Clave de Regla', max_length=100, blank=True, default='', editable=False)
+    
     # Auditoría
     created_at = models.DateTimeField('Fecha Creación', auto_now_add=True)
     updated_at = models.DateTimeField('Fecha Actualización', auto_now=True)
     
+    # Filtros por rango de fechas locales (ver apps.administracion.fechas)
+    objects = RangoFechasQuerySet.as_manager()
+    
     class Meta:
         db_table = 'alertas'
         verbose_name = 'Alerta'
@@ -111,6 +120,8 @@ class Alerta(models.Model):
             models.Index(fields=['estado', '-fecha_hora_alerta']),
             models.Index(fields=['nivel_urgencia', 'estado']),
             models.Index(fields=['tipo', 'estado']),
+            models.Index(fields=['fecha_hora_alerta'], name='idx_alerta_fecha'),
+            models.Index(fields=['clave_regla', 'estado'], name='idx_alerta_clave_regla'),
         ]
     
     def __str__(self):
@@ -154,51 +165,159 @@ class Alerta(models.Model):
             self.observaciones = observaciones
         self.save()
     
+    @staticmethod
+    def _crear_por_regla(nombre, objeto, usuario):
+        from .reglas_alertas import evaluar
+        alertas = evaluar(objeto, usuario=usuario, solo={nombre})
+        return alertas[0] if alertas else None
+    
+    # Atajos a una sola regla de reglas_alertas; para evaluar todas las
+    # reglas de un RN de una vez usar reglas_alertas.evaluar(rn, usuario).
+    
     @classmethod
     def crear_alerta_apgar_critico(cls, recien_nacido, usuario):
-        """Crea una alerta automática por APGAR crítico"""
-        if recien_nacido.apgar_5_min and recien_nacido.apgar_5_min < 7:
-            return cls.objects.create(
-                tipo='APGAR_CRITICO',
-                nivel_urgencia='CRITICA',
-                titulo=f'APGAR Crítico: {recien_nacido.apgar_5_min} puntos',
-                descripcion=f'Recién nacido con APGAR a los 5 minutos de {recien_nacido.apgar_5_min} puntos. Requiere atención inmediata.',
-                recien_nacido=recien_nacido,
-                parto=recien_nacido.parto,
-                paciente=recien_nacido.parto.paciente,
-                usuario_genera=usuario,
-            )
-        return None
+        """Crea una alerta automática por APGAR crítico (si no hay una abierta)"""
+        return cls._crear_por_regla('apgar_critico', recien_nacido, usuario)
     
     @classmethod
     def crear_alerta_bajo_peso(cls, recien_nacido, usuario):
-        """Crea una alerta por bajo peso al nacer"""
-        if recien_nacido.peso_gramos and recien_nacido.peso_gramos < 2500:
-            nivel = 'CRITICA' if recien_nacido.peso_gramos < 1500 else 'ALTA'
-            return cls.objects.create(
-                tipo='BAJO_PESO',
-                nivel_urgencia=nivel,
-                titulo=f'Bajo Peso al Nacer: {recien_nacido.peso_gramos}g',
-                descripcion=f'Recién nacido con peso de {recien_nacido.peso_gramos}g. Requiere seguimiento especial.',
-                recien_nacido=recien_nacido,
-                parto=recien_nacido.parto,
-                paciente=recien_nacido.parto.paciente,
-                usuario_genera=usuario,
-            )
-        return None
+        """Crea una alerta por bajo peso al nacer (si no hay una abierta)"""
+        return cls._crear_por_regla('bajo_peso', recien_nacido, usuario)
     
     @classmethod
     def crear_alerta_reanimacion(cls, recien_nacido, usuario):
-        """Crea una alerta por reanimación requerida"""
-        if recien_nacido.reanimacion_requerida:
-            return cls.objects.create(
-                tipo='REANIMACION',
-                nivel_urgencia='CRITICA',
-                titulo='Reanimación Neonatal Requerida',
-                descripcion='Recién nacido requirió maniobras de reanimación.',
-                recien_nacido=recien_nacido,
-                parto=recien_nacido.parto,
-                paciente=recien_nacido.parto.paciente,
-                usuario_genera=usuario,
-            )
-        return None
+        """Crea una alerta por reanimación requerida (si no hay una abierta)"""
+        return cls._crear_por_regla('reanimacion', recien_nacido, usuario)
+
+
+class EstadisticaDiaria(models.Model):
+    """
+    Tabla de resumen (rollup) con los contadores diarios de partos,
+    recién nacidos y alertas. Se mantiene actualizada desde las señales
+    de guardado (ver signals.py) y se reconstruye por rango con el comando
+    `reconstruir_estadisticas`. Los reportes por rango leen a lo más
+    una fila por día en lugar de recorrer las tablas clínicas.
+    """
+    
+    fecha = models.DateField('Fecha', unique=True)
+    
+    # Partos (por fecha_parto)
+    partos_total = models.IntegerField(default=0)
+    partos_por_tipo = models.JSONField(
+        default=dict,
+        help_text='Conteo por Parto.tipo_parto: {"cesarea_electiva": n, ...}'
+    )
+    partos_por_robson = models.JSONField(
+        default=dict,
+        help_text='Conteo por grupo Robson: {"1": n, ...}'
+    )
+    cesareas_por_robson = models.JSONField(
+        default=dict,
+        help_text='Conteo de cesáreas por grupo Robson'
+    )
+    
+    # Recién nacidos (por fecha de registro)
+    rn_total = models.IntegerField(default=0)
+    rn_muy_bajo_peso = models.IntegerField(default=0, help_text='< 1500g')
+    rn_bajo_peso = models.IntegerField(default=0, help_text='1500-2499g')
+    rn_peso_normal = models.IntegerField(default=0, help_text='2500-3999g')
+    rn_macrosomico = models.IntegerField(default=0, help_text='>= 4000g')
+    rn_apgar_1_critico = models.IntegerField(default=0, help_text='APGAR 1 min 0-3')
+    rn_apgar_1_moderado = models.IntegerField(default=0, help_text='APGAR 1 min 4-6')
+    rn_apgar_1_normal = models.IntegerField(default=0, help_text='APGAR 1 min 7-10')
+    rn_apgar_5_critico = models.IntegerField(default=0, help_text='APGAR 5 min 0-3')
+    rn_apgar_5_moderado = models.IntegerField(default=0, help_text='APGAR 5 min 4-6')
+    rn_apgar_5_normal = models.IntegerField(default=0, help_text='APGAR 5 min 7-10')
+    rn_reanimacion = models.IntegerField(default=0)
+    
+    # Sumas para calcular promedios sobre cualquier rango
+    rn_peso_suma = models.BigIntegerField(default=0)
+    rn_apgar_1_suma = models.IntegerField(default=0)
+    rn_apgar_5_suma = models.IntegerField(default=0)
+    
+    # Alertas (por fecha_hora_alerta)
+    alertas_total = models.IntegerField(default=0)
+    alertas_por_tipo = models.JSONField(
+        default=dict,
+        help_text='Conteo por tipo de alerta: {"APGAR_CRITICO": n, ...}'
+    )
+    alertas_por_nivel = models.JSONField(
+        default=dict,
+        help_text='Conteo por nivel de urgencia: {"CRITICA": n, ...}'
+    )
+    
+    updated_at = models.DateTimeField('Fecha Actualización', auto_now=True)
+    
+    class Meta:
+        db_table = 'estadistica_diaria'
+        verbose_name = 'Estadística Diaria'
+        verbose_name_plural = 'Estadísticas Diarias'
+        ordering = ['-fecha']
+    
+    def __str__(self):
+        return f"Estadística {self.fecha}: {self.partos_total} partos, {self.rn_total} RN, {self.alertas_total} alertas"
+
+
+class TrabajoReporte(models.Model):
+    """
+    Trabajo de generación de un reporte PDF en segundo plano.
+    La solicitud crea el trabajo y retorna de inmediato; un pool local de
+    procesos genera el PDF en disco (ver cola_pdf.py). Solicitudes con el
+    mismo (tipo, fecha_inicio, fecha_fin) reutilizan el archivo generado
+    mientras los datos del período no cambien.
+    """
+    
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('PROCESANDO', 'Procesando'),
+        ('COMPLETADO', 'Completado'),
+        ('ERROR', 'Error'),
+    ]
+    
+    tipo = models.CharField('Tipo de Reporte', max_length=30)
+    fecha_inicio = models.DateField('Fecha Inicio')
+    fecha_fin = models.DateField('Fecha Fin')
+    estado = models.CharField('Estado', max_length=15, choices=ESTADO_CHOICES, default='PENDIENTE')
+    
+    # Archivo generado (ruta relativa a REPORTES_PDF_DIR)
+    archivo = models.CharField('Archivo', max_length=255, blank=True)
+    nombre_descarga = models.CharField('Nombre de Descarga', max_length=150, blank=True)
+    error = models.TextField('Error', blank=True)
+    # Huella de los datos del período al generar el PDF (ver cola_pdf.version_datos)
+    version_datos = models.CharField('Versión de Datos', max_length=64, blank=True)
+    
+    usuario_solicita = models.ForeignKey(
+        Usuario,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='trabajos_reporte',
+        verbose_name='Usuario que solicita'
+    )
+    
+    # Tiempos
+    created_at = models.DateTimeField('Fecha Solicitud', auto_now_add=True)
+    fecha_hora_inicio_proceso = models.DateTimeField('Inicio de Proceso', null=True, blank=True)
+    fecha_hora_fin_proceso = models.DateTimeField('Fin de Proceso', null=True, blank=True)
+    
+    class Meta:
+        db_table = 'trabajo_reporte'
+        verbose_name = 'Trabajo de Reporte'
+        verbose_name_plural = 'Trabajos de Reporte'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['tipo', 'fecha_inicio', 'fecha_fin', '-created_at'],
+                name='idx_trabajo_reporte_params'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Reporte {self.tipo} {self.fecha_inicio} - {self.fecha_fin} ({self.get_estado_display()})"
+    
+    @property
+    def en_proceso(self):
+        return self.estado in ['PENDIENTE', 'PROCESANDO']
+    
+    @property
+    def completado(self):
+        return self.estado == 'COMPLETADO'
@@ -0,0 +1,286 @@
+"""
+Reglas declarativas de alertas clínicas.
+
+Cada Regla indica sobre qué modelo se evalúa, la condición que la dispara
+y cómo se arma la alerta (tipo, nivel, título y descripción). evaluar()
+recorre una sola vez las reglas de cada entidad guardada, descarta las
+alertas que ya están abiertas (ACTIVA o EN_ATENCION) con la misma clave y
+crea el resto con un único bulk_create.
+
+La clave (Alerta.clave_regla) identifica qué disparó la alerta:
+"<tipo>:<modelo>:<id>". Las reglas que describen el mismo hecho comparten
+clave; por ejemplo, el APGAR crítico del RN y el de su APGARDetalle usan
+la del recién nacido, de modo que no se duplican.
+
+Los ids de recién nacido, parto y paciente se obtienen una vez por entidad
+(ver ENTIDADES), no una vez por regla. bulk_create no dispara post_save:
+evaluar() suma las nuevas a EstadisticaDiaria y notifica al canal de alertas.
+
+reproducir() aplica las reglas al historial por lotes (comando
+reproducir_alertas); ahí se descartan también las claves de alertas ya
+resueltas o descartadas, para no reabrir hechos antiguos.
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.db import models, transaction
+
+from apps.neonatologia.models import APGARDetalle, RecienNacido
+from apps.obstetricia.models import ComplicacionMaterna, ExamenPrenatal, ProtocoloVIH
+from .estadisticas import sumar_creadas
+from .feed_alertas import feed
+from .models import Alerta
+
+
+ESTADOS_ABIERTOS = ('ACTIVA', 'EN_ATENCION')
+
+
+@dataclass(frozen=True)
+class Entidad:
+    """Cómo ubicar una entidad en la historia clínica."""
+    relaciones: tuple  # select_related necesario para ids()
+    campo_fecha: str  # fecha clínica, para reproducir por rango
+    ids: Callable  # objeto -> (recien_nacido_id, parto_id, paciente_id)
+    usuario_id: Callable = lambda objeto: None
+
+
+ENTIDADES = {
+    RecienNacido: Entidad(
+        relaciones=('parto',),
+        campo_fecha='parto__fecha_parto',
+        ids=lambda rn: (rn.pk, rn.parto_id, rn.parto.paciente_id),
+    ),
+    APGARDetalle: Entidad(
+        relaciones=('recien_nacido__parto',),
+        campo_fecha='recien_nacido__parto__fecha_parto',
+        ids=lambda detalle: (
+            detalle.recien_nacido_id, detalle.recien_nacido.parto_id, detalle.recien_nacido.parto.paciente_id,
+        ),
+        usuario_id=lambda detalle: detalle.usuario_evaluador_id,
+    ),
+    ExamenPrenatal: Entidad(
+        relaciones=('control_prenatal',),
+        campo_fecha='fecha_examen',
+        ids=lambda examen: (None, None, examen.control_prenatal.paciente_id),
+    ),
+    ComplicacionMaterna: Entidad(
+        relaciones=('parto',),
+        campo_fecha='parto__fecha_parto',
+        ids=lambda complicacion: (None, complicacion.parto_id, complicacion.parto.paciente_id),
+        usuario_id=lambda complicacion: complicacion.usuario_registro_id,
+    ),
+    ProtocoloVIH: Entidad(
+        relaciones=('parto',),
+        campo_fecha='parto__fecha_parto',
+        ids=lambda protocolo: (None, protocolo.parto_id, protocolo.parto.paciente_id),
+    ),
+}
+
+
+@dataclass(frozen=True)
+class Regla:
+    nombre: str
+    modelo: type
+    tipo: str  # Alerta.tipo
+    condicion: Callable
+    nivel: object  # nivel_urgencia, o función objeto -> nivel_urgencia
+    titulo: Callable
+    descripcion: Callable
+    # Objeto sobre el que se deduplica: objeto -> (modelo, id). Por defecto, el mismo.
+    sobre: Optional[Callable] = None
+
+    def nivel_de(self, objeto):
+        return self.nivel(objeto) if callable(self.nivel) else self.nivel
+
+    def clave(self, objeto):
+        modelo, pk = self.sobre(objeto) if self.sobre else (self.modelo._meta.model_name, objeto.pk)
+        return f'{self.tipo}:{modelo}:{pk}'
+
+
+def _grave(complicacion):
+    return complicacion.severidad in ('grave', 'critica')
+
+
+REGLAS = [
+    # Recién nacido
+    Regla(
+        'apgar_critico', RecienNacido, 'APGAR_CRITICO',
+        condicion=lambda rn: rn.apgar_5_min is not None and rn.apgar_5_min < 7,
+        nivel='CRITICA',
+        titulo=lambda rn: f'APGAR Crítico: {rn.apgar_5_min} puntos',
+        descripcion=lambda rn: (
+            f'Recién nacido con APGAR a los 5 minutos de {rn.apgar_5_min} puntos. Requiere atención inmediata.'
+        ),
+    ),
+    Regla(
+        'bajo_peso', RecienNacido, 'BAJO_PESO',
+        condicion=lambda rn: bool(rn.peso_gramos) and rn.peso_gramos < 2500,
+        nivel=lambda rn: 'CRITICA' if rn.peso_gramos < 1500 else 'ALTA',
+        titulo=lambda rn: f'Bajo Peso al Nacer: {rn.peso_gramos}g',
+        descripcion=lambda rn: f'Recién nacido con peso de {rn.peso_gramos}g. Requiere seguimiento especial.',
+    ),
+    Regla(
+        'reanimacion', RecienNacido, 'REANIMACION',
+        condicion=lambda rn: rn.reanimacion_requerida,
+        nivel='CRITICA',
+        titulo=lambda rn: 'Reanimación Neonatal Requerida',
+        descripcion=lambda rn: 'Recién nacido requirió maniobras de reanimación.',
+    ),
+    # APGAR detallado: misma clave que la regla del RN
+    Regla(
+        'apgar_detalle_critico', APGARDetalle, 'APGAR_CRITICO',
+        condicion=lambda detalle: detalle.requiere_alerta,
+        nivel='CRITICA',
+        titulo=lambda detalle: f'APGAR Crítico: {detalle.total} puntos (minuto {detalle.minuto})',
+        descripcion=lambda detalle: (
+            f'Evaluación APGAR detallada de {detalle.total} puntos al minuto {detalle.minuto}. '
+            f'Requiere atención inmediata.'
+        ),
+        sobre=lambda detalle: ('reciennacido', detalle.recien_nacido_id),
+    ),
+    # Exámenes prenatales
+    Regla(
+        'examen_critico', ExamenPrenatal, 'EXAMEN_CRITICO',
+        condicion=lambda examen: examen.es_critico,
+        nivel=lambda examen: 'CRITICA' if examen.tipo_examen == 'vih' else 'ALTA',
+        titulo=lambda examen: f'Examen Crítico: {examen.get_tipo_examen_display()} {examen.get_resultado_display()}',
+        descripcion=lambda examen: (
+            f'Examen prenatal {examen.get_tipo_examen_display()} con resultado '
+            f'{examen.get_resultado_display()}. Requiere protocolo especial.'
+        ),
+    ),
+    # Complicaciones maternas
+    Regla(
+        'hemorragia_postparto', ComplicacionMaterna, 'HEMORRAGIA',
+        condicion=lambda complicacion: complicacion.tipo == 'hemorragia',
+        nivel=lambda complicacion: (
+            'CRITICA' if _grave(complicacion) or complicacion.requirio_transfusion else 'ALTA'
+        ),
+        titulo=lambda complicacion: f'Hemorragia Postparto ({complicacion.get_severidad_display()})',
+        descripcion=lambda complicacion: (
+            f'{complicacion.codigo_cie10} {complicacion.descripcion_cie10}. Requiere atención inmediata.'
+        ),
+    ),
+    Regla(
+        'complicacion_materna_grave', ComplicacionMaterna, 'COMPLICACION_MADRE',
+        condicion=lambda complicacion: complicacion.tipo != 'hemorragia' and _grave(complicacion),
+        nivel='CRITICA',
+        titulo=lambda complicacion: f'Complicación Materna: {complicacion.get_tipo_display()}',
+        descripcion=lambda complicacion: (
+            f'{complicacion.codigo_cie10} {complicacion.descripcion_cie10} '
+            f'({complicacion.get_severidad_display()}).'
+        ),
+    ),
+    # Protocolo VIH
+    Regla(
+        'protocolo_vih_activado', ProtocoloVIH, 'PROTOCOLO_VIH',
+        condicion=lambda protocolo: protocolo.activado,
+        nivel='CRITICA',
+        titulo=lambda protocolo: 'Protocolo VIH Perinatal Activado',
+        descripcion=lambda protocolo: (
+            'Se activó el protocolo VIH: ARV, cesárea electiva y suspensión de lactancia. '
+            'Notificar a infectología y neonatología.'
+        ),
+    ),
+]
+
+
+def registrar(regla):
+    """Agrega una regla al registro (el modelo debe estar en ENTIDADES)."""
+    if regla.modelo not in ENTIDADES:
+        raise ValueError(f'{regla.modelo.__name__} no tiene una Entidad registrada.')
+    REGLAS.append(regla)
+
+
+def reglas_de(modelo, solo=None):
+    return [
+        regla for regla in REGLAS
+        if regla.modelo is modelo and (solo is None or regla.nombre in solo)
+    ]
+
+
+def evaluar(objetos, usuario=None, solo=None, contra_todas=False, simular=False):
+    """
+    Evalúa las reglas de uno o varios objetos guardados y crea las alertas
+    disparadas que no estén ya abiertas. `solo` limita las reglas por
+    nombre; con contra_todas=True también se descartan las claves de
+    alertas cerradas. Retorna las alertas nuevas (sin guardar si simular).
+    Consultas: alertas existentes, bulk_create y la fila de estadística
+    de cada día (lectura con bloqueo y escritura), más las de ids() si
+    las relaciones no vienen cargadas.
+    """
+    if isinstance(objetos, models.Model):
+        objetos = [objetos]
+
+    candidatas = {}
+    for objeto in objetos:
+        entidad = ENTIDADES[type(objeto)]
+        ids = None
+        for regla in reglas_de(type(objeto), solo):
+            if not regla.condicion(objeto):
+                continue
+            clave = regla.clave(objeto)
+            if clave in candidatas:
+                continue
+            if ids is None:
+                ids = entidad.ids(objeto)
+            recien_nacido_id, parto_id, paciente_id = ids
+            candidatas[clave] = Alerta(
+                tipo=regla.tipo,
+                nivel_urgencia=regla.nivel_de(objeto),
+                titulo=regla.titulo(objeto),
+                descripcion=regla.descripcion(objeto),
+                recien_nacido_id=recien_nacido_id,
+                parto_id=parto_id,
+                paciente_id=paciente_id,
+                usuario_genera_id=usuario.pk if usuario is not None else entidad.usuario_id(objeto),
+                clave_regla=clave,
+            )
+    if not candidatas:
+        return []
+
+    existentes = Alerta.objects.filter(clave_regla__in=list(candidatas))
+    if not contra_todas:
+        existentes = existentes.filter(estado__in=ESTADOS_ABIERTOS)
+    for clave in existentes.values_list('clave_regla', flat=True):
+        candidatas.pop(clave, None)
+
+    nuevas = list(candidatas.values())
+    if simular or not nuevas:
+        return nuevas
+
+    Alerta.objects.bulk_create(nuevas)
+    sumar_creadas(nuevas)
+    transaction.on_commit(feed.notificar)
+    return nuevas
+
+
+def reproducir(desde=None, hasta=None, modelos=None, tamano_lote=500, simular=False):
+    """
+    Aplica las reglas a las entidades con fecha clínica en [desde, hasta]
+    (sin límite si se omiten), por lotes en orden de id. `modelos` limita
+    por model_name. Retorna un Counter de alertas creadas por tipo.
+    """
+    creadas = Counter()
+    for modelo, entidad in ENTIDADES.items():
+        if modelos and modelo._meta.model_name not in modelos:
+            continue
+        if not reglas_de(modelo):
+            continue
+        consulta = modelo.objects.select_related(*entidad.relaciones)
+        if desde is not None:
+            consulta = consulta.filter(**{f'{entidad.campo_fecha}__gte': desde})
+        if hasta is not None:
+            consulta = consulta.filter(**{f'{entidad.campo_fecha}__lte': hasta})
+
+        ultimo_id = 0
+        while True:
+            lote = list(consulta.filter(pk__gt=ultimo_id).order_by('pk')[:tamano_lote])
+            if not lote:
+                break
+            ultimo_id = lote[-1].pk
+            with transaction.atomic():
+                creadas.update(alerta.tipo for alerta in evaluar(lote, contra_todas=True, simular=simular))
+    return creadas
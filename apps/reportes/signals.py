@@ -0,0 +1,76 @@
+"""
+Señales que mantienen actualizada la tabla EstadisticaDiaria.
+
+Cada vez que se guarda o elimina un Parto, RecienNacido o Alerta se
+descuenta su aporte anterior y se suma el nuevo en la fila del día
+(estadisticas.aplicar_cambio); los valores anteriores se recuerdan en
+post_init. Las cargas masivas (bulk_create, bulk_update) no disparan
+señales: después de ellas se debe ejecutar
+`python manage.py reconstruir_estadisticas` sobre el rango cargado.
+
+Además, cada cambio de una Alerta despierta al canal de alertas activas
+(feed_alertas) una vez confirmada la transacción, y al guardar un
+APGARDetalle, ExamenPrenatal, ComplicacionMaterna o ProtocoloVIH se
+evalúan sus reglas de alerta (reglas_alertas). Las del RecienNacido las
+evalúa registrar_recien_nacido, que conoce al usuario.
+"""
+
+from django.db.models.signals import post_init, post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+
+from apps.obstetricia.models import ComplicacionMaterna, ExamenPrenatal, Parto, ProtocoloVIH
+from apps.neonatologia.models import APGARDetalle, RecienNacido
+from .models import Alerta
+from .estadisticas import CAMPOS_APORTE, aplicar_cambio, recalcular_dia, valores_aporte
+from .feed_alertas import feed
+from .reglas_alertas import evaluar
+
+
+@receiver(post_init, sender=Parto)
+@receiver(post_init, sender=RecienNacido)
+@receiver(post_init, sender=Alerta)
+def recordar_aporte(sender, instance, **kwargs):
+    """Guarda los valores leídos de la base para descontarlos al guardar."""
+    instance._aporte_original = valores_aporte(instance) if instance.pk is not None else None
+
+
+@receiver(post_save, sender=Parto)
+@receiver(post_save, sender=RecienNacido)
+@receiver(post_save, sender=Alerta)
+def actualizar_estadistica(sender, instance, created, **kwargs):
+    anteriores = None if created else getattr(instance, '_aporte_original', None)
+    actuales = valores_aporte(instance)
+    if actuales is None or (anteriores is None and not created):
+        # Instancia cargada con only()/defer(): se recalcula su día completo
+        recalcular_dia(getattr(instance, CAMPOS_APORTE[sender][0]))
+        instance._aporte_original = None
+        return
+    aplicar_cambio(sender, anteriores, actuales)
+    instance._aporte_original = actuales
+
+
+@receiver(post_delete, sender=Parto)
+@receiver(post_delete, sender=RecienNacido)
+@receiver(post_delete, sender=Alerta)
+def descontar_estadistica(sender, instance, **kwargs):
+    anteriores = getattr(instance, '_aporte_original', None)
+    if anteriores is None:
+        recalcular_dia(getattr(instance, CAMPOS_APORTE[sender][0]))
+    else:
+        aplicar_cambio(sender, anteriores, None)
+
+
+@receiver(post_save, sender=Alerta)
+@receiver(post_delete, sender=Alerta)
+def notificar_canal_alertas(sender, instance, **kwargs):
+    transaction.on_commit(feed.notificar)
+
+
+@receiver(post_save, sender=APGARDetalle)
+@receiver(post_save, sender=ExamenPrenatal)
+@receiver(post_save, sender=ComplicacionMaterna)
+@receiver(post_save, sender=ProtocoloVIH)
+def evaluar_reglas_alerta(sender, instance, raw=False, **kwargs):
+    if not raw:
+        evaluar(instance)
@@ -1,6 +1,13 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from django.test import TestCase, override_settings
+from django.urls import reverse
 from django.utils import timezone
-from datetime import date
+from datetime import date, timedelta
+from unittest import mock
 from apps.administracion.models import Usuario
 from apps.pacientes.models import PacienteMadre
 from apps.obstetricia.models import Parto
@@ -171,3 +178,908 @@ class ValidacionDatosReporteTest(TestCase):
         self.assertIsNotNone(self.parto.grupo_robson)
         self.assertGreaterEqual(self.parto.grupo_robson, 1)
         self.assertLessEqual(self.parto.grupo_robson, 10)
+
+
+class AgregacionesReporteTest(TestCase):
+    """Tests para la capa de agregación de un solo paso"""
+    
+    def setUp(self):
+        """Configuración inicial"""
+        from apps.neonatologia.models import RecienNacido
+        from apps.reportes.models import Alerta
+        
+        self.usuario = Usuario.objects.create_user(
+            username='jefe_test',
+            rut='12.345.678-5',
+            password='testpass123',
+            rol='jefe_servicio'
+        )
+        
+        pesos = [1200, 2000, 3200, 4200]
+        apgars = [(2, 3), (5, 6), (8, 9), (9, 10)]
+        for i in range(4):
+            paciente = PacienteMadre.objects.create(
+                rut=f'1{i}.222.333-{i}',
+                nombre=f'Paciente{i}',
+                apellido_paterno='Test',
+                apellido_materno='Prueba',
+                fecha_nacimiento=date(1990, 1, 1),
+                comuna='Chillán',
+                region='Ñuble'
+            )
+            parto = Parto.objects.create(
+                paciente=paciente,
+                usuario_registro=self.usuario,
+                fecha_parto=timezone.now().date(),
+                hora_parto=timezone.now().time(),
+                edad_gestacional_semanas=35 if i == 0 else 39,
+                tipo_parto=['cesarea_electiva', 'cesarea_urgencia', 'eutocico', 'eutocico'][i],
+                presentacion='cefalica',
+                inicio_trabajo_parto='espontaneo',
+                grupo_robson=10 if i == 0 else 1
+            )
+            RecienNacido.objects.create(
+                parto=parto,
+                sexo='femenino',
+                peso_gramos=pesos[i],
+                talla_cm=50.0,
+                circunferencia_craneana_cm=35.0,
+                apgar_1_min=apgars[i][0],
+                apgar_5_min=apgars[i][1],
+                reanimacion_requerida=(i == 0)
+            )
+            Alerta.objects.create(
+                tipo='BAJO_PESO' if i < 2 else 'APGAR_CRITICO',
+                nivel_urgencia='CRITICA' if i % 2 == 0 else 'ALTA',
+                estado='RESUELTA' if i == 3 else 'ACTIVA',
+                titulo=f'Alerta {i}',
+                descripcion='Test',
+                paciente=paciente,
+                usuario_genera=self.usuario
+            )
+    
+    def test_agregar_partos_una_consulta(self):
+        """Test que los contadores de partos salen de una sola consulta"""
+        from apps.reportes.agregaciones import agregar_partos
+        
+        with self.assertNumQueries(1):
+            resumen = agregar_partos(Parto.objects.all())
+        
+        self.assertEqual(resumen.total, 4)
+        self.assertEqual(resumen.cesareas, 2)
+        self.assertEqual(resumen.tasa_cesarea, 50.0)
+    
+    def test_agregar_recien_nacidos_una_consulta(self):
+        """Test bandas de peso y APGAR en una sola consulta"""
+        from apps.neonatologia.models import RecienNacido
+        from apps.reportes.agregaciones import agregar_recien_nacidos
+        
+        with self.assertNumQueries(1):
+            resumen = agregar_recien_nacidos(RecienNacido.objects.all())
+        
+        self.assertEqual(resumen.total, 4)
+        self.assertEqual(resumen.muy_bajo_peso, 1)
+        self.assertEqual(resumen.bajo_peso, 1)
+        self.assertEqual(resumen.peso_normal, 1)
+        self.assertEqual(resumen.macrosomico, 1)
+        self.assertEqual(resumen.apgar_5_critico, 1)
+        self.assertEqual(resumen.apgar_5_moderado, 1)
+        self.assertEqual(resumen.apgar_5_bajo, 2)
+        self.assertEqual(resumen.reanimacion, 1)
+        self.assertEqual(resumen.no_reanimacion, 3)
+        self.assertEqual(resumen.peso_promedio, 2650)
+    
+    def test_agregar_alertas_una_consulta(self):
+        """Test distribución de alertas por tipo, nivel y estado en una consulta"""
+        from apps.reportes.models import Alerta
+        from apps.reportes.agregaciones import agregar_alertas
+        
+        with self.assertNumQueries(1):
+            resumen = agregar_alertas(Alerta.objects.all())
+        
+        self.assertEqual(resumen.total, 4)
+        self.assertEqual(resumen.criticas, 2)
+        self.assertEqual(resumen.pendientes, 3)
+        self.assertEqual(resumen.resueltas, 1)
+        self.assertEqual(resumen.tasa_resolucion, 25.0)
+        
+        por_tipo = {item['tipo']: item for item in resumen.por_tipo}
+        self.assertEqual(por_tipo['BAJO_PESO']['total'], 2)
+        self.assertEqual(por_tipo['BAJO_PESO']['criticas'], 1)
+        por_nivel = {item['nivel']: item for item in resumen.por_nivel}
+        self.assertEqual(por_nivel['alta']['resueltas'], 1)
+        self.assertEqual(por_nivel['alta']['pendientes'], 1)
+    
+    def test_resumen_mensual_genera_datos(self):
+        """Test que el resumen mensual incluye RN con APGAR bajo"""
+        from apps.reportes.views import _get_resumen_mensual_data
+        
+        hoy = timezone.now().date()
+        datos = _get_resumen_mensual_data(hoy, hoy)
+        
+        self.assertEqual(datos['total_partos'], 4)
+        self.assertEqual(datos['rn_apgar_bajo'], 2)
+        self.assertEqual(datos['pacientes_nuevas'], 4)
+
+
+class EstadisticaDiariaTest(TestCase):
+    """Tests para la tabla de resumen diaria"""
+    
+    def setUp(self):
+        """Configuración inicial"""
+        self.usuario = Usuario.objects.create_user(
+            username='matrona_test',
+            rut='12.345.678-5',
+            password='testpass123',
+            rol='matrona'
+        )
+        self.paciente = PacienteMadre.objects.create(
+            rut='11.111.111-1',
+            nombre='Ana',
+            apellido_paterno='González',
+            apellido_materno='Silva',
+            fecha_nacimiento=date(1990, 5, 15),
+            comuna='Chillán',
+            region='Ñuble'
+        )
+        self.hoy = timezone.localdate()
+    
+    def crear_parto(self, **kwargs):
+        datos = {
+            'paciente': self.paciente,
+            'usuario_registro': self.usuario,
+            'fecha_parto': self.hoy,
+            'hora_parto': timezone.now().time(),
+            'edad_gestacional_semanas': 39,
+            'tipo_parto': 'eutocico',
+            'presentacion': 'cefalica',
+            'inicio_trabajo_parto': 'espontaneo',
+            'primigesta': True,
+            'grupo_robson': 1,
+        }
+        datos.update(kwargs)
+        return Parto.objects.create(**datos)
+    
+    def test_guardar_parto_actualiza_estadistica(self):
+        """Test que guardar un parto actualiza la fila del día"""
+        from apps.reportes.models import EstadisticaDiaria
+        
+        self.crear_parto()
+        self.crear_parto(tipo_parto='cesarea_urgencia', grupo_robson=2)
+        
+        estadistica = EstadisticaDiaria.objects.get(fecha=self.hoy)
+        self.assertEqual(estadistica.partos_total, 2)
+        self.assertEqual(estadistica.partos_por_tipo['cesarea_urgencia'], 1)
+        self.assertEqual(estadistica.cesareas_por_robson, {'2': 1})
+    
+    def test_cambio_fecha_parto_recalcula_ambos_dias(self):
+        """Test que mover un parto de día descuenta el día original"""
+        from datetime import timedelta
+        from apps.reportes.models import EstadisticaDiaria
+        
+        parto = self.crear_parto()
+        ayer = self.hoy - timedelta(days=1)
+        parto.fecha_parto = ayer
+        parto.save()
+        
+        self.assertFalse(EstadisticaDiaria.objects.filter(fecha=self.hoy).exists())
+        self.assertEqual(EstadisticaDiaria.objects.get(fecha=ayer).partos_total, 1)
+    
+    def test_recien_nacido_y_alerta_actualizan_estadistica(self):
+        """Test contadores de RN y alertas en la fila del día"""
+        from apps.neonatologia.models import RecienNacido
+        from apps.reportes.models import Alerta, EstadisticaDiaria
+        
+        parto = self.crear_parto()
+        rn = RecienNacido.objects.create(
+            parto=parto,
+            sexo='femenino',
+            peso_gramos=2200,
+            talla_cm=48.0,
+            circunferencia_craneana_cm=33.0,
+            apgar_1_min=5,
+            apgar_5_min=6
+        )
+        Alerta.crear_alerta_bajo_peso(rn, self.usuario)
+        
+        estadistica = EstadisticaDiaria.objects.get(fecha=self.hoy)
+        self.assertEqual(estadistica.rn_total, 1)
+        self.assertEqual(estadistica.rn_bajo_peso, 1)
+        self.assertEqual(estadistica.rn_apgar_5_moderado, 1)
+        self.assertEqual(estadistica.rn_peso_suma, 2200)
+        self.assertEqual(estadistica.alertas_total, 1)
+        self.assertEqual(estadistica.alertas_por_nivel, {'ALTA': 1})
+    
+    def test_reconstruir_estadisticas_comando(self):
+        """Test que el comando reconstruye filas borradas"""
+        from io import StringIO
+        from django.core.management import call_command
+        from apps.reportes.models import EstadisticaDiaria
+        
+        self.crear_parto()
+        self.crear_parto(grupo_robson=3)
+        EstadisticaDiaria.objects.all().delete()
+        
+        call_command('reconstruir_estadisticas', stdout=StringIO())
+        
+        estadistica = EstadisticaDiaria.objects.get(fecha=self.hoy)
+        self.assertEqual(estadistica.partos_total, 2)
+        self.assertEqual(estadistica.partos_por_robson, {'1': 1, '3': 1})
+    
+    def test_resumen_rango_lee_tabla_resumen(self):
+        """Test que el resumen de un año se obtiene con una sola consulta"""
+        from datetime import timedelta
+        from apps.reportes.estadisticas import resumir_rango
+        
+        self.crear_parto()
+        self.crear_parto(tipo_parto='cesarea_electiva', grupo_robson=2)
+        
+        with self.assertNumQueries(1):
+            resumen = resumir_rango(self.hoy - timedelta(days=364), self.hoy)
+        
+        self.assertEqual(resumen.partos().total, 2)
+        self.assertEqual(resumen.partos().tasa_cesarea, 50.0)
+        self.assertEqual([g['grupo_robson'] for g in resumen.robson().grupos], [1, 2])
+
+    def test_cambio_estado_alerta_no_toca_estadistica(self):
+        """Test que cambiar el estado de una alerta no recalcula la fila del día"""
+        from apps.reportes.models import Alerta
+
+        alerta = Alerta.objects.create(
+            tipo='BAJO_PESO', nivel_urgencia='ALTA', titulo='Bajo peso', descripcion='-',
+            paciente=self.paciente,
+        )
+        alerta.estado = 'EN_ATENCION'
+
+        with self.assertNumQueries(1):
+            alerta.save()
+
+    def test_incremental_coincide_con_reconstruccion(self):
+        """Test que las señales dejan las mismas filas que reconstruir_rango"""
+        from apps.neonatologia.models import RecienNacido
+        from apps.reportes.estadisticas import CAMPOS_CONTADORES, reconstruir_rango
+        from apps.reportes.models import Alerta, EstadisticaDiaria
+
+        ayer = self.hoy - timedelta(days=1)
+        parto = self.crear_parto()
+        movido = self.crear_parto(tipo_parto='cesarea_urgencia', grupo_robson=2)
+        eliminado = self.crear_parto(grupo_robson=3)
+        rn = RecienNacido.objects.create(
+            parto=parto, sexo='femenino', peso_gramos=2200, talla_cm=48.0,
+            circunferencia_craneana_cm=33.0, apgar_1_min=5, apgar_5_min=6,
+        )
+        alerta = Alerta.objects.create(
+            tipo='BAJO_PESO', nivel_urgencia='ALTA', titulo='Bajo peso', descripcion='-',
+            paciente=self.paciente,
+        )
+
+        movido.fecha_parto = ayer
+        movido.grupo_robson = 4
+        movido.save()
+        eliminado.delete()
+        rn = RecienNacido.objects.get(pk=rn.pk)
+        rn.peso_gramos = 3300
+        rn.apgar_5_min = 9
+        rn.save()
+        alerta.nivel_urgencia = 'CRITICA'
+        alerta.save()
+
+        def filas():
+            return {
+                fila.fecha: {campo: getattr(fila, campo) for campo in CAMPOS_CONTADORES}
+                for fila in EstadisticaDiaria.objects.all()
+            }
+
+        incrementales = filas()
+        reconstruir_rango(ayer, self.hoy)
+        self.assertEqual(incrementales, filas())
+        self.assertEqual(incrementales[self.hoy]['rn_peso_normal'], 1)
+        self.assertEqual(incrementales[ayer]['partos_por_robson'], {'4': 1})
+
+    def test_fila_creada_por_otra_transaccion(self):
+        """Test que si otra transacción crea la fila del día primero, se suma sobre ella"""
+        from apps.reportes.models import EstadisticaDiaria
+
+        # La fila no existe al consultar, pero ya existe al hacer el INSERT
+        EstadisticaDiaria.objects.create(fecha=self.hoy, partos_total=1, partos_por_tipo={'eutocico': 1})
+        consultas = [EstadisticaDiaria.objects.none(), EstadisticaDiaria.objects.select_for_update()]
+
+        with mock.patch.object(EstadisticaDiaria.objects, 'select_for_update', side_effect=consultas):
+            self.crear_parto()
+
+        estadistica = EstadisticaDiaria.objects.get(fecha=self.hoy)
+        self.assertEqual(estadistica.partos_total, 2)
+        self.assertEqual(estadistica.partos_por_tipo, {'eutocico': 2})
+
+
+class ColaReportesPDFTest(TestCase):
+    """Tests para la generación de reportes PDF en segundo plano"""
+    
+    def setUp(self):
+        """Configuración inicial"""
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        configuracion = override_settings(REPORTES_PDF_MODO='sincrono', REPORTES_PDF_DIR=self.directorio)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        
+        self.usuario = Usuario.objects.create_user(
+            username='jefe_test',
+            rut='12.345.678-5',
+            password='testpass123',
+            rol='jefe_servicio'
+        )
+        self.client.force_login(self.usuario)
+        self.url = reverse('generar_reporte_pdf', args=['partos_periodo', '2024-01-01', '2024-01-31'])
+    
+    def solicitar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(self.url)
+    
+    def test_solicitud_genera_pdf_y_redirige_a_estado(self):
+        """La solicitud crea un trabajo, genera el PDF y redirige al estado"""
+        from .models import TrabajoReporte
+        
+        response = self.solicitar()
+        trabajo = TrabajoReporte.objects.get()
+        
+        self.assertRedirects(response, reverse('estado_reporte', args=[trabajo.id]))
+        self.assertEqual(trabajo.estado, 'COMPLETADO')
+        self.assertEqual(trabajo.nombre_descarga, 'Reporte_Partos_2024-01-01_2024-01-31.pdf')
+        
+        estado = self.client.get(reverse('estado_reporte', args=[trabajo.id]), {'formato': 'json'}).json()
+        self.assertEqual(estado['estado'], 'COMPLETADO')
+        
+        descarga = self.client.get(estado['url_descarga'])
+        self.assertEqual(descarga['Content-Type'], 'application/pdf')
+        self.assertTrue(descarga.content.startswith(b'%PDF'))
+    
+    def test_solicitud_identica_reutiliza_archivo(self):
+        """Un período ya generado no se vuelve a generar si sus datos no cambian"""
+        from .models import TrabajoReporte
+        
+        self.solicitar()
+        TrabajoReporte.objects.update(fecha_hora_fin_proceso=timezone.now() - timedelta(days=30))
+        self.solicitar()
+        
+        self.assertEqual(TrabajoReporte.objects.count(), 1)
+    
+    def test_cambio_de_datos_regenera_periodo_cerrado(self):
+        """Un parto registrado en el período invalida el PDF ya generado"""
+        from .models import TrabajoReporte
+        
+        self.solicitar()
+        TrabajoReporte.objects.update(fecha_hora_fin_proceso=timezone.now() - timedelta(days=30))
+        paciente = PacienteMadre.objects.create(
+            rut='11.111.111-1',
+            nombre='Ana',
+            apellido_paterno='González',
+            apellido_materno='Silva',
+            fecha_nacimiento=date(1990, 5, 15),
+            estado_civil='soltera',
+            escolaridad='media_completa',
+            prevision='fonasa_b',
+            direccion='Calle Principal 123',
+            comuna='Chillán',
+            region='Ñuble'
+        )
+        Parto.objects.create(
+            paciente=paciente,
+            usuario_registro=self.usuario,
+            fecha_parto=date(2024, 1, 15),
+            hora_parto=timezone.now().time(),
+            edad_gestacional_semanas=39,
+            edad_gestacional_dias=0,
+            tipo_parto='eutocico',
+            presentacion='cefalica',
+            inicio_trabajo_parto='espontaneo',
+            primigesta=True,
+            multigesta=False,
+            grupo_robson=1
+        )
+        self.solicitar()
+        
+        self.assertEqual(TrabajoReporte.objects.count(), 2)
+    
+    def test_version_incluye_pacientes(self):
+        """Registrar una paciente en el período o editar una nombrada cambia la versión"""
+        from datetime import datetime
+        from .cola_pdf import version_datos
+
+        inicio, fin = date(2024, 1, 1), date(2024, 1, 31)
+        inicial = version_datos(inicio, fin)
+        paciente = PacienteMadre.objects.create(
+            rut='11.111.111-1',
+            nombre='Ana',
+            apellido_paterno='González',
+            apellido_materno='Silva',
+            fecha_nacimiento=date(1990, 5, 15),
+            comuna='Chillán',
+            region='Ñuble'
+        )
+        PacienteMadre.objects.filter(pk=paciente.pk).update(
+            created_at=timezone.make_aware(datetime(2024, 1, 10))
+        )
+        registrada = version_datos(inicio, fin)
+        self.assertNotEqual(registrada, inicial)
+
+        paciente.refresh_from_db()
+        paciente.apellido_paterno = 'Muñoz'
+        paciente.save()
+        self.assertNotEqual(version_datos(inicio, fin), registrada)
+
+    def test_descarga_estampa_al_usuario_que_descarga(self):
+        """El PDF compartido lleva en el pie a quien lo descarga"""
+        from pypdf import PdfReader
+        from .models import TrabajoReporte
+        
+        self.solicitar()
+        trabajo = TrabajoReporte.objects.get()
+        otro = Usuario.objects.create_user(
+            username='obstetra_test', rut='11.111.111-1', password='testpass123',
+            rol='medico_obstetra', first_name='Otra', last_name='Persona',
+        )
+        self.client.force_login(otro)
+        
+        descarga = self.client.get(reverse('descargar_reporte', args=[trabajo.id]))
+        texto = PdfReader(io.BytesIO(descarga.content)).pages[0].extract_text()
+        self.assertIn('por Otra Persona', texto)
+    
+    def test_trabajo_pendiente_se_reutiliza(self):
+        """Mientras el trabajo está en proceso, las solicitudes iguales lo comparten"""
+        from .models import TrabajoReporte
+        
+        # Sin ejecutar on_commit el trabajo queda pendiente
+        self.client.get(self.url)
+        self.client.get(self.url)
+        
+        trabajo = TrabajoReporte.objects.get()
+        self.assertTrue(trabajo.en_proceso)
+        response = self.client.get(reverse('descargar_reporte', args=[trabajo.id]))
+        self.assertRedirects(response, reverse('estado_reporte', args=[trabajo.id]))
+    
+    def test_tipo_invalido(self):
+        """Un tipo de reporte desconocido no crea trabajos"""
+        from .models import TrabajoReporte
+        
+        response = self.client.get(reverse('generar_reporte_pdf', args=['otro', '2024-01-01', '2024-01-31']))
+        
+        self.assertRedirects(response, reverse('seleccionar_reporte'))
+        self.assertFalse(TrabajoReporte.objects.exists())
+
+
+class CacheFichaClinicaPDFTest(TestCase):
+    """Tests para la caché en disco de la ficha clínica en PDF"""
+    
+    def setUp(self):
+        """Configuración inicial"""
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        configuracion = override_settings(FICHA_PDF_CACHE_DIR=self.directorio)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        
+        self.usuario = Usuario.objects.create_user(
+            username='matrona_test',
+            rut='12.345.678-5',
+            password='testpass123',
+            rol='matrona'
+        )
+        paciente = PacienteMadre.objects.create(
+            rut='11.111.111-1',
+            nombre='Ana',
+            apellido_paterno='González',
+            apellido_materno='Silva',
+            fecha_nacimiento=date(1990, 5, 15),
+            comuna='Chillán',
+            region='Ñuble'
+        )
+        self.parto = Parto.objects.create(
+            paciente=paciente,
+            usuario_registro=self.usuario,
+            fecha_parto=timezone.localdate(),
+            hora_parto=timezone.now().time(),
+            edad_gestacional_semanas=39,
+            tipo_parto='eutocico',
+            presentacion='cefalica',
+            inicio_trabajo_parto='espontaneo',
+            primigesta=True,
+            grupo_robson=1,
+        )
+        self.client.force_login(self.usuario)
+        self.url = reverse('generar_pdf_parto', args=[self.parto.id])
+    
+    def test_descarga_repetida_usa_cache(self):
+        """La segunda descarga no vuelve a renderizar el PDF"""
+        primera = self.client.get(self.url)
+        self.assertEqual(primera.status_code, 200)
+        self.assertTrue(primera['ETag'])
+        
+        with mock.patch('apps.reportes.views.pisa.CreatePDF') as crear_pdf:
+            segunda = self.client.get(self.url)
+        
+        crear_pdf.assert_not_called()
+        self.assertEqual(segunda['ETag'], primera['ETag'])
+        self.assertEqual(segunda['Content-Type'], 'application/pdf')
+
+    def test_cache_compartida_con_pie_por_usuario(self):
+        """Otro usuario reutiliza el mismo archivo y su descarga lleva su propio pie"""
+        from pypdf import PdfReader
+
+        otro = Usuario.objects.create_user(
+            username='pediatra_test', rut='11.222.333-4', password='testpass123', rol='pediatra',
+            first_name='Pedro', last_name='Pérez',
+        )
+        self.client.get(self.url)
+        self.client.force_login(otro)
+        with mock.patch('apps.reportes.views.pisa.CreatePDF') as crear_pdf:
+            response = self.client.get(self.url)
+
+        crear_pdf.assert_not_called()
+        self.assertEqual(len(list(Path(self.directorio).glob('*.pdf'))), 1)
+        texto = PdfReader(io.BytesIO(response.content)).pages[0].extract_text()
+        self.assertIn('por Pedro Pérez', texto)
+    
+    def test_if_none_match_responde_304(self):
+        """Si el navegador tiene la versión vigente no se envía el PDF"""
+        etag = self.client.get(self.url)['ETag']
+        
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, 304)
+    
+    def test_modificar_parto_invalida_cache(self):
+        """Editar el parto cambia la clave y reemplaza el archivo anterior"""
+        etag = self.client.get(self.url)['ETag']
+        
+        self.parto.observaciones = 'Actualizado'
+        self.parto.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(list(Path(self.directorio).glob('*.pdf'))), 1)
+    
+    def test_limite_de_tamano_elimina_menos_usados(self):
+        """Al superar el tamaño máximo se eliminan los archivos más antiguos"""
+        from . import cache_pdf
+        
+        with override_settings(FICHA_PDF_CACHE_MAX_BYTES=250):
+            antiguo = cache_pdf.guardar(1, 'a', b'x' * 100)
+            os.utime(antiguo, (0, 0))
+            usado = cache_pdf.guardar(2, 'b', b'x' * 100)
+            nuevo = cache_pdf.guardar(3, 'c', b'x' * 100)
+        
+        self.assertFalse(antiguo.exists())
+        self.assertTrue(usado.exists())
+        self.assertTrue(nuevo.exists())
+
+
+class ExportarReporteTest(TestCase):
+    """Tests para la exportación de datos de reportes en CSV/XLSX"""
+    
+    def setUp(self):
+        """Configuración inicial"""
+        self.usuario = Usuario.objects.create_user(
+            username='jefe_test',
+            rut='12.345.678-5',
+            password='testpass123',
+            rol='jefe_servicio'
+        )
+        self.paciente = PacienteMadre.objects.create(
+            rut='11.111.111-1',
+            nombre='Ana',
+            apellido_paterno='González',
+            apellido_materno='Silva',
+            fecha_nacimiento=date(1990, 5, 15),
+            comuna='Chillán',
+            region='Ñuble'
+        )
+        for dia in [1, 2, 3]:
+            Parto.objects.create(
+                paciente=self.paciente,
+                usuario_registro=self.usuario,
+                fecha_parto=date(2024, 1, dia),
+                hora_parto=timezone.now().time(),
+                edad_gestacional_semanas=39,
+                tipo_parto='eutocico',
+                presentacion='cefalica',
+                inicio_trabajo_parto='espontaneo',
+                primigesta=True,
+                grupo_robson=1,
+            )
+        self.client.force_login(self.usuario)
+        self.url = reverse('exportar_reporte', args=['partos_periodo'])
+    
+    def test_exportar_csv_en_streaming(self):
+        """El CSV se entrega como streaming con una fila por parto"""
+        response = self.client.get(self.url, {'fecha_inicio': '2024-01-01', 'fecha_fin': '2024-01-02'})
+        
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lineas = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lineas), 3)
+        self.assertTrue(lineas[0].startswith('ID Parto,Fecha'))
+        self.assertIn('11.111.111-1', lineas[1])
+    
+    def test_exportar_xlsx(self):
+        """El XLSX contiene encabezados y filas del período"""
+        from .exportar import xlsx_disponible
+        if not xlsx_disponible():
+            self.skipTest('openpyxl no está instalado')
+        from openpyxl import load_workbook
+        
+        response = self.client.get(self.url, {
+            'fecha_inicio': '2024-01-01', 'fecha_fin': '2024-01-31', 'formato': 'xlsx'
+        })
+        
+        libro = load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(libro.active.max_row, 4)
+    
+    def test_tipo_sin_datos_exportables(self):
+        """Los reportes solo de indicadores no se exportan"""
+        response = self.client.get(
+            reverse('exportar_reporte', args=['resumen_mensual']),
+            {'fecha_inicio': '2024-01-01', 'fecha_fin': '2024-01-31'}
+        )
+        
+        self.assertRedirects(response, reverse('seleccionar_reporte'))
+
+
+class CanalAlertasActivasTest(TestCase):
+    """Tests para el canal compartido de alertas activas"""
+    
+    def setUp(self):
+        """Configuración inicial"""
+        from .feed_alertas import feed
+        
+        self.usuario = Usuario.objects.create_user(
+            username='matrona_test',
+            rut='12.345.678-5',
+            password='testpass123',
+            rol='matrona'
+        )
+        feed.notificar()
+        self.client.force_login(self.usuario)
+    
+    def crear_alerta(self, nivel='CRITICA'):
+        from .models import Alerta
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            return Alerta.objects.create(
+                tipo='APGAR_CRITICO',
+                nivel_urgencia=nivel,
+                titulo='APGAR Crítico',
+                descripcion='Prueba',
+                usuario_genera=self.usuario,
+            )
+    
+    @override_settings(ALERTAS_FEED_INTERVALO=60)
+    def test_clientes_comparten_una_revision(self):
+        """Dentro del intervalo, las lecturas no consultan la BD"""
+        from .feed_alertas import FeedAlertas
+        
+        canal = FeedAlertas()
+        with self.assertNumQueries(2):
+            primera = canal.actual()
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                self.assertEqual(canal.actual(), primera)
+    
+    def test_sin_cambios_solo_consulta_firma(self):
+        """Si la firma no cambia, no se recarga la lista ni cambia la versión"""
+        from .feed_alertas import FeedAlertas
+        
+        canal = FeedAlertas()
+        version = canal.actual()['version']
+        canal.notificar()
+        
+        with self.assertNumQueries(1):
+            self.assertEqual(canal.actual()['version'], version)
+    
+    @override_settings(ALERTAS_FEED_INTERVALO=60)
+    def test_cambio_de_estado_notifica(self):
+        """Crear y atender una alerta genera nuevas versiones de inmediato"""
+        from .feed_alertas import feed
+        
+        inicial = feed.actual()
+        alerta = self.crear_alerta()
+        
+        creada = feed.esperar(inicial['version'], timeout=1)
+        self.assertEqual(creada['criticas'], 1)
+        self.assertEqual(creada['alertas'][0]['id'], alerta.id)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            alerta.marcar_en_atencion(self.usuario)
+        atendida = feed.esperar(creada['version'], timeout=1)
+        self.assertEqual(atendida['total'], 0)
+    
+    def test_api_alertas_activas(self):
+        """La API JSON mantiene su formato"""
+        self.crear_alerta(nivel='ALTA')
+        
+        data = self.client.get(reverse('api_alertas_activas')).json()
+        
+        self.assertEqual(data['total'], 1)
+        self.assertEqual(data['criticas'], 0)
+        self.assertEqual(len(data['alertas']), 1)
+    
+    def test_stream_envia_instantanea_al_conectar(self):
+        """El canal SSE envía la instantánea vigente al conectar"""
+        self.crear_alerta()
+        
+        response = self.client.get(reverse('stream_alertas_activas'))
+        eventos = iter(response.streaming_content)
+        
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(next(eventos).startswith(b'retry:'))
+        evento = next(eventos).decode()
+        response.close()
+        self.assertIn('event: alertas', evento)
+        self.assertIn('"criticas": 1', evento)
+
+    def test_solo_las_paginas_de_alertas_abren_el_canal(self):
+        """Fuera de las páginas de alertas el contador se consulta por intervalo"""
+        stream = reverse('stream_alertas_activas')
+
+        listado = self.client.get(reverse('listado_alertas'))
+        perfil = self.client.get(reverse('perfil_usuario'))
+
+        self.assertContains(listado, stream)
+        self.assertNotContains(perfil, stream)
+        self.assertContains(perfil, reverse('api_alertas_activas'))
+
+
+
+class ListadoAlertasPaginadoTest(TestCase):
+    """Tests de la paginación por cursor del listado de alertas"""
+    
+    def setUp(self):
+        """60 alertas activas"""
+        from .models import Alerta
+        
+        self.usuario = Usuario.objects.create_user(
+            username='matrona_test',
+            rut='12.345.678-5',
+            password='testpass123',
+            rol='matrona'
+        )
+        Alerta.objects.bulk_create([
+            Alerta(
+                tipo='APGAR_CRITICO',
+                nivel_urgencia='ALTA',
+                titulo=f'Alerta {i}',
+                descripcion='Prueba',
+                usuario_genera=self.usuario,
+                fecha_hora_alerta=timezone.now() - timedelta(minutes=i),
+            )
+            for i in range(60)
+        ])
+        self.client.force_login(self.usuario)
+    
+    def test_pagina_siguiente(self):
+        """Test que el listado muestra 50 alertas y enlaza las 10 restantes"""
+        response = self.client.get(reverse('listado_alertas'))
+        pagina = response.context['alertas']
+        self.assertEqual(len(pagina), 50)
+        self.assertEqual(pagina.objetos[0].titulo, 'Alerta 0')
+        self.assertEqual(pagina.total_estimado, 60)
+        
+        response = self.client.get(reverse('listado_alertas') + pagina.url_siguiente)
+        pagina = response.context['alertas']
+        self.assertEqual([a.titulo for a in pagina], [f'Alerta {i}' for i in range(50, 60)])
+        self.assertIsNone(pagina.url_siguiente)
+        self.assertIsNotNone(pagina.url_primera)
+
+
+class ReglasAlertasTest(TestCase):
+    """Registro declarativo de reglas de alertas"""
+    
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(
+            username='matrona_test', rut='12.345.678-5', password='testpass123', rol='matrona'
+        )
+        self.paciente = PacienteMadre.objects.create(
+            rut='11.111.111-1', nombre='Ana', apellido_paterno='González', apellido_materno='Silva',
+            fecha_nacimiento=date(1990, 5, 15), comuna='Chillán', region='Ñuble'
+        )
+        self.parto = Parto.objects.create(
+            paciente=self.paciente, usuario_registro=self.usuario, fecha_parto=timezone.localdate(),
+            hora_parto=timezone.now().time(), edad_gestacional_semanas=39, tipo_parto='eutocico',
+            presentacion='cefalica', inicio_trabajo_parto='espontaneo', primigesta=True,
+        )
+    
+    def crear_rn(self, **kwargs):
+        from apps.neonatologia.models import RecienNacido
+        datos = {
+            'parto': self.parto, 'sexo': 'femenino', 'peso_gramos': 3200, 'talla_cm': 50.0,
+            'circunferencia_craneana_cm': 35.0, 'apgar_1_min': 8, 'apgar_5_min': 9,
+        }
+        datos.update(kwargs)
+        return RecienNacido.objects.create(**datos)
+    
+    def test_todas_las_reglas_en_un_insert(self):
+        """Las alertas del RN se crean con un solo INSERT, sin volver a leer parto ni paciente"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from apps.reportes.models import Alerta, EstadisticaDiaria
+        from apps.reportes.reglas_alertas import evaluar
+        rn = self.crear_rn(apgar_5_min=5, peso_gramos=1400, reanimacion_requerida=True)
+        
+        with CaptureQueriesContext(connection) as consultas:
+            alertas = evaluar(rn, usuario=self.usuario)
+        
+        self.assertEqual(sorted(a.tipo for a in alertas), ['APGAR_CRITICO', 'BAJO_PESO', 'REANIMACION'])
+        # Claves abiertas + un INSERT; el resto es la estadística del día
+        sql = [consulta['sql'] for consulta in consultas.captured_queries]
+        self.assertIn('FROM "alertas"', sql[0])
+        self.assertTrue(sql[1].startswith('INSERT INTO "alertas"'))
+        self.assertFalse(any(s.startswith('INSERT INTO "alertas"') for s in sql[2:]))
+        alerta = Alerta.objects.get(tipo='BAJO_PESO')
+        self.assertEqual(alerta.nivel_urgencia, 'CRITICA')
+        self.assertEqual(
+            (alerta.recien_nacido_id, alerta.parto_id, alerta.paciente_id, alerta.usuario_genera_id),
+            (rn.pk, self.parto.pk, self.paciente.pk, self.usuario.pk),
+        )
+        self.assertEqual(EstadisticaDiaria.objects.get(fecha=timezone.localdate()).alertas_total, 3)
+    
+    def test_no_duplica_alertas_abiertas(self):
+        """Una alerta abierta con la misma clave no se vuelve a crear; una resuelta sí"""
+        from apps.reportes.models import Alerta
+        from apps.reportes.reglas_alertas import evaluar
+        rn = self.crear_rn(apgar_5_min=6)
+        
+        self.assertEqual(len(evaluar(rn)), 1)
+        self.assertEqual(evaluar(rn), [])
+        self.assertIsNone(Alerta.crear_alerta_apgar_critico(rn, self.usuario))
+        
+        Alerta.objects.get().marcar_resuelta()
+        self.assertEqual(len(evaluar(rn)), 1)
+        self.assertEqual(Alerta.objects.count(), 2)
+    
+    def test_reglas_por_senal(self):
+        """APGAR detallado, examen crítico, hemorragia y protocolo VIH generan alertas al guardarse"""
+        from apps.neonatologia.models import APGARDetalle
+        from apps.obstetricia.models import ComplicacionMaterna, ControlPrenatal, ExamenPrenatal, ProtocoloVIH
+        from apps.reportes.models import Alerta
+        rn = self.crear_rn(apgar_5_min=6)
+        Alerta.crear_alerta_apgar_critico(rn, self.usuario)
+        
+        # Mismo hecho que la alerta APGAR del RN: no se duplica
+        APGARDetalle.objects.create(
+            recien_nacido=rn, minuto=5, frecuencia_cardiaca=1, esfuerzo_respiratorio=1, tono_muscular=1,
+            irritabilidad_refleja=1, color_piel=1, usuario_evaluador=self.usuario,
+        )
+        control = ControlPrenatal.objects.create(paciente=self.paciente, fur=date(2024, 1, 1))
+        ExamenPrenatal.objects.create(control_prenatal=control, tipo_examen='vih', resultado='positivo')
+        ExamenPrenatal.objects.create(control_prenatal=control, tipo_examen='hemograma', resultado='positivo')
+        ComplicacionMaterna.objects.create(
+            parto=self.parto, codigo_cie10='O72.1', descripcion_cie10='Hemorragia postparto',
+            tipo='hemorragia', severidad='moderada', usuario_registro=self.usuario,
+        )
+        ProtocoloVIH.objects.create(parto=self.parto).activar_protocolo()
+        
+        self.assertEqual(
+            sorted(Alerta.objects.values_list('tipo', 'nivel_urgencia')),
+            [('APGAR_CRITICO', 'CRITICA'), ('EXAMEN_CRITICO', 'CRITICA'),
+             ('HEMORRAGIA', 'ALTA'), ('PROTOCOLO_VIH', 'CRITICA')],
+        )
+        examen = Alerta.objects.get(tipo='EXAMEN_CRITICO')
+        self.assertEqual((examen.paciente_id, examen.parto_id), (self.paciente.pk, None))
+    
+    def test_reproducir_historial(self):
+        """reproducir_alertas crea las alertas faltantes una sola vez, aunque luego se resuelvan"""
+        from io import StringIO
+        from django.core.management import call_command
+        from apps.reportes.models import Alerta
+        self.crear_rn(peso_gramos=2100)  # sin pasar por la vista: no hay alertas
+        
+        salida = StringIO()
+        call_command('reproducir_alertas', '--simular', stdout=salida)
+        self.assertIn('BAJO_PESO: 1', salida.getvalue())
+        self.assertFalse(Alerta.objects.exists())
+        
+        call_command('reproducir_alertas', '--lote', '1', stdout=StringIO())
+        Alerta.objects.get(tipo='BAJO_PESO').marcar_resuelta()
+        call_command('reproducir_alertas', stdout=StringIO())
+        self.assertEqual(Alerta.objects.count(), 1)
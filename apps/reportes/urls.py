@@ -14,8 +14,12 @@ urlpatterns = [
     
     # API
     path('api/alertas/activas/', views.api_alertas_activas, name='api_alertas_activas'),
+    path('api/alertas/stream/', views.stream_alertas_activas, name='stream_alertas_activas'),
     
     # Reportes estadísticos
     path('', views.seleccionar_reporte, name='seleccionar_reporte'),
     path('generar/<str:tipo>/<str:fecha_inicio>/<str:fecha_fin>/', views.generar_reporte_pdf, name='generar_reporte_pdf'),
+    path('trabajos/<int:trabajo_id>/', views.estado_reporte, name='estado_reporte'),
+    path('trabajos/<int:trabajo_id>/descargar/', views.descargar_reporte, name='descargar_reporte'),
+    path('exportar/<str:tipo>/', views.exportar_reporte, name='exportar_reporte'),
 ]
@@ -1,51 +1,104 @@
+import json
+import time
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, FileResponse, Http404, StreamingHttpResponse
+from django.urls import reverse
 from django.template.loader import get_template
+from django.views.decorators.http import condition
 from xhtml2pdf import pisa
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from django.db.models import Q, Count, Avg
+from django.db.models import Q, Count
 from datetime import datetime, timedelta, date
+from io import BytesIO
 from apps.administracion.decorators import rol_requerido
+from apps.administracion.paginacion import paginar_keyset
+from apps.administracion.metricas import cronometro_pdf, registrar_cache
+from apps.administracion.replicas import en_replica
 from apps.obstetricia.models import Parto
 from apps.neonatologia.models import RecienNacido
 from apps.pacientes.models import PacienteMadre
-from .models import Alerta
+from .models import Alerta, TrabajoReporte
 from .forms import ReporteForm
+from .agregaciones import (
+    porcentaje, agregar_partos, agregar_robson, agregar_recien_nacidos,
+    agregar_apgar_critico, agregar_bajo_peso, agregar_alertas,
+)
+from .estadisticas import resumir_rango, serie_diaria
+from .cola_pdf import encolar_reporte, ruta_archivo
+from . import cache_pdf
+from .feed_alertas import feed
+from .exportar import EXPORTACIONES, filas_csv, archivo_xlsx, xlsx_disponible
+
+
+def _versiones_ficha(parto_id):
+    """updated_at del parto, la paciente y el recién nacido en una consulta."""
+    return Parto.objects.filter(pk=parto_id).values(
+        'updated_at', 'paciente__updated_at', 'recien_nacido__updated_at'
+    ).first()
+
+
+def _etag_ficha(request, parto_id):
+    versiones = _versiones_ficha(parto_id)
+    if versiones is None:
+        return None
+    # Débil: el pie con usuario y hora cambia en cada descarga
+    return f'W/"{cache_pdf.clave_ficha(parto_id, versiones)}"'
 
 
 @login_required
 @rol_requerido('matrona', 'medico_obstetra', 'pediatra', 'jefe_servicio')
+@condition(etag_func=_etag_ficha)
 def generar_pdf_parto(request, parto_id):
     """
     Genera un PDF con la ficha clínica del parto y recién nacido.
+    Las fichas sin cambios se sirven desde la caché en disco, compartida
+    entre usuarios, con el pie de quién y cuándo la genera agregado en cada
+    descarga; si el navegador ya tiene la versión vigente (If-None-Match)
+    responde 304.
     """
-    parto = get_object_or_404(Parto, pk=parto_id)
-    
-    template_path = 'reportes/ficha_clinica_pdf.html'
-    context = {
-        'parto': parto,
-        'paciente': parto.paciente,
-        'rn': getattr(parto, 'recien_nacido', None),
-        'user': request.user,
-    }
+    versiones = _versiones_ficha(parto_id)
+    if versiones is None:
+        raise Http404('Parto no encontrado')
     
-    # Renderizar template
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="ficha_clinica_{parto.id}.pdf"'
+    clave = cache_pdf.clave_ficha(parto_id, versiones)
+    ruta = cache_pdf.obtener(parto_id, clave)
+    registrar_cache('ficha_pdf', ruta is not None)
     
-    template = get_template(template_path)
-    html = template.render(context)
+    if ruta is None:
+        parto = get_object_or_404(Parto.objects.select_related('paciente', 'recien_nacido'), pk=parto_id)
+        
+        template_path = 'reportes/ficha_clinica_pdf.html'
+        context = {
+            'parto': parto,
+            'paciente': parto.paciente,
+            'rn': getattr(parto, 'recien_nacido', None),
+        }
+        
+        template = get_template(template_path)
+        html = template.render(context)
+        
+        # Crear PDF
+        contenido = BytesIO()
+        with cronometro_pdf('ficha_clinica'):
+            pisa_status = pisa.CreatePDF(
+               html, dest=contenido
+            )
+        
+        if pisa_status.err:
+           return HttpResponse('Error al generar PDF <pre>' + html + '</pre>')
+        
+        ruta = cache_pdf.guardar(parto_id, clave, contenido.getvalue())
     
-    # Crear PDF
-    pisa_status = pisa.CreatePDF(
-       html, dest=response
+    pie = (
+        f'Generado el {timezone.localtime():%d/%m/%Y %H:%M} por {request.user.get_full_name()} | Sistema HHM'
     )
-    
-    if pisa_status.err:
-       return HttpResponse('Error al generar PDF <pre>' + html + '</pre>')
-       
+    response = HttpResponse(cache_pdf.con_pie(ruta, pie), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="ficha_clinica_{parto_id}.pdf"'
+    response['Cache-Control'] = 'private, no-cache'
     return response
 
 
@@ -73,8 +126,11 @@ def listado_alertas(request):
     if nivel_filtro:
         alertas = alertas.filter(nivel_urgencia=nivel_filtro)
     
-    # Ordenar por urgencia y fecha
-    alertas = alertas.order_by('-nivel_urgencia', '-fecha_hora_alerta')
+    # Más recientes primero, paginadas por cursor sobre (fecha_hora_alerta, id)
+    pagina = paginar_keyset(
+        alertas, Alerta, request.GET.get('cursor'), tamano=50,
+        campos=('fecha_hora_alerta', 'id'), contar=True
+    ).con_enlaces(request.GET)
     
     # Estadísticas
     stats = {
@@ -84,13 +140,13 @@ def listado_alertas(request):
             estado__in=['ACTIVA', 'EN_ATENCION'],
             nivel_urgencia='CRITICA'
         ).count(),
-        'hoy': Alerta.objects.filter(
-            fecha_hora_alerta__date=timezone.now().date()
+        'hoy': Alerta.objects.del_dia(
+            'fecha_hora_alerta', timezone.localdate()
         ).count(),
     }
     
     context = {
-        'alertas': alertas[:50],  # Limitar a 50 resultados
+        'alertas': pagina,
         'stats': stats,
         'estado_filtro': estado_filtro,
         'tipo_filtro': tipo_filtro,
@@ -98,6 +154,7 @@ def listado_alertas(request):
         'tipos_alerta': Alerta.TIPO_ALERTA_CHOICES,
         'niveles_urgencia': Alerta.NIVEL_URGENCIA_CHOICES,
         'estados': Alerta.ESTADO_CHOICES,
+        'alertas_en_vivo': True,
     }
     
     return render(request, 'reportes/alertas.html', context)
@@ -112,6 +169,7 @@ def detalle_alerta(request, alerta_id):
     
     context = {
         'alerta': alerta,
+        'alertas_en_vivo': True,
     }
     
     return render(request, 'reportes/detalle_alerta.html', context)
@@ -157,25 +215,34 @@ def resolver_alerta(request, alerta_id):
 
 
 @login_required
+@en_replica
 def dashboard_alertas(request):
     """
     Dashboard con métricas y gráficos de alertas.
     """
     # Rango de fechas (últimos 7 días)
-    hoy = timezone.now().date()
+    hoy = timezone.localdate()
     hace_7_dias = hoy - timedelta(days=7)
     
-    # Alertas por tipo
-    alertas_por_tipo = Alerta.objects.filter(
-        fecha_hora_alerta__date__gte=hace_7_dias
-    ).values('tipo').annotate(total=Count('id')).order_by('-total')
-    
-    # Alertas por día
-    alertas_por_dia = Alerta.objects.filter(
-        fecha_hora_alerta__date__gte=hace_7_dias
-    ).extra(
-        select={'dia': 'DATE(fecha_hora_alerta)'}
-    ).values('dia').annotate(total=Count('id')).order_by('dia')
+    # Alertas por tipo y por día desde la tabla de resumen diaria
+    resumen = resumir_rango(hace_7_dias, hoy)
+    alertas_por_tipo = sorted(
+        [{'tipo': tipo, 'total': total} for tipo, total in resumen.alertas_por_tipo.items()],
+        key=lambda item: -item['total']
+    )
+    alertas_por_dia = [
+        {'dia': dia, 'fecha': dia, 'total': total}
+        for dia, total in serie_diaria(hace_7_dias, hoy, 'alertas_total')
+    ]
+    
+    # Estados del período (la tabla de resumen no guarda el estado)
+    estados = Alerta.objects.entre_fechas(
+        'fecha_hora_alerta', hace_7_dias
+    ).aggregate(
+        activas=Count('id', filter=Q(estado='ACTIVA')),
+        resueltas=Count('id', filter=Q(estado='RESUELTA')),
+        criticas=Count('id', filter=Q(nivel_urgencia='CRITICA')),
+    )
     
     # Alertas críticas activas
     alertas_criticas = Alerta.objects.filter(
@@ -202,6 +269,16 @@ def dashboard_alertas(request):
         'alertas_por_dia': alertas_por_dia,
         'alertas_criticas': alertas_criticas,
         'tiempo_promedio_resolucion': round(tiempo_promedio, 1),
+        'stats': {
+            'total_alertas': resumen.alertas_total,
+            'alertas_activas': estados['activas'],
+            'alertas_resueltas': estados['resueltas'],
+            'alertas_criticas': estados['criticas'],
+            'tiempo_promedio_resolucion': round(tiempo_promedio, 1),
+            'alertas_por_tipo': alertas_por_tipo,
+            'alertas_por_dia': alertas_por_dia,
+        },
+        'alertas_en_vivo': True,
     }
     
     return render(request, 'reportes/dashboard_alertas.html', context)
@@ -211,22 +288,44 @@ def dashboard_alertas(request):
 def api_alertas_activas(request):
     """
     API JSON para obtener alertas activas (para notificaciones en tiempo real).
+    Lee la instantánea compartida del canal de alertas.
     """
-    alertas = Alerta.objects.filter(
-        estado='ACTIVA'
-    ).values(
-        'id', 'tipo', 'nivel_urgencia', 'titulo', 
-        'descripcion', 'fecha_hora_alerta'
-    ).order_by('-nivel_urgencia', '-fecha_hora_alerta')[:10]
-    
-    return JsonResponse({
-        'alertas': list(alertas),
-        'total': Alerta.objects.filter(estado='ACTIVA').count(),
-        'criticas': Alerta.objects.filter(
-            estado='ACTIVA', 
-            nivel_urgencia='CRITICA'
-        ).count(),
-    })
+    return JsonResponse(feed.actual())
+
+
+def _eventos_alertas(duracion):
+    """Genera eventos SSE con cada nueva versión de las alertas activas."""
+    limite = time.monotonic() + duracion
+    version = None
+    yield f'retry: {settings.ALERTAS_SSE_REINTENTO_MS}\n\n'
+    while time.monotonic() < limite:
+        instantanea = feed.esperar(version, timeout=settings.ALERTAS_SSE_LATIDO)
+        if instantanea['version'] == version:
+            yield ': latido\n\n'
+            continue
+        version = instantanea['version']
+        datos = json.dumps(instantanea, cls=DjangoJSONEncoder)
+        yield f'id: {version}\nevent: alertas\ndata: {datos}\n\n'
+
+
+@login_required
+def stream_alertas_activas(request):
+    """
+    Canal Server-Sent Events de alertas activas. Envía la instantánea al
+    conectar y luego solo cuando cambia. La conexión se cierra después de
+    ALERTAS_SSE_DURACION segundos y el navegador se reconecta solo.
+
+    Cada conexión ocupa un hilo del servidor mientras está abierta, por lo
+    que solo la abren las páginas de alertas (contexto alertas_en_vivo) y
+    en producción se requieren workers con hilos (ver README).
+    """
+    response = StreamingHttpResponse(
+        _eventos_alertas(settings.ALERTAS_SSE_DURACION),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @login_required
@@ -259,77 +358,134 @@ def seleccionar_reporte(request):
 @rol_requerido('jefe_servicio', 'medico_obstetra')
 def generar_reporte_pdf(request, tipo, fecha_inicio, fecha_fin):
     """
-    Genera un PDF con el reporte seleccionado.
+    Encola la generación del PDF del reporte seleccionado y redirige a la
+    página de estado. Si ya existe un PDF vigente para el mismo tipo y
+    rango de fechas, se reutiliza.
     """
-    fecha_inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
-    fecha_fin = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
-    
-    # Obtener datos según el tipo de reporte
-    context = {
-        'fecha_inicio': fecha_inicio,
-        'fecha_fin': fecha_fin,
-        'fecha_generacion': datetime.now(),
-        'usuario': request.user,
-    }
-    
-    if tipo == 'partos_periodo':
-        context.update(_get_partos_periodo_data(fecha_inicio, fecha_fin))
-        template_name = 'reportes/pdf/partos_periodo.html'
-        filename = f'Reporte_Partos_{fecha_inicio}_{fecha_fin}.pdf'
-        
-    elif tipo == 'partos_robson':
-        context.update(_get_robson_data(fecha_inicio, fecha_fin))
-        template_name = 'reportes/pdf/partos_robson.html'
-        filename = f'Reporte_Robson_{fecha_inicio}_{fecha_fin}.pdf'
-        
-    elif tipo == 'cesarea_tasa':
-        context.update(_get_cesarea_data(fecha_inicio, fecha_fin))
-        template_name = 'reportes/pdf/cesarea_tasa.html'
-        filename = f'Reporte_Cesareas_{fecha_inicio}_{fecha_fin}.pdf'
-        
-    elif tipo == 'neonatologia':
-        context.update(_get_neonatologia_data(fecha_inicio, fecha_fin))
-        template_name = 'reportes/pdf/neonatologia.html'
-        filename = f'Reporte_Neonatologia_{fecha_inicio}_{fecha_fin}.pdf'
-        
-    elif tipo == 'apgar_critico':
-        context.update(_get_apgar_critico_data(fecha_inicio, fecha_fin))
-        template_name = 'reportes/pdf/apgar_critico.html'
-        filename = f'Reporte_APGAR_Critico_{fecha_inicio}_{fecha_fin}.pdf'
-        
-    elif tipo == 'bajo_peso':
-        context.update(_get_bajo_peso_data(fecha_inicio, fecha_fin))
-        template_name = 'reportes/pdf/bajo_peso.html'
-        filename = f'Reporte_Bajo_Peso_{fecha_inicio}_{fecha_fin}.pdf'
-        
-    elif tipo == 'alertas':
-        context.update(_get_alertas_data(fecha_inicio, fecha_fin))
-        template_name = 'reportes/pdf/alertas.html'
-        filename = f'Reporte_Alertas_{fecha_inicio}_{fecha_fin}.pdf'
-        
-    elif tipo == 'resumen_mensual':
-        context.update(_get_resumen_mensual_data(fecha_inicio, fecha_fin))
-        template_name = 'reportes/pdf/resumen_mensual.html'
-        filename = f'Resumen_Mensual_{fecha_inicio}_{fecha_fin}.pdf'
-    else:
+    if tipo not in REPORTES:
         messages.error(request, 'Tipo de reporte no válido.')
         return redirect('seleccionar_reporte')
     
-    # Generar PDF
-    template = get_template(template_name)
-    html = template.render(context)
+    try:
+        fecha_inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
+        fecha_fin = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
+    except ValueError:
+        messages.error(request, 'Formato de fecha inválido.')
+        return redirect('seleccionar_reporte')
     
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    trabajo = encolar_reporte(tipo, fecha_inicio, fecha_fin, request.user)
+    return redirect('estado_reporte', trabajo_id=trabajo.id)
+
+
+@login_required
+@rol_requerido('jefe_servicio', 'medico_obstetra')
+def estado_reporte(request, trabajo_id):
+    """
+    Estado de un trabajo de reporte. Responde JSON si se solicita con
+    ?formato=json (para consultas desde JavaScript).
+    """
+    trabajo = get_object_or_404(TrabajoReporte, pk=trabajo_id)
+    
+    if request.GET.get('formato') == 'json':
+        return JsonResponse({
+            'id': trabajo.id,
+            'estado': trabajo.estado,
+            'error': trabajo.error,
+            'url_descarga': reverse('descargar_reporte', args=[trabajo.id]) if trabajo.completado else None,
+        })
     
-    pisa_status = pisa.CreatePDF(html, dest=response)
+    return render(request, 'reportes/estado_reporte.html', {
+        'trabajo': trabajo,
+        'nombre_reporte': dict(ReporteForm.TIPO_REPORTE_CHOICES).get(trabajo.tipo, trabajo.tipo),
+        'exportable': trabajo.tipo in EXPORTACIONES,
+    })
+
+
+@login_required
+@rol_requerido('jefe_servicio', 'medico_obstetra')
+def descargar_reporte(request, trabajo_id):
+    """
+    Descarga el PDF generado por un trabajo completado, con el pie de
+    quién lo descarga y cuándo.
+    """
+    trabajo = get_object_or_404(TrabajoReporte, pk=trabajo_id)
+    ruta = ruta_archivo(trabajo)
+    
+    if not trabajo.completado or ruta is None or not ruta.exists():
+        messages.warning(request, 'El reporte aún no está disponible.')
+        return redirect('estado_reporte', trabajo_id=trabajo.id)
+    
+    pie = (
+        f'Descargado el {timezone.localtime():%d/%m/%Y %H:%M} por {request.user.get_full_name()} | Sistema HHM'
+    )
+    response = HttpResponse(cache_pdf.con_pie(ruta, pie), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{trabajo.nombre_descarga}"'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+@rol_requerido('jefe_servicio', 'medico_obstetra')
+def exportar_reporte(request, tipo):
+    """
+    Exporta los registros de un reporte en CSV (por defecto) o XLSX.
+    Parámetros GET: fecha_inicio, fecha_fin (YYYY-MM-DD) y formato.
+    El CSV se envía a medida que se leen los bloques de la BD.
+    """
+    exportacion = EXPORTACIONES.get(tipo)
+    if exportacion is None:
+        messages.error(request, 'Este reporte no tiene datos exportables.')
+        return redirect('seleccionar_reporte')
     
-    if pisa_status.err:
-        return HttpResponse('Error al generar el PDF', status=500)
+    try:
+        fecha_inicio = datetime.strptime(request.GET.get('fecha_inicio', ''), '%Y-%m-%d').date()
+        fecha_fin = datetime.strptime(request.GET.get('fecha_fin', ''), '%Y-%m-%d').date()
+    except ValueError:
+        messages.error(request, 'Formato de fecha inválido.')
+        return redirect('seleccionar_reporte')
     
+    nombre = f'{exportacion.nombre}_{fecha_inicio}_{fecha_fin}'
+    formato = request.GET.get('formato', 'csv')
+    
+    if formato == 'xlsx':
+        if not xlsx_disponible():
+            messages.error(request, 'La exportación a Excel no está disponible en este servidor.')
+            return redirect('seleccionar_reporte')
+        return FileResponse(
+            archivo_xlsx(exportacion, fecha_inicio, fecha_fin),
+            as_attachment=True,
+            filename=f'{nombre}.xlsx',
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+    
+    response = StreamingHttpResponse(
+        filas_csv(exportacion, fecha_inicio, fecha_fin),
+        content_type='text/csv; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{nombre}.csv"'
     return response
 
 
+@en_replica
+def construir_reporte(tipo, fecha_inicio, fecha_fin):
+    """
+    Construye el HTML de un reporte. Retorna (html, nombre_archivo).
+    Usado por el worker de la cola de PDF; el PDF se comparte entre
+    usuarios, por lo que no incluye quién lo solicita.
+    """
+    funcion, template_name, prefijo = REPORTES[tipo]
+    
+    context = {
+        'fecha_inicio': fecha_inicio,
+        'fecha_fin': fecha_fin,
+        'fecha_generacion': datetime.now(),
+    }
+    context.update(funcion(fecha_inicio, fecha_fin))
+    
+    html = get_template(template_name).render(context)
+    return html, f'{prefijo}_{fecha_inicio}_{fecha_fin}.pdf'
+
+
 # Funciones auxiliares para obtener datos de cada reporte
 
 def _get_partos_periodo_data(fecha_inicio, fecha_fin):
@@ -338,17 +494,15 @@ def _get_partos_periodo_data(fecha_inicio, fecha_fin):
         fecha_parto__range=[fecha_inicio, fecha_fin]
     ).select_related('paciente', 'usuario_registro')
     
-    total_partos = partos.count()
-    partos_vaginales = partos.filter(tipo_parto='vaginal').count()
-    cesareas = partos.filter(tipo_parto__in=['cesarea_electiva', 'cesarea_urgencia']).count()
+    resumen = agregar_partos(partos)
     
     return {
         'partos': partos,
-        'total_partos': total_partos,
-        'partos_vaginales': partos_vaginales,
-        'cesareas': cesareas,
-        'tasa_cesarea': round((cesareas / total_partos * 100), 2) if total_partos > 0 else 0,
-        'porcentaje_vaginales': round((partos_vaginales / total_partos * 100), 2) if total_partos > 0 else 0,
+        'total_partos': resumen.total,
+        'partos_vaginales': resumen.vaginales,
+        'cesareas': resumen.cesareas,
+        'tasa_cesarea': resumen.tasa_cesarea,
+        'porcentaje_vaginales': resumen.porcentaje_vaginales,
     }
 
 
@@ -356,21 +510,11 @@ def _get_robson_data(fecha_inicio, fecha_fin):
     """Obtiene datos de clasificación Robson."""
     partos = Parto.objects.filter(fecha_parto__range=[fecha_inicio, fecha_fin])
     
-    # Agrupar por grupo Robson
-    robson_grupos = partos.values('grupo_robson').annotate(
-        total=Count('id'),
-        cesareas=Count('id', filter=Q(tipo_parto__in=['cesarea_electiva', 'cesarea_urgencia']))
-    ).order_by('grupo_robson')
-    
-    # Calcular porcentajes
-    total_partos = partos.count()
-    for grupo in robson_grupos:
-        grupo['porcentaje'] = round((grupo['total'] / total_partos * 100), 2) if total_partos > 0 else 0
-        grupo['tasa_cesarea'] = round((grupo['cesareas'] / grupo['total'] * 100), 2) if grupo['total'] > 0 else 0
+    resumen = agregar_robson(partos)
     
     return {
-        'robson_grupos': robson_grupos,
-        'total_partos': total_partos,
+        'robson_grupos': resumen.grupos,
+        'total_partos': resumen.total,
     }
 
 
@@ -378,11 +522,9 @@ def _get_cesarea_data(fecha_inicio, fecha_fin):
     """Obtiene datos de tasa de cesáreas."""
     partos = Parto.objects.filter(fecha_parto__range=[fecha_inicio, fecha_fin])
     
-    total_partos = partos.count()
-    cesareas_electiva = partos.filter(tipo_parto='cesarea_electiva').count()
-    cesareas_urgencia = partos.filter(tipo_parto='cesarea_urgencia').count()
-    total_cesareas = cesareas_electiva + cesareas_urgencia
-    total_vaginales = partos.filter(tipo_parto='vaginal').count()
+    resumen = agregar_partos(partos)
+    total_partos = resumen.total
+    total_cesareas = resumen.cesareas
     
     # Indicaciones de cesárea (simulado - adaptar según campo real)
     indicaciones = [
@@ -395,200 +537,151 @@ def _get_cesarea_data(fecha_inicio, fecha_fin):
     
     return {
         'total_partos': total_partos,
-        'cesareas_electiva': cesareas_electiva,
-        'cesareas_urgencia': cesareas_urgencia,
+        'cesareas_electiva': resumen.cesareas_electiva,
+        'cesareas_urgencia': resumen.cesareas_urgencia,
         'total_cesareas': total_cesareas,
-        'total_vaginales': total_vaginales,
-        'tasa_cesarea': round((total_cesareas / total_partos * 100), 2) if total_partos > 0 else 0,
-        'porcentaje_electiva': round((cesareas_electiva / total_cesareas * 100), 2) if total_cesareas > 0 else 0,
-        'porcentaje_urgencia': round((cesareas_urgencia / total_cesareas * 100), 2) if total_cesareas > 0 else 0,
-        'porcentaje_electiva_total': round((cesareas_electiva / total_partos * 100), 2) if total_partos > 0 else 0,
-        'porcentaje_urgencia_total': round((cesareas_urgencia / total_partos * 100), 2) if total_partos > 0 else 0,
+        'total_vaginales': resumen.vaginales,
+        'tasa_cesarea': resumen.tasa_cesarea,
+        'porcentaje_electiva': porcentaje(resumen.cesareas_electiva, total_cesareas),
+        'porcentaje_urgencia': porcentaje(resumen.cesareas_urgencia, total_cesareas),
+        'porcentaje_electiva_total': porcentaje(resumen.cesareas_electiva, total_partos),
+        'porcentaje_urgencia_total': porcentaje(resumen.cesareas_urgencia, total_partos),
         'indicaciones': indicaciones,
     }
 
 
 def _get_neonatologia_data(fecha_inicio, fecha_fin):
     """Obtiene datos neonatales."""
-    rn = RecienNacido.objects.filter(
-        created_at__date__range=[fecha_inicio, fecha_fin]
-    ).select_related('parto__paciente')
-    
-    total_rn = rn.count()
-    rn_bajo_peso_count = rn.filter(peso_gramos__lt=2500, peso_gramos__gte=1500).count()
-    rn_muy_bajo_peso = rn.filter(peso_gramos__lt=1500).count()
-    rn_peso_normal = rn.filter(peso_gramos__gte=2500, peso_gramos__lt=4000).count()
-    rn_macrosomico = rn.filter(peso_gramos__gte=4000).count()
-    
-    # APGAR por categorías
-    apgar_1_critico = rn.filter(apgar_1_min__lte=3).count()
-    apgar_1_moderado = rn.filter(apgar_1_min__gte=4, apgar_1_min__lte=6).count()
-    apgar_1_normal = rn.filter(apgar_1_min__gte=7).count()
-    
-    apgar_5_critico = rn.filter(apgar_5_min__lte=3).count()
-    apgar_5_moderado = rn.filter(apgar_5_min__gte=4, apgar_5_min__lte=6).count()
-    apgar_5_normal = rn.filter(apgar_5_min__gte=7).count()
-    
-    rn_reanimacion = rn.filter(reanimacion_requerida=True).count()
-    rn_no_reanimacion = total_rn - rn_reanimacion
+    rn = RecienNacido.objects.entre_fechas('created_at', fecha_inicio, fecha_fin)
     
-    peso_promedio = rn.aggregate(Avg('peso_gramos'))['peso_gramos__avg']
-    apgar_1_promedio = rn.aggregate(Avg('apgar_1_min'))['apgar_1_min__avg']
-    apgar_5_promedio = rn.aggregate(Avg('apgar_5_min'))['apgar_5_min__avg']
+    resumen = agregar_recien_nacidos(rn)
+    total_rn = resumen.total
     
     return {
         'total_rn': total_rn,
-        'rn_bajo_peso': rn_bajo_peso_count,
-        'rn_muy_bajo_peso': rn_muy_bajo_peso,
-        'rn_peso_normal': rn_peso_normal,
-        'rn_macrosomico': rn_macrosomico,
-        'apgar_1_critico': apgar_1_critico,
-        'apgar_1_moderado': apgar_1_moderado,
-        'apgar_1_normal': apgar_1_normal,
-        'apgar_5_critico': apgar_5_critico,
-        'apgar_5_moderado': apgar_5_moderado,
-        'apgar_5_normal': apgar_5_normal,
-        'rn_reanimacion': rn_reanimacion,
-        'rn_no_reanimacion': rn_no_reanimacion,
-        'peso_promedio': round(peso_promedio, 0) if peso_promedio else 0,
-        'apgar_1_promedio': round(apgar_1_promedio, 1) if apgar_1_promedio else 0,
-        'apgar_5_promedio': round(apgar_5_promedio, 1) if apgar_5_promedio else 0,
-        'porcentaje_bajo_peso': round(((rn_bajo_peso_count + rn_muy_bajo_peso) / total_rn * 100), 2) if total_rn > 0 else 0,
-        'porcentaje_muy_bajo_peso': round((rn_muy_bajo_peso / total_rn * 100), 2) if total_rn > 0 else 0,
-        'porcentaje_peso_normal': round((rn_peso_normal / total_rn * 100), 2) if total_rn > 0 else 0,
-        'porcentaje_macrosomico': round((rn_macrosomico / total_rn * 100), 2) if total_rn > 0 else 0,
-        'porcentaje_reanimacion': round((rn_reanimacion / total_rn * 100), 2) if total_rn > 0 else 0,
-        'porcentaje_no_reanimacion': round((rn_no_reanimacion / total_rn * 100), 2) if total_rn > 0 else 0,
+        'rn_bajo_peso': resumen.bajo_peso,
+        'rn_muy_bajo_peso': resumen.muy_bajo_peso,
+        'rn_peso_normal': resumen.peso_normal,
+        'rn_macrosomico': resumen.macrosomico,
+        'apgar_1_critico': resumen.apgar_1_critico,
+        'apgar_1_moderado': resumen.apgar_1_moderado,
+        'apgar_1_normal': resumen.apgar_1_normal,
+        'apgar_5_critico': resumen.apgar_5_critico,
+        'apgar_5_moderado': resumen.apgar_5_moderado,
+        'apgar_5_normal': resumen.apgar_5_normal,
+        'rn_apgar_bajo': resumen.apgar_5_bajo,
+        'rn_reanimacion': resumen.reanimacion,
+        'rn_no_reanimacion': resumen.no_reanimacion,
+        'peso_promedio': resumen.peso_promedio,
+        'apgar_1_promedio': resumen.apgar_1_promedio,
+        'apgar_5_promedio': resumen.apgar_5_promedio,
+        'porcentaje_bajo_peso': porcentaje(resumen.bajo_peso + resumen.muy_bajo_peso, total_rn),
+        'porcentaje_muy_bajo_peso': porcentaje(resumen.muy_bajo_peso, total_rn),
+        'porcentaje_peso_normal': porcentaje(resumen.peso_normal, total_rn),
+        'porcentaje_macrosomico': porcentaje(resumen.macrosomico, total_rn),
+        'porcentaje_reanimacion': porcentaje(resumen.reanimacion, total_rn),
+        'porcentaje_no_reanimacion': porcentaje(resumen.no_reanimacion, total_rn),
     }
 
 
 def _get_apgar_critico_data(fecha_inicio, fecha_fin):
     """Obtiene datos de RN con APGAR crítico."""
-    rn_criticos = RecienNacido.objects.filter(
-        created_at__date__range=[fecha_inicio, fecha_fin]
+    rn_criticos = RecienNacido.objects.entre_fechas(
+        'created_at', fecha_inicio, fecha_fin
     ).filter(
         Q(apgar_1_min__lt=7) | Q(apgar_5_min__lt=7)
     ).select_related('parto__paciente').order_by('apgar_5_min')
     
-    apgar_1_critico = rn_criticos.filter(apgar_1_min__lt=7).count()
-    apgar_5_critico = rn_criticos.filter(apgar_5_min__lt=7).count()
-    rn_reanimacion = rn_criticos.filter(reanimacion_requerida=True).count()
+    resumen = agregar_apgar_critico(rn_criticos)
     
     return {
         'recien_nacidos': rn_criticos,
-        'total_criticos': rn_criticos.count(),
-        'apgar_1_critico': apgar_1_critico,
-        'apgar_5_critico': apgar_5_critico,
-        'rn_reanimacion': rn_reanimacion,
+        'total_criticos': resumen.total,
+        'apgar_1_critico': resumen.apgar_1_critico,
+        'apgar_5_critico': resumen.apgar_5_critico,
+        'rn_reanimacion': resumen.reanimacion,
     }
 
 
 def _get_bajo_peso_data(fecha_inicio, fecha_fin):
     """Obtiene datos de RN con bajo peso."""
-    rn_bajo_peso = RecienNacido.objects.filter(
-        created_at__date__range=[fecha_inicio, fecha_fin],
-        peso_gramos__lt=2500
-    ).select_related('parto__paciente').order_by('peso_gramos')
+    rn_bajo_peso = RecienNacido.objects.entre_fechas(
+        'created_at', fecha_inicio, fecha_fin
+    ).filter(peso_gramos__lt=2500).select_related('parto__paciente').order_by('peso_gramos')
     
-    rn_muy_bajo_peso_count = rn_bajo_peso.filter(peso_gramos__lt=1500).count()
-    rn_pretermino = rn_bajo_peso.filter(parto__edad_gestacional__lt=37).count()
-    peso_promedio = rn_bajo_peso.aggregate(Avg('peso_gramos'))['peso_gramos__avg']
+    resumen = agregar_bajo_peso(rn_bajo_peso)
     
     return {
         'recien_nacidos': rn_bajo_peso,
-        'total_bajo_peso': rn_bajo_peso.count(),
-        'rn_muy_bajo_peso': rn_muy_bajo_peso_count,
-        'rn_pretermino': rn_pretermino,
-        'peso_promedio': round(peso_promedio, 0) if peso_promedio else 0,
+        'total_bajo_peso': resumen.total,
+        'rn_muy_bajo_peso': resumen.muy_bajo_peso,
+        'rn_pretermino': resumen.pretermino,
+        'peso_promedio': resumen.peso_promedio,
     }
 
 
 def _get_alertas_data(fecha_inicio, fecha_fin):
     """Obtiene datos de alertas."""
-    alertas = Alerta.objects.filter(
-        fecha_hora_alerta__date__range=[fecha_inicio, fecha_fin]
+    alertas = Alerta.objects.entre_fechas(
+        'fecha_hora_alerta', fecha_inicio, fecha_fin
     ).select_related('paciente', 'recien_nacido', 'usuario_genera')
     
-    total_alertas = alertas.count()
-    
-    # Alertas por tipo
-    alertas_por_tipo = []
-    for tipo_alert in alertas.values('tipo').annotate(total=Count('id')).order_by('-total'):
-        total = tipo_alert['total']
-        criticas = alertas.filter(tipo=tipo_alert['tipo'], nivel_urgencia='CRITICA').count()
-        alertas_por_tipo.append({
-            'tipo': tipo_alert['tipo'],
-            'total': total,
-            'porcentaje': round((total / total_alertas * 100), 2) if total_alertas > 0 else 0,
-            'criticas': criticas,
-        })
-    
-    # Alertas por nivel de urgencia
-    alertas_por_nivel = []
-    for nivel in alertas.values('nivel_urgencia').annotate(total=Count('id')):
-        total = nivel['total']
-        pendientes = alertas.filter(nivel_urgencia=nivel['nivel_urgencia'], estado__in=['ACTIVA', 'EN_ATENCION']).count()
-        resueltas = alertas.filter(nivel_urgencia=nivel['nivel_urgencia'], estado='RESUELTA').count()
-        alertas_por_nivel.append({
-            'nivel': nivel['nivel_urgencia'].lower() if nivel['nivel_urgencia'] else 'bajo',
-            'total': total,
-            'porcentaje': round((total / total_alertas * 100), 2) if total_alertas > 0 else 0,
-            'pendientes': pendientes,
-            'resueltas': resueltas,
-        })
-    
-    # Alertas por estado
-    alertas_por_estado = []
-    for estado in alertas.values('estado').annotate(total=Count('id')):
-        total = estado['total']
-        alertas_por_estado.append({
-            'estado': estado['estado'].lower() if estado['estado'] else 'pendiente',
-            'total': total,
-            'porcentaje': round((total / total_alertas * 100), 2) if total_alertas > 0 else 0,
-        })
-    
-    alertas_criticas = alertas.filter(nivel_urgencia='CRITICA').count()
-    alertas_pendientes = alertas.filter(estado__in=['ACTIVA', 'EN_ATENCION']).count()
-    alertas_resueltas = alertas.filter(estado='RESUELTA').count()
-    tasa_resolucion = round((alertas_resueltas / total_alertas * 100), 2) if total_alertas > 0 else 0
+    resumen = agregar_alertas(alertas)
     
     return {
-        'total_alertas': total_alertas,
-        'alertas_por_tipo': alertas_por_tipo,
-        'alertas_por_nivel': alertas_por_nivel,
-        'alertas_por_estado': alertas_por_estado,
-        'alertas_criticas': alertas_criticas,
-        'alertas_pendientes': alertas_pendientes,
-        'alertas_resueltas': alertas_resueltas,
-        'tasa_resolucion': tasa_resolucion,
+        'total_alertas': resumen.total,
+        'alertas_por_tipo': resumen.por_tipo,
+        'alertas_por_nivel': resumen.por_nivel,
+        'alertas_por_estado': resumen.por_estado,
+        'alertas_criticas': resumen.criticas,
+        'alertas_pendientes': resumen.pendientes,
+        'alertas_resueltas': resumen.resueltas,
+        'tasa_resolucion': resumen.tasa_resolucion,
         'tiempo_promedio_resolucion': None,  # Calcular si hay campo de tiempo
         'alertas': alertas[:50],  # Primeras 50
     }
 
 
 def _get_resumen_mensual_data(fecha_inicio, fecha_fin):
-    """Obtiene resumen completo mensual."""
-    # Combinar todos los datos
-    partos_data = _get_partos_periodo_data(fecha_inicio, fecha_fin)
-    robson_data = _get_robson_data(fecha_inicio, fecha_fin)
-    cesarea_data = _get_cesarea_data(fecha_inicio, fecha_fin)
-    neo_data = _get_neonatologia_data(fecha_inicio, fecha_fin)
-    alertas_data = _get_alertas_data(fecha_inicio, fecha_fin)
+    """
+    Obtiene resumen completo mensual.
+    Lee la tabla de resumen EstadisticaDiaria (una fila por día)
+    en lugar de recorrer partos, recién nacidos y alertas.
+    """
+    resumen = resumir_rango(fecha_inicio, fecha_fin)
+    resumen_partos = resumen.partos()
+    resumen_rn = resumen.recien_nacidos()
     
     # Pacientes nuevas
-    pacientes_nuevas = PacienteMadre.objects.filter(
-        created_at__date__range=[fecha_inicio, fecha_fin]
+    pacientes_nuevas = PacienteMadre.objects.entre_fechas(
+        'created_at', fecha_inicio, fecha_fin
     ).count()
     
     return {
-        **partos_data,
-        'robson_grupos': robson_data['robson_grupos'],
-        'tasa_cesarea': cesarea_data['tasa_cesarea'],
-        'total_rn': neo_data['total_rn'],
-        'peso_promedio': neo_data['peso_promedio'],
-        'apgar_5_promedio': neo_data['apgar_5_promedio'],
-        'rn_bajo_peso': neo_data['rn_bajo_peso'],
-        'rn_apgar_bajo': neo_data['rn_apgar_bajo'],
-        'total_alertas': alertas_data['total_alertas'],
+        'total_partos': resumen_partos.total,
+        'partos_vaginales': resumen_partos.vaginales,
+        'cesareas': resumen_partos.cesareas,
+        'tasa_cesarea': resumen_partos.tasa_cesarea,
+        'porcentaje_vaginales': resumen_partos.porcentaje_vaginales,
+        'robson_grupos': resumen.robson().grupos,
+        'total_rn': resumen_rn.total,
+        'peso_promedio': resumen_rn.peso_promedio,
+        'apgar_5_promedio': resumen_rn.apgar_5_promedio,
+        'rn_bajo_peso': resumen_rn.bajo_peso,
+        'rn_apgar_bajo': resumen_rn.apgar_5_bajo,
+        'total_alertas': resumen.alertas_total,
         'pacientes_nuevas': pacientes_nuevas,
     }
+
+
+# Tipo de reporte -> (función de datos, template, prefijo del archivo)
+REPORTES = {
+    'partos_periodo': (_get_partos_periodo_data, 'reportes/pdf/partos_periodo.html', 'Reporte_Partos'),
+    'partos_robson': (_get_robson_data, 'reportes/pdf/partos_robson.html', 'Reporte_Robson'),
+    'cesarea_tasa': (_get_cesarea_data, 'reportes/pdf/cesarea_tasa.html', 'Reporte_Cesareas'),
+    'neonatologia': (_get_neonatologia_data, 'reportes/pdf/neonatologia.html', 'Reporte_Neonatologia'),
+    'apgar_critico': (_get_apgar_critico_data, 'reportes/pdf/apgar_critico.html', 'Reporte_APGAR_Critico'),
+    'bajo_peso': (_get_bajo_peso_data, 'reportes/pdf/bajo_peso.html', 'Reporte_Bajo_Peso'),
+    'alertas': (_get_alertas_data, 'reportes/pdf/alertas.html', 'Reporte_Alertas'),
+    'resumen_mensual': (_get_resumen_mensual_data, 'reportes/pdf/resumen_mensual.html', 'Resumen_Mensual'),
+}
@@ -49,13 +49,17 @@ INSTALLED_APPS = [
 # Custom User Model
 AUTH_USER_MODEL = 'administracion.Usuario'
 
-# Authentication Backends
+# Authentication Backends. RUTAuthenticationBackend busca por RUT y por
+# username y hereda los permisos de ModelBackend; no se agrega ModelBackend
+# para no repetir la búsqueda ni el hash de un identificador inexistente.
 AUTHENTICATION_BACKENDS = [
     'apps.administracion.backends.RUTAuthenticationBackend',
-    'django.contrib.auth.backends.ModelBackend',
 ]
 
 MIDDLEWARE = [
+    'apps.administracion.consultas.MedidorConsultasMiddleware',
+    'apps.administracion.metricas.MetricasMiddleware',
+    'apps.administracion.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -89,13 +93,201 @@ WSGI_APPLICATION = 'hospital_hhm.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
+#
+# BD_PERFIL elige el motor:
+# - 'sqlite' (por defecto): sitios pequeños y desarrollo. Al abrir cada
+#   conexión se aplican SQLITE_PRAGMAS (WAL, synchronous=NORMAL, espera ante
+#   bloqueos) desde apps.administracion.signals.
+# - 'postgresql': producción con uso concurrente. Conexiones persistentes
+#   (CONN_MAX_AGE) verificadas antes de reutilizarse y límites de tiempo por
+#   sentencia, bloqueo y transacción inactiva. Django 4.2 no trae pool
+#   propio: cada worker mantiene su conexión y, si hay más workers que
+#   conexiones disponibles, se antepone PgBouncer en modo transacción
+#   (BD_PGBOUNCER=True). En ese caso los límites de tiempo se configuran en
+#   el rol (ALTER ROLE ... SET statement_timeout) y no en la conexión.
+
+BD_PERFIL = config('BD_PERFIL', default='sqlite')
+
+if BD_PERFIL == 'postgresql':
+    BD_PGBOUNCER = config('BD_PGBOUNCER', default=False, cast=bool)
+    _opciones_pg = {
+        'connect_timeout': config('BD_CONNECT_TIMEOUT', default=5, cast=int),
+        'application_name': config('BD_APPLICATION_NAME', default='hospital_hhm'),
+    }
+    if not BD_PGBOUNCER:
+        _opciones_pg['options'] = ' '.join([
+            f"-c statement_timeout={config('BD_STATEMENT_TIMEOUT_MS', default=30000, cast=int)}",
+            f"-c lock_timeout={config('BD_LOCK_TIMEOUT_MS', default=5000, cast=int)}",
+            f"-c idle_in_transaction_session_timeout={config('BD_IDLE_TRANSACCION_MS', default=60000, cast=int)}",
+        ])
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DATABASE_NAME', default='hospital_hhm_db'),
+            'USER': config('DATABASE_USER', default='hospital_hhm'),
+            'PASSWORD': config('DATABASE_PASSWORD', default=''),
+            'HOST': config('DATABASE_HOST', default='localhost'),
+            'PORT': config('DATABASE_PORT', default='5432'),
+            'CONN_MAX_AGE': config('BD_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            # PgBouncer en modo transacción no admite cursores con nombre
+            'DISABLE_SERVER_SIDE_CURSORS': BD_PGBOUNCER,
+            'OPTIONS': _opciones_pg,
+        }
+    }
+elif BD_PERFIL == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('BD_SQLITE_NOMBRE', default=str(BASE_DIR / 'db.sqlite3')),
+            # Segundos que una escritura espera a que se libere el bloqueo
+            'OPTIONS': {'timeout': config('BD_SQLITE_TIMEOUT', default=20, cast=int)},
+        }
+    }
+else:
+    raise ValueError(f"BD_PERFIL inválido: {BD_PERFIL!r} (use 'sqlite' o 'postgresql')")
+
+# Réplica de lectura para reportes y dashboards (apps.administracion.replicas).
+# El alias existe siempre, pero solo se usa con BD_REPLICA=True; sin una
+# réplica configurada apunta a la misma BD que la primaria.
+BD_REPLICA = config('BD_REPLICA', default=False, cast=bool)
+BD_REPLICA_ALIAS = 'replica'
+if BD_PERFIL == 'postgresql':
+    DATABASES[BD_REPLICA_ALIAS] = {
+        **DATABASES['default'],
+        'HOST': config('BD_REPLICA_HOST', default=DATABASES['default']['HOST']),
+        'PORT': config('BD_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        # En los tests la réplica es una BD independiente
+        'TEST': {'NAME': f"test_{DATABASES['default']['NAME']}_replica"},
+    }
+else:
+    DATABASES[BD_REPLICA_ALIAS] = {
+        **DATABASES['default'],
+        'NAME': config('BD_REPLICA_SQLITE_NOMBRE', default=DATABASES['default']['NAME']),
+    }
+DATABASE_ROUTERS = ['apps.administracion.replicas.RouterReplica']
+# Retraso máximo tolerado, segundos que se lee de la primaria tras escribir
+# y cada cuánto se mide el retraso (por proceso)
+BD_REPLICA_RETRASO_MAX = config('BD_REPLICA_RETRASO_MAX', default=30, cast=float)
+BD_REPLICA_ADHERENCIA = config('BD_REPLICA_ADHERENCIA', default=15, cast=int)
+BD_REPLICA_VERIFICAR_CADA = config('BD_REPLICA_VERIFICAR_CADA', default=5, cast=float)
+
+# PRAGMA aplicados a cada conexión SQLite. En WAL las lecturas no bloquean a
+# la escritura (y viceversa); synchronous=NORMAL es seguro en WAL y evita un
+# fsync por transacción.
+SQLITE_PRAGMAS = {
+    'journal_mode': config('BD_SQLITE_JOURNAL', default='wal'),
+    'synchronous': 'normal',
+    'busy_timeout': config('BD_SQLITE_TIMEOUT', default=20, cast=int) * 1000,
+    'temp_store': 'memory',
+    'cache_size': -64000,  # 64 MB
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'hospital-hhm',
     }
 }
 
+# Segundos que se reutiliza la instantánea del usuario de la sesión
+# (apps.administracion.sesion): plazo máximo para que un bloqueo o cambio de
+# rol hecho en otro proceso se aplique
+SESION_USUARIO_TTL = config('SESION_USUARIO_TTL', default=10, cast=int)
+
+# Límite de intentos de inicio de sesión (apps.administracion.intentos_login):
+# fallos por identificador e IP antes de rechazar y de bloquear la cuenta,
+# fallos por IP con cualquier identificador, ventana de conteo en segundos y
+# cada cuántos segundos se escriben los fallos acumulados en la BD
+LOGIN_INTENTOS_MAX = config('LOGIN_INTENTOS_MAX', default=5, cast=int)
+LOGIN_INTENTOS_IP_MAX = config('LOGIN_INTENTOS_IP_MAX', default=30, cast=int)
+LOGIN_VENTANA = config('LOGIN_VENTANA', default=900, cast=int)
+LOGIN_LOTE_INTERVALO = config('LOGIN_LOTE_INTERVALO', default=5, cast=float)
+
+# Segundos que se mantienen en caché los datos del dashboard general
+DASHBOARD_CACHE_TTL = config('DASHBOARD_CACHE_TTL', default=60, cast=int)
+
+
+# Lista de tamizaje prenatal (apps.obstetricia.tamizaje): un embarazo sin
+# parto registrado sigue abierto hasta TAMIZAJE_SEMANAS_EMBARAZO semanas
+# desde la FUR; pacientes por página en la vista y en la API
+TAMIZAJE_SEMANAS_EMBARAZO = config('TAMIZAJE_SEMANAS_EMBARAZO', default=44, cast=int)
+TAMIZAJE_POR_PAGINA = config('TAMIZAJE_POR_PAGINA', default=25, cast=int)
+
+# Cola de generación de reportes PDF
+# 'procesos' usa un pool local de procesos; 'sincrono' genera el PDF en la
+# misma solicitud (útil en tests y desarrollo).
+REPORTES_PDF_MODO = config('REPORTES_PDF_MODO', default='procesos')
+REPORTES_PDF_WORKERS = config('REPORTES_PDF_WORKERS', default=2, cast=int)
+REPORTES_PDF_DIR = BASE_DIR / 'media' / 'reportes'
+# Segundos que un PDF se reutiliza aunque cambien los datos del período;
+# pasado ese plazo se reutiliza solo si su version_datos sigue vigente
+REPORTES_PDF_REUTILIZAR_TTL = config('REPORTES_PDF_REUTILIZAR_TTL', default=600, cast=int)
+# Segundos tras los cuales un trabajo sin terminar se considera abandonado
+REPORTES_PDF_TIMEOUT = config('REPORTES_PDF_TIMEOUT', default=300, cast=int)
+
+# Caché en disco de las fichas clínicas en PDF (tamaño máximo en bytes)
+FICHA_PDF_CACHE_DIR = BASE_DIR / 'media' / 'fichas'
+FICHA_PDF_CACHE_MAX_BYTES = config('FICHA_PDF_CACHE_MAX_BYTES', default=200 * 1024 * 1024, cast=int)
+
+
+# Canal de alertas activas (SSE): segundos entre revisiones de la BD por
+# proceso, latido para mantener viva la conexión y duración máxima de cada
+# conexión antes de que el navegador se reconecte. Cada conexión ocupa un
+# hilo del servidor durante ALERTAS_SSE_DURACION; solo la abren las páginas
+# de alertas y con gunicorn se deben usar workers con hilos (gthread).
+ALERTAS_FEED_INTERVALO = config('ALERTAS_FEED_INTERVALO', default=5, cast=float)
+ALERTAS_SSE_LATIDO = config('ALERTAS_SSE_LATIDO', default=20, cast=int)
+ALERTAS_SSE_DURACION = config('ALERTAS_SSE_DURACION', default=300, cast=int)
+ALERTAS_SSE_REINTENTO_MS = config('ALERTAS_SSE_REINTENTO_MS', default=5000, cast=int)
+
+
+# Auditoría diferida: 'diferido' acumula los registros en memoria y en un
+# spool local y los inserta por lotes (AUDITORIA_LOTE registros o
+# AUDITORIA_INTERVALO segundos); 'sincrono' inserta cada registro de inmediato.
+AUDITORIA_MODO = config('AUDITORIA_MODO', default='diferido')
+AUDITORIA_LOTE = config('AUDITORIA_LOTE', default=50, cast=int)
+AUDITORIA_INTERVALO = config('AUDITORIA_INTERVALO', default=5, cast=float)
+AUDITORIA_SPOOL_DIR = config('AUDITORIA_SPOOL_DIR', default=str(BASE_DIR / 'logs' / 'auditoria'))
+# fsync tras cada registro: sobrevive a cortes de energía, a costa de latencia
+AUDITORIA_SPOOL_FSYNC = config('AUDITORIA_SPOOL_FSYNC', default=False, cast=bool)
+
+# Particiones mensuales de auditoría (PostgreSQL): meses futuros que se
+# crean por adelantado, meses cerrados que se mantienen en la BD antes de
+# archivarse (archivar_auditoria) y años que se conservan los archivos
+# (Decreto 7/2023)
+AUDITORIA_MESES_ADELANTO = config('AUDITORIA_MESES_ADELANTO', default=3, cast=int)
+AUDITORIA_MESES_EN_LINEA = config('AUDITORIA_MESES_EN_LINEA', default=24, cast=int)
+AUDITORIA_ARCHIVO_DIR = config('AUDITORIA_ARCHIVO_DIR', default=str(BASE_DIR / 'archivo' / 'auditoria'))
+AUDITORIA_RETENCION_ANIOS = config('AUDITORIA_RETENCION_ANIOS', default=5, cast=int)
+
+# Presupuesto de consultas por solicitud (apps.administracion.consultas):
+# registra en el logger 'apps' las vistas que superan su presupuesto o
+# repiten una misma consulta CONSULTAS_REPETICIONES_MAX veces o más (N+1).
+# CONSULTAS_ESTRICTO lanza una excepción en vez de solo registrar.
+CONSULTAS_MEDIR = config('CONSULTAS_MEDIR', default=DEBUG, cast=bool)
+CONSULTAS_ESTRICTO = config('CONSULTAS_ESTRICTO', default=False, cast=bool)
+CONSULTAS_PRESUPUESTO_DEFECTO = config('CONSULTAS_PRESUPUESTO_DEFECTO', default=15, cast=int)
+CONSULTAS_REPETICIONES_MAX = config('CONSULTAS_REPETICIONES_MAX', default=5, cast=int)
+
+# Métricas de operación expuestas en /metrics (apps.administracion.metricas).
+# Cada worker vuelca sus totales a METRICAS_DIR cada METRICAS_INTERVALO
+# segundos; el endpoint suma los archivos de todos los procesos. Además de
+# jefe_servicio y staff, un recolector puede autenticarse con
+# "Authorization: Bearer <METRICAS_TOKEN>".
+METRICAS_ACTIVAS = config('METRICAS_ACTIVAS', default=True, cast=bool)
+METRICAS_DIR = config('METRICAS_DIR', default=str(BASE_DIR / 'logs' / 'metricas'))
+METRICAS_INTERVALO = config('METRICAS_INTERVALO', default=10, cast=float)
+METRICAS_TOKEN = config('METRICAS_TOKEN', default='')
+
+# Los tests insertan la auditoría de forma síncrona (ver test_runner.py)
+TEST_RUNNER = 'hospital_hhm.test_runner.HospitalTestRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
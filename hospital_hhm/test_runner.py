@@ -0,0 +1,31 @@
+"""
+Runner de tests del proyecto.
+
+Cada TestCase corre dentro de una transacción que se revierte al final, así
+que los registros que quedaran en la cola diferida de auditoría apuntarían
+a datos de un test anterior. Durante los tests la auditoría se inserta de
+forma síncrona y el spool se escribe en un directorio temporal, al igual
+que los volcados de métricas.
+"""
+
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class HospitalTestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._spool_auditoria = tempfile.mkdtemp(prefix='auditoria-tests-')
+        settings.AUDITORIA_MODO = 'sincrono'
+        settings.AUDITORIA_SPOOL_DIR = self._spool_auditoria
+        self._metricas = tempfile.mkdtemp(prefix='metricas-tests-')
+        settings.METRICAS_DIR = self._metricas
+
+    def teardown_test_environment(self, **kwargs):
+        shutil.rmtree(self._spool_auditoria, ignore_errors=True)
+        shutil.rmtree(self._metricas, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
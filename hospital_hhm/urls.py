@@ -4,10 +4,12 @@ URL configuration for hospital_hhm project.
 from django.contrib import admin
 from django.urls import path, include
 from django.shortcuts import redirect
+from apps.administracion.views import metricas
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', lambda request: redirect('login')),
+    path('metrics', metricas, name='metricas'),
     path('auth/', include('apps.administracion.urls')),
     path('pacientes/', include('apps.pacientes.urls')),
     path('obstetricia/', include('apps.obstetricia.urls')),
@@ -0,0 +1,52 @@
+#!/bin/bash
+# Matriz de compatibilidad de migraciones
+# Sistema Obstétrico Hospital Herminda Martín
+#
+# Ejecuta las pruebas de migraciones (y opcionalmente toda la suite) con
+# cada perfil de base de datos (BD_PERFIL). PostgreSQL se omite si no hay
+# un servidor accesible con las variables DATABASE_* del entorno.
+#
+# Uso:
+#   ./scripts/migraciones/matriz_compatibilidad.sh            # solo migraciones
+#   ./scripts/migraciones/matriz_compatibilidad.sh --completa # toda la suite
+
+SCRIPT_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd "$SCRIPT_DIR/../.."
+
+PRUEBAS="apps.administracion.tests.CompatibilidadMigracionesTest apps.administracion.tests.PerfilesBaseDatosTest"
+if [ "$1" == "--completa" ]; then
+    PRUEBAS="apps"
+fi
+
+FALLIDOS=0
+for PERFIL in sqlite postgresql; do
+    echo "=================================================="
+    echo "  Perfil: $PERFIL"
+    echo "=================================================="
+
+    if [ "$PERFIL" == "postgresql" ]; then
+        BD_PERFIL=postgresql python -c "
+import os, django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospital_hhm.settings')
+django.setup()
+from django.db import connection
+connection.ensure_connection()
+" 2>/dev/null
+        if [ $? -ne 0 ]; then
+            echo "⚠️  PostgreSQL no disponible (revise DATABASE_HOST/USER/PASSWORD). Se omite."
+            echo ""
+            continue
+        fi
+    fi
+
+    BD_PERFIL=$PERFIL python manage.py test $PRUEBAS --noinput
+    if [ $? -ne 0 ]; then
+        echo "❌ Fallaron las pruebas con $PERFIL"
+        FALLIDOS=$((FALLIDOS + 1))
+    else
+        echo "✅ $PERFIL compatible"
+    fi
+    echo ""
+done
+
+exit $FALLIDOS